@@ -195,6 +195,24 @@ SESSION_COOKIE_SECURE = not DEBUG
 SESSION_COOKIE_HTTPONLY = True
 SESSION_COOKIE_SAMESITE = 'Lax'
 
+# Face recognition service
+# Shared key the face service sends (X-Face-Service-Key) when it calls the backend.
+# Unset (dev): only the session roster is served to a keyless face service on localhost.
+FACE_SERVICE_API_KEY = os.environ.get('FACE_SERVICE_API_KEY', '')
+# Length of one embedding in User.face_vector (float32 values); must match the face service model
+FACE_VECTOR_DIM = int(os.environ.get('FACE_VECTOR_DIM', 2048))
+# Server-side face service client (classroom/face_client.py)
+FACE_SERVICE_URL = os.environ.get('FACE_SERVICE_URL', 'http://localhost:5000')
+FACE_SERVICE_CONNECT_TIMEOUT = float(os.environ.get('FACE_SERVICE_CONNECT_TIMEOUT', 2))
+FACE_SERVICE_READ_TIMEOUT = float(os.environ.get('FACE_SERVICE_READ_TIMEOUT', 10))
+FACE_SERVICE_RETRIES = int(os.environ.get('FACE_SERVICE_RETRIES', 2))
+FACE_SERVICE_POOL_SIZE = int(os.environ.get('FACE_SERVICE_POOL_SIZE', 10))
+FACE_SERVICE_BREAKER_THRESHOLD = int(os.environ.get('FACE_SERVICE_BREAKER_THRESHOLD', 5))
+FACE_SERVICE_BREAKER_RESET = float(os.environ.get('FACE_SERVICE_BREAKER_RESET', 30))
+# Re-run recognition on the backend instead of trusting the user_id posted by the browser.
+# FACE_VERIFY_ATTENDANCE=False is an explicit opt-out (trusts the browser; dev without a face service only)
+FACE_VERIFY_ATTENDANCE = os.environ.get('FACE_VERIFY_ATTENDANCE', 'True') == 'True'
+
 # Security settings for production
 if not DEBUG:
     SECURE_SSL_REDIRECT = True
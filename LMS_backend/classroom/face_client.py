@@ -0,0 +1,221 @@
+"""
+Server-side client for the face recognition service (LMS_face_service).
+
+One FaceServiceClient per process (get_face_client()) keeps a requests.Session whose
+HTTPAdapter holds a keep-alive connection pool, so Django does not pay a TCP handshake
+per recognition. Every call has connect/read timeouts; connection errors, timeouts and
+502/503/504/429 responses are retried a bounded number of times with exponential backoff.
+A circuit breaker counts those failures: once the face service looks down or saturated,
+calls fail fast with FaceServiceUnavailable until a single probe succeeds again.
+
+classroom/fake_face_service.py provides an in-process fake for tests.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+# Responses that mean "service down or saturated": retried and counted by the breaker
+UNAVAILABLE_STATUSES = {429, 502, 503, 504}
+
+
+class FaceServiceError(Exception):
+    """The face service rejected the request (4xx / malformed response)"""
+
+
+class FaceServiceUnavailable(FaceServiceError):
+    """Face service unreachable, saturated, or the circuit breaker is open"""
+
+
+class CircuitBreaker:
+    """
+    closed -> (failure_threshold consecutive failures) -> open
+    open -> (reset_timeout elapsed) -> half_open: one probe call is let through;
+    success closes the breaker, failure opens it again.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if self.clock() - self.opened_at >= self.reset_timeout:
+            return 'half_open'
+        return 'open'
+
+    def allow(self):
+        with self._lock:
+            state = self.state
+            if state == 'closed':
+                return True
+            if state == 'half_open' and not self.probing:
+                self.probing = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.probing or self.failures >= self.failure_threshold:
+                self.opened_at = self.clock()
+            self.probing = False
+
+    def stats(self):
+        return {
+            'state': self.state,
+            'failures': self.failures,
+            'rejected': self.rejected,
+        }
+
+
+class FaceServiceClient:
+    def __init__(self, base_url, api_key='', connect_timeout=2.0, read_timeout=10.0, retries=2,
+                 backoff=0.2, pool_size=10, breaker=None, session=None, sleep=time.sleep):
+        self.base_url = base_url.rstrip('/')
+        self.api_key = api_key
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.pool_size = pool_size
+        self.breaker = breaker or CircuitBreaker()
+        self._sleep = sleep
+
+        if session is None:
+            session = requests.Session()
+            # Retries are handled here (so the breaker sees every attempt), not by urllib3
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0, pool_block=True)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+        if api_key:
+            session.headers['X-Face-Service-Key'] = api_key
+        self.session = session
+
+    def request(self, method, path, retry=True, timeout=None, **kwargs):
+        """
+        Send one request with bounded retries. Returns the requests.Response for any
+        status the service answered normally (2xx/4xx). Raises FaceServiceUnavailable
+        when the circuit is open or every attempt failed.
+        """
+        attempts = 1 + (self.retries if retry else 0)
+        last_error = None
+        for attempt in range(attempts):
+            if not self.breaker.allow():
+                raise FaceServiceUnavailable('Face service circuit breaker is open') from last_error
+
+            retry_after = None
+            try:
+                response = self.session.request(method, self.base_url + path,
+                                                timeout=timeout or self.timeout, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                last_error = e
+            else:
+                if response.status_code not in UNAVAILABLE_STATUSES:
+                    self.breaker.record_success()
+                    return response
+                last_error = FaceServiceUnavailable(f'Face service returned {response.status_code}')
+                retry_after = response.headers.get('Retry-After')
+                response.close()
+            self.breaker.record_failure()
+
+            if attempt + 1 < attempts:
+                delay = self.backoff * (2 ** attempt)
+                if retry_after and retry_after.isdigit():
+                    delay = max(delay, min(float(retry_after), 5.0))
+                self._sleep(delay)
+
+        raise FaceServiceUnavailable(str(last_error)) from last_error
+
+    def _json(self, response):
+        try:
+            body = response.json()
+        except ValueError:
+            raise FaceServiceError(f'Invalid response from face service ({response.status_code})')
+        if response.status_code >= 400:
+            raise FaceServiceError(body.get('error') or f'Face service returned {response.status_code}')
+        return body
+
+    # ----- API -----
+    def health(self):
+        """Readiness of the face service (no retries: used for probes)"""
+        return self._json(self.request('GET', '/api/health/ready', retry=False))
+
+    def recognize(self, image, session_id=None, roster=None, threshold=None):
+        """
+        Recognize one face in raw JPEG/PNG bytes (POST /api/recognize-binary).
+        Returns the face service result dict (recognized, user_id, confidence, ...).
+        """
+        params = {}
+        if session_id is not None:
+            params['session_id'] = session_id
+        if roster:
+            params['roster'] = ','.join(roster)
+        if threshold is not None:
+            params['threshold'] = threshold
+        response = self.request('POST', '/api/recognize-binary', params=params, data=image,
+                                headers={'Content-Type': 'application/octet-stream'})
+        return self._json(response)
+
+    def recognize_many(self, images, session_id=None, roster=None, threshold=None):
+        """
+        Recognize several images concurrently over the pooled connections (the face
+        service micro-batches concurrent requests). Returns results in input order;
+        an image that failed yields its FaceServiceError instead of a dict.
+        """
+        def recognize_one(image):
+            try:
+                return self.recognize(image, session_id=session_id, roster=roster, threshold=threshold)
+            except FaceServiceError as e:
+                return e
+
+        if len(images) <= 1:
+            return [recognize_one(image) for image in images]
+        with ThreadPoolExecutor(max_workers=min(self.pool_size, len(images))) as pool:
+            return list(pool.map(recognize_one, images))
+
+    def stats(self):
+        return {
+            'base_url': self.base_url,
+            'pool_size': self.pool_size,
+            'breaker': self.breaker.stats(),
+        }
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_face_client():
+    """Process-wide FaceServiceClient built from settings (shares one connection pool)"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = FaceServiceClient(
+                settings.FACE_SERVICE_URL,
+                api_key=settings.FACE_SERVICE_API_KEY,
+                connect_timeout=settings.FACE_SERVICE_CONNECT_TIMEOUT,
+                read_timeout=settings.FACE_SERVICE_READ_TIMEOUT,
+                retries=settings.FACE_SERVICE_RETRIES,
+                pool_size=settings.FACE_SERVICE_POOL_SIZE,
+                breaker=CircuitBreaker(settings.FACE_SERVICE_BREAKER_THRESHOLD,
+                                       settings.FACE_SERVICE_BREAKER_RESET),
+            )
+        return _client
@@ -0,0 +1,122 @@
+"""
+Binary format for bulk face vector export/import between Django and the face service.
+
+User.face_vector holds the raw little-endian float32 bytes of one embedding (dim values)
+or of several prototypes (count * dim values). The stream format is:
+
+    header   b"FVEC" | u8 version | u32 dim | u32 number of records (hint, may be 0)
+    record   u16 len(user_id) | user_id (utf-8) | u16 count | count * dim float32 (LE)
+    trailer  u16 0 | u32 number of records written
+
+A record with count 0 clears that user's face vector (import only). A stream without
+the trailer is truncated and must be rejected. The face service has a NumPy version
+of the same codec (LMS_face_service/face_vectors.py).
+"""
+import struct
+
+from django.conf import settings
+
+from .models import User
+
+MAGIC = b'FVEC'
+VERSION = 1
+
+_HEADER = struct.Struct('<4sBII')
+_U16 = struct.Struct('<H')
+_U32 = struct.Struct('<I')
+
+STREAM_CHUNK_SIZE = 1 << 16
+
+
+def face_vector_dim():
+    return settings.FACE_VECTOR_DIM
+
+
+def prototype_count(data, dim):
+    """Number of dim-sized float32 vectors in face_vector bytes, 0 if malformed"""
+    if not data:
+        return 0
+    row_bytes = 4 * dim
+    if len(data) % row_bytes:
+        return 0
+    return len(data) // row_bytes
+
+
+def encode_header(dim, n_records=0):
+    return _HEADER.pack(MAGIC, VERSION, dim, n_records)
+
+
+def encode_record(user_id, data, dim):
+    """One record; data is count * dim float32 bytes (empty to clear)"""
+    name = user_id.encode('utf-8')
+    return _U16.pack(len(name)) + name + _U16.pack(len(data) // (4 * dim)) + bytes(data)
+
+
+def encode_trailer(n_records):
+    return _U16.pack(0) + _U32.pack(n_records)
+
+
+def face_vector_rows():
+    """(username, face_vector bytes) for every user with a stored face vector, streamed from the DB"""
+    queryset = (
+        User.objects.filter(face_vector__isnull=False)
+        .exclude(username__isnull=True)
+        .order_by('id')
+        .values_list('username', 'face_vector')
+    )
+    for username, data in queryset.iterator(chunk_size=2000):
+        yield username, bytes(data)
+
+
+def stream_face_vectors(rows, dim, n_hint=0):
+    """Encode (user_id, bytes) rows into ~64 KB chunks; malformed vectors are skipped"""
+    buffer = bytearray(encode_header(dim, n_hint))
+    written = 0
+    for user_id, data in rows:
+        if not prototype_count(data, dim):
+            continue
+        buffer += encode_record(user_id, data, dim)
+        written += 1
+        if len(buffer) >= STREAM_CHUNK_SIZE:
+            yield bytes(buffer)
+            buffer.clear()
+    buffer += encode_trailer(written)
+    yield bytes(buffer)
+
+
+def _read_exact(stream, size):
+    # Request/socket streams may return short reads before EOF
+    chunks, received = [], 0
+    while received < size:
+        chunk = stream.read(size - received)
+        if not chunk:
+            raise ValueError('Truncated face vector stream')
+        chunks.append(chunk)
+        received += len(chunk)
+    return b''.join(chunks)
+
+
+def read_header(stream):
+    """Returns: (dim, n_records hint)"""
+    magic, version, dim, n_records = _HEADER.unpack(_read_exact(stream, _HEADER.size))
+    if magic != MAGIC or version != VERSION:
+        raise ValueError('Not a face vector stream (bad magic or version)')
+    if dim == 0:
+        raise ValueError('Invalid face vector dimension 0')
+    return dim, n_records
+
+
+def read_records(stream, dim):
+    """Yield (user_id, face_vector bytes) until the trailer; empty bytes mean 'clear'"""
+    count = 0
+    while True:
+        (name_length,) = _U16.unpack(_read_exact(stream, _U16.size))
+        if name_length == 0:
+            (expected,) = _U32.unpack(_read_exact(stream, _U32.size))
+            if expected != count:
+                raise ValueError(f'Face vector stream has {count} records, trailer says {expected}')
+            return
+        user_id = _read_exact(stream, name_length).decode('utf-8')
+        (rows,) = _U16.unpack(_read_exact(stream, _U16.size))
+        yield user_id, _read_exact(stream, rows * dim * 4) if rows else b''
+        count += 1
@@ -0,0 +1,98 @@
+"""
+In-process fake of the face recognition service for tests.
+
+FakeFaceService is a requests transport adapter: mounted on a Session it answers
+/api/health/ready and /api/recognize-binary without opening sockets, so tests can
+exercise FaceServiceClient (pooling aside) including retries and the circuit breaker.
+
+    fake = FakeFaceService()
+    fake.enroll(b'alice-jpeg', 'alice', confidence=97.5)
+    fake.fail_next(2)                 # next two calls raise ConnectionError
+    fake.respond_next(503)            # then one 503
+    client = fake.client(retries=2)
+"""
+import json
+import threading
+from urllib.parse import parse_qs, urlsplit
+
+import requests
+from requests.adapters import BaseAdapter
+
+from .face_client import FaceServiceClient
+
+
+class FakeFaceService(BaseAdapter):
+    base_url = 'http://face-service.test'
+
+    def __init__(self):
+        super().__init__()
+        self.faces = {}
+        self.ready = True
+        self.calls = []
+        self._faults = []
+        self._lock = threading.Lock()
+
+    def enroll(self, image, user_id, confidence=95.0):
+        """Recognizing exactly these image bytes returns user_id"""
+        self.faces[bytes(image)] = (user_id, confidence)
+
+    def fail_next(self, times=1, error=requests.ConnectionError):
+        with self._lock:
+            self._faults.extend([error] * times)
+
+    def respond_next(self, status_code, times=1):
+        with self._lock:
+            self._faults.extend([status_code] * times)
+
+    def client(self, **kwargs):
+        session = requests.Session()
+        session.mount(self.base_url, self)
+        kwargs.setdefault('sleep', lambda seconds: None)
+        return FaceServiceClient(self.base_url, session=session, **kwargs)
+
+    # ----- requests adapter -----
+    def send(self, request, **kwargs):
+        url = urlsplit(request.url)
+        with self._lock:
+            self.calls.append((request.method, url.path))
+            fault = self._faults.pop(0) if self._faults else None
+        if isinstance(fault, type):
+            raise fault(f'Fake face service: {fault.__name__}', request=request)
+        if fault is not None:
+            return self._response(request, fault, {'success': False, 'error': 'Injected failure'})
+
+        if url.path == '/api/health/ready':
+            return self._response(request, 200 if self.ready else 503, {'ready': self.ready})
+        if url.path == '/api/recognize-binary' and request.method == 'POST':
+            return self._recognize(request, parse_qs(url.query))
+        return self._response(request, 404, {'success': False, 'error': 'Not found'})
+
+    def close(self):
+        pass
+
+    def _recognize(self, request, params):
+        if not request.body:
+            return self._response(request, 400, {'success': False, 'error': 'No image provided'})
+        session_id = params.get('session_id', [None])[0]
+        roster = params['roster'][0].split(',') if 'roster' in params else None
+        match = self.faces.get(bytes(request.body))
+        if match and roster is not None and match[0] not in roster:
+            match = None
+        user_id, confidence = match or (None, 0)
+        return self._response(request, 200, {
+            'success': True,
+            'recognized': match is not None,
+            'user_id': user_id,
+            'confidence': confidence,
+            'session_id': session_id,
+        })
+
+    @staticmethod
+    def _response(request, status_code, body):
+        response = requests.Response()
+        response.status_code = status_code
+        response.headers['Content-Type'] = 'application/json'
+        response._content = json.dumps(body).encode('utf-8')
+        response.request = request
+        response.url = request.url
+        return response
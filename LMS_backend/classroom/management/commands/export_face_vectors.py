@@ -0,0 +1,30 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from classroom import face_vectors
+from classroom.models import User
+
+
+class Command(BaseCommand):
+    help = 'Export every User.face_vector in the binary format the face service bulk-loads (see classroom/face_vectors.py)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', nargs='?', default='-', help='Output file (default: stdout)')
+
+    def handle(self, *args, **options):
+        dim = face_vectors.face_vector_dim()
+        count = User.objects.filter(face_vector__isnull=False).exclude(username__isnull=True).count()
+        chunks = face_vectors.stream_face_vectors(face_vectors.face_vector_rows(), dim, count)
+
+        if options['output'] == '-':
+            out = sys.stdout.buffer
+            for chunk in chunks:
+                out.write(chunk)
+            out.flush()
+            return
+
+        with open(options['output'], 'wb') as out:
+            for chunk in chunks:
+                out.write(chunk)
+        self.stderr.write(self.style.SUCCESS(f'Exported {count} face vectors (dim {dim}) to {options["output"]}'))
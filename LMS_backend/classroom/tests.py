@@ -7,6 +7,16 @@ from .models import User, Class, Session, ClassMembership, Attendance, Material,
 from django.core.files.uploadedfile import SimpleUploadedFile
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework.response import Response
+from django.test import override_settings
+from django.core.management import call_command
+from . import face_vectors
+from .face_client import CircuitBreaker, FaceServiceError, FaceServiceUnavailable
+from .fake_face_service import FakeFaceService
+from unittest import mock
+import base64
+import io
+import struct
+import tempfile
 
 class AuthAPI(APITestCase):
     def test_register_admin(self):
@@ -363,4 +373,327 @@ class AnnouncementTestAPI(APITestCase):
         response = self.client.post(reverse('announcement-list-create'), data, format='json')
         print(response.content)
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
-        self.assertEqual(Announcement.objects.count(), 0)
\ No newline at end of file
+        self.assertEqual(Announcement.objects.count(), 0)
+
+class SessionRosterTestAPI(APITestCase):
+    def setUp(self):
+        self.lecturer = User.objects.create_user(username='kimtuoi', email='kimtuoi@gmail.com', password='Admin@123', role='lecturer')
+        self.student = User.objects.create_user(username='congtri', email='congtri@gmail.com', password='Student@123', role='student')
+        self.outsider = User.objects.create_user(username='outsider', email='outsider@gmail.com', password='Student@123', role='student')
+        self.class_obj = Class.objects.create(name='Test Class', description='Test Description', start_date='2025-09-16', end_date='2025-09-17', lecturer=self.lecturer)
+        self.session_obj = Session.objects.create(class_id=self.class_obj, topic='Test Session', date='2025-09-16 10:00:00')
+        ClassMembership.objects.create(user=self.student, class_id=self.class_obj, role='student')
+
+    def test_roster_as_lecturer(self):
+        self.client.force_authenticate(user=self.lecturer)
+        response = self.client.get(reverse('session-roster', args=[self.session_obj.id]))
+        print(response.content)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['user_ids'], ['congtri'])
+        self.assertEqual(response.data['class_id'], self.class_obj.id)
+
+    def test_roster_as_outsider(self):
+        self.client.force_authenticate(user=self.outsider)
+        response = self.client.get(reverse('session-roster', args=[self.session_obj.id]))
+        print(response.content)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    @override_settings(FACE_SERVICE_API_KEY='face-secret')
+    def test_roster_with_service_key(self):
+        response = self.client.get(reverse('session-roster', args=[self.session_obj.id]), HTTP_X_FACE_SERVICE_KEY='face-secret')
+        print(response.content)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 1)
+
+    @override_settings(FACE_SERVICE_API_KEY='face-secret')
+    def test_roster_with_wrong_service_key(self):
+        response = self.client.get(reverse('session-roster', args=[self.session_obj.id]), HTTP_X_FACE_SERVICE_KEY='wrong')
+        print(response.content)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    @override_settings(FACE_SERVICE_API_KEY='')
+    def test_roster_keyless_face_service_on_localhost(self):
+        # Face service chưa cấu hình key gửi header rỗng từ localhost
+        response = self.client.get(reverse('session-roster', args=[self.session_obj.id]),
+                                   HTTP_X_FACE_SERVICE_KEY='', REMOTE_ADDR='127.0.0.1')
+        print(response.content)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['user_ids'], ['congtri'])
+
+    @override_settings(FACE_SERVICE_API_KEY='')
+    def test_roster_keyless_remote_or_proxied(self):
+        response = self.client.get(reverse('session-roster', args=[self.session_obj.id]),
+                                   HTTP_X_FACE_SERVICE_KEY='', REMOTE_ADDR='10.0.0.7')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        response = self.client.get(reverse('session-roster', args=[self.session_obj.id]),
+                                   HTTP_X_FACE_SERVICE_KEY='', REMOTE_ADDR='127.0.0.1',
+                                   HTTP_X_FORWARDED_FOR='203.0.113.5')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+class BulkFaceAttendanceTestAPI(APITestCase):
+    def setUp(self):
+        self.lecturer = User.objects.create_user(username='kimtuoi', email='kimtuoi@gmail.com', password='Admin@123', role='lecturer')
+        self.student = User.objects.create_user(username='congtri', email='congtri@gmail.com', password='Student@123', role='student')
+        self.student2 = User.objects.create_user(username='minhanh', email='minhanh@gmail.com', password='Student@123', role='student')
+        self.outsider = User.objects.create_user(username='outsider', email='outsider@gmail.com', password='Student@123', role='student')
+        self.class_obj = Class.objects.create(name='Test Class', description='Test Description', start_date='2025-09-16', end_date='2025-09-17', lecturer=self.lecturer)
+        self.session_obj = Session.objects.create(class_id=self.class_obj, topic='Test Session', date='2025-09-16 10:00:00', is_attendance_open=True)
+        ClassMembership.objects.create(user=self.student, class_id=self.class_obj, role='student')
+        ClassMembership.objects.create(user=self.student2, class_id=self.class_obj, role='student')
+        Attendance.objects.create(session=self.session_obj, user=self.student2, is_verified=True)
+
+    def test_bulk_mark_as_lecturer(self):
+        self.client.force_authenticate(user=self.lecturer)
+        data = {
+            'session_id': self.session_obj.id,
+            'matches': [
+                {'user_id': 'congtri', 'confidence': 91.2},
+                {'user_id': 'minhanh', 'confidence': 88.0},
+                {'user_id': 'outsider', 'confidence': 80.0},
+                {'user_id': 'ghost', 'confidence': 75.0}
+            ]
+        }
+        response = self.client.post(reverse('mark-bulk-attendance-face'), data, format='json')
+        print(response.content)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['marked'], ['congtri'])
+        self.assertEqual(response.data['already_marked'], ['minhanh'])
+        self.assertEqual(response.data['not_enrolled'], ['outsider'])
+        self.assertEqual(response.data['not_found'], ['ghost'])
+        self.assertEqual(Attendance.objects.filter(session=self.session_obj).count(), 2)
+
+    def test_bulk_mark_as_student(self):
+        self.client.force_authenticate(user=self.student)
+        data = {'session_id': self.session_obj.id, 'matches': [{'user_id': 'congtri'}]}
+        response = self.client.post(reverse('mark-bulk-attendance-face'), data, format='json')
+        print(response.content)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(Attendance.objects.count(), 1)
+
+    def test_bulk_mark_attendance_closed(self):
+        self.session_obj.is_attendance_open = False
+        self.session_obj.save()
+        self.client.force_authenticate(user=self.lecturer)
+        data = {'session_id': self.session_obj.id, 'matches': [{'user_id': 'congtri'}]}
+        response = self.client.post(reverse('mark-bulk-attendance-face'), data, format='json')
+        print(response.content)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+@override_settings(FACE_SERVICE_API_KEY='face-secret', FACE_VECTOR_DIM=4)
+class FaceVectorSyncTestAPI(APITestCase):
+    def setUp(self):
+        self.student = User.objects.create_user(username='congtri', email='congtri@gmail.com', password='Student@123', role='student')
+        self.student2 = User.objects.create_user(username='minhanh', email='minhanh@gmail.com', password='Student@123', role='student')
+        self.student3 = User.objects.create_user(username='noface', email='noface@gmail.com', password='Student@123', role='student')
+        self.student.face_vector = struct.pack('<4f', 0.1, 0.2, 0.3, 0.4)
+        self.student.save()
+        # Hai prototype
+        self.student2.face_vector = struct.pack('<8f', 1, 0, 0, 0, 0, 1, 0, 0)
+        self.student2.save()
+
+    def read_stream(self, content):
+        stream = io.BytesIO(content)
+        dim, _ = face_vectors.read_header(stream)
+        return dim, dict(face_vectors.read_records(stream, dim))
+
+    def test_export_with_service_key(self):
+        response = self.client.get(reverse('face-vectors-export'), HTTP_X_FACE_SERVICE_KEY='face-secret')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        dim, records = self.read_stream(b''.join(response.streaming_content))
+        self.assertEqual(dim, 4)
+        self.assertEqual(set(records), {'congtri', 'minhanh'})
+        self.assertEqual(records['minhanh'], bytes(self.student2.face_vector))
+
+    def test_export_skips_malformed_vectors(self):
+        self.student3.face_vector = b'\x00' * 6
+        self.student3.save()
+        response = self.client.get(reverse('face-vectors-export'), HTTP_X_FACE_SERVICE_KEY='face-secret')
+        _, records = self.read_stream(b''.join(response.streaming_content))
+        self.assertNotIn('noface', records)
+
+    def test_export_as_student(self):
+        self.client.force_authenticate(user=self.student)
+        response = self.client.get(reverse('face-vectors-export'))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_import_with_service_key(self):
+        body = (face_vectors.encode_header(4, 3)
+                + face_vectors.encode_record('noface', struct.pack('<4f', 1, 1, 1, 1), 4)
+                + face_vectors.encode_record('congtri', b'', 4)
+                + face_vectors.encode_record('ghost', struct.pack('<4f', 0, 0, 0, 1), 4)
+                + face_vectors.encode_trailer(3))
+        response = self.client.post(reverse('face-vectors-import'), body, content_type='application/octet-stream',
+                                    HTTP_X_FACE_SERVICE_KEY='face-secret')
+        print(response.content)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['updated'], 1)
+        self.assertEqual(response.data['cleared'], 1)
+        self.assertEqual(response.data['not_found'], ['ghost'])
+        self.student3.refresh_from_db()
+        self.student.refresh_from_db()
+        self.assertEqual(bytes(self.student3.face_vector), struct.pack('<4f', 1, 1, 1, 1))
+        self.assertIsNone(self.student.face_vector)
+
+    def test_import_truncated_stream(self):
+        body = face_vectors.encode_header(4, 1) + face_vectors.encode_record('noface', struct.pack('<4f', 1, 1, 1, 1), 4)
+        response = self.client.post(reverse('face-vectors-import'), body, content_type='application/octet-stream',
+                                    HTTP_X_FACE_SERVICE_KEY='face-secret')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.student3.refresh_from_db()
+        self.assertIsNone(self.student3.face_vector)
+
+    def test_export_command(self):
+        out = io.BytesIO()
+        with tempfile.NamedTemporaryFile(suffix='.fvec') as f:
+            call_command('export_face_vectors', f.name, stderr=io.StringIO())
+            out.write(f.read())
+        _, records = self.read_stream(out.getvalue())
+        self.assertEqual(records['congtri'], struct.pack('<4f', 0.1, 0.2, 0.3, 0.4))
+
+class FaceServiceClientTest(TestCase):
+    def setUp(self):
+        self.fake = FakeFaceService()
+        self.fake.enroll(b'congtri-face', 'congtri', confidence=93.5)
+
+    def test_recognize(self):
+        result = self.fake.client().recognize(b'congtri-face', session_id=7, roster=['congtri', 'minhanh'])
+        self.assertTrue(result['recognized'])
+        self.assertEqual(result['user_id'], 'congtri')
+        self.assertEqual(result['session_id'], '7')
+        result = self.fake.client().recognize(b'congtri-face', roster=['minhanh'])
+        self.assertFalse(result['recognized'])
+
+    def test_retries_then_succeeds(self):
+        self.fake.fail_next(1)
+        self.fake.respond_next(503)
+        client = self.fake.client(retries=2)
+        self.assertEqual(client.recognize(b'congtri-face')['user_id'], 'congtri')
+        self.assertEqual(len(self.fake.calls), 3)
+        self.assertEqual(client.breaker.stats()['failures'], 0)
+
+    def test_retries_are_bounded(self):
+        self.fake.fail_next(10)
+        client = self.fake.client(retries=2)
+        with self.assertRaises(FaceServiceUnavailable):
+            client.recognize(b'congtri-face')
+        self.assertEqual(len(self.fake.calls), 3)
+
+    def test_client_error_not_retried(self):
+        client = self.fake.client(retries=2)
+        with self.assertRaises(FaceServiceError) as ctx:
+            client.recognize(b'')
+        self.assertNotIsInstance(ctx.exception, FaceServiceUnavailable)
+        self.assertEqual(len(self.fake.calls), 1)
+        self.assertEqual(client.breaker.state, 'closed')
+
+    def test_breaker_opens_and_recovers(self):
+        now = [0.0]
+        breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30, clock=lambda: now[0])
+        client = self.fake.client(retries=0, breaker=breaker)
+        self.fake.fail_next(3)
+        for _ in range(3):
+            with self.assertRaises(FaceServiceUnavailable):
+                client.recognize(b'congtri-face')
+        self.assertEqual(breaker.state, 'open')
+
+        # Fail fast: the fake service is not called while open
+        with self.assertRaises(FaceServiceUnavailable):
+            client.recognize(b'congtri-face')
+        self.assertEqual(len(self.fake.calls), 3)
+        self.assertEqual(breaker.stats()['rejected'], 1)
+
+        # Half-open: one failing probe re-opens, one succeeding probe closes
+        now[0] = 31
+        self.assertEqual(breaker.state, 'half_open')
+        self.fake.respond_next(503)
+        with self.assertRaises(FaceServiceUnavailable):
+            client.recognize(b'congtri-face')
+        self.assertEqual(breaker.state, 'open')
+        now[0] = 62
+        self.assertEqual(client.recognize(b'congtri-face')['user_id'], 'congtri')
+        self.assertEqual(breaker.state, 'closed')
+
+    def test_recognize_many(self):
+        self.fake.enroll(b'minhanh-face', 'minhanh')
+        results = self.fake.client(pool_size=4).recognize_many([b'congtri-face', b'minhanh-face', b'unknown', b''])
+        self.assertEqual([r['user_id'] for r in results[:3]], ['congtri', 'minhanh', None])
+        self.assertIsInstance(results[3], FaceServiceError)
+
+# FACE_VERIFY_ATTENDANCE mặc định bật
+@override_settings(FACE_SERVICE_API_KEY='face-secret')
+class VerifiedFaceAttendanceTestAPI(APITestCase):
+    def setUp(self):
+        self.lecturer = User.objects.create_user(username='kimtuoi', email='kimtuoi@gmail.com', password='Admin@123', role='lecturer')
+        self.student = User.objects.create_user(username='congtri', email='congtri@gmail.com', password='Student@123', role='student')
+        self.student2 = User.objects.create_user(username='minhanh', email='minhanh@gmail.com', password='Student@123', role='student')
+        self.class_obj = Class.objects.create(name='Test Class', description='Test Description', start_date='2025-09-16', end_date='2025-09-17', lecturer=self.lecturer)
+        self.session_obj = Session.objects.create(class_id=self.class_obj, topic='Test Session', date='2025-09-16 10:00:00', is_attendance_open=True)
+        ClassMembership.objects.create(user=self.student, class_id=self.class_obj, role='student')
+        ClassMembership.objects.create(user=self.student2, class_id=self.class_obj, role='student')
+
+        self.fake = FakeFaceService()
+        self.fake.enroll(b'congtri-face', 'congtri', confidence=93.5)
+        patcher = mock.patch('classroom.views.get_face_client', return_value=self.fake.client(retries=1))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def post(self, image, **extra):
+        data = {'session_id': self.session_obj.id, 'image': base64.b64encode(image).decode(), **extra}
+        return self.client.post(reverse('mark-attendance-face'), data, format='json')
+
+    def test_marks_recognized_user(self):
+        response = self.post(b'congtri-face')
+        print(response.content)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['attendance']['username'], 'congtri')
+        self.assertTrue(Attendance.objects.filter(session=self.session_obj, user=self.student).exists())
+
+    def test_frontend_multipart_request(self):
+        # FaceAttendance.js markAttendance(): FormData with the captured JPEG frame
+        data = {
+            'session_id': self.session_obj.id,
+            'user_id': 'congtri',
+            'confidence': '91.2',
+            'distance': '0.08',
+            'image': SimpleUploadedFile('frame.jpg', b'congtri-face', content_type='image/jpeg'),
+        }
+        response = self.client.post(reverse('mark-attendance-face'), data, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['attendance']['username'], 'congtri')
+        self.assertEqual(len(self.fake.calls), 1)
+
+    def test_claimed_user_must_match_face(self):
+        response = self.post(b'congtri-face', user_id='minhanh')
+        print(response.content)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(Attendance.objects.count(), 0)
+
+    def test_user_id_alone_is_rejected(self):
+        data = {'session_id': self.session_obj.id, 'user_id': 'congtri'}
+        response = self.client.post(reverse('mark-attendance-face'), data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Attendance.objects.count(), 0)
+
+    def test_unrecognized_face(self):
+        response = self.post(b'stranger-face')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_face_service_down(self):
+        self.fake.fail_next(2)
+        response = self.post(b'congtri-face')
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(Attendance.objects.count(), 0)
+
+    def test_face_service_request_is_trusted(self):
+        data = {'session_id': self.session_obj.id, 'user_id': 'congtri'}
+        response = self.client.post(reverse('mark-attendance-face'), data, format='json',
+                                    HTTP_X_FACE_SERVICE_KEY='face-secret')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.fake.calls, [])
+
+    @override_settings(FACE_VERIFY_ATTENDANCE=False)
+    def test_opt_out_trusts_posted_user_id(self):
+        data = {'session_id': self.session_obj.id, 'user_id': 'congtri'}
+        response = self.client.post(reverse('mark-attendance-face'), data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.fake.calls, [])
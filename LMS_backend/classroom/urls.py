@@ -5,7 +5,8 @@ from .views import ( RegisterView, CustomLoginView, UserListCreateView, UserDeta
     AttendanceView, MaterialView, SystemAnnouncementView, ClassAnnouncementView,
     enroll_class, AdminCreateUserView, LoginHistoryView, ClassMembershipView,
     get_available_classes, join_open_class, join_class_with_code,ClassAnnouncementDetailView,
-    mark_attendance_with_face, toggle_attendance, delete_attendance,
+    mark_attendance_with_face, toggle_attendance, delete_attendance, get_session_roster,
+    mark_bulk_attendance_with_face, export_face_vectors, import_face_vectors,
     UnreadNotificationCountView, MarkAllNotificationAsReadView, MarkNotificationAsReadView,
     NotificationListView, TagViewSet, CategoryViewSet,ClassListView
 )
@@ -58,6 +59,7 @@ urlpatterns = [
     path('sessions/', SessionListCreateView.as_view(), name='session-list'),
     path('sessions/<int:pk>/', SessionDetailView.as_view(), name='session-detail'),
     path('sessions/<int:session_id>/toggle-attendance/', toggle_attendance, name='toggle-attendance'),
+    path('sessions/<int:session_id>/roster/', get_session_roster, name='session-roster'),
     
     # Membership
     path('invite/', InviteUserView.as_view(), name='invite-user'),
@@ -66,6 +68,9 @@ urlpatterns = [
     # Attendance
     path('attendances/', AttendanceView.as_view(), name='attendance-list'),
     path('attendances/mark-with-face/', mark_attendance_with_face, name='mark-attendance-face'),
+    path('attendances/mark-bulk-with-face/', mark_bulk_attendance_with_face, name='mark-bulk-attendance-face'),
+    path('face-vectors/export/', export_face_vectors, name='face-vectors-export'),
+    path('face-vectors/import/', import_face_vectors, name='face-vectors-import'),
     path('attendances/<int:pk>/', delete_attendance, name='delete-attendance'), 
     
     # Materials
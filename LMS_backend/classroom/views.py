@@ -25,6 +25,14 @@ import json
 from rest_framework.views import APIView
 from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.pagination import PageNumberPagination
+from django.conf import settings
+from django.db import transaction
+from django.http import StreamingHttpResponse
+from . import face_vectors
+from .face_client import get_face_client, FaceServiceError, FaceServiceUnavailable
+import base64
+import binascii
+import hmac
 
 logger = logging.getLogger(__name__)
 
@@ -562,6 +570,21 @@ class AttendanceView(generics.ListCreateAPIView):
             raise ValidationError("You have already attended this session")
         serializer.save(user=self.request.user)
 
+def attendance_image(request):
+    """Image bytes from a multipart 'image' file or a base64 'image' field (data URL allowed)"""
+    upload = request.FILES.get('image') if hasattr(request, 'FILES') else None
+    if upload is not None:
+        return upload.read()
+    encoded = request.data.get('image')
+    if not isinstance(encoded, str) or not encoded:
+        return None
+    if encoded.startswith('data:'):
+        encoded = encoded.split(',', 1)[-1]
+    try:
+        return base64.b64decode(encoded, validate=True)
+    except (binascii.Error, ValueError):
+        return None
+
 # Face Recognition Attendance API
 @api_view(['POST'])
 @authentication_classes([])  # No authentication required
@@ -577,6 +600,46 @@ def mark_attendance_with_face(request):
         print(f"  - username: {username}")
         print(f"  - confidence: {confidence}")
         
+        # Browser-posted user_id is not trusted: recognize the image on the backend
+        if settings.FACE_VERIFY_ATTENDANCE and not is_face_service_request(request):
+            if not session_id:
+                return Response({
+                    'success': False,
+                    'error': 'Missing session_id'
+                }, status=status.HTTP_400_BAD_REQUEST)
+            image = attendance_image(request)
+            if not image:
+                return Response({
+                    'success': False,
+                    'error': 'Missing or invalid image'
+                }, status=status.HTTP_400_BAD_REQUEST)
+            try:
+                result = get_face_client().recognize(image, session_id=session_id)
+            except FaceServiceUnavailable as e:
+                return Response({
+                    'success': False,
+                    'error': f'Face service unavailable: {e}'
+                }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+            except FaceServiceError as e:
+                return Response({
+                    'success': False,
+                    'error': str(e)
+                }, status=status.HTTP_400_BAD_REQUEST)
+            if not result.get('recognized'):
+                return Response({
+                    'success': False,
+                    'error': 'Face not recognized'
+                }, status=status.HTTP_403_FORBIDDEN)
+            if username and username != result['user_id']:
+                print(f"  ✗ Claimed user '{username}' but face matched '{result['user_id']}'")
+                return Response({
+                    'success': False,
+                    'error': 'Face does not match user_id'
+                }, status=status.HTTP_403_FORBIDDEN)
+            username = result['user_id']
+            confidence = result.get('confidence', 0)
+            print(f"  ✓ Verified by face service: {username} ({confidence})")
+        
         if not session_id or not username:
             return Response({
                 'success': False,
@@ -675,6 +738,222 @@ def mark_attendance_with_face(request):
             'error': str(e)
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+def is_face_service_request(request, allow_keyless_loopback=False):
+    """
+    True nếu request đến từ face service (header X-Face-Service-Key khớp).
+    allow_keyless_loopback: chưa cấu hình FACE_SERVICE_API_KEY (dev) thì tin
+    request có header (rỗng) từ localhost không qua proxy, giống
+    is_admin_request của face service
+    """
+    expected = settings.FACE_SERVICE_API_KEY
+    if not expected:
+        return (allow_keyless_loopback
+                and 'X-Face-Service-Key' in request.headers
+                and request.META.get('REMOTE_ADDR') in ('127.0.0.1', '::1')
+                and 'HTTP_X_FORWARDED_FOR' not in request.META)
+    provided = request.headers.get('X-Face-Service-Key', '')
+    return hmac.compare_digest(provided, expected)
+
+# Session roster for class-scoped face recognition
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def get_session_roster(request, session_id):
+    try:
+        session = Session.objects.select_related('class_id').get(id=session_id)
+    except Session.DoesNotExist:
+        return Response({
+            'success': False,
+            'error': 'Session not found'
+        }, status=status.HTTP_404_NOT_FOUND)
+
+    class_obj = session.class_id
+    user = request.user
+
+    # Face service (service key, hoặc localhost khi chưa có key), admin, giảng viên hoặc thành viên của lớp
+    allowed = is_face_service_request(request, allow_keyless_loopback=True) or (
+        user.is_authenticated and (
+            user.role == 'admin'
+            or class_obj.lecturer_id == user.id
+            or class_obj.created_by_id == user.id
+            or ClassMembership.objects.filter(user=user, class_id=class_obj).exists()
+        )
+    )
+    if not allowed:
+        return Response({
+            'success': False,
+            'error': 'Permission denied'
+        }, status=status.HTTP_403_FORBIDDEN)
+
+    # Face service dùng username làm user_id
+    user_ids = list(
+        ClassMembership.objects.filter(class_id=class_obj, role='student')
+        .exclude(user__username__isnull=True)
+        .values_list('user__username', flat=True)
+    )
+
+    return Response({
+        'success': True,
+        'session_id': session.id,
+        'class_id': class_obj.id,
+        'user_ids': user_ids,
+        'count': len(user_ids)
+    })
+
+# Mark attendance for every face recognized in a group photo
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def mark_bulk_attendance_with_face(request):
+    session_id = request.data.get('session_id')
+    matches = request.data.get('matches')
+
+    if not session_id or not isinstance(matches, list):
+        return Response({
+            'success': False,
+            'error': 'Missing session_id or matches'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        session = Session.objects.select_related('class_id').get(id=session_id)
+    except Session.DoesNotExist:
+        return Response({
+            'success': False,
+            'error': 'Session not found'
+        }, status=status.HTTP_404_NOT_FOUND)
+
+    # Face service (service key), admin hoặc giảng viên của lớp
+    class_obj = session.class_id
+    user = request.user
+    allowed = is_face_service_request(request) or (
+        user.is_authenticated and (
+            user.role == 'admin'
+            or class_obj.lecturer_id == user.id
+            or class_obj.created_by_id == user.id
+        )
+    )
+    if not allowed:
+        return Response({
+            'success': False,
+            'error': 'Permission denied'
+        }, status=status.HTTP_403_FORBIDDEN)
+
+    if not session.is_attendance_open:
+        return Response({
+            'success': False,
+            'error': 'Attendance is not open for this session'
+        }, status=status.HTTP_403_FORBIDDEN)
+
+    usernames = {str(m.get('user_id')) for m in matches if isinstance(m, dict) and m.get('user_id')}
+
+    # 3 query cho cả batch thay vì 4 query cho mỗi sinh viên
+    users = {u.username: u for u in User.objects.filter(username__in=usernames)}
+    enrolled_ids = set(
+        ClassMembership.objects.filter(class_id=class_obj, role='student', user__in=users.values())
+        .values_list('user_id', flat=True)
+    )
+    attended_ids = set(
+        Attendance.objects.filter(session=session, user_id__in=enrolled_ids)
+        .values_list('user_id', flat=True)
+    )
+
+    to_create = [
+        Attendance(session=session, user=u, is_verified=True)
+        for u in users.values() if u.id in enrolled_ids and u.id not in attended_ids
+    ]
+    Attendance.objects.bulk_create(to_create, ignore_conflicts=True)
+
+    logger.info(f"[FACE ATTENDANCE] Bulk marked {len(to_create)} students for session {session.id}")
+
+    return Response({
+        'success': True,
+        'session_id': session.id,
+        'marked': sorted(a.user.username for a in to_create),
+        'already_marked': sorted(u.username for u in users.values() if u.id in attended_ids),
+        'not_enrolled': sorted(u.username for u in users.values() if u.id not in enrolled_ids),
+        'not_found': sorted(usernames - set(users))
+    }, status=status.HTTP_201_CREATED if to_create else status.HTTP_200_OK)
+
+# Bulk face vector sync with the face service (binary format in classroom/face_vectors.py)
+def can_sync_face_vectors(request):
+    user = request.user
+    return is_face_service_request(request) or (user.is_authenticated and user.role == 'admin')
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def export_face_vectors(request):
+    if not can_sync_face_vectors(request):
+        return Response({
+            'success': False,
+            'error': 'Permission denied'
+        }, status=status.HTTP_403_FORBIDDEN)
+
+    dim = face_vectors.face_vector_dim()
+    count = User.objects.filter(face_vector__isnull=False).exclude(username__isnull=True).count()
+    response = StreamingHttpResponse(
+        face_vectors.stream_face_vectors(face_vectors.face_vector_rows(), dim, count),
+        content_type='application/octet-stream'
+    )
+    response['X-Face-Vector-Dim'] = str(dim)
+    response['X-Face-Vector-Count'] = str(count)
+    return response
+
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def import_face_vectors(request):
+    if not can_sync_face_vectors(request):
+        return Response({
+            'success': False,
+            'error': 'Permission denied'
+        }, status=status.HTTP_403_FORBIDDEN)
+
+    if request.stream is None:
+        return Response({
+            'success': False,
+            'error': 'Empty body'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    dim = face_vectors.face_vector_dim()
+    updated, cleared, not_found = 0, 0, []
+
+    def apply(batch):
+        nonlocal updated, cleared
+        users = list(User.objects.filter(username__in=batch))
+        for u in users:
+            u.face_vector = batch[u.username] or None
+        User.objects.bulk_update(users, ['face_vector'], batch_size=500)
+        found = {u.username for u in users}
+        not_found.extend(sorted(set(batch) - found))
+        cleared += sum(1 for u in users if u.face_vector is None)
+        updated += sum(1 for u in users if u.face_vector is not None)
+
+    try:
+        stream_dim, _ = face_vectors.read_header(request.stream)
+        if stream_dim != dim:
+            raise ValueError(f'Face vector dim {stream_dim} != expected {dim}')
+        # Áp dụng cả stream trong một transaction: stream hỏng thì không ghi gì
+        with transaction.atomic():
+            batch = {}
+            for username, data in face_vectors.read_records(request.stream, dim):
+                batch[username] = data
+                if len(batch) >= 500:
+                    apply(batch)
+                    batch = {}
+            if batch:
+                apply(batch)
+    except ValueError as e:
+        return Response({
+            'success': False,
+            'error': str(e)
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    logger.info(f"[FACE VECTORS] Imported {updated} face vectors, cleared {cleared}")
+
+    return Response({
+        'success': True,
+        'updated': updated,
+        'cleared': cleared,
+        'not_found': not_found
+    })
+
 # Toggle Attendance Status (Open/Close)
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
@@ -0,0 +1,198 @@
+"""
+IVF approximate nearest-neighbour index (pure NumPy)
+=====================================================
+Chia gallery thành `nlist` cụm bằng k-means; khi tìm kiếm chỉ quét `nprobe`
+cụm gần query nhất thay vì toàn bộ N người.
+
+Index không giữ bản sao embeddings: mỗi inverted list chỉ chứa số hàng (row)
+trong ma trận của FaceGallery, nên bộ nhớ tăng thêm chỉ là O(N) int.
+
+Knobs:
+- nlist:  số cụm (mặc định ~sqrt(N)). Nhiều cụm → mỗi cụm nhỏ hơn, quét nhanh hơn
+- nprobe: số cụm quét mỗi query. Tăng nprobe → recall cao hơn, chậm hơn
+"""
+import numpy as np
+
+
+def kmeans(data, n_clusters, n_iter=10, seed=0):
+    """K-means (Lloyd) với bước gán cụm là một phép GEMM"""
+    rng = np.random.default_rng(seed)
+    n = data.shape[0]
+    centroids = data[rng.choice(n, size=n_clusters, replace=False)].copy()
+
+    for _ in range(n_iter):
+        assign = assign_nearest(data, centroids)
+
+        # Cộng dồn theo cụm: sort theo assign rồi reduceat (nhanh hơn np.add.at)
+        order = np.argsort(assign, kind='stable')
+        counts = np.bincount(assign, minlength=n_clusters).astype(np.float32)
+        starts = np.concatenate(([0], np.cumsum(counts[:-1]))).astype(np.int64)
+        sums = np.zeros_like(centroids)
+        nonempty = counts > 0
+        sums[nonempty] = np.add.reduceat(data[order], starts[nonempty], axis=0)
+
+        empty = counts == 0
+        if empty.any():
+            # Cụm rỗng: khởi tạo lại bằng điểm ngẫu nhiên
+            sums[empty] = data[rng.choice(n, size=int(empty.sum()))]
+            counts[empty] = 1.0
+        centroids = sums / counts[:, None]
+
+    return centroids.astype(np.float32)
+
+
+def assign_nearest(data, centroids):
+    """Index centroid gần nhất cho từng hàng của data"""
+    scores = np.einsum('ij,ij->i', centroids, centroids)[None, :] - 2.0 * (data @ centroids.T)
+    return np.argmin(scores, axis=1)
+
+
+class IVFIndex:
+    """Inverted-file index trên các hàng của một ma trận embedding"""
+
+    def __init__(self, nlist=None, nprobe=8, n_iter=10, train_size_per_list=40, seed=0):
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.n_iter = n_iter
+        self.train_size_per_list = train_size_per_list
+        self.seed = seed
+
+        self.centroids = None
+        self.lists = []
+        self._row_list = np.empty(0, dtype=np.int32)
+        self.trained_size = 0
+        self._shared = False     # mảng đang dùng chung với một fork()
+
+    @property
+    def is_trained(self):
+        return self.centroids is not None
+
+    def train(self, matrix):
+        """Học centroids trên (một mẫu của) matrix và gán toàn bộ hàng vào list"""
+        n = matrix.shape[0]
+        nlist = self.nlist or max(1, int(np.sqrt(n)))
+        nlist = min(nlist, n)
+
+        rng = np.random.default_rng(self.seed)
+        sample_size = min(n, nlist * self.train_size_per_list)
+        sample = matrix[rng.choice(n, size=sample_size, replace=False)] if sample_size < n else matrix
+
+        self.centroids = kmeans(np.ascontiguousarray(sample, dtype=np.float32), nlist, self.n_iter, self.seed)
+        self._row_list = self._assign_in_chunks(matrix).astype(np.int32)
+
+        order = np.argsort(self._row_list, kind='stable')
+        bounds = np.searchsorted(self._row_list[order], np.arange(nlist + 1))
+        self.lists = [order[bounds[i]:bounds[i + 1]].astype(np.int64) for i in range(nlist)]
+        self.trained_size = n
+        self._shared = False
+
+    def _assign_in_chunks(self, matrix, chunk=8192):
+        return np.concatenate([
+            assign_nearest(matrix[i:i + chunk], self.centroids)
+            for i in range(0, matrix.shape[0], chunk)
+        ]) if matrix.shape[0] else np.empty(0, dtype=np.int64)
+
+    def _empty_clone(self):
+        clone = IVFIndex(nlist=self.nlist, nprobe=self.nprobe, n_iter=self.n_iter,
+                         train_size_per_list=self.train_size_per_list, seed=self.seed)
+        clone.centroids = self.centroids          # chỉ bị thay thế khi train, không sửa tại chỗ
+        clone.trained_size = self.trained_size
+        return clone
+
+    def fork(self):
+        """
+        Bản sao cho snapshot copy-on-write của FaceGallery, O(nlist): dùng
+        chung các mảng. add() chỉ thay mảng của một list bằng mảng mới và ghi
+        _row_list ở hàng mới (snapshot cũ không đọc); update / remove sửa tại
+        chỗ nên copy đầy đủ trước lần sửa đầu tiên.
+        """
+        clone = self._empty_clone()
+        clone.lists = list(self.lists)
+        clone._row_list = self._row_list
+        self._shared = clone._shared = True
+        return clone
+
+    def _unshare(self):
+        if self._shared:
+            self.lists = [rows.copy() for rows in self.lists]
+            self._row_list = self._row_list.copy()
+            self._shared = False
+
+    def reindex(self, new_rows):
+        """
+        Index sau khi FaceGallery compact: new_rows[row cũ] = row mới, -1 nếu
+        hàng bị bỏ. Giữ centroids, không train lại.
+        """
+        clone = self._empty_clone()
+        for rows in self.lists:
+            mapped = new_rows[rows[rows < len(new_rows)]]
+            clone.lists.append(mapped[mapped >= 0])
+        live = np.flatnonzero(new_rows >= 0)
+        clone._row_list = np.empty(len(live), dtype=np.int32)
+        clone._row_list[new_rows[live]] = self._row_list[live]
+        return clone
+
+    # ----- Incremental updates -----
+    def add(self, row, vector):
+        """Thêm hàng `row` (vừa append vào cuối ma trận)"""
+        list_id = int(assign_nearest(vector[None, :], self.centroids)[0])
+        if row >= self._row_list.shape[0]:
+            grown = np.empty(max(row + 1, 2 * self._row_list.shape[0], 64), dtype=np.int32)
+            grown[:self._row_list.shape[0]] = self._row_list
+            self._row_list = grown
+        self._row_list[row] = list_id
+        self.lists[list_id] = np.append(self.lists[list_id], row)
+
+    def update(self, row, vector):
+        """Embedding của `row` thay đổi → chuyển sang list mới nếu cần"""
+        self._unshare()
+        old_list = int(self._row_list[row])
+        new_list = int(assign_nearest(vector[None, :], self.centroids)[0])
+        if old_list != new_list:
+            self.lists[old_list] = self.lists[old_list][self.lists[old_list] != row]
+            self.lists[new_list] = np.append(self.lists[new_list], row)
+            self._row_list[row] = new_list
+
+    def remove(self, row, size):
+        """
+        Xóa hàng `row`. FaceGallery dời các hàng phía sau lên 1, nên mọi
+        row > `row` trong các list cũng giảm 1.
+        """
+        self._unshare()
+        list_id = int(self._row_list[row])
+        self.lists[list_id] = self.lists[list_id][self.lists[list_id] != row]
+        for rows in self.lists:
+            rows[rows > row] -= 1
+        self._row_list[row:size - 1] = self._row_list[row + 1:size]
+
+    # ----- Search -----
+    def candidates(self, query, matrix, sq_norms, k, nprobe=None):
+        """
+        Các hàng ứng viên (tối đa k) trong `nprobe` cụm gần query nhất,
+        xếp theo khoảng cách xấp xỉ tăng dần.
+        """
+        nprobe = min(nprobe or self.nprobe, len(self.lists))
+        centroid_scores = np.einsum('ij,ij->i', self.centroids, self.centroids) - 2.0 * (self.centroids @ query)
+        probe = np.argpartition(centroid_scores, nprobe - 1)[:nprobe]
+
+        # Sort rows để gather theo thứ tự bộ nhớ (np.take nhanh hơn fancy indexing)
+        rows = np.sort(np.concatenate([self.lists[i] for i in probe]))
+        if rows.size == 0:
+            return rows
+
+        scores = np.take(sq_norms, rows) - 2.0 * (np.take(matrix, rows, axis=0) @ query)
+        if rows.size > k:
+            top = np.argpartition(scores, k - 1)[:k]
+            rows, scores = rows[top], scores[top]
+        return rows[np.argsort(scores, kind='stable')]
+
+    def stats(self):
+        sizes = np.array([rows.size for rows in self.lists]) if self.lists else np.zeros(1)
+        return {
+            'type': 'ivf',
+            'nlist': len(self.lists),
+            'nprobe': self.nprobe,
+            'trained_size': self.trained_size,
+            'mean_list_size': round(float(sizes.mean()), 1),
+            'max_list_size': int(sizes.max()),
+        }
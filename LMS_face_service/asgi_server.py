@@ -0,0 +1,429 @@
+"""
+ASGI server mode cho face service
+==================================
+Flask dev server xử lý mỗi request trên một thread: nhận upload chậm, parse
+JSON / base64 và chạy TensorFlow + YOLO đều tranh nhau trên cùng các thread.
+Ở chế độ này:
+
+- body được nhận trên event loop (upload chậm không giữ thread nào)
+- parse JSON / base64 / cv2.imdecode và so khớp gallery chạy trong một
+  decode pool nhỏ
+- mọi lần gọi model đi qua inference executor (face_recognition_api.
+  inference_executor: INFERENCE_WORKERS = số core, hàng đợi
+  INFERENCE_QUEUE_SIZE); hàng đợi đầy -> 503 + Retry-After ngay lập tức.
+  Micro-batcher gửi cả batch sang executor, handler chỉ await Future của
+  frame nên không giữ worker nào trong lúc chờ batch
+- /api/recognize, /api/recognize-binary, /api/recognize-group xử lý trực
+  tiếp; các endpoint còn lại chạy qua Flask app (WSGI) trong decode pool,
+  hoặc trong inference executor nếu endpoint đó gọi model (register-face...)
+- WebSocket /api/recognize-stream (chỉ có ở chế độ này, cần thêm gói
+  websockets cho uvicorn): client đẩy nhiều frame trên một kết nối, server
+  theo dõi khuôn mặt và bỏ phiếu (stream_recognition.py)
+
+Queue depth / in-flight / thời gian chờ nằm ở /api/health -> inference_executor
+(và recognize_batching.queue_depth cho frame đang chờ gom batch), và ở
+/api/metrics (face_queue_depth, latency theo endpoint / stage).
+
+Usage (cần uvicorn: pip install uvicorn):
+    python asgi_server.py
+    uvicorn asgi_server:app --host 0.0.0.0 --port 5000
+"""
+import asyncio
+import io
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl
+
+import numpy as np
+
+import face_recognition_api as api
+from inference_executor import ExecutorSaturated
+
+ASGI_HOST = os.environ.get('ASGI_HOST', '0.0.0.0')
+ASGI_PORT = int(os.environ.get('ASGI_PORT', 5000))
+DECODE_WORKERS = int(os.environ.get('DECODE_WORKERS', 2))
+ASGI_MAX_BODY_MB = float(os.environ.get('ASGI_MAX_BODY_MB', 32))
+
+# Endpoint Flask gọi thẳng model -> chạy trong inference executor. /api/recognize*
+# (multipart) không nằm ở đây: chúng chờ micro-batcher, batcher lại cần worker
+# của executor, giữ worker trong lúc chờ sẽ deadlock khi executor chỉ có 1 worker.
+MODEL_PATHS = ('/api/register-face', '/api/recognize-group')
+# Endpoint chạy lâu nhưng không gọi model (đọc + validate + swap gallery) -> executor mặc định,
+# không chiếm decode pool của các request nhận diện
+ADMIN_PATHS = ('/api/admin/',)
+
+decode_pool = None
+
+
+class RequestError(Exception):
+    """Lỗi của client (400 / 413) với body JSON"""
+
+    def __init__(self, status, error):
+        super().__init__(error)
+        self.status = status
+        self.error = error
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+async def send_json(send, status, body, headers=()):
+    payload = json.dumps(body, default=_json_default).encode('utf-8')
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(payload)).encode()),
+            (b'access-control-allow-origin', b'*'),
+            *headers,
+        ],
+    })
+    await send({'type': 'http.response.body', 'body': payload})
+
+
+async def read_body(scope, receive):
+    """Nhận toàn bộ body trên event loop (giới hạn ASGI_MAX_BODY_MB)"""
+    limit = int(ASGI_MAX_BODY_MB * 2**20)
+    declared = header(scope, b'content-length')
+    if declared and declared.isdigit() and int(declared) > limit:
+        raise RequestError(413, 'Request body too large')
+
+    body = bytearray()
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            raise ConnectionError('Client disconnected')
+        body += message.get('body', b'')
+        if len(body) > limit:
+            raise RequestError(413, 'Request body too large')
+        if not message.get('more_body'):
+            return bytes(body)
+
+
+def header(scope, name):
+    for key, value in scope['headers']:
+        if key == name:
+            return value.decode('latin-1')
+    return None
+
+
+def query_args(scope):
+    return dict(parse_qsl(scope.get('query_string', b'').decode('latin-1')))
+
+
+# ===========================
+# Decode (decode pool)
+# ===========================
+def decode_json_image(body):
+    """JSON {image (base64), ...} -> (data, ảnh)"""
+    try:
+        data = json.loads(body)
+    except ValueError:
+        raise RequestError(400, 'Invalid JSON')
+    if not isinstance(data, dict) or 'image' not in data:
+        raise RequestError(400, 'No image provided')
+    img = api.base64_to_image(data['image'])
+    if img is None:
+        raise RequestError(400, 'Invalid image')
+    return data, img
+
+
+def decode_binary_image(body, args):
+    """Body JPEG/PNG thô + query string -> (params, ảnh)"""
+    if not body:
+        raise RequestError(400, 'No image provided')
+    img = api.buffer_to_image(np.frombuffer(body, dtype=np.uint8))
+    if img is None:
+        raise RequestError(400, 'Invalid image')
+    return api.request_params(args), img
+
+
+async def decode(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(decode_pool, fn, *args)
+
+
+# ===========================
+# Endpoint trực tiếp
+# ===========================
+async def analyze(img, cache_key=None):
+    """analyze_frame() không chặn: qua micro-batcher hoặc thẳng vào executor"""
+    if not api.RECOGNIZE_BATCHING:
+        return (await api.inference_executor.run(api.analyze_frames, [img], [cache_key]))[0]
+    if api.recognize_batcher.queue_depth >= api.INFERENCE_QUEUE_SIZE:
+        raise ExecutorSaturated(f"recognize queue is full ({api.recognize_batcher.queue_depth} waiting)")
+    future = asyncio.wrap_future(api.recognize_batcher.submit((img, cache_key)))
+    return await asyncio.wait_for(future, api.BATCH_RESULT_TIMEOUT)
+
+
+async def recognize_data(scope, data, img):
+    cache_key = api.frame_cache_key(data, (scope.get('client') or ('',))[0])
+    return await decode(api.recognize_analysis, await analyze(img, cache_key), data)
+
+
+async def recognize(scope, body):
+    data, img = await decode(decode_json_image, body)
+    return await recognize_data(scope, data, img)
+
+
+async def recognize_binary(scope, body):
+    params, img = await decode(decode_binary_image, body, query_args(scope))
+    return await recognize_data(scope, params, img)
+
+
+async def recognize_group(scope, body):
+    if (header(scope, b'content-type') or '').startswith('application/json'):
+        data, img = await decode(decode_json_image, body)
+    else:
+        data, img = await decode(decode_binary_image, body, query_args(scope))
+    return await api.inference_executor.run(api.recognize_group_image, img, data)
+
+
+ROUTES = {
+    ('POST', '/api/recognize'): recognize,
+    ('POST', '/api/recognize-binary'): recognize_binary,
+    ('POST', '/api/recognize-group'): recognize_group,
+}
+
+
+def native_route(scope):
+    handler = ROUTES.get((scope['method'], scope['path']))
+    if handler is recognize_binary or handler is recognize_group:
+        # multipart -> để Flask parse
+        if (header(scope, b'content-type') or '').startswith('multipart/'):
+            return None
+    return handler
+
+
+# ===========================
+# WebSocket /api/recognize-stream
+# ===========================
+# ?session_id=&threshold=&roster=  -> mỗi message nhị phân là một frame JPEG/PNG,
+# server trả JSON {type: progress | decision, ...} cho từng frame; client gửi frame
+# tiếp theo sau khi nhận trả lời. Text {"type": "reset"} xóa track, {"type": "end"}
+# yêu cầu kết luận ngay. Sau decision server đóng kết nối.
+def decode_frame(data):
+    img = api.buffer_to_image(np.frombuffer(data, dtype=np.uint8))
+    if img is None:
+        raise RequestError(400, 'Invalid image')
+    return img
+
+
+async def recognize_stream(scope, receive, send):
+    await receive()   # websocket.connect
+    if api.startup_state['state'] != 'ready':
+        await send({'type': 'websocket.close', 'code': 1013})
+        return
+    try:
+        stream = api.recognition_stream(api.request_params(query_args(scope)))
+    except ValueError:
+        await send({'type': 'websocket.close', 'code': 1008})
+        return
+    await send({'type': 'websocket.accept'})
+
+    stats = api.stream_stats
+    stats['active'] += 1
+    stats['streams'] += 1
+    try:
+        while True:
+            message = await receive()
+            if message['type'] == 'websocket.disconnect':
+                return
+
+            if message.get('bytes') is not None:
+                try:
+                    img = await decode(decode_frame, message['bytes'])
+                    reply = await api.inference_executor.run(stream.process, img)
+                    stats['frames'] += 1
+                except RequestError as e:
+                    reply = {'type': 'error', 'error': e.error}
+                except ExecutorSaturated as e:
+                    reply = {'type': 'error', 'error': str(e), 'retry': True}
+            else:
+                try:
+                    control = json.loads(message.get('text') or '{}')
+                except ValueError:
+                    control = {}
+                if control.get('type') == 'reset':
+                    stream.reset()
+                    reply = {'type': 'reset'}
+                elif control.get('type') == 'end':
+                    reply = stream.finish()
+                else:
+                    reply = {'type': 'error', 'error': 'Unknown message'}
+
+            await send({'type': 'websocket.send', 'text': json.dumps(reply, default=_json_default)})
+            if reply['type'] == 'decision':
+                stats['decisions'] += 1
+                stats['recognized'] += bool(reply.get('recognized'))
+                api.recognition_results.inc(result='recognized' if reply.get('recognized')
+                                            else api.REJECTION_REASONS.get(reply.get('error'), 'unknown'))
+                await send({'type': 'websocket.close', 'code': 1000})
+                return
+    except Exception as e:
+        api.log.error('stream_failed', exc=e, endpoint=scope['path'])
+        await send({'type': 'websocket.close', 'code': 1011})
+    finally:
+        stats['active'] -= 1
+        stats['embedded_frames'] += stream.embedded_frames
+
+
+# ===========================
+# Fallback: Flask app qua WSGI
+# ===========================
+def call_wsgi(scope, body):
+    """Chạy Flask app cho một request; Returns (status, headers, body)"""
+    server_name, server_port = scope.get('server') or ('localhost', ASGI_PORT)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': '',
+        'PATH_INFO': scope['path'],
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server_name,
+        'SERVER_PORT': str(server_port),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': (scope.get('client') or ('', 0))[0],
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    for key, value in scope['headers']:
+        name = key.decode('latin-1').upper().replace('-', '_')
+        if name == 'CONTENT_LENGTH':
+            continue
+        if name != 'CONTENT_TYPE':
+            name = 'HTTP_' + name
+        value = value.decode('latin-1')
+        environ[name] = f"{environ[name]},{value}" if name in environ else value
+
+    response = {}
+
+    def start_response(status, headers, exc_info=None):
+        response['status'] = int(status.split(' ', 1)[0])
+        response['headers'] = headers
+
+    result = api.app(environ, start_response)
+    try:
+        payload = b''.join(result)
+    finally:
+        if hasattr(result, 'close'):
+            result.close()
+    headers = [(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in response['headers']]
+    return response['status'], headers, payload
+
+
+async def proxy_to_flask(scope, body, send):
+    if scope['path'].startswith(MODEL_PATHS):
+        future = api.inference_executor.run(call_wsgi, scope, body)
+    elif scope['path'].startswith(ADMIN_PATHS):
+        future = asyncio.get_running_loop().run_in_executor(None, call_wsgi, scope, body)
+    else:
+        future = decode(call_wsgi, scope, body)
+    status, headers, payload = await future
+    await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+    await send({'type': 'http.response.body', 'body': payload})
+
+
+# ===========================
+# ASGI app
+# ===========================
+async def lifespan(receive, send):
+    global decode_pool
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            decode_pool = ThreadPoolExecutor(max_workers=DECODE_WORKERS, thread_name_prefix='decode')
+            api.inference_executor.start()
+            api.recognize_batcher.use_executor(api.inference_executor)
+            print(f"[INFO] ASGI mode: {api.inference_executor.max_workers} inference workers "
+                  f"(queue {api.inference_executor.max_queue}), {DECODE_WORKERS} decode workers")
+            if api.startup_state['state'] == 'starting':
+                if api.STARTUP_MODE == 'background':
+                    threading.Thread(target=api.init_models, name='init-models', daemon=True).start()
+                    print("[INFO] Background startup: serving /api/health/live while models load")
+                elif not await asyncio.get_running_loop().run_in_executor(None, api.init_models):
+                    await send({'type': 'lifespan.startup.failed', 'message': api.startup_state['error'] or ''})
+                    return
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            api.inference_executor.stop()
+            decode_pool.shutdown(wait=False)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await lifespan(receive, send)
+    if scope['type'] == 'websocket':
+        if scope['path'] == '/api/recognize-stream':
+            return await recognize_stream(scope, receive, send)
+        await receive()
+        return await send({'type': 'websocket.close', 'code': 1008})
+    if scope['type'] != 'http':
+        return
+
+    # Endpoint chạy qua Flask được đo bởi hook của Flask; ở đây chỉ đo native route
+    start = time.perf_counter()
+    handler = None
+    status = 500
+    try:
+        body = await read_body(scope, receive)
+        handler = native_route(scope)
+        if handler is None:
+            return await proxy_to_flask(scope, body, send)
+
+        if api.startup_state['state'] != 'ready':
+            status = 503
+            return await send_json(send, 503, {
+                'success': False,
+                'error': 'Service is not ready',
+                'state': api.startup_state['state']
+            })
+        result = await handler(scope, body)
+        status = 200
+        await send_json(send, 200, result)
+
+    except RequestError as e:
+        status = e.status
+        await send_json(send, e.status, {'success': False, 'error': e.error})
+    except ExecutorSaturated as e:
+        status = 503
+        await send_json(send, 503, {'success': False, 'error': str(e)}, headers=[(b'retry-after', b'1')])
+    except ConnectionError:
+        status = 499   # client đóng kết nối
+    except Exception as e:
+        api.log.error('request_failed', exc=e, endpoint=scope['path'])
+        await send_json(send, 500, {'success': False, 'error': str(e)})
+    finally:
+        if handler is not None:
+            api.observe_request(scope['path'], scope['method'], status, start)
+
+
+if __name__ == '__main__':
+    try:
+        import uvicorn
+    except ImportError:
+        print("[ERROR] ASGI mode needs uvicorn: pip install uvicorn")
+        sys.exit(1)
+
+    print("\n" + "="*60)
+    print("FACE RECOGNITION API SERVICE (ASGI)")
+    print("YOLOv8m-face + VGG-Face ResNet50")
+    print("="*60 + "\n")
+    print(f"[INFO] Starting ASGI server on http://localhost:{ASGI_PORT}")
+    uvicorn.run(app, host=ASGI_HOST, port=ASGI_PORT, log_level='warning', lifespan='on')
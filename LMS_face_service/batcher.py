@@ -0,0 +1,138 @@
+"""
+Dynamic micro-batching scheduler
+=================================
+Gom các request đồng thời thành một batch để chạy YOLO + embedding một lần
+thay vì một lần cho mỗi request (batch size 1).
+
+Worker lấy item đầu tiên trong queue, sau đó chờ thêm tối đa `max_wait_ms`
+hoặc đến khi đủ `max_batch_size` item, rồi gọi process_batch(items) và trả
+kết quả về cho từng request handler qua Future.
+
+Với use_executor(executor) (chế độ ASGI) batch chạy trên inference executor
+thay vì trên thread của batcher: mỗi lần có worker rảnh mới gom batch tiếp,
+nên khi mọi worker đang bận, frame dồn lại trong queue thành batch lớn hơn.
+Các batch chạy song song chỉ ở phần decode / crop / match; lần gọi model
+được face_recognition_api tuần tự hóa (detector_lock / embedder_lock).
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+_STOP = object()
+
+
+class MicroBatcher:
+    """Gom item từ nhiều thread thành batch cho một hàm process_batch"""
+
+    def __init__(self, process_batch, max_batch_size=16, max_wait_ms=10, name='micro-batcher'):
+        self.process_batch = process_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.name = name
+
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._executor = None
+        self._slots = None
+
+        self.batches = 0
+        self.items = 0
+        self.largest_batch = 0
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+        return self
+
+    def stop(self):
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join()
+            self._thread = None
+
+    def use_executor(self, executor):
+        """Chạy process_batch trên executor, tối đa executor.max_workers batch cùng lúc"""
+        self._slots = threading.Semaphore(executor.max_workers)
+        self._executor = executor
+        return self
+
+    def submit(self, item):
+        """Đưa item vào queue; trả về Future chứa kết quả của item đó"""
+        future = Future()
+        self._queue.put((item, future))
+        return future
+
+    @property
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    def _collect(self, first):
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                entry = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if entry is _STOP:
+                self._queue.put(_STOP)
+                break
+            batch.append(entry)
+        return batch
+
+    def _process(self, batch):
+        futures = [future for _, future in batch]
+        try:
+            results = self.process_batch([item for item, _ in batch])
+            for future, result in zip(futures, results):
+                future.set_result(result)
+        except Exception as e:
+            for future in futures:
+                future.set_exception(e)
+
+    def _process_on_executor(self, batch, slots):
+        try:
+            self._process(batch)
+        finally:
+            slots.release()
+
+    def _run(self):
+        while True:
+            executor, slots = self._executor, self._slots
+            if slots is not None:
+                slots.acquire()   # chờ worker rảnh rồi mới gom batch
+
+            first = self._queue.get()
+            if first is _STOP:
+                return
+
+            batch = self._collect(first)
+            if executor is None:
+                self._process(batch)
+            else:
+                try:
+                    executor.submit(self._process_on_executor, batch, slots)
+                except Exception as e:
+                    slots.release()
+                    for _, future in batch:
+                        future.set_exception(e)
+
+            self.batches += 1
+            self.items += len(batch)
+            self.largest_batch = max(self.largest_batch, len(batch))
+
+    def stats(self):
+        return {
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000,
+            'queue_depth': self.queue_depth,
+            'batches': self.batches,
+            'items': self.items,
+            'mean_batch_size': round(self.items / self.batches, 2) if self.batches else 0.0,
+            'largest_batch': self.largest_batch,
+        }
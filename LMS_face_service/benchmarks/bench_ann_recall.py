@@ -0,0 +1,107 @@
+"""
+Recall@1 / latency report: IVF index vs exact search
+=====================================================
+Gallery tổng hợp có cấu trúc cụm (giống embeddings thật: các khuôn mặt
+tương tự nằm gần nhau). Với mỗi nprobe, đo recall@1 so với exact search và
+latency trung bình. Cuối cùng kiểm tra insert/delete tăng dần sau khi train.
+
+Usage:
+    python benchmarks/bench_ann_recall.py
+    python benchmarks/bench_ann_recall.py --size 200000 --nlist 512 --nprobe 4 8 16 32
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from gallery import FaceGallery, EMBEDDING_DIM
+from ann_index import IVFIndex
+
+
+def make_clustered(n, dim, rng, n_groups=1000, rank=64, spread=0.35):
+    """Embeddings chuẩn hóa, sinh từ n_groups tâm trong không gian con rank chiều"""
+    basis = rng.standard_normal((rank, dim), dtype=np.float32)
+    centers = rng.standard_normal((n_groups, rank), dtype=np.float32)
+    groups = rng.integers(0, n_groups, size=n)
+
+    data = np.empty((n, dim), dtype=np.float32)
+    chunk = 10000
+    for i in range(0, n, chunk):
+        g = groups[i:i + chunk]
+        latent = centers[g] + spread * rng.standard_normal((g.size, rank), dtype=np.float32)
+        block = latent @ basis + 0.5 * rng.standard_normal((g.size, dim), dtype=np.float32)
+        block /= np.linalg.norm(block, axis=1, keepdims=True) + 1e-8
+        data[i:i + chunk] = block
+    return data
+
+
+def make_queries(data, n_queries, rng, noise=0.02):
+    picks = rng.choice(data.shape[0], size=n_queries, replace=False)
+    queries = data[picks] + noise * rng.standard_normal((n_queries, data.shape[1]), dtype=np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True) + 1e-8
+    return queries
+
+
+def measure(gallery, queries, **kwargs):
+    start = time.perf_counter()
+    results = [gallery.nearest(q, **kwargs) for q in queries]
+    return results, (time.perf_counter() - start) / len(queries) * 1000
+
+
+def run(size, dim, n_queries, nlist, nprobes, seed):
+    rng = np.random.default_rng(seed)
+
+    print(f"[INFO] Building synthetic gallery: {size} identities x {dim} dims")
+    data = make_clustered(size, dim, rng)
+    gallery = FaceGallery(dim=dim, capacity=size)
+    for i in range(size):
+        gallery[f"student_{i:06d}"] = data[i]
+
+    start = time.perf_counter()
+    gallery.configure_index(IVFIndex(nlist=nlist), min_size=0)
+    print(f"[INFO] IVF train: {time.perf_counter() - start:.2f}s  {gallery.index.stats()}")
+
+    queries = make_queries(data, n_queries, rng)
+    exact, exact_ms = measure(gallery, queries, exact=True)
+    print(f"\nexact search: {exact_ms:.3f} ms/query\n")
+
+    print(f"{'nprobe':>6} | {'recall@1':>8} | {'ms/query':>8} | {'speedup':>7}")
+    print("-" * 40)
+    for nprobe in nprobes:
+        approx, ann_ms = measure(gallery, queries, nprobe=nprobe)
+        recall = np.mean([a[0] == e[0] for a, e in zip(approx, exact)])
+        print(f"{nprobe:>6} | {recall:>8.3f} | {ann_ms:>8.3f} | {exact_ms / ann_ms:>6.1f}x")
+
+    # Insert / delete sau khi train (giống /api/register-face và /api/delete-user)
+    n_new = min(1000, size // 10)
+    new_data = make_clustered(n_new, dim, rng)
+    for i in range(n_new):
+        gallery[f"new_{i:05d}"] = new_data[i]
+    for i in range(0, n_new, 2):
+        del gallery[f"new_{i:05d}"]
+    for i in range(0, size, max(1, size // 500)):
+        del gallery[f"student_{i:06d}"]
+
+    probe_ids = [f"new_{i:05d}" for i in range(1, n_new, 2)]
+    probe = np.stack([gallery[user_id] for user_id in probe_ids])
+    found, _ = measure(gallery, probe)
+    self_recall = np.mean([f[0] == user_id for f, user_id in zip(found, probe_ids)])
+    print(f"\n[INFO] After {n_new} inserts / {n_new // 2 + 500} deletes: "
+          f"self-recall@1 of inserted = {self_recall:.3f}, size = {len(gallery)}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size', type=int, default=50000)
+    parser.add_argument('--dim', type=int, default=EMBEDDING_DIM)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--nlist', type=int, default=None)
+    parser.add_argument('--nprobe', type=int, nargs='+', default=[1, 4, 8, 16, 32, 64])
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    run(args.size, args.dim, args.queries, args.nlist, args.nprobe, args.seed)
@@ -0,0 +1,265 @@
+"""
+Benchmark: ASGI mode vs Flask dev server dưới upload đồng thời
+================================================================
+N client gửi /api/recognize (JSON base64, như FaceAttendance.js) liên tục;
+body được gửi thành nhiều mảnh rải trong --upload-ms để mô phỏng mạng chậm.
+Báo cáo throughput và latency p50/p95/p99 (từ byte đầu tiên tới khi nhận
+xong response) cho từng server, kèm stats inference executor của ASGI.
+
+Mặc định benchmark tự chạy từng server trong một process con với model tổng
+hợp (không cần TF/YOLO): mỗi lần gọi model tốn --model-ms + --item-ms mỗi
+ảnh CPU thật (NumPy matmul, nhả GIL như TF), chia đôi cho detect / embed và
+giữ detector_lock / embedder_lock của service như model thật, gallery ngẫu nhiên --gallery
+người. Decode JSON/base64/JPEG là code thật của service.
+    python benchmarks/bench_asgi_server.py --clients 4 16 64
+
+Server thật (đã load model) đang chạy sẵn:
+    python face_recognition_api.py                     # :5000
+    ASGI_PORT=5001 python asgi_server.py               # :5001
+    python benchmarks/bench_asgi_server.py --targets flask=http://localhost:5000 asgi=http://localhost:5001
+"""
+import argparse
+import base64
+import http.client
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from urllib.parse import urlsplit
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) if values else 0.0
+
+
+# ===========================
+# Server (process con)
+# ===========================
+def synthetic_model(model_ms, item_ms, dim, seed=0, locks=None):
+    """analyze_frames tổng hợp: CPU thật trong hai khóa (detect, embed), mỗi stage một model"""
+    rng = np.random.default_rng(seed)
+    a = rng.standard_normal((192, 192)).astype(np.float32)
+    locks = locks or (threading.Lock(), threading.Lock())
+
+    def burn(seconds):
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            a @ a
+
+    def analyze_frames(images, cache_keys=None):
+        for lock in locks:
+            with lock:
+                burn((model_ms + item_ms * len(images)) / 2000)
+        embeddings = rng.standard_normal((len(images), dim)).astype(np.float32)
+        embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+        return [{'is_real': True, 'liveness_confidence': 90.0, 'embedding': e} for e in embeddings]
+
+    return analyze_frames
+
+
+def serve(args):
+    import face_recognition_api as api
+    from gallery import FaceGallery
+
+    rng = np.random.default_rng(0)
+    matrix = rng.standard_normal((args.gallery, 2048)).astype(np.float32)
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+    api.face_registry.swap(FaceGallery.from_arrays(matrix, [f"student_{i:06d}" for i in range(args.gallery)]))
+
+    api.analyze_frames = synthetic_model(args.model_ms, args.item_ms, 2048, seed=1,
+                                         locks=(api.detector_lock, api.embedder_lock))
+    if api.RECOGNIZE_BATCHING:
+        api.recognize_batcher.start()
+    api.startup_state['state'] = 'ready'
+
+    if args.serve == 'flask':
+        api.app.run(host='127.0.0.1', port=args.port, debug=False, threaded=True)
+    else:
+        import uvicorn
+        import asgi_server
+        uvicorn.run(asgi_server.app, host='127.0.0.1', port=args.port, log_level='warning', lifespan='on')
+
+
+def start_server(mode, port, args):
+    command = [sys.executable, __file__, '--serve', mode, '--port', str(port),
+               '--model-ms', str(args.model_ms), '--item-ms', str(args.item_ms), '--gallery', str(args.gallery)]
+    process = subprocess.Popen(command, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{mode} server exited with code {process.returncode}")
+        try:
+            status, _ = request_json(url, 'GET', '/api/health/ready')
+            if status == 200:
+                return process, url
+        except OSError:
+            pass
+        time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f"{mode} server did not become ready")
+
+
+# ===========================
+# Client
+# ===========================
+def request_json(url, method, path, timeout=10):
+    parts = urlsplit(url)
+    conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=timeout)
+    try:
+        conn.request(method, path)
+        response = conn.getresponse()
+        return response.status, json.loads(response.read() or b'null')
+    finally:
+        conn.close()
+
+
+def upload(conn, body, chunks, upload_s):
+    """POST /api/recognize, body gửi thành `chunks` mảnh rải đều trong upload_s"""
+    conn.putrequest('POST', '/api/recognize')
+    conn.putheader('Content-Type', 'application/json')
+    conn.putheader('Content-Length', str(len(body)))
+    conn.endheaders()
+    step = -(-len(body) // chunks)
+    for i in range(0, len(body), step):
+        if i and upload_s:
+            time.sleep(upload_s / chunks)
+        conn.send(body[i:i + step])
+    response = conn.getresponse()
+    response.read()
+    return response.status
+
+
+def run_load(url, body, n_clients, args):
+    parts = urlsplit(url)
+    latencies, statuses = [], {}
+    errors = [0]
+    lock = threading.Lock()
+    stop_at = time.monotonic() + args.duration
+
+    def client():
+        local, local_status = [], {}
+        conn = None
+        while time.monotonic() < stop_at:
+            if conn is None:
+                conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=60)
+            start = time.perf_counter()
+            try:
+                status = upload(conn, body, args.upload_chunks, args.upload_ms / 1000)
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                conn = None
+                with lock:
+                    errors[0] += 1
+                continue
+            local_status[status] = local_status.get(status, 0) + 1
+            if status == 200:
+                local.append((time.perf_counter() - start) * 1000)
+        if conn is not None:
+            conn.close()
+        with lock:
+            latencies.extend(local)
+            for status, count in local_status.items():
+                statuses[status] = statuses.get(status, 0) + count
+
+    threads = [threading.Thread(target=client) for _ in range(n_clients)]
+    start = time.monotonic()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.monotonic() - start
+
+    return {
+        'clients': n_clients,
+        'ok': len(latencies),
+        'rejected': sum(count for status, count in statuses.items() if status != 200),
+        'errors': errors[0],
+        'throughput': len(latencies) / elapsed,
+        'p50_ms': percentile(latencies, 50),
+        'p95_ms': percentile(latencies, 95),
+        'p99_ms': percentile(latencies, 99),
+    }
+
+
+def test_image(path):
+    import cv2
+    if path:
+        with open(path, 'rb') as f:
+            return f.read()
+    # Frame 640x480 có cấu trúc (JPEG ~ kích thước ảnh webcam thật)
+    y, x = np.mgrid[0:480, 0:640]
+    frame = np.stack([(x * 0.4) % 255, (y * 0.5) % 255, ((x + y) * 0.3) % 255], axis=-1)
+    frame += np.random.default_rng(0).normal(0, 12, frame.shape)
+    return cv2.imencode('.jpg', np.clip(frame, 0, 255).astype(np.uint8), [cv2.IMWRITE_JPEG_QUALITY, 90])[1].tobytes()
+
+
+def run(args):
+    image = test_image(args.image)
+    body = json.dumps({'image': base64.b64encode(image).decode('ascii'), 'threshold': 0.30}).encode()
+    print(f"[INFO] Upload {len(body) / 1024:.0f} KB JSON in {args.upload_chunks} chunks over {args.upload_ms} ms, "
+          f"{args.duration}s per run, {os.cpu_count()} CPU")
+    if not args.targets:
+        print(f"[INFO] Synthetic model: {args.model_ms} ms/call + {args.item_ms} ms/image, "
+              f"gallery {args.gallery} people")
+
+    targets = [t.split('=', 1) for t in args.targets] if args.targets else [('flask', None), ('asgi', None)]
+    print(f"\n{'server':>7} | {'clients':>7} | {'req/s':>7} | {'p50 ms':>8} | {'p95 ms':>8} | {'p99 ms':>8} | "
+          f"{'503':>5} | {'errors':>6}")
+    print("-" * 78)
+    executor_stats = {}
+    for port, (name, url) in enumerate(targets, start=args.port):
+        process = None
+        if url is None:
+            process, url = start_server(name, port, args)
+        try:
+            for n in args.clients:
+                r = run_load(url, body, n, args)
+                print(f"{name:>7} | {n:>7} | {r['throughput']:>7.1f} | {r['p50_ms']:>8.1f} | {r['p95_ms']:>8.1f} | "
+                      f"{r['p99_ms']:>8.1f} | {r['rejected']:>5} | {r['errors']:>6}")
+            _, health = request_json(url, 'GET', '/api/health')
+            if health:
+                executor_stats[name] = {key: health.get(key) for key in ('recognize_batching', 'inference_executor')}
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait()
+
+    print()
+    for name, stats in executor_stats.items():
+        batching = stats['recognize_batching']
+        if batching:
+            print(f"[INFO] {name} micro-batching: mean batch {batching['mean_batch_size']}, "
+                  f"largest {batching['largest_batch']}")
+        if stats['inference_executor']:
+            print(f"[INFO] {name} inference executor: {stats['inference_executor']}")
+    return 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', type=int, nargs='+', default=[4, 16, 64])
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--upload-ms', type=float, default=200.0, help='Thời gian gửi hết body (mạng chậm)')
+    parser.add_argument('--upload-chunks', type=int, default=8)
+    parser.add_argument('--image', help='Ảnh JPEG/PNG để gửi (mặc định: frame 640x480 tổng hợp)')
+    parser.add_argument('--targets', nargs='+', help='name=url của server đang chạy (bỏ qua server tổng hợp)')
+    parser.add_argument('--model-ms', type=float, default=30.0)
+    parser.add_argument('--item-ms', type=float, default=10.0)
+    parser.add_argument('--gallery', type=int, default=2000)
+    parser.add_argument('--port', type=int, default=5600)
+    parser.add_argument('--serve', choices=['flask', 'asgi'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args)
+    else:
+        sys.exit(run(args))
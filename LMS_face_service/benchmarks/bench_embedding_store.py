@@ -0,0 +1,82 @@
+"""
+Benchmark: face_database.pkl vs EmbeddingStore (memmap + log)
+==============================================================
+Đo chi phí một lần đăng ký (lưu) và chi phí khởi động (load) ở các kích
+thước gallery khác nhau, dùng thư mục tạm.
+
+Usage:
+    python benchmarks/bench_embedding_store.py --sizes 10000 100000
+"""
+import argparse
+import pickle
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from embedding_store import EmbeddingStore
+from gallery import FaceGallery, EMBEDDING_DIM
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return (time.perf_counter() - start) * 1000, result
+
+
+def run(sizes, dim, seed):
+    rng = np.random.default_rng(seed)
+    print(f"{'identities':>10} | {'pickle save':>11} | {'store put':>9} | {'pickle load':>11} | {'store open':>10}   (ms)")
+    print("-" * 70)
+
+    for n in sizes:
+        workdir = Path(tempfile.mkdtemp())
+        try:
+            matrix = rng.standard_normal((n, dim), dtype=np.float32)
+            database = {f"student_{i:06d}": matrix[i] for i in range(n)}
+            new_embedding = rng.standard_normal(dim, dtype=np.float32)
+
+            # Cũ: mỗi lần đăng ký pickle lại toàn bộ dict
+            pkl_path = workdir / "face_database.pkl"
+            database["new_student"] = new_embedding
+
+            def pickle_save():
+                with open(pkl_path, 'wb') as f:
+                    pickle.dump(database, f)
+            save_pkl_ms, _ = timed(pickle_save)
+
+            def pickle_load():
+                with open(pkl_path, 'rb') as f:
+                    return FaceGallery.from_dict(pickle.load(f))
+            load_pkl_ms, _ = timed(pickle_load)
+
+            # Mới: một hàng + một dòng log
+            del database["new_student"]
+            store = EmbeddingStore(workdir / "face_store", dim=dim)
+            store.import_dict(database)
+            put_ms, _ = timed(lambda: store.put("new_student", new_embedding))
+
+            def store_open():
+                opened = EmbeddingStore(workdir / "face_store").open()
+                return FaceGallery.from_arrays(*opened.load_arrays())
+            open_ms, gallery = timed(store_open)
+            assert len(gallery) == n + 1 and np.array_equal(gallery["new_student"], new_embedding)
+
+            print(f"{n:>10} | {save_pkl_ms:>11.1f} | {put_ms:>9.2f} | {load_pkl_ms:>11.1f} | {open_ms:>10.1f}")
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 50000])
+    parser.add_argument('--dim', type=int, default=EMBEDDING_DIM)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    run(args.sizes, args.dim, args.seed)
@@ -0,0 +1,203 @@
+"""
+Benchmark: vòng lặp realtime naive vs FaceTracker
+==================================================
+Mô phỏng utils/realtime_face_recognition.py trên một cảnh 1280x720 tổng hợp:
+--people khuôn mặt di chuyển (đổi hướng ngẫu nhiên, thỉnh thoảng đi ngang
+qua nhau), người ra / vào khung hình, YOLO thỉnh thoảng bỏ sót hoặc lệch box.
+
+Thời gian model là mô hình chi phí (không cần YOLO / TF): --yolo-ms mỗi lần
+detect, --embed-call-ms + --embed-ms x số mặt mỗi lần predict. Thời gian của
+FaceTracker (ghép + ngoại suy) là đo thật. FPS = 1000 / thời gian trung bình
+một frame (tối đa --camera-fps).
+
+- naive: detect + embed mọi mặt mọi frame (vòng lặp cũ)
+- tracked N: detect mỗi N frame, embed track mới / track đã giảm độ tin cậy
+
+Báo cáo FPS, YOLO / embedding mỗi giây, số lần đổi ID (một người bị gán ID
+track mới), và % box hiển thị sai tên (track đã nhảy sang người khác mà chưa
+embed lại).
+
+Usage:
+    python benchmarks/bench_face_tracker.py
+    python benchmarks/bench_face_tracker.py --people 8 --detect-every 2 3 5 8
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from face_tracker import FaceTracker
+from stream_recognition import iou
+
+WIDTH, HEIGHT = 1280, 720
+
+
+class Scene:
+    """Ground truth: các khuôn mặt (tên, box) mỗi frame"""
+
+    def __init__(self, rng, args):
+        self.rng = rng
+        self.args = args
+        self.faces = {}
+        self.next_person = 0
+        for _ in range(args.people):
+            self._enter()
+
+    def _enter(self):
+        size = float(self.rng.uniform(110, 200))
+        x = float(self.rng.uniform(0, WIDTH - size))
+        y = float(self.rng.uniform(0, HEIGHT - size * 1.2))
+        speed = self.args.speed
+        self.faces[f"person_{self.next_person}"] = {
+            'pos': np.array([x, y]), 'size': size,
+            'velocity': self.rng.uniform(-speed, speed, 2),
+        }
+        self.next_person += 1
+
+    def step(self):
+        args = self.args
+        for name in list(self.faces):
+            if self.rng.random() < args.leave:
+                del self.faces[name]
+                self._enter()
+        for face in self.faces.values():
+            if self.rng.random() < 0.05:
+                face['velocity'] = self.rng.uniform(-args.speed, args.speed, 2)
+            face['pos'] += face['velocity']
+            limit = np.array([WIDTH - face['size'], HEIGHT - face['size'] * 1.2])
+            bounced = (face['pos'] < 0) | (face['pos'] > limit)
+            face['velocity'][bounced] *= -1
+            face['pos'] = np.clip(face['pos'], 0, limit)
+
+    def boxes(self):
+        return {name: (f['pos'][0], f['pos'][1], f['pos'][0] + f['size'], f['pos'][1] + f['size'] * 1.2)
+                for name, f in self.faces.items()}
+
+    def detect(self):
+        """YOLO mô phỏng: bỏ sót với xác suất --miss, box lệch ±--jitter pixel"""
+        detections = []
+        for box in self.boxes().values():
+            if self.rng.random() < self.args.miss:
+                continue
+            jitter = self.rng.uniform(-self.args.jitter, self.args.jitter, 4)
+            detections.append((tuple(float(v) for v in np.asarray(box) + jitter), 0.9))
+        return detections
+
+
+def truth_for(box, truth):
+    """Tên người có box ground truth khớp nhất (IoU >= 0.3) với box hiển thị"""
+    best, best_iou = None, 0.3
+    for name, gt_box in truth.items():
+        overlap = iou(box, gt_box)
+        if overlap >= best_iou:
+            best, best_iou = name, overlap
+    return best
+
+
+def run_mode(detect_every, naive, args):
+    rng = np.random.default_rng(args.seed)
+    scene = Scene(rng, args)
+    tracker = FaceTracker(half_life=args.half_life, reembed_below=args.reembed_below,
+                          min_interval=args.min_interval)
+
+    model_ms = yolo_calls = embeds = 0.0
+    tracker_s = 0.0
+    shown = wrong = 0
+    track_of = {}      # người -> track ID lần gần nhất
+    id_switches = 0
+
+    for frame_idx in range(1, args.frames + 1):
+        scene.step()
+        truth = scene.boxes()
+
+        start = time.perf_counter()
+        if (frame_idx - 1) % detect_every == 0:
+            detections = scene.detect()
+            tracker_start = time.perf_counter()
+            tracks = tracker.update(detections, frame_idx)
+            if naive:
+                to_embed = [t for t in tracks if not t.missed]
+            else:
+                to_embed = [t for t in tracks if tracker.needs_embedding(t, frame_idx)]
+            tracker_s += time.perf_counter() - tracker_start
+            model_ms += args.yolo_ms
+            yolo_calls += 1
+            if to_embed:
+                model_ms += args.embed_call_ms + args.embed_ms * len(to_embed)
+                embeds += len(to_embed)
+            for track in to_embed:
+                # "Nhận diện" đúng người đang nằm dưới box lúc embed
+                name = truth_for(track.box, truth) or "Unknown"
+                track.set_identity(name, 0.1, float(np.clip(rng.normal(80, 8), 0, 100)), frame_idx)
+        else:
+            tracks = tracker.predict()
+        tracker_s += 0 if (frame_idx - 1) % detect_every == 0 else time.perf_counter() - start
+
+        for track in tracks:
+            if track.missed:
+                continue
+            person = truth_for(track.box, truth)
+            if person is None:
+                continue
+            shown += 1
+            wrong += track.name not in (None, person)
+            if track_of.get(person, track.id) != track.id:
+                id_switches += 1
+            track_of[person] = track.id
+
+    frame_ms = (model_ms + tracker_s * 1000) / args.frames + args.render_ms
+    fps = min(args.camera_fps, 1000 / frame_ms)
+    seconds = args.frames / fps
+    return {
+        'fps': fps,
+        'yolo_per_s': yolo_calls / seconds,
+        'embeds_per_s': embeds / seconds,
+        'embeds_per_frame': embeds / args.frames,
+        'id_switches': id_switches,
+        'wrong_label': wrong / max(shown, 1),
+        'tracker_us': tracker_s * 1e6 / args.frames,
+    }
+
+
+def run(args):
+    print(f"[INFO] {args.people} faces on {WIDTH}x{HEIGHT}, {args.frames} frames, speed ≤ {args.speed} px/frame, "
+          f"leave p={args.leave}, YOLO miss p={args.miss}, jitter ±{args.jitter}px")
+    print(f"[INFO] Cost model: YOLO {args.yolo_ms} ms, embed {args.embed_call_ms} ms/call + {args.embed_ms} ms/face, "
+          f"render {args.render_ms} ms\n")
+    print(f"{'mode':>11} | {'FPS':>6} | {'YOLO/s':>6} | {'embeds/s':>8} | {'emb/frame':>9} | {'ID switch':>9} | "
+          f"{'wrong label':>11} | {'tracker µs':>10}")
+    print("-" * 96)
+    modes = [('naive', 1, True)] + [(f'tracked {n}', n, False) for n in args.detect_every]
+    for name, detect_every, naive in modes:
+        r = run_mode(detect_every, naive, args)
+        print(f"{name:>11} | {r['fps']:>6.1f} | {r['yolo_per_s']:>6.1f} | {r['embeds_per_s']:>8.1f} | "
+              f"{r['embeds_per_frame']:>9.2f} | {r['id_switches']:>9} | {r['wrong_label']:>11.2%} | "
+              f"{r['tracker_us']:>10.1f}")
+    return 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--people', type=int, default=4)
+    parser.add_argument('--frames', type=int, default=3000)
+    parser.add_argument('--speed', type=float, default=4.0, help='Tốc độ tối đa (pixel / frame)')
+    parser.add_argument('--leave', type=float, default=0.002, help='Xác suất mỗi frame một người rời khung hình')
+    parser.add_argument('--miss', type=float, default=0.05, help='Xác suất YOLO bỏ sót một khuôn mặt')
+    parser.add_argument('--jitter', type=float, default=4.0)
+    parser.add_argument('--detect-every', type=int, nargs='+', default=[1, 3, 5])
+    parser.add_argument('--half-life', type=float, default=90)
+    parser.add_argument('--reembed-below', type=float, default=50.0)
+    parser.add_argument('--min-interval', type=int, default=15)
+    parser.add_argument('--yolo-ms', type=float, default=150.0, help='YOLOv8m 1280x720 trên CPU')
+    parser.add_argument('--embed-call-ms', type=float, default=15.0)
+    parser.add_argument('--embed-ms', type=float, default=60.0, help='ResNet50 224x224 mỗi mặt trên CPU')
+    parser.add_argument('--render-ms', type=float, default=3.0)
+    parser.add_argument('--camera-fps', type=float, default=30.0)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    sys.exit(run(args))
@@ -0,0 +1,98 @@
+"""
+Benchmark: cold start từ User.face_vector (stream FVEC)
+========================================================
+Đo thời gian một node mới dựng gallery từ stream face vectors của Django:
+decode stream -> EmbeddingStore.import_arrays -> FaceGallery.from_arrays,
+so với parse lại face_database.pkl. Stream được dựng sẵn trong bộ nhớ (không
+đo mạng / DB); --file để đọc stream thật từ `manage.py export_face_vectors`.
+
+Usage:
+    python benchmarks/bench_face_vector_sync.py --sizes 10000 50000
+    python benchmarks/bench_face_vector_sync.py --file vectors.fvec
+"""
+import argparse
+import io
+import pickle
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import face_vectors
+from embedding_store import EmbeddingStore
+from gallery import FaceGallery, EMBEDDING_DIM
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return (time.perf_counter() - start) * 1000, result
+
+
+def cold_start(stream, workdir):
+    """Stream -> store -> gallery, như load_face_database() với GALLERY_SOURCE=backend"""
+    t_decode, (matrix, ids) = timed(lambda: face_vectors.load_arrays(stream))
+    store = EmbeddingStore(workdir / "face_store")
+    t_import, _ = timed(lambda: store.import_arrays(matrix, ids))
+    t_map, gallery = timed(lambda: FaceGallery.from_arrays(*store.load_arrays()))
+    return gallery, t_decode, t_import, t_map
+
+
+def run(args):
+    print(f"{'identities':>10} | {'stream MB':>9} | {'decode':>7} | {'import':>7} | {'map':>6} | "
+          f"{'total':>7} | {'pickle load':>11}   (ms)")
+    print("-" * 82)
+
+    if args.file:
+        workdir = Path(tempfile.mkdtemp())
+        try:
+            with open(args.file, 'rb') as f:
+                gallery, t_decode, t_import, t_map = cold_start(f, workdir)
+            size_mb = Path(args.file).stat().st_size / 2**20
+            print(f"{len(gallery):>10} | {size_mb:>9.1f} | {t_decode:>7.1f} | {t_import:>7.1f} | {t_map:>6.1f} | "
+                  f"{t_decode + t_import + t_map:>7.1f} | {'-':>11}")
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+        return 0
+
+    rng = np.random.default_rng(args.seed)
+    for n in args.sizes:
+        workdir = Path(tempfile.mkdtemp())
+        try:
+            matrix = rng.standard_normal((n, args.dim), dtype=np.float32)
+            records = [(f"student_{i:06d}", matrix[i]) for i in range(n)]
+            blob = face_vectors.encode(records, args.dim)
+
+            gallery, t_decode, t_import, t_map = cold_start(io.BytesIO(blob), workdir)
+            assert len(gallery) == n and np.array_equal(gallery["student_000000"], matrix[0])
+
+            pkl_path = workdir / "face_database.pkl"
+            with open(pkl_path, 'wb') as f:
+                pickle.dump(dict(records), f)
+
+            def pickle_load():
+                with open(pkl_path, 'rb') as f:
+                    return FaceGallery.from_dict(pickle.load(f))
+            t_pickle, _ = timed(pickle_load)
+
+            print(f"{n:>10} | {len(blob) / 2**20:>9.1f} | {t_decode:>7.1f} | {t_import:>7.1f} | {t_map:>6.1f} | "
+                  f"{t_decode + t_import + t_map:>7.1f} | {t_pickle:>11.1f}")
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+    return 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 50000])
+    parser.add_argument('--dim', type=int, default=EMBEDDING_DIM)
+    parser.add_argument('--file', help='Stream FVEC thật (manage.py export_face_vectors vectors.fvec)')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    sys.exit(run(args))
@@ -0,0 +1,151 @@
+"""
+Benchmark: perceptual-hash frame cache
+=======================================
+Mô phỏng webcam của từng sinh viên: một khuôn mặt tổng hợp (hoặc ảnh thật với
+--images) được crop lại mỗi frame với nhiễu cảm biến, lệch box của YOLO vài
+pixel, ánh sáng dao động nhẹ; thỉnh thoảng sinh viên cử động (dịch / nghiêng
+đầu) thành một tư thế mới. Với từng --distances (ngưỡng Hamming):
+
+- hit rate: tỉ lệ frame dùng lại kết quả (bỏ qua liveness + embedding)
+- false hit: tỉ lệ cặp crop của HAI NGƯỜI KHÁC NHAU có hash cách nhau
+  <= ngưỡng (chỉ xảy ra nếu hai người dùng chung một client key)
+- µs để tính dHash một crop, và bộ nhớ khi lấp đầy --clients client
+
+Usage:
+    python benchmarks/bench_frame_cache.py
+    python benchmarks/bench_frame_cache.py --images dataset --distances 2 4 6 8
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from frame_cache import FrameCache, dhash, hamming
+
+
+def synthetic_face(rng, size=260):
+    """Khuôn mặt vẽ tay: hình dạng, màu da, mắt / miệng / tóc khác nhau mỗi người"""
+    img = np.full((size, size, 3), rng.integers(40, 200, 3), dtype=np.uint8)
+    skin = tuple(int(v) for v in rng.integers(90, 230, 3))
+    center = (size // 2 + int(rng.integers(-10, 10)), size // 2 + int(rng.integers(-5, 15)))
+    axes = (int(rng.integers(70, 95)), int(rng.integers(95, 120)))
+    cv2.ellipse(img, center, axes, 0, 0, 360, skin, -1)
+    hair = tuple(int(v) for v in rng.integers(0, 90, 3))
+    cv2.ellipse(img, (center[0], center[1] - axes[1] // 2), (axes[0], axes[1] // 2), 0, 180, 360, hair, -1)
+    eye_y = center[1] - int(rng.integers(5, 30))
+    eye_dx = int(rng.integers(25, 40))
+    for dx in (-eye_dx, eye_dx):
+        cv2.circle(img, (center[0] + dx, eye_y), int(rng.integers(6, 12)), (30, 30, 30), -1)
+    cv2.ellipse(img, (center[0], center[1] + int(rng.integers(40, 60))),
+                (int(rng.integers(15, 35)), int(rng.integers(4, 12))), 0, 0, 180, (60, 40, 140), -1)
+    texture = rng.normal(0, 10, img.shape)
+    return np.clip(img + cv2.GaussianBlur(texture, (0, 0), 3), 0, 255).astype(np.uint8)
+
+
+def load_faces(args, rng):
+    if not args.images:
+        return [synthetic_face(rng) for _ in range(args.people)]
+    paths = sorted(p for p in Path(args.images).rglob('*') if p.suffix.lower() in ('.jpg', '.jpeg', '.png'))
+    faces = [cv2.imread(str(p)) for p in paths[:args.people]]
+    return [cv2.resize(f, (260, 260)) for f in faces if f is not None]
+
+
+def webcam_crop(face, rng, pose, args):
+    """Một frame: pose (dx, dy, góc) + lệch box + nhiễu cảm biến + dao động sáng"""
+    h, w = face.shape[:2]
+    dx, dy, angle = pose
+    matrix = cv2.getRotationMatrix2D((w / 2, h / 2), angle, 1.0)
+    matrix[:, 2] += (dx, dy)
+    frame = cv2.warpAffine(face, matrix, (w, h), borderMode=cv2.BORDER_REFLECT)
+    jx, jy = rng.integers(-args.jitter, args.jitter + 1, 2)
+    crop = frame[20 + jy:h - 20 + jy, 20 + jx:w - 20 + jx].astype(np.float32)
+    crop = crop * rng.uniform(1 - args.light, 1 + args.light) + rng.normal(0, args.noise, crop.shape)
+    return np.clip(crop, 0, 255).astype(np.uint8)
+
+
+def new_pose(rng):
+    return (float(rng.uniform(-15, 15)), float(rng.uniform(-15, 15)), float(rng.uniform(-12, 12)))
+
+
+def run(args):
+    rng = np.random.default_rng(args.seed)
+    faces = load_faces(args, rng)
+    print(f"[INFO] {len(faces)} people x {args.frames} frames, new pose with p={args.move}, "
+          f"jitter ±{args.jitter}px, noise σ={args.noise}, light ±{args.light:.0%}")
+
+    # Chuỗi frame cố định để mọi ngưỡng thấy cùng dữ liệu
+    sequences = []
+    for face in faces:
+        pose, hashes, moved = new_pose(rng), [], []
+        for i in range(args.frames):
+            is_move = i > 0 and rng.random() < args.move
+            if is_move:
+                pose = new_pose(rng)
+            hashes.append(dhash(webcam_crop(face, rng, pose, args)))
+            moved.append(is_move)
+        sequences.append((hashes, moved))
+
+    crops = [webcam_crop(face, rng, (0, 0, 0), args) for face in faces]
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        for crop in crops:
+            dhash(crop)
+    hash_us = (time.perf_counter() - start) * 1e6 / (args.repeat * len(crops))
+
+    first = np.array([hashes[0] for hashes, _ in sequences], dtype=object)
+    cross = [hamming(int(first[i]), int(first[j])) for i in range(len(first)) for j in range(i + 1, len(first))]
+
+    print(f"[INFO] dHash: {hash_us:.1f} µs/crop; distance between different people: "
+          f"min {min(cross)}, p1 {np.percentile(cross, 1):.0f}, median {np.median(cross):.0f} bits\n")
+    print(f"{'max dist':>8} | {'hit rate':>8} | {'hits after move':>15} | {'false hit':>9}")
+    print("-" * 52)
+    for max_distance in args.distances:
+        cache = FrameCache(max_distance=max_distance, ttl=args.ttl, per_client=args.per_client)
+        move_hits = moves = 0
+        for client, (hashes, moved) in enumerate(sequences):
+            for frame_hash, is_move in zip(hashes, moved):
+                hit = cache.get(client, frame_hash) is not None
+                if not hit:
+                    cache.put(client, frame_hash, {'embedding': np.zeros(2048, np.float32)})
+                moves += is_move
+                move_hits += hit and is_move
+        stats = cache.stats()
+        false_hit = float(np.mean(np.array(cross) <= max_distance))
+        print(f"{max_distance:>8} | {stats['hit_rate']:>8.1%} | {move_hits:>7} / {moves:<5} | {false_hit:>9.2%}")
+
+    # Giới hạn bộ nhớ: lấp đầy nhiều client hơn max_bytes cho phép
+    cache = FrameCache(max_clients=args.clients, per_client=args.per_client, max_bytes=int(args.max_mb * 2**20))
+    for client in range(args.clients * 2):
+        for k in range(args.per_client):
+            cache.put(client, int(rng.integers(0, 2**63)), {'embedding': np.zeros(2048, np.float32)})
+    stats = cache.stats()
+    print(f"\n[INFO] Memory bound: {args.clients * 2} clients x {args.per_client} entries -> "
+          f"{stats['clients']} clients, {stats['entries']} entries, "
+          f"{stats['bytes'] / 2**20:.1f} MB (max {args.max_mb} MB), {stats['evictions']} evicted")
+    return 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--images', help='Thư mục ảnh khuôn mặt thật (mặc định: khuôn mặt tổng hợp)')
+    parser.add_argument('--people', type=int, default=200)
+    parser.add_argument('--frames', type=int, default=30, help='Frame mỗi người (mỗi 2 giây một frame)')
+    parser.add_argument('--move', type=float, default=0.15, help='Xác suất cử động sang tư thế mới mỗi frame')
+    parser.add_argument('--jitter', type=int, default=3, help='Lệch box YOLO tối đa (pixel)')
+    parser.add_argument('--noise', type=float, default=4.0)
+    parser.add_argument('--light', type=float, default=0.03)
+    parser.add_argument('--distances', type=int, nargs='+', default=[0, 2, 4, 6, 8, 12])
+    parser.add_argument('--ttl', type=float, default=3600, help='TTL khi chạy mô phỏng (không đo thời gian thật)')
+    parser.add_argument('--per-client', type=int, default=4)
+    parser.add_argument('--clients', type=int, default=1024)
+    parser.add_argument('--max-mb', type=float, default=32)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    sys.exit(run(args))
@@ -0,0 +1,90 @@
+"""
+Micro-benchmark: dict loop vs FaceGallery (GEMV + top-k)
+=========================================================
+So sánh recognize_face kiểu cũ (vòng lặp Python qua dict) với FaceGallery
+trên gallery tổng hợp 1k / 10k / 100k người. Không cần model hay server.
+
+Usage:
+    python benchmarks/bench_gallery_matcher.py
+    python benchmarks/bench_gallery_matcher.py --sizes 1000 10000 --queries 50
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from gallery import FaceGallery, EMBEDDING_DIM
+
+
+def legacy_nearest(face_embedding, database):
+    """Vòng lặp cũ trong recognize_face()"""
+    distances = {}
+    for person_name, person_embedding in database.items():
+        distances[person_name] = float(np.linalg.norm(face_embedding - person_embedding))
+    best_match = min(distances, key=distances.get)
+    return best_match, distances[best_match]
+
+
+def make_gallery(n, dim, rng):
+    embeddings = rng.standard_normal((n, dim), dtype=np.float32)
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True) + 1e-8
+    return {f"student_{i:06d}": embeddings[i] for i in range(n)}
+
+
+def make_queries(database, n_queries, rng, noise=0.02):
+    ids = list(database.keys())
+    picks = rng.choice(len(ids), size=n_queries)
+    queries = []
+    for i in picks:
+        q = database[ids[i]] + noise * rng.standard_normal(database[ids[i]].shape[0]).astype(np.float32)
+        queries.append(q / (np.linalg.norm(q) + 1e-8))
+    return queries
+
+
+def time_per_call(fn, queries):
+    start = time.perf_counter()
+    results = [fn(q) for q in queries]
+    return (time.perf_counter() - start) / len(queries) * 1000, results
+
+
+def run(sizes, dim, n_queries, seed):
+    rng = np.random.default_rng(seed)
+
+    print(f"{'identities':>10} | {'dict loop (ms)':>14} | {'gallery (ms)':>12} | {'speedup':>7} | parity")
+    print("-" * 64)
+
+    for n in sizes:
+        database = make_gallery(n, dim, rng)
+        gallery = FaceGallery.from_dict(database, dim=dim)
+        queries = make_queries(database, n_queries, rng)
+
+        # Dict loop chậm ở 100k, giảm số query để benchmark không quá lâu
+        legacy_queries = queries[:max(3, n_queries * 1000 // n)] if n > 10000 else queries
+
+        legacy_ms, legacy_results = time_per_call(lambda q: legacy_nearest(q, database), legacy_queries)
+        gallery_ms, gallery_results = time_per_call(gallery.nearest, queries)
+
+        parity = all(
+            a[0] == b[0] and a[1] == b[1]
+            for a, b in zip(legacy_results, gallery_results)
+        )
+
+        print(f"{n:>10} | {legacy_ms:>14.3f} | {gallery_ms:>12.3f} | {legacy_ms / gallery_ms:>6.1f}x | {'OK' if parity else 'MISMATCH'}")
+
+        if not parity:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--dim', type=int, default=EMBEDDING_DIM)
+    parser.add_argument('--queries', type=int, default=100)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    run(args.sizes, args.dim, args.queries, args.seed)
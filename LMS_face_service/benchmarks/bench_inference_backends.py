@@ -0,0 +1,211 @@
+"""
+Benchmark + drift check: Keras/ultralytics vs ONNX Runtime (fp32 / int8)
+=========================================================================
+Trên một tập ảnh cố định:
+- Drift embedding: cosine similarity giữa embedding ONNX và Keras trên cùng
+  các crop khuôn mặt (Keras là chuẩn)
+- Drift detection: số box và IoU trung bình giữa YOLO .pt và YOLO .onnx
+- Latency: embed batch 1 (p50/p95 ms/face), embed cả batch (ms/face),
+  detect (p50 ms/ảnh)
+
+Model ONNX được export từ chính Keras model trong process này vào thư mục
+tạm, nên so sánh dùng cùng trọng số.
+
+Usage (cần tensorflow, ultralytics, onnx, onnxruntime, tf2onnx):
+    python benchmarks/bench_inference_backends.py --images dataset --max-images 64
+    python benchmarks/bench_inference_backends.py --int8-detector --json drift.json
+"""
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from inference_backends import (
+    KerasEmbedder, OnnxEmbedder, EMBEDDER_ONNX_NAME, embedding_drift,
+    export_keras_to_onnx, export_yolo_to_onnx, onnx_path, quantize_int8,
+)
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+
+def load_images(root, max_images):
+    paths = sorted(p for p in Path(root).rglob('*') if p.suffix.lower() in IMAGE_EXTENSIONS)[:max_images]
+    images = [(p, cv2.imread(str(p))) for p in paths]
+    return [(p, img) for p, img in images if img is not None]
+
+
+def crop_faces(results, images):
+    crops = []
+    for result, img in zip(results, images):
+        if len(result.boxes) == 0:
+            continue
+        x1, y1, x2, y2 = map(int, result.boxes[0].xyxy[0].cpu().numpy())
+        crop = img[max(0, y1):y2, max(0, x1):x2]
+        if crop.size:
+            crops.append(crop)
+    return crops
+
+
+def box_iou(a, b):
+    x1, y1 = np.maximum(a[:, None, 0], b[None, :, 0]), np.maximum(a[:, None, 1], b[None, :, 1])
+    x2, y2 = np.minimum(a[:, None, 2], b[None, :, 2]), np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-9)
+
+
+def detection_drift(reference_results, candidate_results):
+    """Mỗi box tham chiếu ghép với box ONNX có IoU cao nhất"""
+    ious, count_diff = [], 0
+    for ref, cand in zip(reference_results, candidate_results):
+        a = ref.boxes.xyxy.cpu().numpy()
+        b = cand.boxes.xyxy.cpu().numpy()
+        count_diff += abs(len(a) - len(b))
+        if len(a) and len(b):
+            ious.extend(box_iou(a, b).max(axis=1).tolist())
+        elif len(a):
+            ious.extend([0.0] * len(a))
+    return {
+        'boxes_iou_mean': float(np.mean(ious)) if ious else 1.0,
+        'boxes_iou_min': float(np.min(ious)) if ious else 1.0,
+        'box_count_diff': count_diff,
+    }
+
+
+def time_calls(fn, items, repeat=1):
+    latencies = []
+    for _ in range(repeat):
+        for item in items:
+            start = time.perf_counter()
+            fn(item)
+            latencies.append((time.perf_counter() - start) * 1000)
+    return {'p50_ms': float(np.percentile(latencies, 50)), 'p95_ms': float(np.percentile(latencies, 95))}
+
+
+def bench_embedder(embedder, face_batch, batch_size, repeat):
+    single = time_calls(lambda i: embedder.embed(face_batch[i:i + 1], batch_size=1), range(len(face_batch)), repeat)
+    embedder.embed(face_batch[:batch_size], batch_size=batch_size)   # warmup
+    start = time.perf_counter()
+    for _ in range(repeat):
+        embedder.embed(face_batch, batch_size=batch_size)
+    batched_ms = (time.perf_counter() - start) * 1000 / (repeat * len(face_batch))
+    return {**single, 'batched_ms_per_face': batched_ms}
+
+
+def run(args):
+    import tensorflow as tf
+    from ultralytics import YOLO
+    from face_recognition_api import YOLO_MODEL_PATH, create_vggface_resnet50, preprocess_faces_batch
+
+    tf.keras.utils.set_random_seed(args.seed)
+
+    images = load_images(args.images, args.max_images)
+    if not images:
+        print(f"[ERROR] No images found in {args.images}")
+        return 1
+    frames = [img for _, img in images]
+    print(f"[INFO] {len(frames)} images from {args.images}")
+
+    workdir = Path(args.model_dir or tempfile.mkdtemp())
+    report = {'images': len(frames), 'embedders': {}, 'detectors': {}}
+
+    # ----- Detectors -----
+    detectors = {'ultralytics-pt': YOLO(str(YOLO_MODEL_PATH))}
+    yolo_onnx = onnx_path(workdir, YOLO_MODEL_PATH.stem)
+    if not yolo_onnx.exists():
+        export_yolo_to_onnx(YOLO_MODEL_PATH, yolo_onnx)
+    detectors['onnx-fp32'] = YOLO(str(yolo_onnx), task='detect')
+    if args.int8_detector:
+        yolo_int8 = onnx_path(workdir, YOLO_MODEL_PATH.stem, int8=True)
+        if not yolo_int8.exists():
+            quantize_int8(yolo_onnx, yolo_int8)
+        detectors['onnx-int8'] = YOLO(str(yolo_int8), task='detect')
+
+    reference_results = None
+    for name, detector in detectors.items():
+        detector(frames[:1], verbose=False)   # warmup
+        results = [detector([img], verbose=False)[0] for img in frames]
+        entry = time_calls(lambda img: detector([img], verbose=False), frames)
+        if reference_results is None:
+            reference_results = results
+        else:
+            entry.update(detection_drift(reference_results, results))
+        report['detectors'][name] = entry
+
+    # ----- Embedders (crop từ detector chuẩn) -----
+    crops = crop_faces(reference_results, frames)
+    if not crops:
+        print("[ERROR] No faces detected in the image set")
+        return 1
+    face_batch = preprocess_faces_batch(crops)
+
+    keras_embedder = KerasEmbedder(create_vggface_resnet50())
+    fp32_path = export_keras_to_onnx(keras_embedder.model, onnx_path(workdir, EMBEDDER_ONNX_NAME))
+    int8_path = quantize_int8(fp32_path, onnx_path(workdir, EMBEDDER_ONNX_NAME, int8=True))
+    embedders = {
+        'keras': keras_embedder,
+        'onnx-fp32': OnnxEmbedder(fp32_path, threads=args.threads),
+        'onnx-int8': OnnxEmbedder(int8_path, threads=args.threads),
+    }
+
+    reference = keras_embedder.embed(face_batch, batch_size=args.batch_size)
+    for name, embedder in embedders.items():
+        entry = bench_embedder(embedder, face_batch, args.batch_size, args.repeat)
+        if name != 'keras':
+            entry.update(embedding_drift(reference, embedder.embed(face_batch, batch_size=args.batch_size)))
+        report['embedders'][name] = entry
+
+    # ----- Report -----
+    print(f"\n[INFO] {len(crops)} face crops, batch size {args.batch_size}\n")
+    print(f"{'embedder':>10} | {'b1 p50':>8} | {'b1 p95':>8} | {'batch/face':>10} | {'cos mean':>8} | {'cos min':>8}")
+    print("-" * 68)
+    for name, r in report['embedders'].items():
+        print(f"{name:>10} | {r['p50_ms']:>8.2f} | {r['p95_ms']:>8.2f} | {r['batched_ms_per_face']:>10.2f} | "
+              f"{r.get('cosine_mean', 1.0):>8.5f} | {r.get('cosine_min', 1.0):>8.5f}")
+
+    print(f"\n{'detector':>14} | {'p50 ms':>8} | {'p95 ms':>8} | {'IoU mean':>8} | {'IoU min':>8} | {'Δboxes':>6}")
+    print("-" * 68)
+    for name, r in report['detectors'].items():
+        print(f"{name:>14} | {r['p50_ms']:>8.2f} | {r['p95_ms']:>8.2f} | {r.get('boxes_iou_mean', 1.0):>8.4f} | "
+              f"{r.get('boxes_iou_min', 1.0):>8.4f} | {r.get('box_count_diff', 0):>6}")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2), encoding='utf-8')
+        print(f"\n[INFO] Report written to {args.json}")
+
+    failures = []
+    if report['embedders']['onnx-fp32']['cosine_min'] < args.min_cosine:
+        failures.append(f"onnx-fp32 cosine_min < {args.min_cosine}")
+    if report['embedders']['onnx-int8']['cosine_min'] < args.min_cosine_int8:
+        failures.append(f"onnx-int8 cosine_min < {args.min_cosine_int8}")
+    if failures:
+        print(f"\n[FAILED] Drift too large: {', '.join(failures)}")
+        return 1
+    print("\n[SUCCESS] Drift within tolerance")
+    return 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--images', default=str(Path(__file__).resolve().parent.parent / 'dataset'))
+    parser.add_argument('--max-images', type=int, default=64)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--threads', type=int, default=0)
+    parser.add_argument('--int8-detector', action='store_true')
+    parser.add_argument('--model-dir', help='Thư mục chứa/ghi file ONNX (mặc định: thư mục tạm)')
+    parser.add_argument('--min-cosine', type=float, default=0.999)
+    parser.add_argument('--min-cosine-int8', type=float, default=0.98)
+    parser.add_argument('--json', help='Ghi report JSON ra file')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    sys.exit(run(args))
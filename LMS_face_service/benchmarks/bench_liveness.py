@@ -0,0 +1,256 @@
+"""
+Parity + benchmark: detect_liveness_simple (cũ) vs liveness.detect_liveness
+============================================================================
+Fixture set: crop tổng hợp cố định theo seed (nhiễu, gradient mịn, ảnh mờ
+kiểu ảnh in, vùng chói, ám màu xanh/đỏ, kích thước lẻ, crop rất nhỏ) và tùy
+chọn thêm crop từ ảnh thật (--images).
+
+Parity: is_real và liveness_confidence phải giống hệt; từng đặc trưng được
+so với sai số --rtol / --atol (chỉ để báo cáo, không quyết định kết quả;
+--atol cho các giá trị ~0, vd. phổ của crop phẳng ở float32).
+Benchmark: µs / lần gọi theo kích thước crop.
+
+Usage:
+    python benchmarks/bench_liveness.py
+    python benchmarks/bench_liveness.py --images dataset --fixtures 500
+"""
+import argparse
+import sys
+import time
+import warnings
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from liveness import detect_liveness, liveness_features
+
+FEATURES = ('laplacian_var', 'high_freq_energy', 'brightness_uniformity',
+            'texture_complexity', 'color_temp_ratio', 'glare_ratio')
+
+
+def reference_liveness(face_img):
+    """detect_liveness_simple() trước khi vectorize (giữ nguyên từng dòng)"""
+    gray = cv2.cvtColor(face_img, cv2.COLOR_BGR2GRAY)
+
+    laplacian_var = cv2.Laplacian(gray, cv2.CV_64F).var()
+
+    dft = cv2.dft(np.float32(gray), flags=cv2.DFT_COMPLEX_OUTPUT)
+    dft_shift = np.fft.fftshift(dft)
+    magnitude_spectrum = np.log(cv2.magnitude(dft_shift[:,:,0], dft_shift[:,:,1]) + 1)
+
+    rows, cols = gray.shape
+    crow, ccol = rows//2, cols//2
+    high_freq_mask = np.ones((rows, cols), np.uint8)
+    r = 30
+    center = [crow, ccol]
+    x, y = np.ogrid[:rows, :cols]
+    mask_area = (x - center[0])**2 + (y - center[1])**2 <= r*r
+    high_freq_mask[mask_area] = 0
+    high_freq_energy = np.sum(magnitude_spectrum * high_freq_mask) / np.sum(high_freq_mask)
+
+    h, w = gray.shape
+    grid_h, grid_w = h//4, w//4
+    grid_means = []
+    for i in range(4):
+        for j in range(4):
+            grid = gray[i*grid_h:(i+1)*grid_h, j*grid_w:(j+1)*grid_w]
+            grid_means.append(np.mean(grid))
+    brightness_uniformity = np.var(grid_means)
+
+    sobelx = cv2.Sobel(gray, cv2.CV_64F, 1, 0, ksize=3)
+    sobely = cv2.Sobel(gray, cv2.CV_64F, 0, 1, ksize=3)
+    sobel_magnitude = np.sqrt(sobelx**2 + sobely**2)
+    texture_complexity = sobel_magnitude.var()
+
+    b, g, r = cv2.split(face_img)
+    color_temp_ratio = (np.mean(b) / (np.mean(r) + 1e-5))
+
+    brightness = cv2.cvtColor(face_img, cv2.COLOR_BGR2GRAY)
+    bright_pixels = np.sum(brightness > 230)
+    glare_ratio = bright_pixels / brightness.size
+
+    scores = []
+
+    if laplacian_var > 800:
+        scores.append(100)
+    elif laplacian_var > 400:
+        scores.append(60)
+    elif laplacian_var > 200:
+        scores.append(30)
+    else:
+        scores.append(0)
+
+    if high_freq_energy > 4.5:
+        scores.append(100)
+    elif high_freq_energy > 3.5:
+        scores.append(60)
+    else:
+        scores.append(20)
+
+    if brightness_uniformity > 100:
+        scores.append(100)
+    elif brightness_uniformity > 50:
+        scores.append(60)
+    else:
+        scores.append(10)
+
+    if texture_complexity > 500:
+        scores.append(100)
+    elif texture_complexity > 250:
+        scores.append(50)
+    else:
+        scores.append(10)
+
+    if color_temp_ratio < 1.05:
+        scores.append(100)
+    elif color_temp_ratio < 1.15:
+        scores.append(60)
+    else:
+        scores.append(20)
+
+    if glare_ratio < 0.01:
+        scores.append(100)
+    elif glare_ratio < 0.03:
+        scores.append(60)
+    else:
+        scores.append(20)
+
+    weights = [2.0, 1.5, 1.0, 1.5, 1.2, 1.0]
+    liveness_confidence = np.average(scores, weights=weights)
+
+    is_real = liveness_confidence >= 70
+
+    features = dict(zip(FEATURES, map(float, (laplacian_var, high_freq_energy, brightness_uniformity,
+                                              texture_complexity, color_temp_ratio, glare_ratio))))
+    return is_real, liveness_confidence, features
+
+
+# ===========================
+# Fixtures
+# ===========================
+def synthetic_fixture(rng, kind, h, w):
+    if kind == 'noise':
+        img = rng.integers(0, 256, (h, w, 3), dtype=np.uint8)
+    elif kind == 'gradient':
+        ramp = np.linspace(0, 255, w, dtype=np.float32)[None, :, None] * np.linspace(0.3, 1, h)[:, None, None]
+        img = np.repeat(ramp, 3, axis=2).astype(np.uint8)
+    elif kind == 'printed':
+        # Ảnh in / màn hình: mờ, ít chi tiết
+        img = cv2.GaussianBlur(rng.integers(0, 256, (h, w, 3), dtype=np.uint8), (0, 0), rng.uniform(2, 6))
+    elif kind == 'face_like':
+        img = np.full((h, w, 3), (120, 150, 190), np.uint8)
+        cv2.ellipse(img, (w // 2, h // 2), (max(1, w // 3), max(1, h // 2 - 2)), 0, 0, 360, (90, 120, 170), -1)
+        noise = rng.normal(0, rng.uniform(5, 40), (h, w, 3))
+        img = np.clip(img + noise, 0, 255).astype(np.uint8)
+    elif kind == 'glare':
+        img = cv2.GaussianBlur(rng.integers(40, 200, (h, w, 3), dtype=np.uint8), (0, 0), 1.5)
+        cy, cx = int(rng.integers(h)), int(rng.integers(w))
+        cv2.circle(img, (cx, cy), max(1, min(h, w) // int(rng.integers(3, 8))), (255, 255, 255), -1)
+    elif kind == 'blue_tint':
+        img = rng.integers(0, 256, (h, w, 3), dtype=np.uint8)
+        img[..., 0] = np.clip(img[..., 0].astype(np.int32) + 60, 0, 255)
+    else:  # flat
+        img = np.full((h, w, 3), int(rng.integers(0, 256)), np.uint8)
+    return img
+
+
+def build_fixtures(n, seed, images_dir=None):
+    rng = np.random.default_rng(seed)
+    kinds = ('noise', 'gradient', 'printed', 'face_like', 'glare', 'blue_tint', 'flat')
+    sizes = [(1, 1), (3, 3), (7, 5), (10, 40), (59, 61), (64, 64)]
+    fixtures = []
+    for i in range(n):
+        h, w = sizes[i] if i < len(sizes) else (int(rng.integers(40, 420)), int(rng.integers(40, 420)))
+        fixtures.append(synthetic_fixture(rng, kinds[i % len(kinds)], h, w))
+
+    if images_dir:
+        for path in sorted(Path(images_dir).rglob('*')):
+            if path.suffix.lower() not in ('.jpg', '.jpeg', '.png'):
+                continue
+            img = cv2.imread(str(path))
+            if img is None:
+                continue
+            h, w = img.shape[:2]
+            y, x = int(rng.integers(0, max(1, h // 3))), int(rng.integers(0, max(1, w // 3)))
+            fixtures.append(np.ascontiguousarray(img[y:y + max(8, h // 2), x:x + max(8, w // 2)]))
+    return fixtures
+
+
+# ===========================
+# Parity / benchmark
+# ===========================
+def check_parity(fixtures, rtol, atol):
+    mismatches = 0
+    worst = {name: 0.0 for name in FEATURES}
+    for idx, img in enumerate(fixtures):
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)   # crop rất nhỏ: mean rỗng / chia 0
+            ref_real, ref_conf, ref_features = reference_liveness(img)
+        new_real, new_conf = detect_liveness(img)
+        new_features = liveness_features(img)
+
+        if bool(ref_real) != bool(new_real) or float(ref_conf) != float(new_conf):
+            mismatches += 1
+            print(f"[MISMATCH] fixture {idx} {img.shape}: ref=({bool(ref_real)}, {float(ref_conf)}) "
+                  f"new=({bool(new_real)}, {float(new_conf)})")
+        for name in FEATURES:
+            a, b = ref_features[name], new_features[name]
+            if np.isnan(a) and np.isnan(b):
+                continue
+            rel = abs(a - b) / max(abs(a), atol)
+            worst[name] = max(worst[name], rel)
+            if not np.isclose(a, b, rtol=rtol, atol=atol):
+                print(f"[DRIFT] fixture {idx} {img.shape} {name}: ref={a!r} new={b!r}")
+    return mismatches, worst
+
+
+def time_per_call(fn, imgs, repeat):
+    fn(imgs[0])
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for img in imgs:
+            fn(img)
+    return (time.perf_counter() - start) * 1e6 / (repeat * len(imgs))
+
+
+def run(args):
+    fixtures = build_fixtures(args.fixtures, args.seed, args.images)
+    mismatches, worst = check_parity(fixtures, args.rtol, args.atol)
+
+    print(f"[INFO] Parity over {len(fixtures)} fixtures: {mismatches} output mismatches")
+    for name, rel in worst.items():
+        print(f"  max relative diff {name:<22} {rel:.2e}")
+
+    rng = np.random.default_rng(args.seed + 1)
+    print(f"\n{'crop':>9} | {'old µs':>8} | {'new µs':>8} | {'speedup':>7}")
+    print("-" * 42)
+    for size in args.sizes:
+        imgs = [synthetic_fixture(rng, 'face_like', size, int(size * 0.85)) for _ in range(8)]
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            old = time_per_call(reference_liveness, imgs, args.repeat)
+        new = time_per_call(detect_liveness, imgs, args.repeat)
+        print(f"{size:>4}x{int(size * 0.85):<4} | {old:>8.0f} | {new:>8.0f} | {old / new:>6.1f}x")
+
+    if mismatches:
+        print(f"\n[FAILED] {mismatches} fixtures differ")
+        return 1
+    print("\n[SUCCESS] Outputs identical on all fixtures")
+    return 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--fixtures', type=int, default=300)
+    parser.add_argument('--images', help='Thêm crop từ ảnh thật trong thư mục này')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[96, 160, 256, 400])
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--rtol', type=float, default=1e-4)
+    parser.add_argument('--atol', type=float, default=1e-3)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    sys.exit(run(args))
@@ -0,0 +1,361 @@
+"""
+Benchmark: thời gian từng stage của pipeline /api/recognize
+============================================================
+Phát lại một tập ảnh cố định qua đúng các hàm của service, đo từng stage
+cho mỗi ảnh:
+
+    decode (base64 + imdecode) -> detect (YOLO) -> crop -> liveness
+    -> preprocess -> embed -> match (gallery)
+
+và end-to-end, với mỗi kích thước gallery (--gallery-sizes, gallery tổng hợp)
+x số thread đồng thời (--threads, mỗi thread xử lý trọn một ảnh như một
+request Flask threaded). Báo cáo mean / p50 / p95 / p99 (ms) và throughput.
+
+Chạy hoàn toàn offline:
+- corpus: ảnh trong --images, hoặc (mặc định) các frame tổng hợp sinh từ
+  --seed, encode JPEG một lần (sha256 của corpus nằm trong report)
+- --models synthetic (mặc định): detect / embed là mô hình chi phí (NumPy
+  matmul nhả GIL như TF, --detect-ms / --embed-ms); decode, crop, liveness,
+  preprocess và match là code thật
+- --models real: load YOLO + VGG-Face như service (init_models, file model
+  cục bộ), gallery vẫn tổng hợp
+
+--json ghi report (commit git, môi trường, cấu hình, số liệu từng run) để
+diff giữa các commit; --compare in chênh lệch p50 / p95 so với report cũ.
+
+Usage:
+    python benchmarks/bench_pipeline_stages.py --json stages.json
+    python benchmarks/bench_pipeline_stages.py --gallery-sizes 1000 20000 --threads 1 4 --compare stages.json
+    python benchmarks/bench_pipeline_stages.py --models real --images dataset --json real.json
+"""
+import argparse
+import base64
+import contextlib
+import hashlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import face_recognition_api as api
+from ann_index import IVFIndex
+from gallery import FaceGallery
+
+STAGES = ('decode', 'detect', 'crop', 'liveness', 'preprocess', 'embed', 'match')
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+
+# ===========================
+# Corpus
+# ===========================
+def synthetic_frame(rng, width=640, height=480):
+    """Frame webcam tổng hợp: nền có texture + một khuôn mặt gần giữa"""
+    y, x = np.mgrid[0:height, 0:width]
+    frame = np.stack([(x * 0.3) % 255, (y * 0.4) % 255, ((x + y) * 0.2) % 255], axis=-1)
+    frame = (frame * 0.4 + rng.normal(60, 15, frame.shape)).astype(np.float32)
+    cx, cy = width // 2 + int(rng.integers(-40, 40)), height // 2 + int(rng.integers(-30, 30))
+    skin = tuple(int(v) for v in rng.integers(110, 220, 3))
+    canvas = np.clip(frame, 0, 255).astype(np.uint8)
+    cv2.ellipse(canvas, (cx, cy), (int(rng.integers(70, 90)), int(rng.integers(95, 115))), 0, 0, 360, skin, -1)
+    for dx in (-30, 30):
+        cv2.circle(canvas, (cx + dx, cy - 20), 9, (30, 30, 30), -1)
+    cv2.ellipse(canvas, (cx, cy + 45), (25, 8), 0, 0, 180, (60, 40, 140), -1)
+    texture = cv2.GaussianBlur(rng.normal(0, 12, canvas.shape), (0, 0), 1.5)
+    return np.clip(canvas + texture, 0, 255).astype(np.uint8)
+
+
+def load_corpus(args):
+    """list[bytes] JPEG/PNG cố định"""
+    if args.images:
+        paths = sorted(p for p in Path(args.images).rglob('*') if p.suffix.lower() in IMAGE_EXTENSIONS)
+        return [p.read_bytes() for p in paths[:args.corpus]]
+    rng = np.random.default_rng(args.seed)
+    return [cv2.imencode('.jpg', synthetic_frame(rng), [cv2.IMWRITE_JPEG_QUALITY, 90])[1].tobytes()
+            for _ in range(args.corpus)]
+
+
+# ===========================
+# Model tổng hợp
+# ===========================
+class _Tensor:
+    def __init__(self, value):
+        self.value = np.asarray(value, dtype=np.float32)
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self.value
+
+
+class _Box:
+    def __init__(self, xyxy, conf):
+        self.xyxy = [_Tensor(xyxy)]
+        self.conf = [_Tensor(conf)]
+
+
+class _Result:
+    def __init__(self, boxes):
+        self.boxes = boxes
+
+
+def burn(ms, work):
+    deadline = time.perf_counter() + ms / 1000
+    while time.perf_counter() < deadline:
+        work @ work
+
+
+class SyntheticDetector:
+    """Giống interface ultralytics: model(images) -> [result.boxes]; box vùng giữa ảnh"""
+
+    def __init__(self, ms):
+        self.ms = ms
+        self.work = np.random.default_rng(0).standard_normal((192, 192)).astype(np.float32)
+
+    def __call__(self, images, verbose=False):
+        burn(self.ms * len(images), self.work)
+        results = []
+        for img in images:
+            h, w = img.shape[:2]
+            results.append(_Result([_Box((w * 0.3, h * 0.2, w * 0.7, h * 0.8), 0.9)]))
+        return results
+
+
+class SyntheticEmbedder:
+    backend = 'synthetic'
+    source = 'synthetic'
+
+    def __init__(self, ms, dim=2048):
+        self.ms = ms
+        self.dim = dim
+        self.work = np.random.default_rng(1).standard_normal((192, 192)).astype(np.float32)
+
+    def embed(self, face_batch, batch_size=32):
+        burn(self.ms * len(face_batch), self.work)
+        rng = np.random.default_rng(int(face_batch.shape[0]))
+        embeddings = rng.standard_normal((len(face_batch), self.dim)).astype(np.float32)
+        return embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+
+
+def setup_models(args):
+    if args.models == 'real':
+        if not api.init_models():
+            raise SystemExit(f"[ERROR] {api.startup_state['error']}")
+        return
+    api.yolo_model = SyntheticDetector(args.detect_ms)
+    api.embedder = SyntheticEmbedder(args.embed_ms)
+
+
+def synthetic_gallery(size, dim, args):
+    rng = np.random.default_rng(args.seed + size)
+    matrix = rng.standard_normal((size, dim)).astype(np.float32)
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+    gallery = FaceGallery.from_arrays(matrix, [f"student_{i:06d}" for i in range(size)])
+    if args.ann:
+        gallery.configure_index(IVFIndex(nlist=api.ANN_NLIST, nprobe=api.ANN_NPROBE), min_size=api.ANN_MIN_SIZE)
+    return gallery
+
+
+# ===========================
+# Đo
+# ===========================
+def process(payload, gallery, threshold):
+    """Một ảnh qua đủ các stage. Returns (dict stage -> ms, ms end-to-end, kết quả)"""
+    timings = {}
+    start = t = time.perf_counter()
+
+    def lap(stage):
+        nonlocal t
+        now = time.perf_counter()
+        timings[stage] = (now - t) * 1000
+        t = now
+
+    img = api.base64_to_image(payload)
+    lap('decode')
+    result = api.detect_faces_batch([img])[0]
+    lap('detect')
+    face_crop, error = api.crop_detected_face(img, result)
+    lap('crop')
+    if error:
+        return timings, (time.perf_counter() - start) * 1000, 'no_face'
+
+    is_real, _ = api.detect_liveness_simple(face_crop)
+    lap('liveness')
+    if not is_real:
+        return timings, (time.perf_counter() - start) * 1000, 'fake'
+
+    face_batch = api.preprocess_faces_batch([face_crop])
+    lap('preprocess')
+    embedding = api.embed_faces_batch(face_batch)[0]
+    embedding = embedding / (np.linalg.norm(embedding) + 1e-8)
+    lap('embed')
+    user_id, _, _ = api.recognize_face(embedding, gallery, threshold=threshold)
+    lap('match')
+    return timings, (time.perf_counter() - start) * 1000, 'recognized' if user_id != "Unknown" else 'unknown'
+
+
+def summarize(values):
+    if not values:
+        return {'count': 0}
+    values = np.asarray(values)
+    return {
+        'count': int(values.size),
+        'mean_ms': round(float(values.mean()), 3),
+        'p50_ms': round(float(np.percentile(values, 50)), 3),
+        'p95_ms': round(float(np.percentile(values, 95)), 3),
+        'p99_ms': round(float(np.percentile(values, 99)), 3),
+    }
+
+
+def run_once(payloads, gallery, threads, args):
+    per_stage = {stage: [] for stage in STAGES}
+    end_to_end, outcomes = [], {}
+    lock = threading.Lock()
+    jobs = [payloads[i % len(payloads)] for i in range(len(payloads) * args.repeat)]
+
+    def work(payload):
+        timings, total_ms, outcome = process(payload, gallery, args.threshold)
+        with lock:
+            for stage, ms in timings.items():
+                per_stage[stage].append(ms)
+            end_to_end.append(total_ms)
+            outcomes[outcome] = outcomes.get(outcome, 0) + 1
+
+    for payload in payloads[:args.warmup]:
+        process(payload, gallery, args.threshold)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(work, jobs))
+    elapsed = time.perf_counter() - start
+
+    return {
+        'gallery_size': len(gallery),
+        'ann_active': bool(getattr(gallery, 'index_active', False)),
+        'threads': threads,
+        'images': len(jobs),
+        'throughput_per_s': round(len(jobs) / elapsed, 2),
+        'outcomes': outcomes,
+        'stages': {stage: summarize(values) for stage, values in per_stage.items()},
+        'end_to_end': summarize(end_to_end),
+    }
+
+
+def git_commit():
+    try:
+        out = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True, timeout=10)
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=ROOT,
+                               capture_output=True, text=True, timeout=10)
+        return out.stdout.strip() + ('-dirty' if dirty.stdout.strip() else '') if out.returncode == 0 else None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def print_run(run):
+    print(f"\n[gallery {run['gallery_size']}{' (ANN)' if run['ann_active'] else ''}, {run['threads']} thread(s)] "
+          f"{run['images']} images, {run['throughput_per_s']} img/s, outcomes {run['outcomes']}")
+    print(f"{'stage':>11} | {'mean':>8} | {'p50':>8} | {'p95':>8} | {'p99':>8}")
+    print("-" * 55)
+    for stage, s in list(run['stages'].items()) + [('end-to-end', run['end_to_end'])]:
+        if s['count']:
+            print(f"{stage:>11} | {s['mean_ms']:>8.2f} | {s['p50_ms']:>8.2f} | {s['p95_ms']:>8.2f} | {s['p99_ms']:>8.2f}")
+
+
+def print_comparison(report, baseline):
+    print(f"\n[COMPARE] {baseline.get('commit')} -> {report.get('commit')} (p50 / p95 change)")
+    if baseline.get('corpus_sha256') != report.get('corpus_sha256'):
+        print("[WARNING] Different corpus, numbers are not directly comparable")
+    old_runs = {(r['gallery_size'], r['threads']): r for r in baseline.get('runs', [])}
+    for run in report['runs']:
+        old = old_runs.get((run['gallery_size'], run['threads']))
+        if old is None:
+            continue
+        cells = []
+        for stage in STAGES + ('end_to_end',):
+            new_s = run['end_to_end'] if stage == 'end_to_end' else run['stages'].get(stage, {})
+            old_s = old['end_to_end'] if stage == 'end_to_end' else old['stages'].get(stage, {})
+            if new_s.get('count') and old_s.get('count') and old_s['p50_ms'] > 0 and old_s['p95_ms'] > 0:
+                cells.append(f"{stage} {(new_s['p50_ms'] / old_s['p50_ms'] - 1):+.0%}/"
+                             f"{(new_s['p95_ms'] / old_s['p95_ms'] - 1):+.0%}")
+        print(f"  gallery {run['gallery_size']}, {run['threads']} thread(s): " + ", ".join(cells))
+
+
+def run(args):
+    corpus = load_corpus(args)
+    if not corpus:
+        print("[ERROR] Empty corpus")
+        return 1
+    payloads = [base64.b64encode(data).decode('ascii') for data in corpus]
+    setup_models(args)
+
+    print(f"[INFO] Corpus: {len(corpus)} images ({'synthetic' if not args.images else args.images}), "
+          f"repeat {args.repeat}, models: {args.models}"
+          + (f" (detect {args.detect_ms} ms, embed {args.embed_ms} ms/face)" if args.models == 'synthetic' else ""))
+
+    report = {
+        'benchmark': 'pipeline_stages',
+        'commit': git_commit(),
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'environment': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'opencv': cv2.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+        },
+        'config': {key: value for key, value in vars(args).items() if key not in ('json', 'compare')},
+        'corpus_images': len(corpus),
+        'corpus_sha256': hashlib.sha256(b''.join(corpus)).hexdigest(),
+        'runs': [],
+    }
+
+    # recognize_face in log mỗi lần gọi: không để stdout của terminal làm nhiễu số đo
+    with open(os.devnull, 'w') as devnull:
+        for size in args.gallery_sizes:
+            gallery = synthetic_gallery(size, args.dim, args)
+            for threads in args.threads:
+                with contextlib.redirect_stdout(devnull):
+                    result = run_once(payloads, gallery, threads, args)
+                report['runs'].append(result)
+                print_run(result)
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2), encoding='utf-8')
+        print(f"\n[INFO] Report written to {args.json}")
+    if args.compare:
+        print_comparison(report, json.loads(Path(args.compare).read_text(encoding='utf-8')))
+    return 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--images', help='Thư mục ảnh cố định (mặc định: frame tổng hợp)')
+    parser.add_argument('--corpus', type=int, default=64, help='Số ảnh trong corpus')
+    parser.add_argument('--repeat', type=int, default=3, help='Số lần phát lại corpus mỗi run')
+    parser.add_argument('--warmup', type=int, default=4, help='Số ảnh chạy trước mỗi run (không tính)')
+    parser.add_argument('--gallery-sizes', type=int, nargs='+', default=[100, 1000, 10000])
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 4])
+    parser.add_argument('--dim', type=int, default=2048)
+    parser.add_argument('--ann', action='store_true', help='Bật IVF index như service (ANN_MIN_SIZE / NLIST / NPROBE)')
+    parser.add_argument('--threshold', type=float, default=0.30)
+    parser.add_argument('--models', choices=['synthetic', 'real'], default='synthetic')
+    parser.add_argument('--detect-ms', type=float, default=40.0, help='Chi phí detect tổng hợp mỗi ảnh')
+    parser.add_argument('--embed-ms', type=float, default=25.0, help='Chi phí embed tổng hợp mỗi mặt')
+    parser.add_argument('--json', help='Ghi report JSON ra file')
+    parser.add_argument('--compare', help='Report JSON cũ để so sánh')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    sys.exit(run(args))
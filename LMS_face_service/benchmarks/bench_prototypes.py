@@ -0,0 +1,148 @@
+"""
+Benchmark: một embedding trung bình vs K prototype mỗi người
+=============================================================
+Dữ liệu tổng hợp: thành phần chung của mọi khuôn mặt + vector riêng của mỗi
+người + vài "mode" (góc mặt, ánh sáng, kính...) + nhiễu, chuẩn hóa L2 (giống
+embeddings VGG-Face: khác người vẫn có cosine cao). Ảnh đăng ký lệch về một
+mode, ảnh nhận diện lấy đều các mode. Impostor là các identity không đăng ký.
+
+So sánh theo K (1 = layout cũ, embedding trung bình):
+- bộ nhớ ma trận gallery
+- latency nearest() / assign() cho một ảnh lớp
+- top-1 accuracy, tỉ lệ chấp nhận đúng (GAR) ở ngưỡng cho FAR <= --far
+  và ở ngưỡng cố định --threshold
+
+Usage:
+    python benchmarks/bench_prototypes.py
+    python benchmarks/bench_prototypes.py --identities 5000 --k 1 2 3 5
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from gallery import FaceGallery, select_prototypes
+
+
+def normalize(x):
+    return x / (np.linalg.norm(x, axis=-1, keepdims=True) + 1e-8)
+
+
+def make_identities(common, n, modes, identity_scale, spread, rng):
+    """(n, modes, dim) chưa chuẩn hóa: thành phần chung + riêng từng người + lệch theo mode"""
+    dim = common.shape[0]
+    identity = normalize(rng.standard_normal((n, 1, dim), dtype=np.float32)) * identity_scale
+    offsets = normalize(rng.standard_normal((n, modes, dim), dtype=np.float32)) * spread
+    return (common + identity + offsets).astype(np.float32)
+
+
+def sample_images(identities, per_identity, noise, rng):
+    """(n, per_identity, dim) ảnh: mode ngẫu nhiên (không đều) + nhiễu"""
+    n, modes, dim = identities.shape
+    # Một mode chiếm phần lớn ảnh đăng ký (vd. cùng một buổi chụp)
+    probs = np.array([0.6] + [0.4 / (modes - 1)] * (modes - 1)) if modes > 1 else np.ones(1)
+    picks = rng.choice(modes, size=(n, per_identity), p=probs)
+    images = identities[np.arange(n)[:, None], picks]
+    images = images + noise * normalize(rng.standard_normal(images.shape, dtype=np.float32))
+    return normalize(images).astype(np.float32)
+
+
+def sample_queries(identities, noise, rng):
+    """Một ảnh/người từ mode bất kỳ (đều)"""
+    n, modes, dim = identities.shape
+    images = identities[np.arange(n), rng.integers(0, modes, n)]
+    images = images + noise * normalize(rng.standard_normal(images.shape, dtype=np.float32))
+    return normalize(images).astype(np.float32)
+
+
+def build_gallery(enroll, ids, k):
+    gallery = FaceGallery(dim=enroll.shape[2], capacity=len(ids) * max(1, k))
+    for user_id, embeddings in zip(ids, enroll):
+        gallery[user_id] = select_prototypes(embeddings, k) if k > 1 else normalize(embeddings.mean(axis=0))
+    return gallery
+
+
+def threshold_at_far(impostor_distances, far):
+    """Ngưỡng lớn nhất sao cho tỉ lệ impostor bị chấp nhận <= far"""
+    return float(np.quantile(impostor_distances, far))
+
+
+def run(args):
+    rng = np.random.default_rng(args.seed)
+    common = normalize(rng.standard_normal(args.dim, dtype=np.float32))
+    enrolled = make_identities(common, args.identities, args.modes, args.identity_scale, args.spread, rng)
+    strangers = make_identities(common, args.impostors, args.modes, args.identity_scale, args.spread, rng)
+    enroll = sample_images(enrolled, args.enroll_images, args.noise, rng)
+    genuine_queries = sample_queries(enrolled, args.noise, rng)
+    impostor_queries = sample_queries(strangers, args.noise, rng)
+    ids = [f"student_{i:06d}" for i in range(args.identities)]
+
+    class_size = min(args.class_size, args.identities)
+    group = genuine_queries[rng.choice(args.identities, class_size, replace=False)]
+
+    print(f"[INFO] {args.identities} identities x {args.modes} modes, {args.enroll_images} enrollment images, "
+          f"{args.impostors} impostors, dim {args.dim}")
+    print(f"\n{'K':>2} | {'rows':>6} | {'matrix MB':>9} | {'nearest ms':>10} | {'assign ms':>9} | "
+          f"{'top-1':>6} | {'thr@FAR':>7} | {'GAR@FAR':>7} | {f'GAR@{args.threshold}':>8} | {f'FAR@{args.threshold}':>8}")
+    print("-" * 102)
+
+    for k in args.k:
+        gallery = build_gallery(enroll, ids, k)
+        for q in genuine_queries[:5]:
+            gallery.nearest(q)   # warmup
+
+        start = time.perf_counter()
+        genuine = [gallery.nearest(q) for q in genuine_queries[:args.queries]]
+        nearest_ms = (time.perf_counter() - start) * 1000 / len(genuine)
+
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            gallery.assign(group, args.threshold)
+        assign_ms = (time.perf_counter() - start) * 1000 / args.repeat
+
+        # Accuracy trên toàn bộ query bằng distance_matrix (cùng kết quả với nearest)
+        genuine_d = gallery.distance_matrix(genuine_queries)
+        top1 = float(np.mean(genuine_d.argmin(axis=1) == np.arange(args.identities)))
+        own = genuine_d[np.arange(args.identities), np.arange(args.identities)]
+        impostor_best = gallery.distance_matrix(impostor_queries).min(axis=1)
+
+        thr = threshold_at_far(impostor_best, args.far)
+        correct = genuine_d.argmin(axis=1) == np.arange(args.identities)
+        gar_far = float(np.mean(correct & (own <= thr)))
+        gar_fixed = float(np.mean(correct & (own <= args.threshold)))
+        far_fixed = float(np.mean(impostor_best <= args.threshold))
+
+        parity = all(name == ids[i] or not correct[i] for i, (name, _) in enumerate(genuine))
+        print(f"{k:>2} | {gallery.n_rows:>6} | {gallery.matrix.nbytes / 2**20:>9.1f} | {nearest_ms:>10.3f} | "
+              f"{assign_ms:>9.2f} | {top1:>6.3f} | {thr:>7.3f} | {gar_far:>7.3f} | {gar_fixed:>8.3f} | "
+              f"{far_fixed:>8.3f}" + ("" if parity else "  [nearest != distance_matrix]"))
+
+    print(f"\nGAR@FAR: tỉ lệ ảnh đúng người được chấp nhận ở ngưỡng cho FAR <= {args.far}; "
+          f"assign(): ảnh lớp {class_size} khuôn mặt")
+    return 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--identities', type=int, default=2000)
+    parser.add_argument('--impostors', type=int, default=2000)
+    parser.add_argument('--dim', type=int, default=2048)
+    parser.add_argument('--modes', type=int, default=3, help='Số mode (góc mặt / ánh sáng) mỗi người')
+    parser.add_argument('--identity-scale', type=float, default=0.4, help='Độ lớn vector riêng mỗi người')
+    parser.add_argument('--spread', type=float, default=0.3, help='Độ lệch giữa các mode')
+    parser.add_argument('--noise', type=float, default=0.08)
+    parser.add_argument('--enroll-images', type=int, default=10)
+    parser.add_argument('--k', type=int, nargs='+', default=[1, 2, 3, 5])
+    parser.add_argument('--far', type=float, default=0.01)
+    parser.add_argument('--threshold', type=float, default=0.30)
+    parser.add_argument('--class-size', type=int, default=40)
+    parser.add_argument('--queries', type=int, default=300)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    sys.exit(run(args))
@@ -0,0 +1,196 @@
+"""
+Benchmark: polling /api/recognize vs /api/recognize-stream (bỏ phiếu)
+======================================================================
+Mô phỏng một lượt điểm danh: webcam cho ra crop khuôn mặt tổng hợp, thỉnh
+thoảng mất mặt hoặc bị nhòe do cử động (độ nét thật đo bằng face_quality).
+Embedding của một frame = vector của người đó kéo về "khuôn mặt trung bình"
+theo độ nhòe + nhiễu (mô hình giả định: ảnh nhòe mất chi tiết riêng, mọi
+người trông giống nhau -> dễ khớp nhầm người gần trung bình).
+
+- polling (FaceAttendance.js cũ): mỗi 2 giây một request, full pipeline cho
+  mọi frame có mặt, chấp nhận ngay frame đầu tiên khớp, tối đa 20 lần
+- stream: mỗi --stream-interval giây một frame trên một kết nối; chỉ embed
+  frame đủ nét (RecognitionStream), kết luận khi phiếu đủ
+
+Báo cáo: tỉ lệ thành công, nhận nhầm (sinh viên bị nhận thành người khác +
+người chưa đăng ký được chấp nhận), số lần embed và số frame cho mỗi lượt
+điểm danh thành công, số lần embed cho một người chưa đăng ký (tới khi bỏ
+cuộc), thời gian tới khi có kết quả.
+
+Usage:
+    python benchmarks/bench_stream_voting.py
+    python benchmarks/bench_stream_voting.py --trials 500 --blur 0.5
+"""
+import argparse
+import sys
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from gallery import FaceGallery
+from stream_recognition import RecognitionStream, face_quality
+
+
+def distance_to_confidence(distance, threshold):
+    """Giống face_recognition_api.distance_to_confidence"""
+    confidence_percent = max(0, min(100, (1 - distance / threshold) * 100))
+    if distance < 0.15:
+        confidence_percent = min(100, confidence_percent * 1.1)
+    elif distance > threshold * 0.6:
+        confidence_percent *= 0.75
+    return confidence_percent
+
+
+class Webcam:
+    """Frame 320x240 với một khuôn mặt; nhòe / mất mặt ngẫu nhiên"""
+
+    def __init__(self, rng, args):
+        self.rng = rng
+        self.args = args
+        y, x = np.mgrid[0:160, 0:130]
+        face = np.full((160, 130, 3), 150, np.float32)
+        face += 40 * np.sin(x[..., None] / 5.0) * np.cos(y[..., None] / 7.0)
+        face += rng.normal(0, 20, face.shape)
+        self.face = np.clip(face, 0, 255).astype(np.uint8)
+
+    def frame(self):
+        """Returns (ảnh, box hoặc None, độ nhòe 0..1)"""
+        img = np.full((240, 320, 3), 90, np.uint8)
+        if self.rng.random() < self.args.absent:
+            return img, None, 0.0
+        x, y = 95 + int(self.rng.integers(-4, 5)), 40 + int(self.rng.integers(-4, 5))
+        face = self.face
+        blur = 0.0
+        if self.rng.random() < self.args.blur:
+            blur = float(self.rng.uniform(0.3, 1.0))
+            k = 1 + 2 * int(blur * 7)
+            face = cv2.blur(face, (k, k))
+        img[y:y + 160, x:x + 130] = face
+        return img, (x, y, x + 130, y + 160), blur
+
+
+def embed(identity, blur, rng, args):
+    sigma = args.noise + args.blur_noise * blur
+    e = identity + args.blur_pull * blur * (args.mean_face - identity)
+    e = e + sigma * rng.standard_normal(identity.shape).astype(np.float32) / np.sqrt(identity.size)
+    return e / np.linalg.norm(e)
+
+
+def make_people(rng, n, args):
+    noise = rng.standard_normal((n, args.dim)).astype(np.float32) / np.sqrt(args.dim)
+    people = args.mean_face + args.spread * noise
+    return people / np.linalg.norm(people, axis=1, keepdims=True)
+
+
+def polling_trial(person, true_id, gallery, rng, args):
+    cam = Webcam(rng, args)
+    embeds = 0
+    for attempt in range(1, args.max_attempts + 1):
+        img, box, blur = cam.frame()
+        if box is None:
+            continue
+        embeds += 1
+        user_id, distance = gallery.nearest(embed(person, blur, rng, args))
+        if distance <= args.threshold:
+            return {'decided': True, 'user_id': user_id, 'correct': user_id == true_id,
+                    'embeds': embeds, 'frames': attempt, 'seconds': attempt * args.poll_interval}
+    return {'decided': False, 'embeds': embeds, 'frames': args.max_attempts,
+            'seconds': args.max_attempts * args.poll_interval}
+
+
+def stream_trial(person, true_id, gallery, rng, args):
+    cam = Webcam(rng, args)
+    current = {}
+
+    def detect(img):
+        return [(current['box'], 0.9)] if current['box'] else []
+
+    def analyze_crop(face_crop):
+        return {'is_real': True, 'liveness_confidence': 90.0, 'embedding': embed(person, current['blur'], rng, args)}
+
+    def match(embedding):
+        user_id, distance = gallery.nearest(embedding)
+        confidence = distance_to_confidence(distance, args.threshold)
+        return (user_id if distance <= args.threshold else None), distance, confidence
+
+    stream = RecognitionStream(detect, analyze_crop, match, max_frames=args.stream_frames,
+                               min_votes=args.min_votes, max_gap=args.max_gap, instant_confidence=args.instant)
+    result = None
+    while result is None or result['type'] != 'decision':
+        img, current['box'], current['blur'] = cam.frame()
+        result = stream.process(img)
+    decided = bool(result.get('recognized'))
+    return {'decided': decided, 'user_id': result.get('user_id'), 'correct': result.get('user_id') == true_id,
+            'embeds': stream.embedded_frames, 'frames': stream.frames,
+            'seconds': stream.frames * args.stream_interval}
+
+
+def summarize(name, genuine, impostor):
+    ok = [r for r in genuine if r['decided'] and r['correct']]
+    wrong = sum(r['decided'] and not r['correct'] for r in genuine)
+    impostor_accepted = sum(r['decided'] for r in impostor)
+    embeds_per_ok = sum(r['embeds'] for r in genuine) / max(len(ok), 1)
+    frames_per_ok = sum(r['frames'] for r in genuine) / max(len(ok), 1)
+    embeds_per_impostor = sum(r['embeds'] for r in impostor) / len(impostor)
+    print(f"{name:>8} | {len(ok) / len(genuine):>7.1%} | {wrong / len(genuine):>9.2%} | "
+          f"{impostor_accepted / len(impostor):>9.2%} | {embeds_per_ok:>10.2f} | {frames_per_ok:>10.2f} | "
+          f"{embeds_per_impostor:>10.2f} | {np.median([r['seconds'] for r in ok]) if ok else 0:>8.1f}")
+
+
+def run(args):
+    rng = np.random.default_rng(args.seed)
+    mean_face = rng.standard_normal(args.dim).astype(np.float32)
+    args.mean_face = mean_face / np.linalg.norm(mean_face)
+    people = make_people(rng, args.people, args)
+    ids = [f"student_{i:04d}" for i in range(args.people)]
+    gallery = FaceGallery.from_arrays(people, ids)
+    outsiders = make_people(np.random.default_rng(args.seed + 1), args.trials, args)
+
+    # Độ nét của crop nhòe / không nhòe theo face_quality (để chọn --blur hợp lý)
+    cam = Webcam(rng, args)
+    sharp = face_quality(cam.face, 0.9)
+    blurred = face_quality(cv2.blur(cam.face, (9, 9)), 0.9)
+    print(f"[INFO] {args.people} enrolled, {args.trials} genuine + {args.trials} impostor check-ins; "
+          f"face absent p={args.absent}, motion blur p={args.blur}; quality sharp {sharp:.2f} / blurred {blurred:.2f}")
+    print(f"[INFO] polling every {args.poll_interval}s (max {args.max_attempts}), stream every "
+          f"{args.stream_interval}s (max {args.stream_frames} frames, {args.min_votes} votes, "
+          f"re-embed after <= {args.max_gap} frames)\n")
+
+    print(f"{'mode':>8} | {'success':>7} | {'wrong id':>9} | {'impostor':>9} | {'embeds/ok':>10} | "
+          f"{'frames/ok':>10} | {'embeds/imp':>10} | {'median s':>8}")
+    print("-" * 93)
+    for name, trial in (('polling', polling_trial), ('stream', stream_trial)):
+        trial_rng = np.random.default_rng(args.seed + 2)
+        genuine = [trial(people[i % args.people], ids[i % args.people], gallery, trial_rng, args)
+                   for i in range(args.trials)]
+        impostor = [trial(outsiders[i], None, gallery, trial_rng, args) for i in range(args.trials)]
+        summarize(name, genuine, impostor)
+    return 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--trials', type=int, default=300)
+    parser.add_argument('--people', type=int, default=300)
+    parser.add_argument('--dim', type=int, default=128)
+    parser.add_argument('--spread', type=float, default=0.30, help='Khoảng cách giữa các người trong gallery')
+    parser.add_argument('--noise', type=float, default=0.10, help='Nhiễu embedding của frame nét')
+    parser.add_argument('--blur-noise', type=float, default=0.3, help='Nhiễu thêm khi nhòe hoàn toàn')
+    parser.add_argument('--blur-pull', type=float, default=1.0, help='Mức kéo về khuôn mặt trung bình khi nhòe hoàn toàn')
+    parser.add_argument('--blur', type=float, default=0.4, help='Xác suất frame bị nhòe')
+    parser.add_argument('--absent', type=float, default=0.1, help='Xác suất không có mặt trong frame')
+    parser.add_argument('--threshold', type=float, default=0.30)
+    parser.add_argument('--poll-interval', type=float, default=2.0)
+    parser.add_argument('--max-attempts', type=int, default=20)
+    parser.add_argument('--stream-interval', type=float, default=0.5)
+    parser.add_argument('--stream-frames', type=int, default=60)
+    parser.add_argument('--min-votes', type=int, default=2)
+    parser.add_argument('--max-gap', type=int, default=2, help='Embed lại sau tối đa ngần này frame')
+    parser.add_argument('--instant', type=float, default=70.0, help='Một phiếu với confidence này là đủ (0 = tắt)')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    sys.exit(run(args))
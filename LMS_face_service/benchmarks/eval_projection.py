@@ -0,0 +1,158 @@
+"""
+Đánh giá gallery giảm chiều: PCA projection + float16
+======================================================
+Embeddings tổng hợp có phổ giảm dần giống embeddings thật (thành phần chung
++ vector riêng mỗi người trong một không gian con có phương sai giảm theo
+power-law + biến thiên giữa các ảnh + nhiễu đẳng hướng). PCA được fit trên
+tập đã đăng ký (như fit_projection.py), rồi so với gallery 2048 chiều float32:
+
+- RAM: bytes của ma trận gallery + sq_norms
+- latency: nearest() một query và distance_matrix() cho một ảnh lớp
+- độ chính xác: top-1 (closed-set), tỉ lệ giữ lại so với bản đầy đủ,
+  GAR ở ngưỡng cho FAR <= --far (impostor = người chưa đăng ký)
+
+Usage:
+    python benchmarks/eval_projection.py
+    python benchmarks/eval_projection.py --sizes 10000 100000 --dims 128 256 512
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from gallery import FaceGallery
+from projection import PCAProjection
+
+
+class SyntheticFaces:
+    """Sinh embeddings (chuẩn hóa L2) với cấu trúc phổ cố định theo seed"""
+
+    def __init__(self, dim, latent, decay, seed):
+        rng = np.random.default_rng(seed)
+        basis, _ = np.linalg.qr(rng.standard_normal((dim, latent)))
+        self.basis = basis.T.astype(np.float32)                       # (latent, dim) trực chuẩn
+        self.spectrum = (np.arange(1, latent + 1, dtype=np.float32) ** -decay)
+        self.spectrum /= np.linalg.norm(self.spectrum)
+        self.common = rng.standard_normal(dim).astype(np.float32)
+        self.common /= np.linalg.norm(self.common)
+        self.dim = dim
+
+    def identities(self, n, rng):
+        """(n, latent) hệ số riêng của từng người"""
+        return (rng.standard_normal((n, self.spectrum.size)) * self.spectrum).astype(np.float32)
+
+    def images(self, identity, rng, variation, noise, chunk=8192):
+        """Một ảnh cho mỗi hàng của identity"""
+        out = np.empty((identity.shape[0], self.dim), dtype=np.float32)
+        for i in range(0, identity.shape[0], chunk):
+            coeffs = identity[i:i + chunk]
+            coeffs = coeffs + variation * (rng.standard_normal(coeffs.shape) * self.spectrum).astype(np.float32)
+            x = self.common + 0.6 * np.sqrt(self.spectrum.size) * (coeffs @ self.basis)
+            x += noise * rng.standard_normal(x.shape).astype(np.float32) / np.sqrt(self.dim)
+            out[i:i + chunk] = x / np.linalg.norm(x, axis=1, keepdims=True)
+        return out
+
+
+def evaluate(gallery, genuine, impostors, class_queries, far, repeat):
+    n = len(gallery)
+    for q in genuine[:3]:
+        gallery.nearest(q)
+
+    start = time.perf_counter()
+    for q in genuine[:repeat]:
+        gallery.nearest(q)
+    nearest_ms = (time.perf_counter() - start) * 1000 / min(repeat, len(genuine))
+
+    start = time.perf_counter()
+    gallery.distance_matrix(class_queries)
+    class_ms = (time.perf_counter() - start) * 1000
+
+    # Query i thuộc người i (hàng i)
+    genuine_d = np.concatenate([gallery.distance_matrix(genuine[i:i + 256]) for i in range(0, len(genuine), 256)])
+    impostor_best = np.concatenate([gallery.distance_matrix(impostors[i:i + 256]).min(axis=1)
+                                    for i in range(0, len(impostors), 256)])
+    truth = np.arange(len(genuine))
+    correct = genuine_d.argmin(axis=1) == truth
+    own = genuine_d[truth, truth]
+    threshold = float(np.quantile(impostor_best, far))
+    return {
+        'bytes': gallery.nbytes,
+        'nearest_ms': nearest_ms,
+        'class_ms': class_ms,
+        'top1': float(correct.mean()),
+        'gar': float(np.mean(correct & (own <= threshold))),
+        'threshold': threshold,
+        'rows': n,
+    }
+
+
+def run(args):
+    faces = SyntheticFaces(args.dim, args.latent, args.decay, args.seed)
+    print(f"[INFO] dim {args.dim}, latent {args.latent} (power-law decay {args.decay}), "
+          f"{args.queries} genuine / {args.queries} impostor queries, FAR <= {args.far}")
+
+    for n in args.sizes:
+        rng = np.random.default_rng(args.seed + n)
+        people = faces.identities(n, rng)
+        enrolled = faces.images(people, rng, args.variation, args.noise)
+        ids = [f"student_{i:06d}" for i in range(n)]
+
+        picks = np.arange(min(args.queries, n))
+        genuine = faces.images(people[picks], rng, args.variation, args.noise)
+        impostors = faces.images(faces.identities(len(picks), rng), rng, args.variation, args.noise)
+        class_queries = genuine[:args.class_size]
+
+        print(f"\n=== {n} identities ===")
+        print(f"{'config':>14} | {'MB':>7} | {'RAM':>6} | {'nearest ms':>10} | {'speedup':>7} | "
+              f"{'class ms':>8} | {'top-1':>6} | {'retained':>8} | {'GAR@FAR':>7} | {'thr':>5} | fit s")
+        print("-" * 112)
+
+        full = FaceGallery.from_arrays(enrolled, ids)
+        base = evaluate(full, genuine, impostors, class_queries, args.far, args.repeat)
+        configs = [('2048 float32', base, 0.0)]
+        del full
+
+        # Các thành phần chính lồng nhau: fit một lần với d lớn nhất rồi cắt bớt
+        start = time.perf_counter()
+        pca = PCAProjection.fit(enrolled, max(args.dims))
+        fit_s = time.perf_counter() - start
+        for d in args.dims:
+            projection = PCAProjection(pca.mean, pca.components[:, :d])
+            for dtype in args.dtypes:
+                gallery = FaceGallery.from_arrays(enrolled, ids, projection=projection, dtype=dtype)
+                configs.append((f"{d} {dtype}", evaluate(gallery, genuine, impostors, class_queries,
+                                                        args.far, args.repeat), fit_s))
+                del gallery
+
+        for name, result, fit_s in configs:
+            print(f"{name:>14} | {result['bytes'] / 2**20:>7.1f} | {result['bytes'] / base['bytes']:>5.1%} | "
+                  f"{result['nearest_ms']:>10.3f} | {base['nearest_ms'] / result['nearest_ms']:>6.1f}x | "
+                  f"{result['class_ms']:>8.2f} | {result['top1']:>6.3f} | "
+                  f"{result['top1'] / max(base['top1'], 1e-9):>8.1%} | {result['gar']:>7.3f} | "
+                  f"{result['threshold']:>5.3f} | {fit_s:.1f}")
+        del enrolled
+    return 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--dims', type=int, nargs='+', default=[128, 256, 512])
+    parser.add_argument('--dtypes', nargs='+', default=['float32', 'float16'], choices=['float32', 'float16'])
+    parser.add_argument('--dim', type=int, default=2048)
+    parser.add_argument('--latent', type=int, default=1024, help='Số chiều của không gian con có cấu trúc')
+    parser.add_argument('--decay', type=float, default=0.8, help='Phương sai thành phần i ~ i^-2·decay')
+    parser.add_argument('--variation', type=float, default=0.35, help='Biến thiên giữa các ảnh của cùng người')
+    parser.add_argument('--noise', type=float, default=0.1, help='Nhiễu đẳng hướng')
+    parser.add_argument('--far', type=float, default=0.01)
+    parser.add_argument('--queries', type=int, default=1000)
+    parser.add_argument('--class-size', type=int, default=40)
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    sys.exit(run(args))
@@ -0,0 +1,160 @@
+"""
+Load test: /api/recognize throughput với N client đồng thời
+============================================================
+Mỗi client gửi request liên tục (như FaceAttendance.js nhưng không nghỉ
+2 giây) trong `--duration` giây. Báo cáo throughput và latency p50/p95.
+
+HTTP mode (cần face service đang chạy):
+    RECOGNIZE_BATCHING=False python face_recognition_api.py   # baseline
+    RECOGNIZE_BATCHING=True  python face_recognition_api.py   # micro-batching
+    python benchmarks/load_test_recognize.py --image dataset/congtri/congtri_01.jpg
+
+Offline mode (không cần model): chạy MicroBatcher với mô hình chi phí
+tổng hợp "overhead mỗi lần gọi + chi phí mỗi ảnh", so với gọi batch-1 tuần tự.
+    python benchmarks/load_test_recognize.py --offline
+"""
+import argparse
+import base64
+import sys
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from batcher import MicroBatcher
+
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) if values else 0.0
+
+
+def run_clients(n_clients, duration, call):
+    """n_clients thread gọi call() liên tục trong duration giây"""
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    stop_at = time.monotonic() + duration
+
+    def client():
+        local = []
+        while time.monotonic() < stop_at:
+            start = time.perf_counter()
+            try:
+                call()
+                local.append((time.perf_counter() - start) * 1000)
+            except Exception:
+                with lock:
+                    errors[0] += 1
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=client) for _ in range(n_clients)]
+    start = time.monotonic()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.monotonic() - start
+
+    return {
+        'clients': n_clients,
+        'requests': len(latencies),
+        'errors': errors[0],
+        'throughput': len(latencies) / elapsed,
+        'p50_ms': percentile(latencies, 50),
+        'p95_ms': percentile(latencies, 95),
+    }
+
+
+def print_row(label, r):
+    print(f"{label:>12} | {r['clients']:>7} | {r['throughput']:>9.1f} | {r['p50_ms']:>8.1f} | {r['p95_ms']:>8.1f} | {r['errors']:>6}")
+
+
+def print_header():
+    print(f"{'mode':>12} | {'clients':>7} | {'req/s':>9} | {'p50 ms':>8} | {'p95 ms':>8} | {'errors':>6}")
+    print("-" * 66)
+
+
+def http_mode(args):
+    import requests
+
+    if args.image:
+        with open(args.image, 'rb') as f:
+            image_b64 = base64.b64encode(f.read()).decode('utf-8')
+    else:
+        import cv2
+        frame = np.random.default_rng(0).integers(0, 255, (720, 1280, 3), dtype=np.uint8)
+        image_b64 = base64.b64encode(cv2.imencode('.jpg', frame)[1].tobytes()).decode('utf-8')
+
+    payload = {'image': image_b64, 'threshold': 0.30}
+    if args.session_id is not None:
+        payload['session_id'] = args.session_id
+
+    local = threading.local()
+
+    def call():
+        session = getattr(local, 'session', None)
+        if session is None:
+            session = local.session = requests.Session()
+        response = session.post(f"{args.url}/api/recognize", json=payload, timeout=60)
+        response.raise_for_status()
+
+    health = requests.get(f"{args.url}/api/health", timeout=5).json()
+    label = 'batched' if health.get('recognize_batching') else 'unbatched'
+
+    print_header()
+    for n in args.clients:
+        print_row(label, run_clients(n, args.duration, call))
+
+
+def offline_mode(args):
+    """Chi phí mô phỏng: overhead_ms mỗi lần gọi model + item_ms mỗi ảnh"""
+    overhead = args.overhead_ms / 1000.0
+    per_item = args.item_ms / 1000.0
+    model_lock = threading.Lock()
+
+    def process_batch(items):
+        # Một model, một lần gọi tại một thời điểm (như TF/YOLO trên CPU)
+        with model_lock:
+            time.sleep(overhead + per_item * len(items))
+        return items
+
+    def unbatched_call():
+        process_batch([None])
+
+    batcher = MicroBatcher(process_batch, max_batch_size=args.max_batch_size, max_wait_ms=args.max_wait_ms).start()
+
+    def batched_call():
+        batcher.submit(None).result()
+
+    print(f"[INFO] Synthetic cost: {args.overhead_ms} ms/call + {args.item_ms} ms/image, "
+          f"batch <= {args.max_batch_size}, wait <= {args.max_wait_ms} ms\n")
+    print_header()
+    for n in args.clients:
+        print_row('unbatched', run_clients(n, args.duration, unbatched_call))
+        print_row('batched', run_clients(n, args.duration, batched_call))
+    print(f"\n[INFO] Batcher stats: {batcher.stats()}")
+    batcher.stop()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', type=int, nargs='+', default=[10, 50, 200])
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--url', default='http://localhost:5000')
+    parser.add_argument('--image', help='Ảnh JPEG/PNG để gửi (mặc định: frame ngẫu nhiên)')
+    parser.add_argument('--session-id', type=int)
+    parser.add_argument('--offline', action='store_true', help='Mô phỏng chi phí model, không cần server')
+    parser.add_argument('--overhead-ms', type=float, default=40.0)
+    parser.add_argument('--item-ms', type=float, default=8.0)
+    parser.add_argument('--max-batch-size', type=int, default=16)
+    parser.add_argument('--max-wait-ms', type=float, default=10.0)
+    args = parser.parse_args()
+
+    if args.offline:
+        offline_mode(args)
+    else:
+        http_mode(args)
@@ -0,0 +1,197 @@
+"""
+Stress test: recognize / register / delete đồng thời trên gallery
+==================================================================
+Reader liên tục lấy một người ngẫu nhiên trong gallery, dùng chính embedding
+của người đó làm query và kiểm tra kết quả nearest() phải là người đó
+(khoảng cách ~0); writer đăng ký người mới / đăng ký lại / xóa song song.
+
+--mode snapshot (mặc định): GalleryRegistry, mỗi request một snapshot
+--mode unsafe:   sửa trực tiếp một FaceGallery dùng chung (như dict
+                 face_database cũ) để so sánh - sẽ có lỗi / kết quả sai
+
+--store DIR: writer ghi xuống EmbeddingStore; cuối bài so store với snapshot.
+
+Usage:
+    python benchmarks/stress_gallery_snapshots.py --size 5000 --duration 10
+    python benchmarks/stress_gallery_snapshots.py --mode unsafe
+"""
+import argparse
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from embedding_store import EmbeddingStore
+from gallery import FaceGallery
+from snapshots import GalleryRegistry
+
+
+def random_embeddings(rng, n, dim):
+    vectors = rng.standard_normal((n, dim), dtype=np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+class Counters:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.values = {}
+
+    def add(self, key, n=1):
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + n
+
+
+def reader(get_gallery, stop, counters, seed):
+    rng = np.random.default_rng(seed)
+    while not stop.is_set():
+        gallery = get_gallery()
+        try:
+            n = gallery.n_rows
+            if n == 0:
+                continue
+            row = int(rng.integers(n))
+            user_id = gallery.ids[row]
+            if user_id is None:
+                continue   # lỗ (đã xóa / đăng ký lại), chờ compact
+            query = np.array(gallery[user_id]).reshape(-1, gallery.dim)[row - gallery.row_of(user_id)]
+            match = gallery.nearest(query)
+            if (not 0 <= row - gallery.row_of(user_id) < gallery.prototype_count(user_id)
+                    or match is None or match[0] != user_id or match[1] > 1e-3):
+                counters.add('wrong_results')
+            counters.add('recognize')
+        except Exception as e:
+            counters.add(f'errors ({type(e).__name__})')
+
+
+def writer(put, delete, get_gallery, stop, counters, seed, dim, delete_ratio):
+    rng = np.random.default_rng(seed)
+    next_id = 0
+    while not stop.is_set():
+        try:
+            action = rng.random()
+            if action < delete_ratio:
+                ids = get_gallery().ids
+                user_id = ids[int(rng.integers(len(ids)))] if len(ids) else None
+                if user_id is not None:
+                    delete(user_id)
+                    counters.add('delete')
+            elif action < 2 * delete_ratio:
+                ids = get_gallery().ids
+                user_id = ids[int(rng.integers(len(ids)))] if len(ids) else None
+                if user_id is not None:
+                    put(user_id, random_embeddings(rng, 1, dim)[0])
+                    counters.add('re-register')
+            else:
+                put(f"writer{seed}_{next_id}", random_embeddings(rng, 1, dim)[0])
+                next_id += 1
+                counters.add('register')
+        except KeyError:
+            # Người khác vừa xóa user này
+            counters.add('delete_conflicts')
+        except Exception as e:
+            counters.add(f'writer_errors ({type(e).__name__})')
+
+
+def run(args):
+    rng = np.random.default_rng(args.seed)
+    initial = random_embeddings(rng, args.size, args.dim)
+    gallery = FaceGallery.from_dict({f"student_{i:06d}": initial[i] for i in range(args.size)})
+
+    store = None
+    workdir = None
+    if args.store is not None:
+        workdir = Path(args.store or tempfile.mkdtemp())
+        store = EmbeddingStore(workdir / "face_store", dim=args.dim)
+        store.import_dict(gallery.to_dict())
+
+    if args.mode == 'snapshot':
+        registry = GalleryRegistry(gallery)
+        get_gallery = registry.snapshot
+        persist_put = store.put if store else None
+        persist_delete = store.delete if store else None
+
+        def put(user_id, embedding):
+            registry.put(user_id, embedding, persist=persist_put)
+
+        def delete(user_id):
+            registry.delete(user_id, persist=persist_delete)
+    else:
+        registry = None
+
+        def get_gallery():
+            return gallery
+
+        def put(user_id, embedding):
+            gallery[user_id] = embedding
+            if store:
+                store.put(user_id, embedding)
+
+        def delete(user_id):
+            del gallery[user_id]
+            if store:
+                store.delete(user_id)
+
+    counters = Counters()
+    stop = threading.Event()
+    threads = [threading.Thread(target=reader, args=(get_gallery, stop, counters, 100 + i))
+               for i in range(args.readers)]
+    threads += [threading.Thread(target=writer, args=(put, delete, get_gallery, stop, counters, 200 + i,
+                                                      args.dim, args.delete_ratio))
+                for i in range(args.writers)]
+
+    start = time.monotonic()
+    for t in threads:
+        t.start()
+    time.sleep(args.duration)
+    stop.set()
+    for t in threads:
+        t.join()
+    elapsed = time.monotonic() - start
+
+    final = get_gallery()
+    print(f"[INFO] mode={args.mode} size={args.size} readers={args.readers} writers={args.writers} "
+          f"duration={elapsed:.1f}s")
+    for key in sorted(counters.values):
+        value = counters.values[key]
+        print(f"  {key:<28} {value:>9}  ({value / elapsed:.1f}/s)")
+    print(f"  final size: {len(final)}, version: {final.version}")
+    if registry is not None:
+        print(f"  registry: {registry.stats()}")
+
+    failures = sum(v for k, v in counters.values.items() if 'error' in k or k == 'wrong_results')
+    if store is not None:
+        reopened = EmbeddingStore(workdir / "face_store").open()
+        matrix, ids = reopened.load_arrays()
+        on_disk = dict(zip(ids, matrix[:len(ids)]))
+        consistent = (set(on_disk) == set(final.keys())
+                      and all(np.array_equal(on_disk[u], final[u]) for u in final.keys()))
+        print(f"  store matches final snapshot: {consistent}")
+        failures += 0 if consistent else 1
+        if not args.store:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print("[SUCCESS] No races detected" if failures == 0 else f"[FAILED] {failures} failures")
+    return failures
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mode', choices=['snapshot', 'unsafe'], default='snapshot')
+    parser.add_argument('--size', type=int, default=2000)
+    parser.add_argument('--dim', type=int, default=2048)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--delete-ratio', type=float, default=0.2)
+    parser.add_argument('--duration', type=float, default=5.0)
+    parser.add_argument('--store', nargs='?', const='', default=None,
+                        help='Ghi xuống EmbeddingStore (thư mục, mặc định thư mục tạm)')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    sys.exit(1 if run(args) else 0)
@@ -0,0 +1,278 @@
+"""
+Offline bulk enrollment
+========================
+Đăng ký toàn bộ dataset/<user_id>/*.jpg thẳng vào face store, không qua
+HTTP (thay cho rebuild_database.py / quick_register.py khi rebuild cả lớp):
+
+- decode ảnh bằng thread pool (cv2.imread nhả GIL), prefetch có giới hạn
+- gom ảnh của nhiều người thành batch YOLO + batch embedding
+- cùng backend / model cache / crop / prototypes (GALLERY_PROTOTYPES) với API, nên
+  embedding giống hệt đăng ký qua /api/register-face
+- ghi từng người vào EmbeddingStore ngay khi xong (O(1) I/O mỗi người)
+- resume: enroll_progress.jsonl trong store ghi fingerprint ảnh của từng
+  người đã xong; chạy lại sẽ bỏ qua người không đổi ảnh (--restart để làm lại)
+
+FACE_VECTOR_PUSH=True (mặc định khi GALLERY_SOURCE=backend): embeddings cũng
+được ghi về User.face_vector ở Django theo batch PUSH_BATCH_SIZE người.
+
+Store không có khóa giữa các process: dừng face service trong lúc chạy,
+hoặc ghi vào --store-dir khác trong GALLERY_RELOAD_DIR rồi nạp nóng bằng POST /api/admin/reload-gallery
+{"path": "<store-dir>"} (hoặc GALLERY_WATCH_PATH=<store-dir>), không cần restart.
+
+Usage:
+    python bulk_enroll.py
+    python bulk_enroll.py --dataset dataset --batch-size 32 --workers 8
+    python bulk_enroll.py --restart
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import cv2
+
+import face_recognition_api as api
+from embedding_store import EmbeddingStore
+from inference_backends import load_detector, load_embedder
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+PROGRESS_NAME = "enroll_progress.jsonl"
+PUSH_BATCH_SIZE = 200
+
+
+def scan_dataset(root):
+    """[(user_id, [ảnh...])] cho mỗi thư mục con có ảnh, sắp theo tên"""
+    people = []
+    for person_dir in sorted(Path(root).iterdir()):
+        if not person_dir.is_dir():
+            continue
+        images = sorted(p for p in person_dir.iterdir() if p.suffix.lower() in IMAGE_EXTENSIONS)
+        if images:
+            people.append((person_dir.name, images))
+    return people
+
+
+def fingerprint(paths):
+    """Hash tên + kích thước + mtime của các ảnh (đổi ảnh -> đăng ký lại)"""
+    digest = hashlib.sha1()
+    for path in paths:
+        stat = path.stat()
+        digest.update(f"{path.name}|{stat.st_size}|{stat.st_mtime_ns}\n".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def load_progress(path):
+    progress = {}
+    if path.exists():
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue   # dòng cuối ghi dở khi bị ngắt
+                progress[entry['user_id']] = entry['fingerprint']
+    return progress
+
+
+def decode_stream(pool, items, prefetch):
+    """Decode (user_id, path) song song, trả theo thứ tự, giữ tối đa `prefetch` ảnh trong bộ nhớ"""
+    pending = deque()
+    for user_id, path in items:
+        pending.append((user_id, pool.submit(cv2.imread, str(path))))
+        if len(pending) >= prefetch:
+            user_id, future = pending.popleft()
+            yield user_id, future.result()
+    while pending:
+        user_id, future = pending.popleft()
+        yield user_id, future.result()
+
+
+class BulkEnroller:
+    """Gom ảnh thành batch detect/embed, ghi mỗi người vào store khi đủ ảnh"""
+
+    def __init__(self, detector, embedder, store, progress_file, batch_size=32):
+        self.detector = detector
+        self.embedder = embedder
+        self.store = store
+        self.progress_file = progress_file
+        self.batch_size = batch_size
+
+        self.buffer = []          # [(user_id, img)]
+        self.remaining = {}       # user_id -> số ảnh chưa xử lý
+        self.embeddings = {}      # user_id -> [embedding]
+        self.fingerprints = {}
+
+        self.timings = {'decode_ms': 0.0, 'detect_ms': 0.0, 'embed_ms': 0.0, 'save_ms': 0.0}
+        self.images = 0
+        self.faces = 0
+        self.enrolled = []
+        self.failed = []
+        self.to_push = []         # [(user_id, prototypes)] chờ ghi về Django (FACE_VECTOR_PUSH)
+
+    def expect(self, user_id, n_images, person_fingerprint):
+        self.remaining[user_id] = n_images
+        self.embeddings[user_id] = []
+        self.fingerprints[user_id] = person_fingerprint
+
+    def add(self, user_id, img):
+        if img is None:
+            self._done_with(user_id, 1)
+            return
+        self.images += 1
+        self.buffer.append((user_id, img))
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.buffer:
+            return
+        batch, self.buffer = self.buffer, []
+        images = [img for _, img in batch]
+
+        t_start = time.perf_counter()
+        results = self.detector(images, verbose=False)
+        t_detect = time.perf_counter()
+        self.timings['detect_ms'] += (t_detect - t_start) * 1000
+
+        crops = [(user_id, api.first_face_crop(img, result)) for (user_id, img), result in zip(batch, results)]
+        crops = [(user_id, crop) for user_id, crop in crops if crop is not None]
+        if crops:
+            face_batch = api.preprocess_faces_batch([crop for _, crop in crops])
+            embeddings = self.embedder.embed(face_batch, batch_size=self.batch_size)
+            for (user_id, _), embedding in zip(crops, embeddings):
+                self.embeddings[user_id].append(embedding)
+            self.faces += len(crops)
+        self.timings['embed_ms'] += (time.perf_counter() - t_detect) * 1000
+
+        for user_id, _ in batch:
+            self._done_with(user_id, 1)
+
+    def push(self):
+        """
+        Ghi các người vừa xong về User.face_vector (một request cho cả batch),
+        rồi mới ghi tiến độ của họ: bị ngắt trước khi push thì lần chạy sau làm lại
+        """
+        if not self.to_push:
+            return
+        api.push_face_vectors([(user_id, prototypes) for user_id, prototypes, _ in self.to_push])
+        self._write_progress([entry for _, _, entry in self.to_push])
+        self.to_push = []
+
+    def _write_progress(self, entries):
+        with open(self.progress_file, 'a', encoding='utf-8') as f:
+            for entry in entries:
+                f.write(json.dumps(entry) + '\n')
+
+    def _done_with(self, user_id, n):
+        self.remaining[user_id] -= n
+        if self.remaining[user_id] == 0:
+            self._finalize(user_id)
+
+    def _finalize(self, user_id):
+        embeddings = self.embeddings.pop(user_id)
+        del self.remaining[user_id]
+        person_fingerprint = self.fingerprints.pop(user_id)
+        if not embeddings:
+            self.failed.append(user_id)
+            print(f"  ✗ {user_id}: no valid faces detected")
+            return
+
+        t_start = time.perf_counter()
+        prototypes = api.enrollment_prototypes(embeddings)
+        self.store.put(user_id, prototypes)
+        entry = {'user_id': user_id, 'fingerprint': person_fingerprint, 'num_faces': len(embeddings)}
+        if api.FACE_VECTOR_PUSH:
+            self.to_push.append((user_id, prototypes, entry))
+            if len(self.to_push) >= PUSH_BATCH_SIZE:
+                self.push()
+        else:
+            self._write_progress([entry])
+        self.timings['save_ms'] += (time.perf_counter() - t_start) * 1000
+        self.enrolled.append(user_id)
+        print(f"  ✓ {user_id}: {len(embeddings)} faces")
+
+
+def load_models():
+    """Detector + embedder theo cùng config với face service"""
+    detector = load_detector(api.INFERENCE_BACKEND, api.YOLO_MODEL_PATH, api.ONNX_MODEL_DIR,
+                             int8=api.ONNX_INT8_DETECTOR)
+    embedder = load_embedder(api.INFERENCE_BACKEND, api.create_vggface_resnet50, api.ONNX_MODEL_DIR,
+                             int8=api.ONNX_INT8_EMBEDDER, threads=api.ONNX_THREADS,
+                             keras_cache=Path(api.EMBED_MODEL_CACHE) if api.EMBED_MODEL_CACHE else None)
+    return detector, embedder
+
+
+def run(args):
+    people = scan_dataset(args.dataset)
+    if not people:
+        print(f"[ERROR] No person folders with images in {args.dataset}")
+        return 1
+
+    store = EmbeddingStore(args.store_dir, fsync=api.FACE_STORE_FSYNC).open()
+    progress_file = Path(args.store_dir) / PROGRESS_NAME
+    if args.restart and progress_file.exists():
+        progress_file.unlink()
+    progress = load_progress(progress_file)
+
+    todo, skipped = [], 0
+    for user_id, images in people:
+        person_fingerprint = fingerprint(images)
+        if progress.get(user_id) == person_fingerprint and user_id in store:
+            skipped += 1
+            continue
+        todo.append((user_id, images, person_fingerprint))
+
+    total_images = sum(len(images) for _, images, _ in todo)
+    print(f"[INFO] {len(people)} people in {args.dataset}: {skipped} already enrolled, "
+          f"{len(todo)} to enroll ({total_images} images)")
+    if not todo:
+        return 0
+
+    print(f"[INFO] Loading models (backend: {api.INFERENCE_BACKEND})...")
+    detector, embedder = load_models()
+
+    enroller = BulkEnroller(detector, embedder, store, progress_file, batch_size=args.batch_size)
+    for user_id, images, person_fingerprint in todo:
+        enroller.expect(user_id, len(images), person_fingerprint)
+
+    items = [(user_id, path) for user_id, images, _ in todo for path in images]
+    t_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        t_wait = time.perf_counter()
+        for user_id, img in decode_stream(pool, items, args.prefetch):
+            enroller.timings['decode_ms'] += (time.perf_counter() - t_wait) * 1000
+            enroller.add(user_id, img)
+            t_wait = time.perf_counter()
+    enroller.flush()
+    enroller.push()
+
+    if store.needs_compaction():
+        store.compact()
+    elapsed = time.perf_counter() - t_start
+
+    print(f"\n[SUCCESS] Enrolled {len(enroller.enrolled)} people, {enroller.faces} faces from "
+          f"{enroller.images} images in {elapsed:.1f}s ({enroller.images / max(elapsed, 1e-9):.1f} images/sec)")
+    print("[INFO] Time: " + ", ".join(f"{stage} {ms / 1000:.1f}s" for stage, ms in enroller.timings.items())
+          + " (decode = waiting on the decode pool)")
+    if enroller.failed:
+        print(f"[WARNING] No faces for {len(enroller.failed)} people: {', '.join(enroller.failed)}")
+    print(f"[INFO] Store: {store.stats()}")
+    return 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dataset', default=str(api.BASE_DIR / "dataset"))
+    parser.add_argument('--store-dir', default=str(api.FACE_STORE_DIR))
+    parser.add_argument('--batch-size', type=int, default=api.YOLO_BATCH_SIZE)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 4)
+    parser.add_argument('--prefetch', type=int, default=128, help='Số ảnh decode trước tối đa')
+    parser.add_argument('--restart', action='store_true', help='Bỏ qua tiến độ cũ, đăng ký lại tất cả')
+    args = parser.parse_args()
+
+    sys.exit(run(args))
@@ -0,0 +1,355 @@
+"""
+Memory-mapped embedding store
+==============================
+Thay cho face_database.pkl (pickle lại toàn bộ dict mỗi lần đăng ký/xóa).
+
+dataset/face_store/
+    embeddings.<n>.npy  ma trận (capacity, dim) float32 dạng .npy, được memory-map
+    manifest.json       dim, capacity, tên file ma trận + log, ids theo row tại lần compact gần nhất
+    log.<n>.jsonl       append-only: {"op": "put", "id", "row", "count"} | {"op": "del", "id"}
+
+Mỗi người chiếm một block `count` hàng liên tiếp (multi-prototype, mặc định 1;
+log cũ không có "count" được hiểu là 1).
+
+- put():    ghi block của người đó vào cuối ma trận (seek + write) + một dòng log → O(1) I/O;
+            đăng ký lại thì block cũ thành "lỗ" (không ghi đè hàng cũ, xem load_arrays)
+- delete(): chỉ ghi một dòng log (các hàng cũ thành "lỗ")
+- open():   memory-map embeddings.npy + replay log, không deserialize
+- compact(): ghi lại các hàng còn sống liền nhau, reset log (khi nhiều lỗ/log dài)
+
+compact / grow / import ghi ma trận sang file mới (số thế hệ tăng dần) rồi mới
+đổi manifest, không os.replace đè lên file cũ: gallery đang chạy có thể vẫn
+memory-map file cũ (load_arrays), và Windows không cho thay / xóa file đang
+được map. File cũ được xóa ở lần ghi / open sau, khi không còn ai map nó.
+Mỗi thế hệ có log riêng (tên trong manifest): crash giữa lúc đổi manifest và
+xóa log cũ không làm log cũ (số row của ma trận cũ) bị replay lên ma trận mới.
+Manifest cũ không có "matrix" / "log" dùng embeddings.npy / log.jsonl.
+"""
+import json
+import os
+import threading
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+
+MANIFEST_NAME = "manifest.json"
+MATRIX_NAME = "embeddings.npy"          # store cũ (manifest không có "matrix")
+MATRIX_PATTERN = "embeddings.{}.npy"
+LOG_NAME = "log.jsonl"                  # store cũ (manifest không có "log")
+LOG_PATTERN = "log.{}.jsonl"
+
+
+class EmbeddingStore:
+    """Lưu embeddings trên đĩa: ma trận memmap + id index + log append-only"""
+
+    def __init__(self, directory, dim=2048, initial_capacity=1024,
+                 compact_hole_ratio=0.25, compact_log_entries=10000, fsync=False):
+        self.directory = Path(directory)
+        self.dim = dim
+        self.initial_capacity = initial_capacity
+        self.compact_hole_ratio = compact_hole_ratio
+        self.compact_log_entries = compact_log_entries
+        self.fsync = fsync
+
+        self.capacity = 0
+        self.row_ids = []        # row -> user_id (None nếu đã xóa)
+        self.rows = {}           # user_id -> hàng đầu tiên của block
+        self.counts = {}         # user_id -> số hàng của block
+        self.live_rows = 0
+        self.log_entries = 0
+
+        self.generation = 0
+        self.matrix_name = MATRIX_NAME
+        self.log_name = LOG_NAME
+        self._matrix = None      # memmap chỉ đọc của file ma trận hiện tại
+        self._data_offset = 0    # byte offset của dữ liệu sau header .npy
+        self._lock = threading.RLock()
+
+    # ----- Paths -----
+    @property
+    def manifest_path(self):
+        return self.directory / MANIFEST_NAME
+
+    @property
+    def matrix_path(self):
+        return self.directory / self.matrix_name
+
+    @property
+    def log_path(self):
+        return self.directory / self.log_name
+
+    def exists(self):
+        if not self.manifest_path.exists():
+            return False
+        manifest = self._read_manifest()
+        return (self.directory / manifest.get('matrix', MATRIX_NAME)).exists()
+
+    def _read_manifest(self):
+        return json.loads(self.manifest_path.read_text(encoding='utf-8'))
+
+    # ----- Open / create -----
+    def open(self):
+        """Mở store (tạo mới nếu chưa có) và replay log"""
+        with self._lock:
+            if not self.exists():
+                self._write_new(self.initial_capacity, [], None)
+
+            manifest = self._read_manifest()
+            self.dim = manifest['dim']
+            self.generation = manifest.get('generation', 0)
+            self.matrix_name = manifest.get('matrix', MATRIX_NAME)
+            self.log_name = manifest.get('log', LOG_NAME)
+            self._index_rows(list(manifest['ids']))
+            self._map_matrix()
+            self._replay_log()
+            self._remove_stale_files()
+        return self
+
+    def _index_rows(self, row_ids):
+        """rows/counts từ danh sách id theo hàng (các hàng của một người liên tiếp)"""
+        self.row_ids = row_ids
+        self.counts = Counter(row_ids)
+        self.counts.pop(None, None)
+        self.live_rows = sum(self.counts.values())
+        if self.live_rows == len(self.counts):
+            # Một hàng/người (trường hợp phổ biến)
+            self.rows = {user_id: row for row, user_id in enumerate(row_ids) if user_id is not None}
+        else:
+            self.rows = {}
+            for row, user_id in enumerate(row_ids):
+                if user_id is not None and user_id not in self.rows:
+                    self.rows[user_id] = row
+        self.counts = dict(self.counts)
+
+    def _map_matrix(self):
+        self._matrix = np.load(self.matrix_path, mmap_mode='r')
+        self.capacity = self._matrix.shape[0]
+        self._data_offset = self._matrix.offset
+
+    def _replay_log(self):
+        self.log_entries = 0
+        if not self.log_path.exists():
+            return
+        with open(self.log_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Dòng cuối bị ghi dở (crash) -> bỏ qua
+                    continue
+                self.log_entries += 1
+                if entry['op'] == 'put':
+                    row, count = entry['row'], entry.get('count', 1)
+                    if self.rows.get(entry['id'], row) != row:
+                        self._release(entry['id'])
+                    while len(self.row_ids) < row + count:
+                        self.row_ids.append(None)
+                    if entry['id'] not in self.rows:
+                        self.live_rows += count
+                    self.row_ids[row:row + count] = [entry['id']] * count
+                    self.rows[entry['id']] = row
+                    self.counts[entry['id']] = count
+                elif entry['op'] == 'del':
+                    self._release(entry['id'])
+
+    def _write_new(self, capacity, ids, matrix):
+        """
+        Ghi ma trận sang file thế hệ mới + manifest trỏ tới nó và tới log
+        (rỗng) của thế hệ mới (tmp rồi os.replace, chỉ manifest bị thay), rồi
+        xóa log cũ
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        generation = self.generation + 1
+        matrix_name = MATRIX_PATTERN.format(generation)
+        log_name = LOG_PATTERN.format(generation)
+        out = np.lib.format.open_memmap(self.directory / matrix_name, mode='w+',
+                                        dtype=np.float32, shape=(capacity, self.dim))
+        if matrix is not None and len(matrix):
+            out[:len(matrix)] = matrix
+        out.flush()
+        del out
+
+        tmp_manifest = self.manifest_path.with_suffix('.tmp')
+        tmp_manifest.write_text(json.dumps({'dim': self.dim, 'capacity': capacity, 'generation': generation,
+                                            'matrix': matrix_name, 'log': log_name, 'ids': ids}),
+                                encoding='utf-8')
+        log_path = self.directory / log_name
+        if log_path.exists():
+            log_path.unlink()   # còn sót từ lần ghi thế hệ này bị crash
+
+        self._matrix = None
+        os.replace(tmp_manifest, self.manifest_path)
+        self.generation = generation
+        self.matrix_name = matrix_name
+        self.log_name = log_name
+        self._remove_stale_files()
+
+    def _remove_stale_files(self):
+        """
+        Xóa file ma trận / log của các thế hệ cũ hơn manifest. Thế hệ mới hơn
+        có thể đang được một process khác ghi (bulk_enroll) nên không đụng tới;
+        file ghi dở khi crash bị ghi đè ở lần _write_new sau. File còn bị map
+        (Windows) thì để lần sau.
+        """
+        stale = [self.directory / MATRIX_NAME, self.directory / LOG_NAME, self.directory / 'embeddings.tmp.npy']
+        for pattern in (MATRIX_PATTERN, LOG_PATTERN):
+            prefix, suffix = pattern.split('{}')
+            for path in self.directory.glob(pattern.format('*')):
+                generation = path.name[len(prefix):-len(suffix)]
+                if generation.isdigit() and int(generation) < self.generation:
+                    stale.append(path)
+        for path in stale:
+            if path.name in (self.matrix_name, self.log_name) or not path.exists():
+                continue
+            try:
+                path.unlink()
+            except OSError:
+                pass
+
+    # ----- Mutations -----
+    def put(self, user_id, embedding):
+        """
+        Thêm/cập nhật embedding (D,) hoặc prototypes (K, D) của user_id:
+        ghi một block ở cuối + một dòng log. Không ghi đè block cũ (thành lỗ)
+        vì gallery đang chạy có thể map các hàng đó (load_arrays)
+        """
+        vectors = np.ascontiguousarray(embedding, dtype=np.float32)
+        if vectors.shape[-1] != self.dim:
+            raise ValueError(f"Embedding dim {vectors.shape[-1]} != store dim {self.dim}")
+        vectors = vectors.reshape(-1, self.dim)
+        count = vectors.shape[0]
+
+        with self._lock:
+            if len(self.row_ids) + count > self.capacity:
+                self._grow(max(2 * self.capacity, len(self.row_ids) + count))
+            # Tính row sau khi grow (compact có thể dồn lại các hàng)
+            row = len(self.row_ids)
+
+            self._write_rows(row, vectors)
+            self._append_log({'op': 'put', 'id': user_id, 'row': row, 'count': count})
+
+            self._release(user_id)
+            self.row_ids.extend([user_id] * count)
+            self.live_rows += count
+            self.rows[user_id] = row
+            self.counts[user_id] = count
+
+    def delete(self, user_id):
+        """Xóa user_id: chỉ ghi một dòng log. Returns False nếu không tồn tại"""
+        with self._lock:
+            if user_id not in self.rows:
+                return False
+            self._append_log({'op': 'del', 'id': user_id})
+            self._release(user_id)
+            return True
+
+    def _release(self, user_id):
+        """Bỏ block của user_id khỏi index (các hàng thành lỗ)"""
+        row = self.rows.pop(user_id, None)
+        if row is None:
+            return
+        count = self.counts.pop(user_id)
+        self.row_ids[row:row + count] = [None] * count
+        self.live_rows -= count
+
+    def _write_rows(self, row, vectors):
+        with open(self.matrix_path, 'r+b') as f:
+            f.seek(self._data_offset + row * self.dim * 4)
+            f.write(vectors.tobytes())
+            if self.fsync:
+                f.flush()
+                os.fsync(f.fileno())
+
+    def _append_log(self, entry):
+        with open(self.log_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry) + '\n')
+            if self.fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        self.log_entries += 1
+
+    def _grow(self, capacity):
+        """Hết chỗ: compact sang file lớn hơn (hiếm, chi phí chia đều)"""
+        self.compact(capacity=capacity)
+
+    # ----- Compaction -----
+    @property
+    def holes(self):
+        return len(self.row_ids) - self.live_rows
+
+    def needs_compaction(self):
+        rows = len(self.row_ids)
+        return (rows > 0 and self.holes > self.compact_hole_ratio * rows) or self.log_entries > self.compact_log_entries
+
+    def compact(self, capacity=None):
+        """Ghi lại các hàng còn sống liền nhau (giữ thứ tự), reset log"""
+        with self._lock:
+            live_rows = [row for row, user_id in enumerate(self.row_ids) if user_id is not None]
+            ids = [self.row_ids[row] for row in live_rows]
+            matrix = np.asarray(self._matrix[live_rows]) if live_rows else None
+            capacity = max(capacity or self.capacity, len(ids), self.initial_capacity)
+
+            self._write_new(capacity, ids, matrix)
+            self._index_rows(ids)
+            self.log_entries = 0
+            self._map_matrix()
+
+    # ----- Read -----
+    def __len__(self):
+        return len(self.rows)
+
+    def __contains__(self, user_id):
+        return user_id in self.rows
+
+    def load_arrays(self):
+        """
+        (matrix, ids) của các hàng còn sống theo thứ tự row (ids: user_id của
+        từng hàng, các hàng của một người liên tiếp).
+        Không có lỗ → matrix là view memmap copy-on-write (không đọc cả file);
+        có lỗ → bản sao các hàng còn sống. put() sau đó chỉ ghi vào các hàng
+        chưa dùng (sau ids), nên các hàng trong view không bị đổi dưới chân.
+        """
+        with self._lock:
+            if self.holes == 0:
+                mapped = np.load(self.matrix_path, mmap_mode='c')
+                return mapped, list(self.row_ids)
+            live_rows = [row for row, user_id in enumerate(self.row_ids) if user_id is not None]
+            return np.asarray(self._matrix[live_rows]), [self.row_ids[row] for row in live_rows]
+
+    def import_dict(self, database):
+        """
+        Ghi cả dict {user_id: embedding (D,) | prototypes (K, D)} (vd. từ
+        face_database.pkl) trong một lần
+        """
+        blocks = [np.asarray(v, dtype=np.float32) for v in database.values()]
+        dim = blocks[0].shape[-1] if blocks else self.dim
+        blocks = [block.reshape(-1, dim) for block in blocks]
+        ids = [str(user_id) for user_id, block in zip(database.keys(), blocks) for _ in range(len(block))]
+        self.import_arrays(np.concatenate(blocks) if blocks else np.empty((0, dim), dtype=np.float32), ids)
+
+    def import_arrays(self, matrix, ids):
+        """
+        Thay toàn bộ store bằng matrix (R, dim) + ids theo hàng (các hàng của
+        một người liên tiếp), vd. từ face_vectors.load_arrays()
+        """
+        with self._lock:
+            self.dim = matrix.shape[1]
+            # Chừa chỗ trống để các lần put() tiếp theo không phải grow ngay
+            self._write_new(max(self.initial_capacity, len(ids) + len(ids) // 4), list(ids),
+                            matrix if len(ids) else None)
+            self.open()
+
+    def stats(self):
+        return {
+            'path': str(self.directory),
+            'size': len(self.rows),
+            'rows': self.live_rows,
+            'capacity': self.capacity,
+            'holes': self.holes,
+            'log_entries': self.log_entries,
+        }
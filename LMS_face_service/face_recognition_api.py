@@ -1,4 +1,7 @@
-from flask import Flask, request, jsonify
+import time
+PROCESS_START = time.perf_counter()
+
+from flask import Flask, Response, g, request, jsonify
 from flask_cors import CORS
 import cv2
 import numpy as np
@@ -6,12 +9,28 @@ import base64
 from pathlib import Path
 import pickle
 import os
+import hmac
+import requests
+import threading
 
-os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
+from gallery import FaceGallery, select_prototypes
+from ann_index import IVFIndex
+from roster import RosterCache, SubsetCache
+from batcher import MicroBatcher
+from inference_executor import InferenceExecutor
+from embedding_store import EmbeddingStore
+from snapshots import GalleryRegistry
+from gallery_reload import GalleryReloader, GalleryReloadBusy, read_gallery_source, validate_gallery_arrays
+from inference_backends import BACKENDS, load_detector, load_embedder
+from liveness import detect_liveness
+from projection import PCAProjection
+from frame_cache import FrameCache, dhash
+from stream_recognition import RecognitionStream
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, MetricsRegistry, SampledLogger
+import face_vectors
 
-from ultralytics import YOLO
-import tensorflow as tf
-from tensorflow import keras
+# tensorflow / ultralytics được import lúc load model (lazy), không phải lúc import module
+os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
 
 app = Flask(__name__)
 CORS(app)
@@ -19,11 +38,152 @@ CORS(app)
 # Configuration
 BASE_DIR = Path(__file__).parent
 YOLO_MODEL_PATH = BASE_DIR / "models" / "yolov8m-face.pt"
-DATABASE_FILE = BASE_DIR / "dataset" / "face_database.pkl"
+DATABASE_FILE = BASE_DIR / "dataset" / "face_database.pkl"   # định dạng cũ, chỉ dùng để migrate
+FACE_STORE_DIR = Path(os.environ.get('FACE_STORE_DIR', BASE_DIR / "dataset" / "face_store"))
+FACE_STORE_FSYNC = os.environ.get('FACE_STORE_FSYNC', 'False') == 'True'
+# Số prototype tối đa mỗi người (k-means trên embeddings đăng ký); 1 = embedding trung bình như cũ
+GALLERY_PROTOTYPES = int(os.environ.get('GALLERY_PROTOTYPES', 3))
+# Gallery giảm chiều: PCA fit offline bằng fit_projection.py; store vẫn giữ embeddings 2048 chiều gốc
+GALLERY_PROJECTION = os.environ.get('GALLERY_PROJECTION', '')   # vd. models/gallery_pca.npz ('' = tắt)
+GALLERY_DTYPE = os.environ.get('GALLERY_DTYPE', 'float32')       # float32 | float16
+
+# ANN index (IVF) cho gallery lớn - chỉ bật khi số người >= ANN_MIN_SIZE
+ANN_ENABLED = os.environ.get('ANN_ENABLED', 'True') == 'True'
+ANN_MIN_SIZE = int(os.environ.get('ANN_MIN_SIZE', 20000))
+ANN_NLIST = int(os.environ.get('ANN_NLIST', 0)) or None   # 0 = auto (~sqrt(N))
+ANN_NPROBE = int(os.environ.get('ANN_NPROBE', 8))
+
+# Hot reload: POST /api/admin/reload-gallery, hoặc theo dõi một file / thư mục store
+# do bulk_enroll / export offline ghi ra (không trỏ vào FACE_STORE_DIR: reload ghi lại store đó)
+GALLERY_WATCH_PATH = os.environ.get('GALLERY_WATCH_PATH', '')   # '' = tắt
+# Endpoint chỉ nạp đường dẫn nằm trong thư mục này (hoặc đúng GALLERY_WATCH_PATH)
+GALLERY_RELOAD_DIR = Path(os.environ.get('GALLERY_RELOAD_DIR', BASE_DIR / "dataset" / "gallery_reload"))
+GALLERY_WATCH_INTERVAL = float(os.environ.get('GALLERY_WATCH_INTERVAL', 10))
+# Từ chối gallery mới có ít hơn (1 - tỉ lệ này) x số người hiện tại (force=true để bỏ qua)
+GALLERY_RELOAD_MAX_SHRINK = float(os.environ.get('GALLERY_RELOAD_MAX_SHRINK', 0.5))
+
+# Class-scoped recognition: lấy roster của session từ Django backend
+BACKEND_API_URL = os.environ.get('BACKEND_API_URL', 'http://localhost:8000/api')
+FACE_SERVICE_API_KEY = os.environ.get('FACE_SERVICE_API_KEY', '')
+ROSTER_FETCH_ENABLED = os.environ.get('ROSTER_FETCH_ENABLED', 'True') == 'True'
+ROSTER_CACHE_TTL = int(os.environ.get('ROSTER_CACHE_TTL', 300))
+ROSTER_SUBSET_CACHE_SIZE = int(os.environ.get('ROSTER_SUBSET_CACHE_SIZE', 64))
+
+# User.face_vector ở Django là nguồn dữ liệu gốc
+# GALLERY_SOURCE=backend: lúc khởi động tải toàn bộ face vectors một lần (cache vào face_store)
+GALLERY_SOURCE = os.environ.get('GALLERY_SOURCE', 'store')   # store | backend
+# Ghi embedding đăng ký / xóa về Django trước khi lưu local
+FACE_VECTOR_PUSH = os.environ.get('FACE_VECTOR_PUSH', str(GALLERY_SOURCE == 'backend')) == 'True'
+
+# Batch size cho YOLO / embedding khi xử lý nhiều ảnh một lúc
+YOLO_BATCH_SIZE = int(os.environ.get('YOLO_BATCH_SIZE', 32))
+EMBED_BATCH_SIZE = int(os.environ.get('EMBED_BATCH_SIZE', 32))
+
+# Micro-batching cho /api/recognize: gom request đồng thời thành một batch
+RECOGNIZE_BATCHING = os.environ.get('RECOGNIZE_BATCHING', 'True') == 'True'
+BATCH_MAX_SIZE = int(os.environ.get('BATCH_MAX_SIZE', 16))
+BATCH_MAX_WAIT_MS = float(os.environ.get('BATCH_MAX_WAIT_MS', 10))
+BATCH_RESULT_TIMEOUT = float(os.environ.get('BATCH_RESULT_TIMEOUT', 30))
+
+# Frame cache: bỏ qua liveness + embedding khi cùng client gửi lại khuôn mặt gần như giống hệt
+FRAME_CACHE_ENABLED = os.environ.get('FRAME_CACHE_ENABLED', 'True') == 'True'
+FRAME_CACHE_TTL = float(os.environ.get('FRAME_CACHE_TTL', 10))
+FRAME_CACHE_MAX_DISTANCE = int(os.environ.get('FRAME_CACHE_MAX_DISTANCE', 4))   # bit khác nhau / 64
+FRAME_CACHE_MAX_CLIENTS = int(os.environ.get('FRAME_CACHE_MAX_CLIENTS', 1024))
+FRAME_CACHE_PER_CLIENT = int(os.environ.get('FRAME_CACHE_PER_CLIENT', 4))
+FRAME_CACHE_MAX_MB = float(os.environ.get('FRAME_CACHE_MAX_MB', 32))
+
+# Streaming (/api/recognize-stream, chế độ ASGI): embed frame tốt nhất + bỏ phiếu
+STREAM_MIN_QUALITY = float(os.environ.get('STREAM_MIN_QUALITY', 0.35))
+STREAM_MIN_VOTES = int(os.environ.get('STREAM_MIN_VOTES', 2))
+STREAM_AGREEMENT = float(os.environ.get('STREAM_AGREEMENT', 0.6))
+STREAM_MIN_CONFIDENCE = float(os.environ.get('STREAM_MIN_CONFIDENCE', 50))
+STREAM_INSTANT_CONFIDENCE = float(os.environ.get('STREAM_INSTANT_CONFIDENCE', 70))   # 0 = tắt
+STREAM_MAX_FRAMES = int(os.environ.get('STREAM_MAX_FRAMES', 60))
+
+# Chế độ ASGI (asgi_server.py): executor riêng cho model, số worker mặc định = số core
+INFERENCE_WORKERS = int(os.environ.get('INFERENCE_WORKERS', 0)) or os.cpu_count() or 1
+INFERENCE_QUEUE_SIZE = int(os.environ.get('INFERENCE_QUEUE_SIZE', 64))
+
+# Group photo: độ tin cậy detection tối thiểu cho mỗi khuôn mặt
+GROUP_MIN_FACE_CONF = float(os.environ.get('GROUP_MIN_FACE_CONF', 0.5))
+
+# Inference backend: keras (YOLO .pt + Keras) | onnx (ONNX Runtime trên CPU)
+INFERENCE_BACKEND = os.environ.get('INFERENCE_BACKEND', 'keras')
+ONNX_MODEL_DIR = Path(os.environ.get('ONNX_MODEL_DIR', BASE_DIR / "models" / "onnx"))
+ONNX_INT8_EMBEDDER = os.environ.get('ONNX_INT8_EMBEDDER', 'False') == 'True'
+ONNX_INT8_DETECTOR = os.environ.get('ONNX_INT8_DETECTOR', 'False') == 'True'
+ONNX_THREADS = int(os.environ.get('ONNX_THREADS', 0))   # 0 = mặc định của ONNX Runtime
+
+# Fast start: embedding model đã serialize (build + lưu ở lần đầu), warmup,
+# STARTUP_MODE=background mở HTTP ngay (liveness) và load model trong thread
+EMBED_MODEL_CACHE = os.environ.get('EMBED_MODEL_CACHE', str(BASE_DIR / "models" / "vggface_resnet50.keras"))
+WARMUP_ENABLED = os.environ.get('WARMUP_ENABLED', 'True') == 'True'
+WARMUP_BATCH_SIZE = int(os.environ.get('WARMUP_BATCH_SIZE', 8))
+STARTUP_MODE = os.environ.get('STARTUP_MODE', 'blocking')   # blocking | background
+
+# Log theo request (JSON mỗi dòng): tỉ lệ lấy mẫu cho info / warning, error luôn ghi
+LOG_SAMPLE_RATE = float(os.environ.get('LOG_SAMPLE_RATE', 0.01))
 
 yolo_model = None
-vggface_model = None
-face_database = {}
+embedder = None   # KerasEmbedder | OnnxEmbedder
+# Một instance mỗi model, dùng chung giữa các worker: ultralytics predictor giữ
+# state theo lần gọi (không thread-safe) và mỗi lần gọi TF / ONNX Runtime đã dùng
+# hết các core, nên mỗi model chỉ chạy một lần gọi tại một thời điểm. Detect của
+# batch này vẫn chạy song song với embed của batch khác; decode / crop / match
+# không bị khóa.
+detector_lock = threading.Lock()
+embedder_lock = threading.Lock()
+face_registry = GalleryRegistry(FaceGallery())   # request lấy snapshot qua face_registry.snapshot()
+face_store = EmbeddingStore(FACE_STORE_DIR, fsync=FACE_STORE_FSYNC)
+frame_cache = FrameCache(
+    max_distance=FRAME_CACHE_MAX_DISTANCE,
+    ttl=FRAME_CACHE_TTL,
+    max_clients=FRAME_CACHE_MAX_CLIENTS,
+    per_client=FRAME_CACHE_PER_CLIENT,
+    max_bytes=int(FRAME_CACHE_MAX_MB * 2**20)
+)
+
+# /api/recognize-stream (asgi_server.py cập nhật)
+stream_stats = {'active': 0, 'streams': 0, 'decisions': 0, 'recognized': 0, 'frames': 0, 'embedded_frames': 0}
+
+# Trạng thái khởi động cho /api/health (liveness vs readiness)
+startup_state = {
+    'state': 'starting',   # starting | ready | failed
+    'error': None,
+    'embedder_source': None,
+    'timings': {},
+}
+
+# /api/metrics (Prometheus). Gauge đọc trạng thái lúc scrape (callback bên dưới)
+metrics = MetricsRegistry()
+log = SampledLogger(sample_rate=LOG_SAMPLE_RATE)
+request_latency = metrics.histogram(
+    'face_request_duration_seconds', 'HTTP request latency by endpoint', ('endpoint', 'method'))
+request_count = metrics.counter(
+    'face_requests_total', 'HTTP requests by endpoint and status', ('endpoint', 'method', 'status'))
+stage_latency = metrics.histogram(
+    'face_stage_duration_seconds', 'Pipeline stage latency per call (one call may cover a batch)', ('stage',))
+stage_items = metrics.counter(
+    'face_stage_items_total', 'Frames / faces processed by each pipeline stage', ('stage',))
+recognition_results = metrics.counter(
+    'face_recognitions_total',
+    'Single-face recognition outcomes: recognized | no_face | low_confidence | invalid_crop | liveness_fail | unknown',
+    ('result',))
+
+# Lỗi của analyze_frames / recognize_analysis -> label result
+REJECTION_REASONS = {
+    'No face detected': 'no_face',
+    'Face detection confidence too low': 'low_confidence',
+    'Invalid face crop': 'invalid_crop',
+    'Fake face detected': 'liveness_fail',
+    'Unknown person': 'unknown',
+}
+
+def observe_stage(stage, start, items=1):
+    """Ghi thời gian một lần gọi stage (bắt đầu từ perf_counter() = start)"""
+    stage_latency.observe(time.perf_counter() - start, stage=stage)
+    stage_items.inc(items, stage=stage)
 
 # ===========================
 # VGG-Face ResNet50 Architecture
@@ -33,6 +193,7 @@ def create_vggface_resnet50():
     Tạo VGG-Face ResNet50 architecture manually
     Không cần keras-vggface package
     """
+    from tensorflow import keras
     from tensorflow.keras.applications.resnet import ResNet50
     from tensorflow.keras import layers, models
     
@@ -50,7 +211,8 @@ def create_vggface_resnet50():
     inputs = keras.Input(shape=(224, 224, 3))
     x = base_model(inputs, training=False)
     x = layers.Dense(2048, activation='relu', name='fc_embedding')(x)
-    x = layers.Lambda(lambda x: keras.backend.l2_normalize(x, axis=1), name='normalize')(x)
+    # = l2_normalize(axis=1), nhưng serialize được (không dùng Lambda)
+    x = layers.UnitNormalization(axis=1, name='normalize')(x)
     
     model = models.Model(inputs=inputs, outputs=x, name='vggface_resnet50')
     
@@ -64,135 +226,60 @@ def preprocess_face_for_vggface(face_img):
     face_batch = np.expand_dims(face_normalized, axis=0)
     return face_batch
 
+def preprocess_faces_batch(face_crops):
+    """Crop BGR -> một tensor (N, 224, 224, 3) cho VGG-Face"""
+    return np.concatenate([
+        preprocess_face_for_vggface(cv2.cvtColor(face_crop, cv2.COLOR_BGR2RGB))
+        for face_crop in face_crops
+    ])
+
+def detect_faces_batch(images):
+    """YOLO trên nhiều ảnh, mỗi lần gọi tối đa YOLO_BATCH_SIZE ảnh"""
+    results = []
+    for i in range(0, len(images), YOLO_BATCH_SIZE):
+        with detector_lock:
+            results.extend(yolo_model(images[i:i + YOLO_BATCH_SIZE], verbose=False))
+    return results
+
+def embed_faces_batch(face_batch):
+    """Một lần predict cho cả tensor (N, 224, 224, 3). Returns (N, 2048)"""
+    with embedder_lock:
+        return embedder.embed(face_batch, batch_size=EMBED_BATCH_SIZE)
+
 def euclidean_distance(embedding1, embedding2):
     """Tính khoảng cách Euclidean"""
     return float(np.linalg.norm(embedding1 - embedding2))
 
 def detect_liveness_simple(face_img):
-    """Liveness detection"""
-    gray = cv2.cvtColor(face_img, cv2.COLOR_BGR2GRAY)
-    
-    # 1. Laplacian variance
-    laplacian_var = cv2.Laplacian(gray, cv2.CV_64F).var()
-    
-    # 2. High frequency energy
-    dft = cv2.dft(np.float32(gray), flags=cv2.DFT_COMPLEX_OUTPUT)
-    dft_shift = np.fft.fftshift(dft)
-    magnitude_spectrum = np.log(cv2.magnitude(dft_shift[:,:,0], dft_shift[:,:,1]) + 1)
-    
-    rows, cols = gray.shape
-    crow, ccol = rows//2, cols//2
-    high_freq_mask = np.ones((rows, cols), np.uint8)
-    r = 30
-    center = [crow, ccol]
-    x, y = np.ogrid[:rows, :cols]
-    mask_area = (x - center[0])**2 + (y - center[1])**2 <= r*r
-    high_freq_mask[mask_area] = 0
-    high_freq_energy = np.sum(magnitude_spectrum * high_freq_mask) / np.sum(high_freq_mask)
-    
-    # 3. Brightness uniformity
-    h, w = gray.shape
-    grid_h, grid_w = h//4, w//4
-    grid_means = []
-    for i in range(4):
-        for j in range(4):
-            grid = gray[i*grid_h:(i+1)*grid_h, j*grid_w:(j+1)*grid_w]
-            grid_means.append(np.mean(grid))
-    brightness_uniformity = np.var(grid_means)
-    
-    # 4. Texture complexity
-    sobelx = cv2.Sobel(gray, cv2.CV_64F, 1, 0, ksize=3)
-    sobely = cv2.Sobel(gray, cv2.CV_64F, 0, 1, ksize=3)
-    sobel_magnitude = np.sqrt(sobelx**2 + sobely**2)
-    texture_complexity = sobel_magnitude.var()
-    
-    # 5. Color temperature
-    b, g, r = cv2.split(face_img)
-    color_temp_ratio = (np.mean(b) / (np.mean(r) + 1e-5))
-    
-    # 6. Glare detection
-    brightness = cv2.cvtColor(face_img, cv2.COLOR_BGR2GRAY)
-    bright_pixels = np.sum(brightness > 230)
-    glare_ratio = bright_pixels / brightness.size
-    
-    # Scoring
-    scores = []
-    
-    if laplacian_var > 800:
-        scores.append(100)
-    elif laplacian_var > 400:
-        scores.append(60)
-    elif laplacian_var > 200:
-        scores.append(30)
-    else:
-        scores.append(0)
-    
-    if high_freq_energy > 4.5:
-        scores.append(100)
-    elif high_freq_energy > 3.5:
-        scores.append(60)
-    else:
-        scores.append(20)
-    
-    if brightness_uniformity > 100:
-        scores.append(100)
-    elif brightness_uniformity > 50:
-        scores.append(60)
-    else:
-        scores.append(10)
-    
-    if texture_complexity > 500:
-        scores.append(100)
-    elif texture_complexity > 250:
-        scores.append(50)
-    else:
-        scores.append(10)
-    
-    if color_temp_ratio < 1.05:
-        scores.append(100)
-    elif color_temp_ratio < 1.15:
-        scores.append(60)
-    else:
-        scores.append(20)
-    
-    if glare_ratio < 0.01:
-        scores.append(100)
-    elif glare_ratio < 0.03:
-        scores.append(60)
-    else:
-        scores.append(20)
-    
-    weights = [2.0, 1.5, 1.0, 1.5, 1.2, 1.0]
-    liveness_confidence = np.average(scores, weights=weights)
+    """Liveness detection (engine vectorized trong liveness.py, cùng ngưỡng/kết quả)"""
+    return detect_liveness(face_img)
+
+def distance_to_confidence(distance, threshold):
+    """Quy đổi khoảng cách Euclidean sang độ tin cậy (%)"""
+    confidence_percent = max(0, min(100, (1 - distance / threshold) * 100))
     
-    is_real = liveness_confidence >= 70
+    if distance < 0.15:
+        confidence_percent = min(100, confidence_percent * 1.1)
+    elif distance > threshold * 0.6:
+        confidence_percent *= 0.75
     
-    return is_real, liveness_confidence
+    return confidence_percent
 
 def recognize_face(face_embedding, database, threshold=0.30):
     """Nhận diện khuôn mặt"""
-    print(f"[DEBUG] Database size: {len(database)} people")
-    
     if len(database) == 0:
-        print("[WARNING] Empty database!")
+        log.warning('empty_gallery')
         return ("Unknown", 999.0, 0.0)
     
-    face_embedding = face_embedding / (np.linalg.norm(face_embedding) + 1e-8)
-    
-    distances = {}
-    for person_name, person_embedding in database.items():
-        dist = euclidean_distance(face_embedding, person_embedding)
-        distances[person_name] = dist
+    if not isinstance(database, FaceGallery):
+        database = FaceGallery.from_dict(database)
     
-    best_match = min(distances, key=distances.get)
-    best_distance = distances[best_match]
+    face_embedding = face_embedding / (np.linalg.norm(face_embedding) + 1e-8)
     
-    confidence_percent = max(0, min(100, (1 - best_distance / threshold) * 100))
+    # Một GEMV trên toàn bộ gallery thay vì vòng lặp qua từng người
+    best_match, best_distance = database.nearest(face_embedding)
     
-    if best_distance < 0.15:
-        confidence_percent = min(100, confidence_percent * 1.1)
-    elif best_distance > threshold * 0.6:
-        confidence_percent *= 0.75
+    confidence_percent = distance_to_confidence(best_distance, threshold)
     
     if best_distance > threshold:
         return ("Unknown", best_distance, confidence_percent)
@@ -200,82 +287,732 @@ def recognize_face(face_embedding, database, threshold=0.30):
         return (best_match, best_distance, confidence_percent)
 
 def load_face_database():
-    """Load database"""
-    if DATABASE_FILE.exists():
-        print(f"[INFO] Loading database from: {DATABASE_FILE}")
+    """
+    Load database: memory-map face_store (tải lại từ Django nếu
+    GALLERY_SOURCE=backend, migrate từ pickle cũ nếu cần)
+    """
+    if GALLERY_SOURCE == 'backend' and sync_store_from_backend():
+        pass
+    elif not face_store.exists() and DATABASE_FILE.exists():
+        print(f"[INFO] Migrating {DATABASE_FILE} -> {FACE_STORE_DIR}")
         with open(DATABASE_FILE, 'rb') as f:
-            db = pickle.load(f)
-        print(f"[INFO] Loaded {len(db)} people: {list(db.keys())}")
-        return db
+            face_store.import_dict(pickle.load(f))
     else:
-        print(f"[WARNING] Database file not found: {DATABASE_FILE}")
-    return {}
+        face_store.open()
+    
+    # Compact lúc khởi động để gallery map thẳng file, không cần copy
+    if face_store.holes:
+        face_store.compact()
+    
+    return gallery_from_store()
+
+def gallery_from_store():
+    """FaceGallery map thẳng face_store (projection / dtype theo config, chưa có ANN index)"""
+    matrix, ids = face_store.load_arrays()
+    print(f"[INFO] Mapped {len(face_store)} people ({len(ids)} rows) from {FACE_STORE_DIR}")
+    projection = load_projection(matrix.shape[1])
+    if projection is None and GALLERY_DTYPE == 'float32':
+        return FaceGallery.from_arrays(matrix, ids)
+    gallery = FaceGallery.from_arrays(matrix, ids, projection=projection, dtype=GALLERY_DTYPE)
+    print(f"[INFO] Gallery storage: {gallery.dim} dims {gallery.dtype.name}, "
+          f"{gallery.nbytes / 2**20:.1f} MB for {gallery.n_rows} rows")
+    return gallery
+
+def load_projection(input_dim):
+    """PCAProjection từ GALLERY_PROJECTION, hoặc None nếu tắt / không dùng được"""
+    if not GALLERY_PROJECTION:
+        return None
+    path = Path(GALLERY_PROJECTION)
+    if not path.is_absolute():
+        path = BASE_DIR / path
+    if not path.exists():
+        print(f"[WARNING] GALLERY_PROJECTION {path} not found - run fit_projection.py; using full embeddings")
+        return None
+    projection = PCAProjection.load(path)
+    if projection.input_dim != input_dim:
+        print(f"[WARNING] Projection expects {projection.input_dim} dims, store has {input_dim} - ignored")
+        return None
+    return projection
+
+def fetch_face_vectors():
+    """Toàn bộ User.face_vector từ Django trong một stream. Returns: (matrix, ids theo hàng)"""
+    with requests.get(
+        f"{BACKEND_API_URL}/face-vectors/export/",
+        headers={'X-Face-Service-Key': FACE_SERVICE_API_KEY},
+        stream=True,
+        timeout=(5, 60)
+    ) as response:
+        response.raise_for_status()
+        response.raw.decode_content = True
+        return face_vectors.load_arrays(response.raw)
+
+def sync_store_from_backend():
+    """Thay face_store bằng face vectors của Django. Returns False (giữ store cũ) nếu lỗi"""
+    t_start = time.perf_counter()
+    try:
+        matrix, ids = fetch_face_vectors()
+    except (requests.RequestException, ValueError) as e:
+        print(f"[WARNING] Cannot load face vectors from backend: {e} - using local store")
+        return False
+    face_store.import_arrays(matrix, ids)
+    print(f"[INFO] Loaded {len(face_store)} people ({len(ids)} rows) from backend "
+          f"in {(time.perf_counter() - t_start) * 1000:.0f} ms")
+    return True
+
+def configure_ann(gallery):
+    if ANN_ENABLED:
+        gallery.configure_index(IVFIndex(nlist=ANN_NLIST, nprobe=ANN_NPROBE), min_size=ANN_MIN_SIZE)
+    return gallery
+
+def gallery_watch_path():
+    """GALLERY_WATCH_PATH tuyệt đối, hoặc None nếu tắt"""
+    if not GALLERY_WATCH_PATH:
+        return None
+    path = Path(GALLERY_WATCH_PATH)
+    return path if path.is_absolute() else BASE_DIR / path
+
+def resolve_reload_path(path):
+    """
+    Đường dẫn nguồn reload (tương đối = trong GALLERY_RELOAD_DIR). Chỉ cho phép
+    trong GALLERY_RELOAD_DIR hoặc đúng GALLERY_WATCH_PATH, ngoài ra PermissionError
+    """
+    path = Path(path)
+    resolved = (path if path.is_absolute() else GALLERY_RELOAD_DIR / path).resolve()
+    watch_path = gallery_watch_path()
+    if watch_path is not None and resolved == watch_path.resolve():
+        return resolved
+    if resolved.is_relative_to(GALLERY_RELOAD_DIR.resolve()):
+        return resolved
+    raise PermissionError(f"Reload path must be inside GALLERY_RELOAD_DIR ({GALLERY_RELOAD_DIR})")
+
+def load_gallery_source(source):
+    """(matrix, ids) cho hot reload: 'backend' = face vectors của Django, còn lại là đường dẫn"""
+    if source == 'backend':
+        return fetch_face_vectors()
+    return read_gallery_source(resolve_reload_path(source))
+
+def validate_gallery(matrix, ids, expected_count=None, force=False):
+    current = face_registry.snapshot()
+    return validate_gallery_arrays(
+        matrix, ids,
+        dim=current.input_dim,
+        previous_size=len(current),
+        expected_count=expected_count,
+        max_shrink=GALLERY_RELOAD_MAX_SHRINK,
+        force=force
+    )
+
+def apply_gallery(matrix, ids):
+    """Ghi gallery mới vào face_store (thay toàn bộ) rồi swap; register / delete chờ trong lúc này"""
+    if not len(ids):
+        matrix = np.empty((0, face_store.dim), dtype=np.float32)
+    
+    def build():
+        face_store.import_arrays(matrix, ids)
+        return configure_ann(gallery_from_store())
+    return face_registry.reload(build)
+
+gallery_reloader = GalleryReloader(load_gallery_source, validate_gallery, apply_gallery)
+
+def push_face_vectors(records):
+    """Ghi [(user_id, embedding | None = xóa)] vào User.face_vector ở Django (raise nếu lỗi)"""
+    dim = next((np.shape(v)[-1] for _, v in records if v is not None), face_store.dim)
+    response = requests.post(
+        f"{BACKEND_API_URL}/face-vectors/import/",
+        data=face_vectors.encode(records, dim),
+        headers={'X-Face-Service-Key': FACE_SERVICE_API_KEY, 'Content-Type': 'application/octet-stream'},
+        timeout=10
+    )
+    response.raise_for_status()
+    not_found = response.json().get('not_found')
+    if not_found:
+        log.warning('face_vector_push_not_found', user_ids=not_found)
+
+def save_face(user_id, embedding):
+    """Ghi embedding của một user (Django trước nếu FACE_VECTOR_PUSH, rồi store local O(1) I/O)"""
+    if FACE_VECTOR_PUSH:
+        push_face_vectors([(user_id, embedding)])
+    face_store.put(user_id, embedding)
+    if face_store.needs_compaction():
+        face_store.compact()
+    log.info('face_saved', user_id=user_id, store_size=len(face_store))
 
-def save_face_database():
-    """Save database"""
-    DATABASE_FILE.parent.mkdir(parents=True, exist_ok=True)
-    with open(DATABASE_FILE, 'wb') as f:
-        pickle.dump(face_database, f)
-    print(f"[INFO] Saved database with {len(face_database)} people")
+def delete_saved_face(user_id):
+    """Xóa một user khỏi store (chỉ ghi log)"""
+    if FACE_VECTOR_PUSH:
+        push_face_vectors([(user_id, None)])
+    face_store.delete(user_id)
+    if face_store.needs_compaction():
+        face_store.compact()
+
+def read_stream_to_array(stream, length=None, chunk_size=1 << 16):
+    """
+    Đọc stream (request body / file upload) thẳng vào một buffer uint8 NumPy,
+    không qua bytes/str trung gian khi biết trước độ dài.
+    """
+    if length:
+        buffer = np.empty(length, dtype=np.uint8)
+        view = memoryview(buffer)
+        filled = 0
+        while filled < length:
+            n = stream.readinto(view[filled:])
+            if not n:
+                break
+            filled += n
+        return buffer[:filled]
+    
+    # Không có Content-Length: đọc từng chunk
+    chunks = []
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        chunks.append(np.frombuffer(chunk, dtype=np.uint8))
+    return np.concatenate(chunks) if chunks else np.empty(0, dtype=np.uint8)
+
+def buffer_to_image(buffer):
+    """Decode JPEG/PNG từ buffer uint8"""
+    if buffer.size == 0:
+        return None
+    start = time.perf_counter()
+    img = cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+    observe_stage('decode', start)
+    return img
+
+def images_from_request(field):
+    """
+    Ảnh trong request nhị phân: các file multipart của `field`, hoặc body thô.
+    Returns: list ảnh (None cho ảnh không decode được), [] nếu body rỗng
+    """
+    if request.files:
+        return [
+            buffer_to_image(read_stream_to_array(f.stream, f.content_length or None))
+            for f in request.files.getlist(field)
+        ]
+    buffer = read_stream_to_array(request.stream, request.content_length)
+    return [buffer_to_image(buffer)] if buffer.size else []
+
+def request_params(args=None):
+    """threshold / session_id / roster từ query string (cho endpoint nhị phân)"""
+    if args is None:
+        args = request.args
+    params = {}
+    if 'threshold' in args:
+        params['threshold'] = float(args['threshold'])
+    if 'session_id' in args:
+        params['session_id'] = args['session_id']
+    if args.get('client_id'):
+        params['client_id'] = args['client_id']
+    if args.get('roster'):
+        params['roster'] = [u for u in args['roster'].split(',') if u]
+    for flag in ('check_liveness', 'mark_attendance'):
+        if flag in args:
+            params[flag] = args[flag].lower() in ('1', 'true', 'yes')
+    return params
+
+def fetch_session_roster(session_id):
+    """Lấy danh sách user_id (username) sinh viên của session từ Django"""
+    response = requests.get(
+        f"{BACKEND_API_URL}/sessions/{session_id}/roster/",
+        headers={'X-Face-Service-Key': FACE_SERVICE_API_KEY},
+        timeout=2
+    )
+    response.raise_for_status()
+    return response.json()['user_ids']
+
+def mark_bulk_attendance(session_id, matches):
+    """Điểm danh tất cả sinh viên nhận diện được trong một lần gọi Django"""
+    response = requests.post(
+        f"{BACKEND_API_URL}/attendances/mark-bulk-with-face/",
+        json={'session_id': session_id, 'matches': matches},
+        headers={'X-Face-Service-Key': FACE_SERVICE_API_KEY},
+        timeout=10
+    )
+    return response.json()
+
+roster_cache = RosterCache(fetch_session_roster, ttl=ROSTER_CACHE_TTL, log=log)
+roster_subsets = SubsetCache(maxsize=ROSTER_SUBSET_CACHE_SIZE)
+
+def resolve_search_gallery(data, gallery):
+    """
+    Gallery để so khớp cho request: roster gửi kèm, roster của session_id,
+    hoặc toàn bộ snapshot `gallery` nếu không có roster.
+    Returns: (gallery, scope)
+    """
+    roster = data.get('roster')
+    if roster is None and data.get('session_id') is not None and ROSTER_FETCH_ENABLED:
+        roster = roster_cache.get(data['session_id'])
+    
+    if roster is None:
+        return gallery, 'global'
+    return roster_subsets.get(gallery, roster), 'roster'
 
 def base64_to_image(base64_string):
     """Convert base64 to image"""
     if ',' in base64_string:
         base64_string = base64_string.split(',')[1]
     
+    start = time.perf_counter()
     img_data = base64.b64decode(base64_string)
     nparr = np.frombuffer(img_data, np.uint8)
     img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+    observe_stage('decode', start)
     return img
 
+def frame_cache_key(data, client=None):
+    """Khóa frame cache: (session_id, client_id hoặc địa chỉ client); None nếu tắt"""
+    if not FRAME_CACHE_ENABLED:
+        return None
+    return (str(data.get('session_id', '')), str(data.get('client_id') or client or ''))
+
+def crop_detected_face(img, result, min_conf=0.5):
+    """Crop khuôn mặt đầu tiên của một kết quả YOLO (box đã clip). Returns (crop, None) hoặc (None, lỗi)"""
+    if len(result.boxes) == 0:
+        return None, 'No face detected'
+    
+    # Get first face
+    box = result.boxes[0]
+    x1, y1, x2, y2 = map(int, box.xyxy[0].cpu().numpy())
+    conf = float(box.conf[0].cpu().numpy())
+    
+    if conf < min_conf:
+        return None, 'Face detection confidence too low'
+    
+    # Crop face
+    x1, y1 = max(0, x1), max(0, y1)
+    x2 = min(img.shape[1], x2)
+    y2 = min(img.shape[0], y2)
+    face_crop = img[y1:y2, x1:x2]
+    
+    if face_crop.size == 0:
+        return None, 'Invalid face crop'
+    return face_crop, None
+
+def analyze_frames(images, cache_keys=None):
+    """
+    Detect + liveness + embedding cho nhiều frame: một lần gọi YOLO và một
+    lần predict cho các khuôn mặt thật.
+    cache_keys: khóa frame cache cho từng frame (None = không dùng cache).
+    Returns: list dict, mỗi frame một dict. Có 'embedding' (đã chuẩn hóa)
+    nếu frame hợp lệ, ngược lại có 'error' (+ is_real/liveness_confidence).
+    """
+    start = time.perf_counter()
+    results = detect_faces_batch(images)
+    observe_stage('detect', start, len(images))
+    
+    analyses = []
+    live_crops = []
+    live_analyses = []
+    to_cache = []
+    
+    for img, result, cache_key in zip(images, results, cache_keys or [None] * len(images)):
+        face_crop, error = crop_detected_face(img, result)
+        if error:
+            analyses.append({'error': error})
+            continue
+        
+        # Gần giống một khuôn mặt client này vừa gửi: dùng lại liveness + embedding
+        if cache_key is not None:
+            crop_hash = dhash(face_crop)
+            cached = frame_cache.get(cache_key, crop_hash)
+            if cached is not None:
+                analyses.append(cached)
+                continue
+        
+        # Liveness detection
+        start = time.perf_counter()
+        is_real, liveness_conf = detect_liveness_simple(face_crop)
+        observe_stage('liveness', start)
+        
+        if not is_real:
+            analysis = {
+                'is_real': False,
+                'liveness_confidence': liveness_conf,
+                'error': 'Fake face detected'
+            }
+            analyses.append(analysis)
+        else:
+            analysis = {'is_real': True, 'liveness_confidence': liveness_conf}
+            analyses.append(analysis)
+            live_crops.append(face_crop)
+            live_analyses.append(analysis)
+        
+        if cache_key is not None:
+            to_cache.append((cache_key, crop_hash, analysis))
+    
+    # Face embedding cho tất cả khuôn mặt thật trong một lần predict
+    if live_crops:
+        start = time.perf_counter()
+        embeddings = embed_faces_batch(preprocess_faces_batch(live_crops))
+        observe_stage('embed', start, len(live_crops))
+        for analysis, embedding in zip(live_analyses, embeddings):
+            analysis['embedding'] = embedding / (np.linalg.norm(embedding) + 1e-8)
+    
+    for cache_key, crop_hash, analysis in to_cache:
+        frame_cache.put(cache_key, crop_hash, analysis)
+    
+    return analyses
+
+def detect_faces(img, min_conf=0.5):
+    """YOLO trên một ảnh -> [((x1, y1, x2, y2), conf)] các khuôn mặt >= min_conf, box đã clip"""
+    start = time.perf_counter()
+    result = detect_faces_batch([img])[0]
+    observe_stage('detect', start)
+    faces = []
+    for box in result.boxes:
+        conf = float(box.conf[0].cpu().numpy())
+        if conf < min_conf:
+            continue
+        x1, y1, x2, y2 = map(int, box.xyxy[0].cpu().numpy())
+        x1, y1 = max(0, x1), max(0, y1)
+        x2, y2 = min(img.shape[1], x2), min(img.shape[0], y2)
+        if x2 > x1 and y2 > y1:
+            faces.append(((x1, y1, x2, y2), conf))
+    return faces
+
+def analyze_crop(face_crop):
+    """Liveness + embedding (đã chuẩn hóa) cho một face crop"""
+    start = time.perf_counter()
+    is_real, liveness_conf = detect_liveness_simple(face_crop)
+    observe_stage('liveness', start)
+    if not is_real:
+        return {'is_real': False, 'liveness_confidence': liveness_conf, 'error': 'Fake face detected'}
+    start = time.perf_counter()
+    embedding = embed_faces_batch(preprocess_faces_batch([face_crop]))[0]
+    observe_stage('embed', start)
+    return {
+        'is_real': True,
+        'liveness_confidence': liveness_conf,
+        'embedding': embedding / (np.linalg.norm(embedding) + 1e-8)
+    }
+
+def recognition_stream(data):
+    """RecognitionStream cho một kết nối streaming; data: threshold / session_id / roster"""
+    threshold = data.get('threshold', 0.30)
+    
+    def match(embedding):
+        # Snapshot + roster mỗi lần: thấy ngay đăng ký / xóa trong lúc stream
+        search_gallery, _ = resolve_search_gallery(data, face_registry.snapshot())
+        user_id, distance, confidence = recognize_face(embedding, search_gallery, threshold=threshold)
+        return (None if user_id == "Unknown" else user_id), distance, confidence
+    
+    return RecognitionStream(
+        detect_faces, analyze_crop, match,
+        min_quality=STREAM_MIN_QUALITY,
+        min_votes=STREAM_MIN_VOTES,
+        agreement=STREAM_AGREEMENT,
+        min_confidence=STREAM_MIN_CONFIDENCE,
+        instant_confidence=STREAM_INSTANT_CONFIDENCE,
+        max_frames=STREAM_MAX_FRAMES
+    )
+
+def analyze_batch(items):
+    """process_batch của micro-batcher: items là (ảnh, khóa frame cache)"""
+    images, cache_keys = zip(*items)
+    return analyze_frames(list(images), list(cache_keys))
+
+recognize_batcher = MicroBatcher(
+    analyze_batch,
+    max_batch_size=BATCH_MAX_SIZE,
+    max_wait_ms=BATCH_MAX_WAIT_MS,
+    name='recognize-batcher'
+)
+
+# Chỉ start ở chế độ ASGI; Flask chạy model trên thread của request
+inference_executor = InferenceExecutor(
+    max_workers=INFERENCE_WORKERS,
+    max_queue=INFERENCE_QUEUE_SIZE,
+    name='inference'
+)
+
+def queue_depths():
+    return {
+        ('recognize_batcher',): recognize_batcher.queue_depth if RECOGNIZE_BATCHING else None,
+        ('inference_executor',): inference_executor.queued if inference_executor.started else None,
+    }
+
+metrics.gauge('face_queue_depth', 'Items waiting for a worker', queue_depths, ('queue',))
+metrics.gauge('face_inference_in_flight', 'Inference executor jobs running',
+              lambda: inference_executor.in_flight if inference_executor.started else None)
+metrics.counter_func('face_inference_rejected_total', 'Inference jobs rejected because the queue was full',
+                     lambda: inference_executor.rejected if inference_executor.started else None)
+metrics.gauge('face_gallery_size', 'People in the active gallery snapshot', lambda: len(face_registry.snapshot()))
+metrics.gauge('face_gallery_rows', 'Embedding rows (prototypes) in the active gallery',
+              lambda: face_registry.snapshot().n_rows)
+metrics.gauge('face_gallery_version', 'Version of the active gallery snapshot', lambda: face_registry.version)
+metrics.counter_func('face_frame_cache_lookups_total', 'Frame cache lookups by result',
+                     lambda: {('hit',): frame_cache.hits, ('miss',): frame_cache.misses} if FRAME_CACHE_ENABLED else None,
+                     ('result',))
+metrics.counter_func('face_gallery_reloads_total', 'Gallery hot reloads by result',
+                     lambda: {('ok',): gallery_reloader.reloads, ('rejected',): gallery_reloader.rejected,
+                              ('failed',): gallery_reloader.failed},
+                     ('result',))
+metrics.gauge('face_recognize_streams_active', 'Open /api/recognize-stream connections',
+              lambda: stream_stats['active'])
+metrics.gauge('face_service_ready', '1 when models are loaded and warmed up',
+              lambda: int(startup_state['state'] == 'ready'))
+
+def analyze_frame(img, cache_key=None):
+    """Phân tích một frame, qua micro-batcher nếu được bật"""
+    if RECOGNIZE_BATCHING:
+        return recognize_batcher.submit((img, cache_key)).result(timeout=BATCH_RESULT_TIMEOUT)
+    return analyze_frames([img], [cache_key])[0]
+
 # ===========================
 # Initialize Models
 # ===========================
+def startup_failed(message):
+    """Ghi lỗi khởi động (readiness/liveness sẽ báo failed)"""
+    print(f"  ✗ {message}")
+    startup_state['state'] = 'failed'
+    startup_state['error'] = message
+    return False
+
+def warmup_models():
+    """Chạy một batch giả qua detect + embed để request đầu tiên không phải trace graph"""
+    frame = np.random.default_rng(0).integers(0, 255, (480, 640, 3), dtype=np.uint8)
+    detect_faces_batch([frame])
+    for batch_size in sorted({1, max(1, min(WARMUP_BATCH_SIZE, EMBED_BATCH_SIZE))}):
+        embed_faces_batch(np.zeros((batch_size, 224, 224, 3), dtype=np.float32))
+
 def init_models():
     """Initialize YOLO và VGG-Face"""
-    global yolo_model, vggface_model, face_database
+    global yolo_model, embedder
     
-    print("[INFO] Initializing models...")
+    print(f"[INFO] Initializing models (backend: {INFERENCE_BACKEND})...")
+    timings = startup_state['timings']
+    timings['imports_ms'] = (time.perf_counter() - PROCESS_START) * 1000
+    
+    if INFERENCE_BACKEND not in BACKENDS:
+        return startup_failed(f"Unknown INFERENCE_BACKEND '{INFERENCE_BACKEND}', expected one of {BACKENDS}")
     
     # Load YOLO
-    if YOLO_MODEL_PATH.exists():
-        yolo_model = YOLO(str(YOLO_MODEL_PATH))
-        print("  ✓ YOLOv8m-face loaded")
-    else:
-        print(f"  ✗ YOLO model not found: {YOLO_MODEL_PATH}")
-        return False
+    if not YOLO_MODEL_PATH.exists():
+        return startup_failed(f"YOLO model not found: {YOLO_MODEL_PATH}")
+    t_start = time.perf_counter()
+    try:
+        yolo_model = load_detector(INFERENCE_BACKEND, YOLO_MODEL_PATH, ONNX_MODEL_DIR, int8=ONNX_INT8_DETECTOR)
+        print(f"  ✓ YOLOv8m-face loaded ({INFERENCE_BACKEND}{', int8' if INFERENCE_BACKEND == 'onnx' and ONNX_INT8_DETECTOR else ''})")
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return startup_failed(f"Failed to load YOLO: {e}")
+    timings['detector_ms'] = (time.perf_counter() - t_start) * 1000
     
-    # Create VGG-Face model
+    # VGG-Face: load từ file đã serialize nếu có, không build lại graph
+    t_start = time.perf_counter()
     try:
-        vggface_model = create_vggface_resnet50()
-        print("  ✓ VGG-Face ResNet50 created (2048-dim embeddings)")
+        embedder = load_embedder(INFERENCE_BACKEND, create_vggface_resnet50, ONNX_MODEL_DIR,
+                                 int8=ONNX_INT8_EMBEDDER, threads=ONNX_THREADS,
+                                 keras_cache=Path(EMBED_MODEL_CACHE) if EMBED_MODEL_CACHE else None)
+        startup_state['embedder_source'] = embedder.source
+        print(f"  ✓ VGG-Face ResNet50 ready (2048-dim embeddings, {INFERENCE_BACKEND}"
+              f"{', int8' if INFERENCE_BACKEND == 'onnx' and ONNX_INT8_EMBEDDER else ''}, {embedder.source})")
     except Exception as e:
-        print(f"  ✗ Failed to create VGG-Face: {e}")
         import traceback
         traceback.print_exc()
-        return False
+        return startup_failed(f"Failed to create VGG-Face: {e}")
+    timings['embedder_ms'] = (time.perf_counter() - t_start) * 1000
     
     # Load database
-    face_database = load_face_database()
-    print(f"  ✓ Database loaded ({len(face_database)} people)")
+    t_start = time.perf_counter()
+    gallery = load_face_database()
+    print(f"  ✓ Database loaded ({len(gallery)} people)")
+    timings['database_ms'] = (time.perf_counter() - t_start) * 1000
     
-    if len(face_database) == 0:
+    t_start = time.perf_counter()
+    configure_ann(gallery)
+    if gallery.index_active:
+        print(f"  ✓ ANN index built: {gallery.index.stats()}")
+    timings['ann_index_ms'] = (time.perf_counter() - t_start) * 1000
+    
+    face_registry.swap(gallery)
+    
+    if len(gallery) == 0:
         print("  ⚠ WARNING: Empty database! Use /api/register-face to add faces.")
     
+    watch_path = gallery_watch_path()
+    if watch_path is not None:
+        if watch_path.resolve() == FACE_STORE_DIR.resolve():
+            print("  ⚠ GALLERY_WATCH_PATH must not be FACE_STORE_DIR (reload rewrites it) - watch disabled")
+        else:
+            gallery_reloader.watch(watch_path, interval=GALLERY_WATCH_INTERVAL)
+            print(f"  ✓ Watching {watch_path} for gallery updates (every {GALLERY_WATCH_INTERVAL:g}s)")
+
+    if ROSTER_FETCH_ENABLED and not FACE_SERVICE_API_KEY:
+        print("  ⚠ WARNING: FACE_SERVICE_API_KEY is not set - Django only serves session rosters to a keyless "
+              "face service on localhost; otherwise recognition falls back to the global gallery")
+
+    if RECOGNIZE_BATCHING:
+        recognize_batcher.start()
+        print(f"  ✓ Recognize micro-batching: max {BATCH_MAX_SIZE} frames / {BATCH_MAX_WAIT_MS} ms")
+    
+    # Warmup trước khi báo ready
+    if WARMUP_ENABLED:
+        t_start = time.perf_counter()
+        try:
+            warmup_models()
+        except Exception as e:
+            import traceback
+            traceback.print_exc()
+            return startup_failed(f"Warmup failed: {e}")
+        timings['warmup_ms'] = (time.perf_counter() - t_start) * 1000
+        print(f"  ✓ Warmup done ({timings['warmup_ms']:.0f} ms)")
+    
+    timings['total_ms'] = (time.perf_counter() - PROCESS_START) * 1000
+    startup_state['state'] = 'ready'
+    print(f"  ✓ Ready in {timings['total_ms'] / 1000:.1f}s")
     return True
 
 # ===========================
 # API Endpoints
 # ===========================
+def startup_info():
+    return {
+        'state': startup_state['state'],
+        'error': startup_state['error'],
+        'embedder_source': startup_state['embedder_source'],
+        'uptime_s': round(time.perf_counter() - PROCESS_START, 1),
+        'timings': {stage: round(ms, 1) for stage, ms in startup_state['timings'].items()}
+    }
+
+def observe_request(endpoint, method, status, start):
+    """Latency + số request theo endpoint (route pattern, không phải path thật: /api/delete-user/<user_id>)"""
+    elapsed = time.perf_counter() - start
+    request_latency.observe(elapsed, endpoint=endpoint, method=method)
+    request_count.inc(endpoint=endpoint, method=method, status=status)
+    log.info('request', endpoint=endpoint, method=method, status=status, ms=round(elapsed * 1000, 2))
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request(response):
+    start = g.get('request_start')
+    if start is not None and request.path != '/api/metrics':
+        endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        observe_request(endpoint, request.method, response.status_code, start)
+    return response
+
+@app.before_request
+def reject_until_ready():
+    """STARTUP_MODE=background: trả 503 cho các endpoint cần model cho tới khi ready"""
+    if startup_state['state'] != 'ready' and not request.path.startswith(('/api/health', '/api/metrics')):
+        return jsonify({
+            'success': False,
+            'error': 'Service is not ready',
+            'state': startup_state['state']
+        }), 503
+
+@app.route('/api/health/live', methods=['GET'])
+def liveness_check():
+    """Liveness: process còn chạy (chỉ fail khi khởi động lỗi)"""
+    live = startup_state['state'] != 'failed'
+    return jsonify({'live': live, 'startup': startup_info()}), 200 if live else 503
+
+@app.route('/api/health/ready', methods=['GET'])
+def readiness_check():
+    """Readiness: model đã load + warmup xong, sẵn sàng nhận request"""
+    ready = startup_state['state'] == 'ready'
+    return jsonify({'ready': ready, 'startup': startup_info()}), 200 if ready else 503
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check"""
+    gallery = face_registry.snapshot()
     return jsonify({
-        'status': 'ok',
-        'models_loaded': yolo_model is not None and vggface_model is not None,
-        'database_size': len(face_database)
+        'status': 'ok' if startup_state['state'] == 'ready' else startup_state['state'],
+        'live': startup_state['state'] != 'failed',
+        'ready': startup_state['state'] == 'ready',
+        'startup': startup_info(),
+        'models_loaded': yolo_model is not None and embedder is not None,
+        'inference_backend': INFERENCE_BACKEND,
+        'database_size': len(gallery),
+        'gallery_rows': gallery.n_rows,
+        'gallery_storage': gallery.storage_stats(),
+        'gallery_source': GALLERY_SOURCE,
+        'gallery_prototypes': GALLERY_PROTOTYPES,
+        'gallery_version': gallery.version,
+        'gallery': face_registry.stats(),
+        'gallery_reload': gallery_reloader.stats(),
+        'face_store': face_store.stats(),
+        'ann_index': gallery.index.stats() if gallery.index_active else None,
+        'roster_cache': roster_cache.stats(),
+        'roster_subset_cache': roster_subsets.stats(),
+        'recognize_batching': recognize_batcher.stats() if RECOGNIZE_BATCHING else None,
+        'frame_cache': frame_cache.stats() if FRAME_CACHE_ENABLED else None,
+        'recognize_stream': stream_stats,
+        'inference_executor': inference_executor.stats() if inference_executor.started else None
     })
 
+@app.route('/api/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Prometheus text format"""
+    return Response(metrics.render(), content_type=METRICS_CONTENT_TYPE)
+
+def recognize_image(img, data, client=None):
+    """
+    Pipeline nhận diện cho một ảnh đã decode.
+    data: dict chứa threshold / session_id / roster / client_id (từ JSON hoặc query string)
+    client: địa chỉ client, dùng cho frame cache khi không có client_id
+    """
+    # Detect + liveness + embedding (gom batch với các request khác)
+    return recognize_analysis(analyze_frame(img, frame_cache_key(data, client)), data)
+
+def recognize_analysis(analysis, data):
+    """So khớp kết quả analyze_frame() với gallery (không gọi model)"""
+    threshold = data.get('threshold', 0.30)
+    gallery = face_registry.snapshot()
+    
+    if 'embedding' not in analysis:
+        recognition_results.inc(result=REJECTION_REASONS.get(analysis.get('error'), 'error'))
+        return {
+            'success': True,
+            'recognized': False,
+            **analysis
+        }
+    
+    embedding = analysis['embedding']
+    liveness_conf = analysis['liveness_confidence']
+    
+    # Recognize (chỉ trong roster của lớp nếu có)
+    start = time.perf_counter()
+    search_gallery, scope = resolve_search_gallery(data, gallery)
+    person_name, distance, confidence = recognize_face(
+        embedding, 
+        search_gallery, 
+        threshold=threshold
+    )
+    observe_stage('match', start)
+    
+    if person_name == "Unknown":
+        recognition_results.inc(result='unknown')
+        return {
+            'success': True,
+            'recognized': False,
+            'is_real': True,
+            'liveness_confidence': liveness_conf,
+            'distance': distance,
+            'confidence': confidence,
+            'scope': scope,
+            'error': 'Unknown person'
+        }
+    
+    # Success
+    recognition_results.inc(result='recognized')
+    return {
+        'success': True,
+        'recognized': True,
+        'user_id': person_name,
+        'confidence': round(confidence, 2),
+        'distance': round(distance, 4),
+        'is_real': True,
+        'liveness_confidence': round(liveness_conf, 2),
+        'session_id': data.get('session_id'),
+        'scope': scope
+    }
+
 @app.route('/api/recognize', methods=['POST'])
 def recognize():
     """Nhận diện khuôn mặt từ ảnh base64"""
@@ -290,184 +1027,359 @@ def recognize():
         if img is None:
             return jsonify({'success': False, 'error': 'Invalid image'}), 400
         
-        threshold = data.get('threshold', 0.30)
+        return jsonify(recognize_image(img, data, request.remote_addr))
+        
+    except Exception as e:
+        log.error('request_failed', exc=e, endpoint=request.path)
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/recognize-binary', methods=['POST'])
+def recognize_binary():
+    """
+    Nhận diện từ ảnh nhị phân (không base64):
+    - body là JPEG/PNG thô (Content-Type: image/jpeg, image/png, application/octet-stream)
+    - hoặc multipart/form-data với field 'image'
+    threshold / session_id / roster (phân cách bằng dấu phẩy) truyền qua query string.
+    """
+    try:
+        images = images_from_request('image')
+        
+        if len(images) == 0:
+            return jsonify({'success': False, 'error': 'No image provided'}), 400
         
-        # Detect face
-        results = yolo_model(img, verbose=False)
+        img = images[0]
+        if img is None:
+            return jsonify({'success': False, 'error': 'Invalid image'}), 400
         
-        if len(results) == 0 or len(results[0].boxes) == 0:
-            return jsonify({
-                'success': True,
-                'recognized': False,
-                'error': 'No face detected'
-            })
+        return jsonify(recognize_image(img, request_params(), request.remote_addr))
         
-        # Get first face
-        box = results[0].boxes[0]
-        x1, y1, x2, y2 = map(int, box.xyxy[0].cpu().numpy())
+    except Exception as e:
+        log.error('request_failed', exc=e, endpoint=request.path)
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+def recognize_group_image(img, data):
+    """
+    Nhận diện mọi khuôn mặt trong một ảnh lớp học: detect tất cả, embed
+    trong một lần predict, ghép một-một với roster của session.
+    """
+    threshold = data.get('threshold', 0.30)
+    check_liveness = data.get('check_liveness', False)
+    gallery = face_registry.snapshot()
+    
+    start = time.perf_counter()
+    result = detect_faces_batch([img])[0]
+    observe_stage('detect', start)
+    
+    faces = []
+    face_crops = []
+    for box in result.boxes:
         conf = float(box.conf[0].cpu().numpy())
+        if conf < GROUP_MIN_FACE_CONF:
+            continue
         
-        if conf < 0.5:
-            return jsonify({
-                'success': True,
-                'recognized': False,
-                'error': 'Face detection confidence too low'
-            })
-        
-        # Crop face
+        x1, y1, x2, y2 = map(int, box.xyxy[0].cpu().numpy())
         x1, y1 = max(0, x1), max(0, y1)
         x2 = min(img.shape[1], x2)
         y2 = min(img.shape[0], y2)
         face_crop = img[y1:y2, x1:x2]
-        
         if face_crop.size == 0:
-            return jsonify({
-                'success': True,
-                'recognized': False,
-                'error': 'Invalid face crop'
-            })
+            continue
         
-        # Liveness detection
-        is_real, liveness_conf = detect_liveness_simple(face_crop)
+        face = {'box': [x1, y1, x2, y2], 'detection_confidence': round(conf, 3)}
+        if check_liveness:
+            start = time.perf_counter()
+            is_real, liveness_conf = detect_liveness_simple(face_crop)
+            observe_stage('liveness', start)
+            face['is_real'] = bool(is_real)
+            face['liveness_confidence'] = round(float(liveness_conf), 2)
+            if not is_real:
+                face['error'] = 'Fake face detected'
+                faces.append(face)
+                continue
         
-        if not is_real:
-            return jsonify({
-                'success': True,
-                'recognized': False,
-                'is_real': False,
-                'liveness_confidence': liveness_conf,
-                'error': 'Fake face detected'
-            })
-        
-        # Face recognition
-        face_rgb = cv2.cvtColor(face_crop, cv2.COLOR_BGR2RGB)
-        face_batch = preprocess_face_for_vggface(face_rgb)
-        embedding = vggface_model.predict(face_batch, verbose=0)[0]
-        embedding = embedding / (np.linalg.norm(embedding) + 1e-8)
-        
-        # Recognize
-        person_name, distance, confidence = recognize_face(
-            embedding, 
-            face_database, 
-            threshold=threshold
-        )
-        
-        if person_name == "Unknown":
-            return jsonify({
-                'success': True,
-                'recognized': False,
-                'is_real': True,
-                'liveness_confidence': liveness_conf,
-                'distance': distance,
-                'confidence': confidence,
-                'error': 'Unknown person'
-            })
+        faces.append(face)
+        face_crops.append((face, face_crop))
+    
+    search_gallery, scope = resolve_search_gallery(data, gallery)
+    
+    matches = []
+    if face_crops:
+        # Một lần predict cho toàn bộ khuôn mặt trong ảnh
+        start = time.perf_counter()
+        embeddings = embed_faces_batch(preprocess_faces_batch([crop for _, crop in face_crops]))
+        observe_stage('embed', start, len(face_crops))
+        embeddings = embeddings / (np.linalg.norm(embeddings, axis=1, keepdims=True) + 1e-8)
         
-        # Success
-        return jsonify({
-            'success': True,
-            'recognized': True,
-            'user_id': person_name,
-            'confidence': round(confidence, 2),
-            'distance': round(distance, 4),
-            'is_real': True,
-            'liveness_confidence': round(liveness_conf, 2),
-            'session_id': data.get('session_id')
-        })
+        # Ghép một-một: hai khuôn mặt không thể cùng nhận một sinh viên
+        start = time.perf_counter()
+        assignments = search_gallery.assign(embeddings, threshold)
+        observe_stage('match', start, len(face_crops))
+        for (face, _), assignment in zip(face_crops, assignments):
+            if assignment is None:
+                face['user_id'] = None
+                face['error'] = 'Unknown person'
+                continue
+            user_id, distance = assignment
+            face['user_id'] = user_id
+            face['distance'] = round(distance, 4)
+            face['confidence'] = round(distance_to_confidence(distance, threshold), 2)
+            matches.append({'user_id': user_id, 'confidence': face['confidence'], 'distance': face['distance']})
+    
+    response = {
+        'success': True,
+        'num_faces': len(faces),
+        'num_recognized': len(matches),
+        'faces': faces,
+        'matches': matches,
+        'session_id': data.get('session_id'),
+        'scope': scope
+    }
+    
+    if data.get('mark_attendance') and data.get('session_id') is not None and matches:
+        try:
+            response['attendance'] = mark_bulk_attendance(data['session_id'], matches)
+        except Exception as e:
+            log.warning('bulk_attendance_failed', session_id=data['session_id'], error=str(e))
+            response['attendance'] = {'success': False, 'error': str(e)}
+    
+    return response
+
+@app.route('/api/recognize-group', methods=['POST'])
+def recognize_group():
+    """
+    Điểm danh bằng một ảnh chụp cả lớp.
+    JSON: {image (base64), session_id, roster?, threshold?, check_liveness?, mark_attendance?}
+    hoặc ảnh nhị phân (body/multipart 'image') với các tham số trên ở query string.
+    """
+    try:
+        if request.is_json:
+            data = request.json
+            if 'image' not in data:
+                return jsonify({'success': False, 'error': 'No image provided'}), 400
+            img = base64_to_image(data['image'])
+        else:
+            data = request_params()
+            images = images_from_request('image')
+            if len(images) == 0:
+                return jsonify({'success': False, 'error': 'No image provided'}), 400
+            img = images[0]
+        
+        if img is None:
+            return jsonify({'success': False, 'error': 'Invalid image'}), 400
+        
+        return jsonify(recognize_group_image(img, data))
         
     except Exception as e:
-        print(f"[ERROR] {e}")
-        import traceback
-        traceback.print_exc()
-        return jsonify({
-            'success': False,
-            'error': str(e)
-        }), 500
+        log.error('request_failed', exc=e, endpoint=request.path)
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+def first_face_crop(img, result):
+    """Crop khuôn mặt đầu tiên YOLO tìm thấy trong ảnh đăng ký, hoặc None"""
+    if len(result.boxes) == 0:
+        return None
+    
+    box = result.boxes[0]
+    x1, y1, x2, y2 = map(int, box.xyxy[0].cpu().numpy())
+    
+    face_crop = img[y1:y2, x1:x2]
+    if face_crop.size == 0:
+        return None
+    return face_crop
+
+def average_embeddings(embeddings_list):
+    """Embedding đại diện của một người: trung bình các ảnh rồi chuẩn hóa L2"""
+    mean_embedding = np.mean(embeddings_list, axis=0)
+    return mean_embedding / (np.linalg.norm(mean_embedding) + 1e-8)
+
+def enrollment_prototypes(embeddings_list):
+    """Embedding (D,) hoặc tối đa GALLERY_PROTOTYPES prototype (K, D) lưu vào gallery"""
+    if GALLERY_PROTOTYPES <= 1 or len(embeddings_list) == 1:
+        return average_embeddings(embeddings_list)
+    return select_prototypes(embeddings_list, GALLERY_PROTOTYPES)
+
+def register_images(user_id, decoded, timings):
+    """
+    Đăng ký user từ các ảnh đã decode (batch detect + batch embed).
+    timings: dict đã có decode_ms, được bổ sung các stage còn lại.
+    Returns: (body, http_status)
+    """
+    if len(decoded) == 0:
+        return {'success': False, 'error': 'No valid faces detected'}, 400
+    
+    t_start = time.perf_counter()
+    
+    # 2. Detect: một lần gọi YOLO cho cả batch
+    results = detect_faces_batch(decoded)
+    t_detect = time.perf_counter()
+    timings['detect_ms'] = (t_detect - t_start) * 1000
+    
+    # 3. Crop face đầu tiên của mỗi ảnh + preprocess thành một tensor
+    face_crops = [first_face_crop(img, result) for img, result in zip(decoded, results)]
+    face_crops = [crop for crop in face_crops if crop is not None]
+    
+    if len(face_crops) == 0:
+        return {'success': False, 'error': 'No valid faces detected'}, 400
+    
+    face_batch = preprocess_faces_batch(face_crops)
+    t_preprocess = time.perf_counter()
+    timings['preprocess_ms'] = (t_preprocess - t_detect) * 1000
+    
+    # 4. Embed: một lần predict cho toàn bộ crops
+    embeddings_list = embed_faces_batch(face_batch)
+    t_embed = time.perf_counter()
+    timings['embed_ms'] = (t_embed - t_preprocess) * 1000
+    
+    # Prototypes (hoặc embedding trung bình nếu GALLERY_PROTOTYPES = 1)
+    prototypes = enrollment_prototypes(embeddings_list)
+    
+    # Save to store rồi swap sang snapshot mới (reader không bị chặn)
+    face_registry.put(user_id, prototypes, persist=save_face)
+    t_save = time.perf_counter()
+    timings['save_ms'] = (t_save - t_embed) * 1000
+    timings['total_ms'] = sum(timings.values())
+    
+    return {
+        'success': True,
+        'user_id': user_id,
+        'num_faces': len(embeddings_list),
+        'num_prototypes': 1 if prototypes.ndim == 1 else len(prototypes),
+        'message': f'Registered {len(embeddings_list)} face embeddings for {user_id}',
+        'timings': {stage: round(ms, 2) for stage, ms in timings.items()}
+    }, 200
 
 @app.route('/api/register-face', methods=['POST'])
 def register_face():
     """Đăng ký khuôn mặt mới"""
-    global face_database
-    
     try:
         data = request.json
         
-        if 'user_id' not in data or 'images' not in data:
-            return jsonify({'success': False, 'error': 'Missing user_id or images'}), 400
+        if 'user_id' not in data:
+            return jsonify({'success': False, 'error': 'Missing user_id'}), 400
         
         user_id = str(data['user_id'])
-        images = data['images']
+        images = data.get('images') or []
         
         if len(images) == 0:
             return jsonify({'success': False, 'error': 'No images provided'}), 400
         
-        embeddings_list = []
+        # 1. Decode toàn bộ ảnh
+        t_start = time.perf_counter()
+        decoded = [base64_to_image(img_base64) for img_base64 in images]
+        decoded = [img for img in decoded if img is not None]
+        timings = {'decode_ms': (time.perf_counter() - t_start) * 1000}
         
-        for img_base64 in images:
-            img = base64_to_image(img_base64)
-            if img is None:
-                continue
-            
-            # Detect face first
-            results = yolo_model(img, verbose=False)
-            if len(results) == 0 or len(results[0].boxes) == 0:
-                continue
-            
-            # Get first face
-            box = results[0].boxes[0]
-            x1, y1, x2, y2 = map(int, box.xyxy[0].cpu().numpy())
-            
-            # Crop and extract embedding
-            face_crop = img[y1:y2, x1:x2]
-            if face_crop.size == 0:
-                continue
-            
-            face_rgb = cv2.cvtColor(face_crop, cv2.COLOR_BGR2RGB)
-            face_batch = preprocess_face_for_vggface(face_rgb)
-            embedding = vggface_model.predict(face_batch, verbose=0)[0]
-            embeddings_list.append(embedding)
+        body, status_code = register_images(user_id, decoded, timings)
+        return jsonify(body), status_code
         
-        if len(embeddings_list) == 0:
-            return jsonify({'success': False, 'error': 'No valid faces detected'}), 400
+    except Exception as e:
+        log.error('request_failed', exc=e, endpoint=request.path)
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/register-face-binary', methods=['POST'])
+def register_face_binary():
+    """
+    Đăng ký khuôn mặt từ ảnh nhị phân:
+    - multipart/form-data: field 'user_id' + một hoặc nhiều file 'images'
+    - hoặc body JPEG/PNG thô với ?user_id=...
+    """
+    try:
+        user_id = request.form.get('user_id') or request.args.get('user_id')
         
-        # Average embeddings
-        mean_embedding = np.mean(embeddings_list, axis=0)
-        mean_embedding = mean_embedding / (np.linalg.norm(mean_embedding) + 1e-8)
+        if not user_id:
+            return jsonify({'success': False, 'error': 'Missing user_id'}), 400
         
-        # Save to database
-        face_database[user_id] = mean_embedding
-        save_face_database()
+        # 1. Decode thẳng từ stream vào buffer NumPy
+        t_start = time.perf_counter()
+        decoded = images_from_request('images')
         
-        return jsonify({
-            'success': True,
-            'user_id': user_id,
-            'num_faces': len(embeddings_list),
-            'message': f'Registered {len(embeddings_list)} face embeddings for {user_id}'
-        })
+        if len(decoded) == 0:
+            return jsonify({'success': False, 'error': 'No images provided'}), 400
+        
+        decoded = [img for img in decoded if img is not None]
+        timings = {'decode_ms': (time.perf_counter() - t_start) * 1000}
+        
+        body, status_code = register_images(str(user_id), decoded, timings)
+        return jsonify(body), status_code
         
     except Exception as e:
-        print(f"[ERROR] {e}")
-        import traceback
-        traceback.print_exc()
+        log.error('request_failed', exc=e, endpoint=request.path)
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+def is_admin_request():
+    """Header X-Face-Service-Key = FACE_SERVICE_API_KEY; chưa cấu hình key thì chỉ cho localhost"""
+    if FACE_SERVICE_API_KEY:
+        return hmac.compare_digest(request.headers.get('X-Face-Service-Key', ''), FACE_SERVICE_API_KEY)
+    return request.remote_addr in ('127.0.0.1', '::1')
+
+@app.route('/api/admin/reload-gallery', methods=['GET', 'POST'])
+def reload_gallery():
+    """
+    Nạp gallery rebuild offline mà không restart (model giữ nguyên).
+    JSON: {path? (mặc định GALLERY_WATCH_PATH) | source: 'backend', expected_count?, force?,
+           wait? (mặc định true; false -> 202 ngay, kết quả xem bằng GET)}
+    path: thư mục store (bulk_enroll.py --store-dir) hoặc file face vector (FVEC),
+    trong GALLERY_RELOAD_DIR (đường dẫn tương đối tính từ thư mục đó)
+    """
+    if not is_admin_request():
+        return jsonify({'success': False, 'error': 'Forbidden'}), 403
+    if request.method == 'GET':
+        return jsonify({'success': True, **gallery_reloader.stats()})
+    
+    data = request.get_json(silent=True) or {}
+    source = 'backend' if data.get('source') == 'backend' else (data.get('path') or gallery_watch_path())
+    if not source:
+        return jsonify({'success': False, 'error': 'No path provided'}), 400
+    if source != 'backend':
+        try:
+            source = resolve_reload_path(source)
+        except PermissionError as e:
+            return jsonify({'success': False, 'error': str(e)}), 403
+    try:
+        expected_count = int(data['expected_count']) if data.get('expected_count') is not None else None
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'error': 'expected_count must be an integer'}), 400
+    options = {'expected_count': expected_count, 'force': bool(data.get('force', False))}
+    
+    if not data.get('wait', True):
+        if not gallery_reloader.start(source, **options):
+            return jsonify({'success': False, 'error': 'A gallery reload is already in progress'}), 409
+        return jsonify({'success': True, 'started': True, 'source': str(source)}), 202
+    
+    try:
+        return jsonify({'success': True, **gallery_reloader.reload(source, **options)})
+    except GalleryReloadBusy as e:
+        return jsonify({'success': False, 'error': str(e)}), 409
+    except FileNotFoundError as e:
+        return jsonify({'success': False, 'error': str(e)}), 404
+    except ValueError as e:
+        # GalleryValidationError hoặc file hỏng: gallery đang dùng giữ nguyên
+        return jsonify({'success': False, 'error': str(e), 'version': face_registry.version}), 422
+    except requests.RequestException as e:
+        return jsonify({'success': False, 'error': f"Backend: {e}"}), 502
+    except Exception as e:
+        log.error('request_failed', exc=e, endpoint=request.path)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/api/list-users', methods=['GET'])
 def list_users():
     """List registered users"""
+    gallery = face_registry.snapshot()
     return jsonify({
         'success': True,
-        'users': list(face_database.keys()),
-        'total': len(face_database)
+        'users': list(gallery.keys()),
+        'total': len(gallery)
     })
 
 @app.route('/api/delete-user/<user_id>', methods=['DELETE'])
 def delete_user(user_id):
     """Delete user from database"""
-    global face_database
-    
-    if user_id in face_database:
-        del face_database[user_id]
-        save_face_database()
+    if face_registry.delete(user_id, persist=delete_saved_face) is not None:
         return jsonify({'success': True, 'message': f'Deleted {user_id}'})
     else:
         return jsonify({'success': False, 'error': 'User not found'}), 404
@@ -481,17 +1393,29 @@ if __name__ == '__main__':
     print("YOLOv8m-face + VGG-Face ResNet50")
     print("="*60 + "\n")
     
-    if init_models():
+    if STARTUP_MODE == 'background':
+        # Mở HTTP ngay: /api/health/live trả 200, /api/health/ready trả 503 tới khi init xong
+        threading.Thread(target=init_models, name='init-models', daemon=True).start()
+        print("[INFO] Background startup: serving /api/health/live while models load")
+        app.run(host='0.0.0.0', port=5000, debug=False, threaded=True)
+    elif init_models():
         print("\n[SUCCESS] All models loaded!")
         print("[INFO] Starting Flask server on http://localhost:5000")
         print("\n[ENDPOINTS]")
         print("  - GET  /api/health")
+        print("  - GET  /api/health/live")
+        print("  - GET  /api/health/ready")
+        print("  - GET  /api/metrics")
         print("  - POST /api/recognize")
+        print("  - POST /api/recognize-binary")
+        print("  - POST /api/recognize-group")
         print("  - POST /api/register-face")
+        print("  - POST /api/register-face-binary")
         print("  - GET  /api/list-users")
         print("  - DELETE /api/delete-user/<user_id>")
+        print("  - POST /api/admin/reload-gallery")
         print("\n" + "="*60 + "\n")
         
-        app.run(host='0.0.0.0', port=5000, debug=False)
+        app.run(host='0.0.0.0', port=5000, debug=False, threaded=True)
     else:
         print("\n[ERROR] Failed to initialize models!")
@@ -0,0 +1,190 @@
+"""
+Face tracker (IoU + centroid) cho vòng lặp realtime
+====================================================
+YOLO chỉ chạy mỗi vài frame; giữa hai lần detect box của mỗi track được
+ngoại suy theo vận tốc đo được. Mỗi track giữ một ID ổn định và danh tính đã
+nhận diện; embedding chỉ chạy lại khi track mới, hoặc độ tin cậy danh tính
+đã suy giảm (theo thời gian kể từ lần embed và theo mức box đổi kích thước:
+mặt tiến / lùi hoặc quay đi).
+
+Ghép detection -> track: greedy theo IoU giảm dần (>= iou_threshold), phần
+còn lại ghép theo khoảng cách tâm (<= max_centroid x cạnh box) để không mất
+track khi mặt di chuyển nhanh giữa hai lần detect.
+"""
+import math
+
+import numpy as np
+
+from stream_recognition import iou
+
+
+def box_area(box):
+    return max(0.0, float(box[2] - box[0])) * max(0.0, float(box[3] - box[1]))
+
+
+class Track:
+    def __init__(self, track_id, box, detection_confidence, frame_idx):
+        self.id = track_id
+        self.box = np.asarray(box, dtype=np.float32)
+        self.detected_box = self.box.copy()
+        self.velocity = np.zeros(4, dtype=np.float32)   # pixel / frame cho (x1, y1, x2, y2)
+        self.detection_confidence = detection_confidence
+        self.last_detected = frame_idx
+        self.missed = 0
+        self.hits = 1
+
+        # Danh tính (cập nhật sau mỗi lần embed)
+        self.name = None
+        self.distance = None
+        self.confidence = 0.0
+        self.is_real = None
+        self.liveness_confidence = None
+        self.embedded_at = None
+        self.embedded_box = None
+        self.pending = False     # đang chờ embed (pipeline nhiều luồng)
+
+    @property
+    def int_box(self):
+        x1, y1, x2, y2 = self.box
+        return int(round(x1)), int(round(y1)), int(round(x2)), int(round(y2))
+
+    def set_identity(self, name, distance, confidence, frame_idx, is_real=True, liveness_confidence=None):
+        self.name = name
+        self.distance = distance
+        self.confidence = float(confidence)
+        self.is_real = is_real
+        self.liveness_confidence = liveness_confidence
+        self.embedded_at = frame_idx
+        self.embedded_box = self.box.copy()
+        self.pending = False
+
+    def forget_identity(self):
+        """Database / threshold đổi: lần detect tới sẽ embed lại"""
+        self.embedded_at = None
+
+    def identity_confidence(self, frame_idx, half_life):
+        """Confidence lúc embed, giảm một nửa mỗi half_life frame và theo tỉ lệ diện tích so với box lúc embed"""
+        if self.embedded_at is None:
+            return 0.0
+        age = frame_idx - self.embedded_at
+        area, embedded_area = box_area(self.box), box_area(self.embedded_box)
+        scale = min(area, embedded_area) / max(area, embedded_area, 1.0)
+        return self.confidence * 0.5 ** (age / half_life) * scale
+
+
+class FaceTracker:
+    def __init__(self, iou_threshold=0.3, max_centroid=0.6, max_missed=2, half_life=90,
+                 reembed_below=50.0, min_interval=15, smoothing=0.5):
+        """
+        max_missed: số lần detect liên tiếp không thấy trước khi xóa track
+        half_life / min_interval: tính theo frame
+        reembed_below: embed lại khi identity_confidence < ngưỡng này
+        """
+        self.iou_threshold = iou_threshold
+        self.max_centroid = max_centroid
+        self.max_missed = max_missed
+        self.half_life = half_life
+        self.reembed_below = reembed_below
+        self.min_interval = min_interval
+        self.smoothing = smoothing
+
+        self.tracks = []
+        self.next_id = 1
+        self.created = 0
+
+    def predict(self):
+        """Frame không detect: dịch box theo vận tốc"""
+        for track in self.tracks:
+            track.box = track.box + track.velocity
+        return self.tracks
+
+    def _match(self, detections):
+        """Returns [(track_index, detection_index)] ghép greedy IoU rồi khoảng cách tâm"""
+        pairs, used_tracks, used_detections = [], set(), set()
+
+        scored = [(iou(track.box, box), ti, di)
+                  for ti, track in enumerate(self.tracks) for di, (box, _) in enumerate(detections)]
+        for score, ti, di in sorted(scored, reverse=True):
+            if score < self.iou_threshold:
+                break
+            if ti not in used_tracks and di not in used_detections:
+                pairs.append((ti, di))
+                used_tracks.add(ti)
+                used_detections.add(di)
+
+        centroid = []
+        for ti, track in enumerate(self.tracks):
+            if ti in used_tracks:
+                continue
+            x1, y1, x2, y2 = track.box
+            size = math.sqrt(max((x2 - x1) * (y2 - y1), 1.0))
+            for di, (box, _) in enumerate(detections):
+                if di in used_detections:
+                    continue
+                dx = (box[0] + box[2] - x1 - x2) / 2
+                dy = (box[1] + box[3] - y1 - y2) / 2
+                distance = math.hypot(dx, dy) / size
+                if distance <= self.max_centroid:
+                    centroid.append((distance, ti, di))
+        for _, ti, di in sorted(centroid):
+            if ti not in used_tracks and di not in used_detections:
+                pairs.append((ti, di))
+                used_tracks.add(ti)
+                used_detections.add(di)
+        return pairs
+
+    def update(self, detections, frame_idx):
+        """
+        detections: [((x1, y1, x2, y2), confidence)] của frame frame_idx.
+        Returns danh sách track hiện tại (track mới có embedded_at = None).
+        """
+        pairs = self._match(detections)
+        matched_tracks = {ti for ti, _ in pairs}
+        matched_detections = {di for _, di in pairs}
+
+        for ti, di in pairs:
+            track = self.tracks[ti]
+            box = np.asarray(detections[di][0], dtype=np.float32)
+            elapsed = max(frame_idx - track.last_detected, 1)
+            velocity = (box - track.detected_box) / elapsed
+            track.velocity = self.smoothing * track.velocity + (1 - self.smoothing) * velocity
+            track.box = box
+            track.detected_box = box.copy()
+            track.detection_confidence = detections[di][1]
+            track.last_detected = frame_idx
+            track.missed = 0
+            track.hits += 1
+
+        kept = []
+        for ti, track in enumerate(self.tracks):
+            if ti not in matched_tracks:
+                track.missed += 1
+                if track.missed > self.max_missed:
+                    continue
+            kept.append(track)
+
+        for di, (box, confidence) in enumerate(detections):
+            if di not in matched_detections:
+                kept.append(Track(self.next_id, box, confidence, frame_idx))
+                self.next_id += 1
+                self.created += 1
+
+        self.tracks = kept
+        return self.tracks
+
+    def needs_embedding(self, track, frame_idx):
+        """Track mới, hoặc độ tin cậy danh tính đã giảm (tối đa một lần mỗi min_interval frame)"""
+        if track.missed or track.pending:
+            return False
+        if track.embedded_at is None:
+            return True
+        if frame_idx - track.embedded_at < self.min_interval:
+            return False
+        return track.identity_confidence(frame_idx, self.half_life) < self.reembed_below
+
+    def forget_identities(self):
+        for track in self.tracks:
+            track.forget_identity()
+
+    def reset(self):
+        self.tracks = []
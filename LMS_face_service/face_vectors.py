@@ -0,0 +1,98 @@
+"""
+Face vector stream (bulk sync với Django)
+==========================================
+User.face_vector ở Django là nguồn dữ liệu gốc: float32 little-endian của
+một embedding hoặc count prototype. Định dạng stream (giống hệt
+LMS_backend/classroom/face_vectors.py):
+
+    header   b"FVEC" | u8 version | u32 dim | u32 số record (gợi ý, có thể 0)
+    record   u16 len(user_id) | user_id utf-8 | u16 count | count * dim float32 LE
+    trailer  u16 0 | u32 số record đã ghi
+
+count = 0 nghĩa là xóa (chỉ dùng khi import). Stream thiếu trailer là bị cắt
+ngang và bị từ chối.
+
+load_arrays() đọc cả stream một lần thẳng vào ma trận (R, dim) + ids theo
+hàng, đúng dạng EmbeddingStore.import_arrays / FaceGallery.from_arrays cần.
+"""
+import struct
+
+import numpy as np
+
+MAGIC = b'FVEC'
+VERSION = 1
+
+_HEADER = struct.Struct('<4sBII')
+_U16 = struct.Struct('<H')
+_U32 = struct.Struct('<I')
+
+
+def _read_exact(stream, size):
+    """Đọc đúng size bytes (socket/response có thể trả về ít hơn)"""
+    chunks, received = [], 0
+    while received < size:
+        chunk = stream.read(size - received)
+        if not chunk:
+            raise ValueError("Truncated face vector stream")
+        chunks.append(chunk)
+        received += len(chunk)
+    return b''.join(chunks)
+
+
+def read_header(stream):
+    """Returns: (dim, số record gợi ý)"""
+    magic, version, dim, n_records = _HEADER.unpack(_read_exact(stream, _HEADER.size))
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("Not a face vector stream (bad magic or version)")
+    if dim == 0:
+        raise ValueError("Invalid face vector dimension 0")
+    return dim, n_records
+
+
+def read_records(stream, dim):
+    """Yield (user_id, (count, dim) float32) tới trailer; count = 0 là xóa"""
+    count = 0
+    while True:
+        (name_length,) = _U16.unpack(_read_exact(stream, _U16.size))
+        if name_length == 0:
+            (expected,) = _U32.unpack(_read_exact(stream, _U32.size))
+            if expected != count:
+                raise ValueError(f"Face vector stream has {count} records, trailer says {expected}")
+            return
+        user_id = _read_exact(stream, name_length).decode('utf-8')
+        (rows,) = _U16.unpack(_read_exact(stream, _U16.size))
+        data = _read_exact(stream, rows * dim * 4) if rows else b''
+        yield user_id, np.frombuffer(data, dtype='<f4').reshape(rows, dim)
+        count += 1
+
+
+def load_arrays(stream):
+    """
+    Đọc cả stream vào (matrix (R, dim) float32, ids theo hàng) trong một lần;
+    ma trận được cấp trước theo số record gợi ý và nhân đôi khi thiếu.
+    """
+    dim, hint = read_header(stream)
+    matrix = np.empty((max(hint, 64), dim), dtype=np.float32)
+    ids = []
+    for user_id, vectors in read_records(stream, dim):
+        if not len(vectors):
+            continue
+        n = len(ids)
+        if n + len(vectors) > matrix.shape[0]:
+            grown = np.empty((max(2 * matrix.shape[0], n + len(vectors)), dim), dtype=np.float32)
+            grown[:n] = matrix[:n]
+            matrix = grown
+        matrix[n:n + len(vectors)] = vectors
+        ids.extend([user_id] * len(vectors))
+    return matrix[:len(ids)], ids
+
+
+def encode(records, dim):
+    """bytes cho [(user_id, embedding (D,) | (K, D) | None = xóa)]"""
+    parts = [_HEADER.pack(MAGIC, VERSION, dim, len(records))]
+    for user_id, vectors in records:
+        name = str(user_id).encode('utf-8')
+        data = b'' if vectors is None else np.asarray(vectors, dtype='<f4').reshape(-1, dim).tobytes()
+        parts.append(_U16.pack(len(name)) + name + _U16.pack(len(data) // (4 * dim)) + data)
+    parts.append(_U16.pack(0) + _U32.pack(len(records)))
+    return b''.join(parts)
@@ -0,0 +1,85 @@
+"""
+Fit PCA projection cho gallery (offline)
+=========================================
+Đọc toàn bộ embeddings 2048 chiều trong face store, fit PCA về --dim chiều
+và lưu file .npz cho GALLERY_PROJECTION. Store không bị sửa: embeddings gốc
+vẫn là nguồn dữ liệu, gallery chiếu lại mỗi lần khởi động.
+
+In thêm phần phương sai giữ lại và độ lệch khoảng cách / nearest-neighbour
+trên một mẫu các hàng (để chọn --dim trước khi bật trên server).
+
+Usage:
+    python fit_projection.py --dim 256
+    python fit_projection.py --dim 128 --out models/gallery_pca_128.npz
+    GALLERY_PROJECTION=models/gallery_pca.npz GALLERY_DTYPE=float16 python face_recognition_api.py
+"""
+import argparse
+import sys
+
+import numpy as np
+
+import face_recognition_api as api
+from embedding_store import EmbeddingStore
+from gallery import FaceGallery
+from projection import PCAProjection
+
+DEFAULT_OUT = api.BASE_DIR / "models" / "gallery_pca.npz"
+
+
+def projection_report(matrix, ids, projection, dtype, sample, seed=0):
+    """So nearest-neighbour (leave-one-out) và khoảng cách trên `sample` hàng (store 1 hàng/người)"""
+    rng = np.random.default_rng(seed)
+    n = len(ids)
+    picks = rng.choice(n, size=min(sample, n), replace=False)
+    full = FaceGallery.from_arrays(matrix, ids)
+    reduced = FaceGallery.from_arrays(matrix, ids, projection=projection, dtype=dtype)
+
+    queries = np.asarray(matrix[picks], dtype=np.float32)
+    d_full = full.distance_matrix(queries)
+    d_reduced = reduced.distance_matrix(queries)
+    # Bỏ chính nó ra (leave-one-out; một hàng mỗi người nên cột = hàng)
+    rows = np.arange(len(picks))
+    d_full[rows, picks] = np.inf
+    d_reduced[rows, picks] = np.inf
+    agree = float(np.mean(d_full.argmin(axis=1) == d_reduced.argmin(axis=1)))
+    finite = np.isfinite(d_full)
+    return {
+        'nn_agreement': agree,
+        'mean_abs_distance_error': float(np.abs(d_full[finite] - d_reduced[finite]).mean()),
+        'bytes_full': full.nbytes,
+        'bytes_reduced': reduced.nbytes,
+    }
+
+
+def run(args):
+    store = EmbeddingStore(args.store_dir).open()
+    matrix, ids = store.load_arrays()
+    matrix = matrix[:len(ids)]
+    if len(ids) < args.dim:
+        print(f"[ERROR] Need at least {args.dim} enrolled rows to fit a {args.dim}-dim projection "
+              f"({len(ids)} in {args.store_dir})")
+        return 1
+
+    print(f"[INFO] Fitting PCA {matrix.shape[1]} -> {args.dim} on {len(ids)} rows...")
+    projection = PCAProjection.fit(matrix, args.dim)
+    projection.save(args.out)
+    print(f"[SUCCESS] Saved {args.out} (explained variance {projection.explained_variance:.4f})")
+
+    if args.sample and len(store) == len(ids):
+        report = projection_report(matrix, ids, projection, args.dtype, args.sample)
+        print(f"[INFO] {args.dtype}: nearest-neighbour agreement {report['nn_agreement']:.3f}, "
+              f"mean |distance error| {report['mean_abs_distance_error']:.4f}, "
+              f"gallery {report['bytes_full'] / 2**20:.1f} MB -> {report['bytes_reduced'] / 2**20:.1f} MB")
+    return 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--store-dir', default=str(api.FACE_STORE_DIR))
+    parser.add_argument('--dim', type=int, default=256, help='Số chiều sau khi chiếu (128-512)')
+    parser.add_argument('--out', default=str(DEFAULT_OUT))
+    parser.add_argument('--dtype', default='float16', choices=['float32', 'float16'], help='dtype dùng cho báo cáo')
+    parser.add_argument('--sample', type=int, default=500, help='Số hàng dùng để báo cáo độ lệch (0 = bỏ qua)')
+    args = parser.parse_args()
+
+    sys.exit(run(args))
@@ -0,0 +1,148 @@
+"""
+Perceptual-hash frame cache
+============================
+Sinh viên ngồi yên trước webcam gửi các frame gần như giống hệt nhau mỗi 2
+giây. Cache này giữ kết quả liveness + embedding của vài khuôn mặt gần nhất
+cho mỗi client (session_id, client), khóa bằng dHash 64-bit của face crop đã
+thu nhỏ: frame mới có hash cách hash đã lưu <= max_distance bit thì dùng lại
+kết quả, bỏ qua liveness + ResNet50. YOLO vẫn chạy (cần crop để tính hash);
+so khớp gallery luôn chạy lại nên kết quả đúng với gallery / roster hiện tại.
+
+Giới hạn bộ nhớ: tối đa max_clients client (LRU), per_client entry mỗi client
+và max_bytes tổng; entry hết hạn sau ttl giây.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+ENTRY_OVERHEAD_BYTES = 256   # ước lượng dict / tuple / int của một entry
+
+
+def dhash(image, size=8):
+    """
+    Difference hash: ảnh xám thu về (size, size + 1), mỗi bit là pixel bên
+    phải sáng hơn pixel bên trái. Returns int size*size bit.
+    """
+    gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    # Cắt giữa về bội số nguyên của lưới: INTER_AREA tỉ lệ nguyên nhanh hơn ~4 lần
+    h, w = gray.shape
+    k = min(h // size, w // (size + 1))
+    if k > 1:
+        y, x = (h - k * size) // 2, (w - k * (size + 1)) // 2
+        gray = gray[y:y + k * size, x:x + k * (size + 1)]
+    small = cv2.resize(gray, (size + 1, size), interpolation=cv2.INTER_AREA)
+    bits = small[:, 1:] > small[:, :-1]
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+def hamming(a, b):
+    return (a ^ b).bit_count()
+
+
+def value_nbytes(value):
+    """Bytes ước lượng của một kết quả analyze (phần lớn là embedding)"""
+    nbytes = ENTRY_OVERHEAD_BYTES
+    for item in value.values():
+        if isinstance(item, np.ndarray):
+            nbytes += item.nbytes
+    return nbytes
+
+
+class FrameCache:
+    """client_key -> vài (hash, kết quả) gần nhất, tra theo khoảng cách Hamming"""
+
+    def __init__(self, max_distance=4, ttl=10.0, max_clients=1024, per_client=4, max_bytes=32 * 2**20,
+                 clock=time.monotonic):
+        self.max_distance = max_distance
+        self.ttl = ttl
+        self.max_clients = max_clients
+        self.per_client = per_client
+        self.max_bytes = max_bytes
+        self.clock = clock
+
+        self._clients = OrderedDict()   # client_key -> list[(hash, value, expires_at, nbytes)]
+        self._lock = threading.Lock()
+        self.nbytes = 0
+        self.entries = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+
+    def get(self, client_key, frame_hash):
+        """Kết quả đã lưu gần frame_hash nhất (trong max_distance bit), hoặc None"""
+        now = self.clock()
+        with self._lock:
+            entries = self._clients.get(client_key)
+            best, best_distance = None, self.max_distance + 1
+            if entries:
+                live = [entry for entry in entries if entry[2] > now]
+                if len(live) != len(entries):
+                    self.expired += len(entries) - len(live)
+                    self._drop(entries, live)
+                    if live:
+                        self._clients[client_key] = live
+                    else:
+                        del self._clients[client_key]
+                for entry_hash, value, _, _ in live:
+                    distance = hamming(entry_hash, frame_hash)
+                    if distance < best_distance:
+                        best, best_distance = value, distance
+            if best is None:
+                self.misses += 1
+                return None
+            self._clients.move_to_end(client_key)
+            self.hits += 1
+            return best
+
+    def put(self, client_key, frame_hash, value):
+        nbytes = value_nbytes(value)
+        if nbytes > self.max_bytes:
+            return
+        with self._lock:
+            entries = self._clients.pop(client_key, [])
+            entries.append((frame_hash, value, self.clock() + self.ttl, nbytes))
+            self.nbytes += nbytes
+            self.entries += 1
+            if len(entries) > self.per_client:
+                self._drop(entries, entries[-self.per_client:])
+                self.evictions += len(entries) - self.per_client
+                entries = entries[-self.per_client:]
+            self._clients[client_key] = entries
+
+            while self._clients and (len(self._clients) > self.max_clients or self.nbytes > self.max_bytes):
+                _, evicted = self._clients.popitem(last=False)
+                self._drop(evicted, [])
+                self.evictions += len(evicted)
+
+    def _drop(self, entries, kept):
+        """Trừ bytes của các entry trong entries không còn nằm trong kept (giữ lock)"""
+        removed = len(entries) - len(kept)
+        self.nbytes -= sum(entry[3] for entry in entries) - sum(entry[3] for entry in kept)
+        self.entries -= removed
+
+    def clear(self):
+        with self._lock:
+            self._clients.clear()
+            self.nbytes = 0
+            self.entries = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'clients': len(self._clients),
+            'entries': self.entries,
+            'bytes': self.nbytes,
+            'max_bytes': self.max_bytes,
+            'max_distance': self.max_distance,
+            'ttl_s': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'expired': self.expired,
+            'evictions': self.evictions,
+        }
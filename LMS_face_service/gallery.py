@@ -0,0 +1,570 @@
+"""
+Face gallery stored as one contiguous float32 matrix
+=====================================================
+Thay cho dict {user_id: embedding}: embeddings nằm trong một ma trận (N, D)
+liên tục + mảng id, nên việc so khớp là một phép nhân ma trận-vector (BLAS)
+thay vì vòng lặp Python qua từng người.
+
+Multi-prototype: mỗi người có thể có K prototype (K hàng liên tiếp trong ma
+trận, vd. các tâm k-means của ảnh đăng ký). Khoảng cách tới một người = min
+khoảng cách tới các prototype của người đó. Một embedding/người (layout cũ)
+là trường hợp K = 1.
+
+FaceGallery vẫn hành xử như một dict (get/set/del/keys/items) để các endpoint
+cũ không phải đổi: gallery[user_id] là vector (D,) nếu K = 1, (K, D) nếu K > 1.
+
+Tùy chọn `projection` (PCAProjection) + `dtype` float16: embeddings và query
+được chiếu xuống d chiều khi vào gallery, ma trận lưu ở float16 và được
+upcast sang float32 theo từng khối UPCAST_CHUNK hàng khi tính khoảng cách.
+Khi đó gallery[user_id] trả về vector đã chiếu.
+
+Snapshot copy-on-write (with_embedding / without) không copy ma trận: buffer
+dùng chung chỉ được append. Đăng ký lại thì block mới append ở cuối, block cũ
+và block bị xóa thành "lỗ" (ids None, sq_norms +inf nên khoảng cách = inf)
+trong sq_norms / ids riêng của snapshot mới, 12 byte/hàng thay vì cả hàng
+D chiều. Lỗ vượt COMPACT_HOLE_RATIO thì GalleryRegistry compact() trong
+thread nền.
+"""
+from collections.abc import MutableMapping
+
+import numpy as np
+
+from ann_index import kmeans
+
+EMBEDDING_DIM = 2048
+
+# Số ứng viên lấy ra từ GEMV trước khi tính lại khoảng cách chính xác
+RERANK_CANDIDATES = 8
+
+# Số hàng float16 upcast mỗi lần (vừa cache, không tạo bản sao float32 của cả ma trận)
+UPCAST_CHUNK = 1024
+
+# Sai số tương đối của ||q||² + ||x||² - 2·x·q (float32) so với khoảng cách chính
+# xác; assign() lấy ứng viên trong ngưỡng nới rộng chừng này rồi tính lại exact
+GEMM_TOLERANCE = 1e-4
+
+# Tỉ lệ hàng lỗ (so với số hàng) để snapshot cần compact
+COMPACT_HOLE_RATIO = 0.25
+
+
+def exact_distance(embedding1, embedding2):
+    """Khoảng cách Euclidean, giống hệt euclidean_distance() của API"""
+    return float(np.linalg.norm(embedding1 - embedding2))
+
+
+def select_prototypes(embeddings, k, n_iter=10, seed=0):
+    """
+    Tối đa k prototype (chuẩn hóa L2) từ các embedding đăng ký của một người:
+    tâm k-means nếu có nhiều hơn k ảnh, ngược lại mỗi ảnh là một prototype.
+    Returns: (k', D) float32
+    """
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    embeddings = embeddings.reshape(-1, embeddings.shape[-1])
+    if k <= 1:
+        centers = embeddings.mean(axis=0, keepdims=True)
+    elif embeddings.shape[0] <= k:
+        centers = embeddings
+    else:
+        centers = kmeans(embeddings, k, n_iter=n_iter, seed=seed)
+    return (centers / (np.linalg.norm(centers, axis=1, keepdims=True) + 1e-8)).astype(np.float32)
+
+
+class FaceGallery(MutableMapping):
+    """Gallery embeddings dạng ma trận, truy cập như dict"""
+
+    def __init__(self, dim=EMBEDDING_DIM, capacity=64, projection=None, dtype=np.float32):
+        self.input_dim = projection.input_dim if projection is not None else dim
+        self.dim = projection.output_dim if projection is not None else dim   # số chiều lưu trong ma trận
+        self.projection = projection
+        self.dtype = np.dtype(dtype)
+        self._matrix = np.empty((capacity, self.dim), dtype=self.dtype)
+        self._sq_norms = np.empty(capacity, dtype=np.float32)
+        self._ids = np.empty(capacity, dtype=object)   # user_id sở hữu từng hàng
+        self._rows = {}          # user_id -> hàng đầu tiên (thứ tự dict = thứ tự hàng)
+        self._counts = {}        # user_id -> số prototype (hàng liên tiếp)
+        self._size = 0           # số hàng đang dùng (kể cả lỗ)
+        self._holes = 0          # số hàng lỗ trong [:size] (snapshot, chờ compact)
+        self._tail = [0]         # số hàng đã dùng của buffer, chia sẻ giữa các snapshot
+        self._layout_cache = None
+        self.version = 0
+        self.index = None
+        self.index_min_size = 0
+
+    @classmethod
+    def from_dict(cls, database, dim=None, projection=None, dtype=np.float32):
+        """Build gallery từ dict {user_id: embedding (D,) | prototypes (K, D)} (giữ thứ tự insert)"""
+        if dim is None:
+            first = next(iter(database.values()), None)
+            dim = EMBEDDING_DIM if first is None else int(np.asarray(first).shape[-1])
+        rows = sum(np.asarray(value).size // dim for value in database.values())
+        gallery = cls(dim=dim, capacity=max(64, rows), projection=projection, dtype=dtype)
+        for user_id, embedding in database.items():
+            gallery[user_id] = embedding
+        return gallery
+
+    @classmethod
+    def from_arrays(cls, matrix, ids, projection=None, dtype=np.float32):
+        """
+        Gallery dùng thẳng `matrix` (vd. memmap của EmbeddingStore) làm bộ nhớ,
+        không copy. ids: user_id của từng hàng (các hàng của một người phải
+        liên tiếp). matrix có thể dài hơn ids (phần dư là capacity trống).
+        Có projection / dtype khác float32 thì matrix được chiếu theo khối
+        sang một ma trận mới (memmap gốc chỉ bị đọc một lần).
+        """
+        n = len(ids)
+        if projection is not None or np.dtype(dtype) != np.float32:
+            encoded = cls(dim=matrix.shape[1], capacity=0, projection=projection, dtype=dtype)
+            stored = np.empty((n, encoded.dim), dtype=encoded.dtype)
+            for i in range(0, n, UPCAST_CHUNK):
+                stored[i:i + UPCAST_CHUNK] = encoded._encode(matrix[i:i + UPCAST_CHUNK])
+            matrix = stored
+        else:
+            encoded = None
+            matrix = np.asarray(matrix) if not isinstance(matrix, np.memmap) else matrix
+            if matrix.dtype != np.float32 or not matrix.flags.c_contiguous:
+                matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+
+        rows, counts = {}, {}
+        for row, user_id in enumerate(ids):
+            start = rows.get(user_id)
+            if start is None:
+                rows[user_id] = row
+                counts[user_id] = 1
+            elif start + counts[user_id] == row:
+                counts[user_id] += 1
+            else:
+                raise ValueError(f"Rows of {user_id} are not contiguous")
+
+        gallery = encoded if encoded is not None else cls(dim=matrix.shape[1], capacity=0)
+        gallery._matrix = matrix
+        gallery._sq_norms = np.empty(matrix.shape[0], dtype=np.float32)
+        for i in range(0, n, UPCAST_CHUNK):
+            chunk = np.asarray(matrix[i:min(i + UPCAST_CHUNK, n)], dtype=np.float32)
+            gallery._sq_norms[i:i + chunk.shape[0]] = np.einsum('ij,ij->i', chunk, chunk)
+        gallery._ids = np.empty(matrix.shape[0], dtype=object)
+        gallery._ids[:n] = ids
+        gallery._rows = rows
+        gallery._counts = counts
+        gallery._size = n
+        gallery._tail = [n]
+        return gallery
+
+    def to_dict(self):
+        """Xuất lại dict {user_id: embedding | prototypes} để pickle"""
+        return {user_id: np.array(self[user_id]) for user_id in self._rows}
+
+    # ----- Views -----
+    @property
+    def matrix(self):
+        """View (R, d) của các hàng (prototype) đang dùng, dtype = self.dtype"""
+        return self._matrix[:self._size]
+
+    @property
+    def ids(self):
+        """View (R,) user_id của từng hàng, cùng thứ tự với matrix (None ở hàng lỗ)"""
+        return self._ids[:self._size]
+
+    @property
+    def sq_norms(self):
+        return self._sq_norms[:self._size]
+
+    @property
+    def n_rows(self):
+        return self._size
+
+    @property
+    def holes(self):
+        return self._holes
+
+    def needs_compaction(self):
+        return self._holes > COMPACT_HOLE_RATIO * self._size
+
+    @property
+    def nbytes(self):
+        """Bộ nhớ của các hàng đang dùng (ma trận + sq_norms)"""
+        return self._size * (self.dim * self.dtype.itemsize + 4)
+
+    def storage_stats(self):
+        return {
+            'rows': self._size,
+            'holes': self._holes,
+            'dim': self.dim,
+            'dtype': self.dtype.name,
+            'bytes': self.nbytes,
+            'projection': self.projection.stats() if self.projection is not None else None,
+        }
+
+    def row_of(self, user_id):
+        """Hàng đầu tiên của user_id"""
+        return self._rows[user_id]
+
+    def prototype_count(self, user_id):
+        return self._counts[user_id]
+
+    def _layout(self):
+        """(starts, counts) của từng người theo thứ tự hàng, cache theo version"""
+        cache = self._layout_cache
+        if cache is None or cache[0] != self.version:
+            n = len(self._rows)
+            starts = np.fromiter(self._rows.values(), dtype=np.int64, count=n)
+            counts = np.fromiter(self._counts.values(), dtype=np.int64, count=n)
+            cache = self._layout_cache = (self.version, starts, counts)
+        return cache[1], cache[2]
+
+    @property
+    def max_prototypes(self):
+        if len(self._rows) == self._size:
+            return 1
+        return int(self._layout()[1].max())
+
+    def subset(self, user_ids):
+        """
+        Gallery con (bản sao liên tục) chỉ gồm các user_id có trong gallery,
+        giữ nguyên thứ tự hàng gốc. Không kèm ANN index (roster nhỏ).
+        """
+        starts = np.array(sorted(self._rows[u] for u in user_ids if u in self._rows), dtype=np.int64)
+        owners = self._ids[starts].tolist()
+        counts = np.array([self._counts[u] for u in owners], dtype=np.int64)
+        before = np.cumsum(counts) - counts
+        n = int(counts.sum())
+        rows = np.repeat(starts - before, counts) + np.arange(n)
+
+        sub = FaceGallery(dim=self.input_dim, capacity=max(1, n), projection=self.projection, dtype=self.dtype)
+        sub._matrix[:n] = self._matrix[rows]
+        sub._sq_norms[:n] = self._sq_norms[rows]
+        sub._ids[:n] = self._ids[rows]
+        sub._rows = dict(zip(owners, before.tolist()))
+        sub._counts = dict(zip(owners, counts.tolist()))
+        sub._size = n
+        sub._tail = [n]
+        sub.version = self.version
+        return sub
+
+    # ----- ANN index -----
+    def configure_index(self, index, min_size=20000):
+        """
+        Gắn một ANN index (vd. IVFIndex). Index chỉ được train khi gallery có
+        ít nhất `min_size` hàng; nhỏ hơn thì quét toàn bộ vẫn nhanh hơn.
+        """
+        self.index = index
+        self.index_min_size = min_size
+        self.refresh_index()
+
+    def refresh_index(self, force=False):
+        """Train (lại) index khi đủ lớn hoặc gallery đã gấp đôi so với lúc train"""
+        if self.index is None or self._size < max(1, self.index_min_size):
+            return False
+        if force or not self.index.is_trained or self._size > 2 * self.index.trained_size:
+            self.index.train(self.matrix)
+            return True
+        return False
+
+    @property
+    def index_active(self):
+        return self.index is not None and self.index.is_trained and self._size >= self.index_min_size
+
+    # ----- MutableMapping -----
+    def __len__(self):
+        return len(self._rows)
+
+    def __iter__(self):
+        return iter(list(self._rows))
+
+    def __contains__(self, user_id):
+        return user_id in self._rows
+
+    def __getitem__(self, user_id):
+        start = self._rows[user_id]
+        count = self._counts[user_id]
+        return self._matrix[start] if count == 1 else self._matrix[start:start + count]
+
+    def _project(self, vectors):
+        """(.., input_dim) -> (N, dim) float32 (chiếu nếu có projection)"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.shape[-1] != self.input_dim:
+            raise ValueError(f"Embedding dim {vectors.shape[-1]} != gallery dim {self.input_dim}")
+        vectors = vectors.reshape(-1, self.input_dim)
+        if self.projection is not None:
+            vectors = self.projection.transform(vectors)
+        return vectors
+
+    def _encode(self, vectors):
+        """Như _project nhưng làm tròn về dtype lưu (sq_norms khớp với hàng đã lưu)"""
+        vectors = self._project(vectors)
+        if self.dtype != np.float32:
+            vectors = vectors.astype(self.dtype).astype(np.float32)
+        return vectors
+
+    def _dot(self, queries):
+        """(R, Q) = matrix @ queries.T, upcast float16 theo khối"""
+        matrix = self.matrix
+        if self.dtype == np.float32:
+            return matrix @ queries.T
+        out = np.empty((matrix.shape[0], queries.shape[0]), dtype=np.float32)
+        buffer = np.empty((min(UPCAST_CHUNK, matrix.shape[0]), self.dim), dtype=np.float32)
+        for i in range(0, matrix.shape[0], UPCAST_CHUNK):
+            chunk = buffer[:min(UPCAST_CHUNK, matrix.shape[0] - i)]
+            chunk[...] = matrix[i:i + chunk.shape[0]]
+            np.matmul(chunk, queries.T, out=out[i:i + chunk.shape[0]])
+        return out
+
+    def __setitem__(self, user_id, embedding):
+        vectors = self._encode(embedding)
+        count = vectors.shape[0]
+        if count == 0:
+            raise ValueError(f"No embedding for {user_id}")
+
+        start = self._rows.get(user_id)
+        if start is not None and self._counts[user_id] != count:
+            # Số prototype thay đổi: bỏ block cũ, append block mới ở cuối
+            del self[user_id]
+            start = None
+
+        is_new = start is None
+        if is_new:
+            self._grow(self._size + count)
+            start = self._size
+            self._ids[start:start + count] = [user_id] * count
+            self._rows[user_id] = start
+            self._counts[user_id] = count
+            self._size += count
+            self._tail[0] = self._size
+
+        self._matrix[start:start + count] = vectors
+        self._sq_norms[start:start + count] = np.einsum('ij,ij->i', vectors, vectors)
+        self.version += 1
+
+        if self.index is not None and self.index.is_trained:
+            for i in range(count):
+                if is_new:
+                    self.index.add(start + i, vectors[i])
+                else:
+                    self.index.update(start + i, vectors[i])
+        self.refresh_index()
+
+    def __delitem__(self, user_id):
+        start = self._rows.pop(user_id)
+        count = self._counts.pop(user_id)
+        size = self._size
+        last = size - count
+        # Dời các hàng phía sau lên để giữ thứ tự insert (giống dict)
+        if start < last:
+            self._matrix[start:last] = self._matrix[start + count:size]
+            self._sq_norms[start:last] = self._sq_norms[start + count:size]
+            self._ids[start:last] = self._ids[start + count:size]
+            for row in range(start, last):
+                owner = self._ids[row]
+                if owner is not None and self._rows[owner] == row + count:
+                    self._rows[owner] = row
+        self._ids[last:size] = None
+        if self.index is not None and self.index.is_trained:
+            for i in range(count):
+                self.index.remove(start, size - i)
+        self._size = last
+        self.version += 1
+
+    def _grow(self, needed):
+        capacity = self._matrix.shape[0]
+        if needed <= capacity:
+            return
+        new_capacity = max(needed, capacity * 2, 64)
+        matrix = np.empty((new_capacity, self.dim), dtype=self.dtype)
+        sq_norms = np.empty(new_capacity, dtype=np.float32)
+        ids = np.empty(new_capacity, dtype=object)
+        matrix[:self._size] = self._matrix[:self._size]
+        sq_norms[:self._size] = self._sq_norms[:self._size]
+        ids[:self._size] = self._ids[:self._size]
+        self._matrix, self._sq_norms, self._ids = matrix, sq_norms, ids
+        self._tail = [self._size]
+
+    # ----- Copy-on-write snapshots -----
+    def with_embedding(self, user_id, embedding):
+        """
+        Snapshot mới có thêm/cập nhật user_id; self không bị sửa.
+        Block mới được append vào phần trống của buffer dùng chung (các snapshot
+        cũ chỉ đọc [:size] nên không thấy); cập nhật thì block cũ thành lỗ
+        trong snapshot mới (user_id chuyển xuống cuối thứ tự). Chỉ khi một
+        snapshot khác đã append sau self mới copy buffer (compacted()).
+        """
+        if self._tail[0] != self._size:
+            clone = self.compacted()
+        else:
+            clone = self._derive(private_rows=user_id in self._rows)
+            if user_id in clone._rows:
+                clone._tombstone(user_id)
+        clone[user_id] = embedding
+        return clone
+
+    def without(self, user_id):
+        """Snapshot mới không có user_id: các hàng của nó thành lỗ, ma trận không bị copy / dời"""
+        if user_id not in self._rows:
+            raise KeyError(user_id)
+        clone = self._derive(private_rows=True)
+        clone._tombstone(user_id)
+        return clone
+
+    def _derive(self, private_rows):
+        """
+        Gallery mới cùng nội dung, dùng chung ma trận; private_rows=True thì
+        sq_norms / ids riêng để đánh dấu lỗ (O(R) nhỏ, không copy ma trận)
+        """
+        clone = FaceGallery(dim=self.input_dim, capacity=0, projection=self.projection, dtype=self.dtype)
+        clone._matrix = self._matrix
+        clone._sq_norms = self._sq_norms.copy() if private_rows else self._sq_norms
+        clone._ids = self._ids.copy() if private_rows else self._ids
+        clone._tail = self._tail
+        clone._rows = dict(self._rows)
+        clone._counts = dict(self._counts)
+        clone._size = self._size
+        clone._holes = self._holes
+        clone.version = self.version
+        clone.index = self.index.fork() if self.index is not None else None
+        clone.index_min_size = self.index_min_size
+        return clone
+
+    def _tombstone(self, user_id):
+        """Bỏ block của user_id (chỉ gọi trên snapshot có sq_norms / ids riêng)"""
+        start = self._rows.pop(user_id)
+        count = self._counts.pop(user_id)
+        self._sq_norms[start:start + count] = np.inf
+        self._ids[start:start + count] = None
+        self._holes += count
+        self.version += 1
+
+    def compacted(self):
+        """
+        Bản sao liên tục, buffer riêng, không còn lỗ (cùng nội dung và
+        version); ANN index được đánh số lại, không train lại
+        """
+        starts, counts = self._layout()
+        n = int(counts.sum())
+        before = np.cumsum(counts) - counts
+        rows = np.repeat(starts - before, counts) + np.arange(n)
+        capacity = max(64, self._matrix.shape[0])
+
+        clone = FaceGallery(dim=self.input_dim, capacity=capacity, projection=self.projection, dtype=self.dtype)
+        if self._holes == 0:
+            clone._matrix[:n] = self._matrix[:n]
+            clone._sq_norms[:n] = self._sq_norms[:n]
+            clone._ids[:n] = self._ids[:n]
+        else:
+            np.take(self._matrix, rows, axis=0, out=clone._matrix[:n])
+            clone._sq_norms[:n] = self._sq_norms[rows]
+            clone._ids[:n] = self._ids[rows]
+        clone._rows = dict(zip(self._rows, before.tolist()))
+        clone._counts = dict(self._counts)
+        clone._size = n
+        clone._tail = [n]
+        clone.version = self.version
+        if self.index is not None:
+            new_rows = np.full(self._size, -1, dtype=np.int64)
+            new_rows[rows] = np.arange(n)
+            clone.index = self.index.reindex(new_rows) if self.index.is_trained else self.index.fork()
+        clone.index_min_size = self.index_min_size
+        return clone
+
+    # ----- Search -----
+    def search(self, query, k=1, nprobe=None, exact=False):
+        """
+        Top-k người gần nhất (khoảng cách = min qua các prototype).
+        Returns: list[(user_id, distance)] tăng dần theo distance
+
+        Xếp hạng bằng một GEMV (||x||² - 2·x·q), sau đó tính lại khoảng cách
+        chính xác cho vài ứng viên đầu để kết quả trùng với vòng lặp cũ.
+        Nếu có ANN index đang hoạt động (và exact=False) thì chỉ quét các cụm
+        gần nhất; `nprobe` ghi đè giá trị mặc định của index.
+        """
+        n = self._size
+        if not self._rows:
+            return []
+
+        query = self._project(query)[0]
+        # k người gần nhất nằm trong k·K hàng gần nhất
+        n_candidates = min(n, max(k * self.max_prototypes, RERANK_CANDIDATES))
+
+        candidates = None
+        if not exact and self.index_active:
+            candidates = self.index.candidates(query, self.matrix, self.sq_norms, n_candidates, nprobe)
+        if candidates is None or candidates.size == 0:
+            candidates = self._exact_candidates(query, n_candidates)
+
+        # Min theo người, sort theo (distance, row) để tie-break giống min() trên dict
+        matrix = self.matrix
+        best = {}
+        for row in candidates:
+            row = int(row)
+            owner = self._ids[row]
+            if owner is None:
+                continue   # lỗ
+            entry = (exact_distance(query, matrix[row]), row)
+            if owner not in best or entry < best[owner]:
+                best[owner] = entry
+        ranked = sorted(best.items(), key=lambda item: item[1])
+        return [(owner, distance) for owner, (distance, _) in ranked[:k]]
+
+    def _exact_candidates(self, query, n_candidates):
+        """n_candidates hàng gần nhất theo một GEMV trên toàn bộ gallery"""
+        n = self._size
+        if n_candidates >= n:
+            return np.arange(n)
+        scores = self.sq_norms - 2.0 * self._dot(query[None, :])[:, 0]
+        return np.argpartition(scores, n_candidates - 1)[:n_candidates]
+
+    def nearest(self, query, nprobe=None, exact=False):
+        """(user_id, distance) gần nhất, hoặc None nếu gallery rỗng"""
+        result = self.search(query, k=1, nprobe=nprobe, exact=exact)
+        return result[0] if result else None
+
+    def distance_matrix(self, queries):
+        """
+        (Q, M) khoảng cách Euclidean giữa queries và M người trong gallery
+        (một GEMM; nhiều prototype thì lấy min theo người bằng reduceat)
+        """
+        return self._distances(self._project(queries))
+
+    def _distances(self, queries):
+        """distance_matrix cho queries đã chiếu (Q, dim)"""
+        q_sq = np.einsum('ij,ij->i', queries, queries)
+        sq = q_sq[:, None] + self.sq_norms[None, :] - 2.0 * self._dot(queries).T
+        distances = np.sqrt(np.maximum(sq, 0.0))
+        if len(self._rows) == self._size or distances.shape[1] == 0:
+            return distances
+        starts, _ = self._layout()
+        return np.minimum.reduceat(distances, starts, axis=1)
+
+    def assign(self, queries, threshold):
+        """
+        Ghép một-một query -> user_id (vd. nhiều khuôn mặt trong một ảnh lớp):
+        greedy theo khoảng cách tăng dần, mỗi user_id chỉ gán cho một query.
+        Returns: list[(user_id, distance) | None], cùng thứ tự với queries
+        """
+        queries = self._project(queries)
+        assignments = [None] * queries.shape[0]
+        if self._size == 0 or queries.shape[0] == 0:
+            return assignments
+
+        # Ngưỡng áp dụng cho khoảng cách chính xác (như nearest()): lọc rộng hơn
+        # một chút trên GEMM để không bỏ sót cặp sát ngưỡng, rồi kiểm tra lại
+        distances = self._distances(queries)
+        q_sq = np.einsum('ij,ij->i', queries, queries)
+        max_sq = float(np.max(self.sq_norms, where=np.isfinite(self.sq_norms), initial=0.0))
+        widened = np.sqrt(threshold ** 2 + GEMM_TOLERANCE * (q_sq + max_sq))
+        query_idx, col_idx = np.nonzero(distances <= widened[:, None])
+
+        starts, counts = self._layout()
+        matrix = self.matrix
+        candidates = []
+        for q, col in zip(query_idx.tolist(), col_idx.tolist()):
+            start, count = int(starts[col]), int(counts[col])
+            distance = min(exact_distance(queries[q], matrix[row]) for row in range(start, start + count))
+            if distance <= threshold:
+                candidates.append((distance, q, col))
+        candidates.sort()
+
+        used = set()
+        for distance, q, col in candidates:
+            if assignments[q] is not None or col in used:
+                continue
+            used.add(col)
+            assignments[q] = (self._ids[int(starts[col])], distance)
+        return assignments
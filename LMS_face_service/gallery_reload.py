@@ -0,0 +1,258 @@
+"""
+Hot reload gallery (không restart face service)
+================================================
+Gallery rebuild offline (bulk_enroll.py --store-dir, file face vector export
+của Django) được nạp trong lúc service đang chạy. Không nhận pickle: unpickle
+file do request chỉ định là chạy code tùy ý; face_database.pkl cũ chỉ được
+migrate lúc khởi động (load_face_database).
+
+1. load: đọc nguồn thành (matrix (R, dim), ids theo hàng), ngoài mọi lock
+2. validate: số chiều, giá trị hữu hạn / khác 0, hàng của mỗi người liên
+   tiếp, số người (expected_count, không giảm quá max_shrink trừ khi force)
+3. apply: ghi vào face_store + build FaceGallery + swap atomic
+   (GalleryRegistry.reload)
+
+Request đang chạy giữ snapshot cũ tới hết request; request sau đó thấy
+gallery mới. Mỗi lúc chỉ một lần reload (lần thứ hai -> GalleryReloadBusy).
+
+watch(): thread poll (mtime, size) của file / các file trong thư mục mỗi
+interval giây; thấy đổi và giữ nguyên qua một lần poll nữa (đã ghi xong) thì
+reload. Không cần watchdog / inotify.
+"""
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+import face_vectors
+from embedding_store import EmbeddingStore
+
+# Số hàng mỗi lần kiểm tra giá trị (không đọc cả memmap vào RAM một lúc)
+VALIDATE_CHUNK = 8192
+
+
+class GalleryValidationError(ValueError):
+    """Gallery mới không hợp lệ; gallery đang dùng giữ nguyên"""
+
+
+class GalleryReloadBusy(RuntimeError):
+    """Đang có một lần reload khác"""
+
+
+def read_gallery_source(path):
+    """(matrix, ids theo hàng) từ thư mục EmbeddingStore hoặc file face vector stream (FVEC)"""
+    path = Path(path)
+    if path.is_dir():
+        store = EmbeddingStore(path)
+        if not store.exists():
+            raise FileNotFoundError(f"No embedding store in {path}")
+        return store.open().load_arrays()
+    if not path.exists():
+        raise FileNotFoundError(f"Gallery file {path} not found")
+
+    with open(path, 'rb') as f:
+        if f.read(len(face_vectors.MAGIC)) != face_vectors.MAGIC:
+            raise GalleryValidationError(f"{path.name} is not a face vector file or embedding store")
+        f.seek(0)
+        return face_vectors.load_arrays(f)
+
+
+def validate_gallery_arrays(matrix, ids, dim, previous_size=0, expected_count=None, max_shrink=0.5, force=False):
+    """
+    Raise GalleryValidationError nếu (matrix, ids) không dùng được.
+    force chỉ bỏ qua kiểm tra số người giảm mạnh, không bỏ qua lỗi dữ liệu.
+    Returns: số người
+    """
+    if matrix.ndim != 2 or (len(ids) and matrix.shape[1] != dim):
+        raise GalleryValidationError(f"Embedding dimension {matrix.shape[1:]} does not match the service ({dim})")
+    if matrix.shape[0] < len(ids):
+        raise GalleryValidationError(f"{len(ids)} ids but only {matrix.shape[0]} embedding rows")
+
+    people, previous_id = set(), None
+    for user_id in ids:
+        if user_id != previous_id:
+            if not user_id:
+                raise GalleryValidationError("Empty user_id")
+            if user_id in people:
+                raise GalleryValidationError(f"Rows of {user_id} are not contiguous")
+            people.add(user_id)
+            previous_id = user_id
+
+    for start in range(0, len(ids), VALIDATE_CHUNK):
+        chunk = np.asarray(matrix[start:min(start + VALIDATE_CHUNK, len(ids))], dtype=np.float32)
+        bad = np.flatnonzero(~np.isfinite(chunk).all(axis=1))
+        if len(bad):
+            raise GalleryValidationError(f"Non-finite embedding values for {ids[start + bad[0]]}")
+        zero = np.flatnonzero(np.einsum('ij,ij->i', chunk, chunk) < 1e-12)
+        if len(zero):
+            raise GalleryValidationError(f"Zero embedding for {ids[start + zero[0]]}")
+
+    if expected_count is not None and len(people) != expected_count:
+        raise GalleryValidationError(f"Expected {expected_count} people, source has {len(people)}")
+    if not people and not force:
+        raise GalleryValidationError("Source gallery is empty (force=true to load anyway)")
+    if not force and previous_size and len(people) < previous_size * (1 - max_shrink):
+        raise GalleryValidationError(
+            f"Source has {len(people)} people, current gallery {previous_size} "
+            f"(shrinks more than {max_shrink:.0%}; force=true to load anyway)")
+    return len(people)
+
+
+def path_signature(path):
+    """(tên, mtime_ns, size) của file, hoặc của từng file trong thư mục; None nếu chưa có"""
+    path = Path(path)
+    try:
+        files = sorted(p for p in path.iterdir() if p.is_file()) if path.is_dir() else [path]
+        signature = []
+        for p in files:
+            st = p.stat()
+            signature.append((p.name, st.st_mtime_ns, st.st_size))
+        return tuple(signature)
+    except OSError:
+        return None
+
+
+class GalleryReloader:
+    def __init__(self, load, validate, apply):
+        """
+        load(source) -> (matrix, ids)
+        validate(matrix, ids, **options) -> số người, raise GalleryValidationError
+        apply(matrix, ids) -> (snapshot cũ, snapshot mới)
+        """
+        self.load = load
+        self.validate = validate
+        self.apply = apply
+
+        self._busy = threading.Lock()
+        self._watch_stop = threading.Event()
+        self._watch_thread = None
+        self.watch_path = None
+        self.watch_interval = None
+
+        self.reloads = 0
+        self.rejected = 0
+        self.failed = 0
+        self.last_result = None
+        self.last_error = None
+
+    @property
+    def in_progress(self):
+        return self._busy.locked()
+
+    def reload(self, source, **options):
+        """Load + validate + swap, chạy trên thread gọi. Returns dict báo cáo"""
+        if not self._busy.acquire(blocking=False):
+            raise GalleryReloadBusy("A gallery reload is already in progress")
+        try:
+            return self._reload(source, options)
+        finally:
+            self._busy.release()
+
+    def start(self, source, **options):
+        """reload() trong thread nền; False nếu đang có lần reload khác (kết quả ở stats())"""
+        if not self._busy.acquire(blocking=False):
+            return False
+
+        def run():
+            try:
+                self._reload(source, options)
+            except Exception:
+                pass   # đã ghi vào last_error
+            finally:
+                self._busy.release()
+
+        threading.Thread(target=run, name='gallery-reload', daemon=True).start()
+        return True
+
+    def _reload(self, source, options):
+        started_at = time.time()
+        t_start = time.perf_counter()
+        try:
+            matrix, ids = self.load(source)
+            t_loaded = time.perf_counter()
+            matrix = matrix[:len(ids)]
+            self.validate(matrix, ids, **options)
+            t_validated = time.perf_counter()
+            previous, gallery = self.apply(matrix, ids)
+        except Exception as e:
+            if isinstance(e, GalleryValidationError):
+                self.rejected += 1
+            else:
+                self.failed += 1
+            self.last_error = {'source': str(source), 'error': str(e), 'at': started_at}
+            print(f"[WARNING] Gallery reload from {source} failed: {e}")
+            raise
+        t_done = time.perf_counter()
+
+        result = {
+            'source': str(source),
+            'previous_version': previous.version,
+            'version': gallery.version,
+            'previous_size': len(previous),
+            'size': len(gallery),
+            'rows': gallery.n_rows,
+            'load_ms': round((t_loaded - t_start) * 1000, 1),
+            'validate_ms': round((t_validated - t_loaded) * 1000, 1),
+            'swap_ms': round((t_done - t_validated) * 1000, 1),
+            'total_ms': round((t_done - t_start) * 1000, 1),
+            'at': started_at,
+        }
+        self.reloads += 1
+        self.last_result = result
+        self.last_error = None
+        print(f"[INFO] Gallery reloaded from {source}: v{result['previous_version']} -> v{result['version']}, "
+              f"{result['previous_size']} -> {result['size']} people in {result['total_ms']:.0f} ms")
+        return result
+
+    # ----- File watch -----
+    def watch(self, path, interval=10.0, **options):
+        """Reload mỗi khi path đổi (poll mỗi interval giây); trạng thái lúc bắt đầu không reload"""
+        self.stop_watch()
+        self.watch_path = str(path)
+        self.watch_interval = interval
+        self._watch_stop = threading.Event()
+        self._watch_thread = threading.Thread(
+            target=self._watch, args=(Path(path), interval, options, self._watch_stop),
+            name='gallery-watch', daemon=True)
+        self._watch_thread.start()
+        return self
+
+    def stop_watch(self):
+        if self._watch_thread is not None:
+            self._watch_stop.set()
+            self._watch_thread.join()
+            self._watch_thread = None
+            self.watch_path = None
+
+    def _watch(self, path, interval, options, stop):
+        seen = path_signature(path)
+        pending = None
+        while not stop.wait(interval):
+            signature = path_signature(path)
+            if signature is None or signature == seen:
+                pending = None
+                continue
+            if signature != pending:
+                # Vừa đổi: chờ thêm một lần poll để chắc file đã ghi xong
+                pending = signature
+                continue
+            try:
+                self.reload(path, **options)
+            except GalleryReloadBusy:
+                continue   # lần poll sau thử lại
+            except Exception:
+                pass       # đã ghi log; chỉ thử lại khi file đổi tiếp
+            seen, pending = signature, None
+
+    def stats(self):
+        return {
+            'in_progress': self.in_progress,
+            'reloads': self.reloads,
+            'rejected': self.rejected,
+            'failed': self.failed,
+            'last': self.last_result,
+            'last_error': self.last_error,
+            'watch_path': self.watch_path,
+            'watch_interval_s': self.watch_interval,
+        }
@@ -0,0 +1,213 @@
+"""
+Pluggable inference backends
+=============================
+INFERENCE_BACKEND=keras (mặc định): YOLO .pt qua ultralytics + Keras ResNet50
+INFERENCE_BACKEND=onnx:  export cả hai model sang ONNX một lần (cache trong
+                         ONNX_MODEL_DIR) rồi chạy bằng ONNX Runtime trên CPU,
+                         tùy chọn int8 dynamic quantization.
+
+Detector luôn là một đối tượng ultralytics YOLO (ultralytics tự chạy file
+.onnx bằng ONNX Runtime), nên code đọc result.boxes không phải đổi.
+Embedder có chung interface: embed(face_batch, batch_size) -> (N, 2048).
+
+Fast start: Keras model được lưu thành file .keras ở lần khởi động đầu và
+load lại từ đĩa ở các lần sau (không build graph, không tải ImageNet weights);
+tensorflow / ultralytics / onnxruntime chỉ được import khi thực sự cần.
+
+Cần thêm (chỉ khi dùng backend onnx): onnx, onnxruntime, tf2onnx
+"""
+import shutil
+from pathlib import Path
+
+import numpy as np
+
+BACKENDS = ('keras', 'onnx')
+
+EMBEDDER_ONNX_NAME = "vggface_resnet50"
+EMBEDDER_INPUT_SHAPE = (224, 224, 3)
+
+
+def onnx_path(model_dir, name, int8=False):
+    return Path(model_dir) / (f"{name}.int8.onnx" if int8 else f"{name}.onnx")
+
+
+# ===========================
+# Embedders
+# ===========================
+class KerasEmbedder:
+    """Keras model.predict"""
+
+    backend = 'keras'
+
+    def __init__(self, model, source='built'):
+        self.model = model
+        self.source = source   # 'cache' | 'built'
+
+    def embed(self, face_batch, batch_size=32):
+        return self.model.predict(face_batch, batch_size=batch_size, verbose=0)
+
+
+class OnnxEmbedder:
+    """ONNX Runtime InferenceSession trên CPU"""
+
+    backend = 'onnx'
+
+    def __init__(self, path, threads=0, source='onnx'):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+
+        self.path = Path(path)
+        self.source = source   # 'onnx' | 'onnx-exported'
+        self.session = ort.InferenceSession(str(self.path), options, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def embed(self, face_batch, batch_size=32):
+        face_batch = np.ascontiguousarray(face_batch, dtype=np.float32)
+        outputs = [
+            self.session.run(None, {self.input_name: face_batch[i:i + batch_size]})[0]
+            for i in range(0, face_batch.shape[0], batch_size)
+        ]
+        return np.concatenate(outputs) if outputs else np.empty((0, 2048), dtype=np.float32)
+
+
+# ===========================
+# Export / quantization
+# ===========================
+def export_keras_to_onnx(model, path, opset=13):
+    """Keras model -> ONNX (batch động)"""
+    import tensorflow as tf
+    import tf2onnx
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    spec = (tf.TensorSpec((None, *EMBEDDER_INPUT_SHAPE), tf.float32, name='input'),)
+    tf2onnx.convert.from_keras(model, input_signature=spec, opset=opset, output_path=str(path))
+    return path
+
+
+def export_yolo_to_onnx(pt_path, path, imgsz=640):
+    """YOLO .pt -> ONNX qua ultralytics (batch động, giữ metadata names/stride)"""
+    from ultralytics import YOLO
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    exported = YOLO(str(pt_path)).export(format='onnx', dynamic=True, imgsz=imgsz)
+    shutil.move(str(exported), str(path))
+    return path
+
+
+def quantize_int8(src, dst):
+    """int8 dynamic quantization (weights int8, activations quantize lúc chạy)"""
+    import onnx
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantize_dynamic(str(src), str(dst), weight_type=QuantType.QInt8)
+
+    # Giữ metadata (ultralytics đọc names/stride/imgsz từ đây)
+    source = onnx.load(str(src), load_external_data=False)
+    quantized = onnx.load(str(dst))
+    del quantized.metadata_props[:]
+    quantized.metadata_props.extend(source.metadata_props)
+    onnx.save(quantized, str(dst))
+    return Path(dst)
+
+
+def embedding_drift(reference, candidate):
+    """
+    So embeddings (N, D) của hai backend trên cùng input.
+    Returns: dict cosine similarity mean/min và max |diff|
+    """
+    reference = np.asarray(reference, dtype=np.float32)
+    candidate = np.asarray(candidate, dtype=np.float32)
+    cosine = np.einsum('ij,ij->i', reference, candidate) / (
+        np.linalg.norm(reference, axis=1) * np.linalg.norm(candidate, axis=1) + 1e-12)
+    return {
+        'n': int(cosine.size),
+        'cosine_mean': float(cosine.mean()) if cosine.size else 1.0,
+        'cosine_min': float(cosine.min()) if cosine.size else 1.0,
+        'max_abs_diff': float(np.abs(reference - candidate).max()) if cosine.size else 0.0,
+    }
+
+
+# ===========================
+# Loaders
+# ===========================
+def load_cached_keras_model(create_keras_model, cache_path=None):
+    """
+    Keras model từ file .keras đã lưu; chưa có thì create_keras_model() rồi lưu
+    lại cho lần khởi động sau (cũng giữ cố định trọng số lớp fc_embedding).
+    Returns: (model, source) với source 'cache' | 'built'
+    """
+    if cache_path is not None and Path(cache_path).exists():
+        from tensorflow import keras
+        try:
+            return keras.models.load_model(str(cache_path), compile=False), 'cache'
+        except Exception as e:
+            print(f"[WARNING] Cannot load cached model {cache_path}: {e} - rebuilding")
+
+    model = create_keras_model()
+    if cache_path is not None:
+        Path(cache_path).parent.mkdir(parents=True, exist_ok=True)
+        model.save(str(cache_path))
+        print(f"  → Saved embedding model to {cache_path}")
+    return model, 'built'
+
+
+def load_detector(backend, pt_path, model_dir=None, int8=False, imgsz=640):
+    """ultralytics YOLO chạy .pt (keras) hoặc .onnx (onnx, export nếu chưa có)"""
+    from ultralytics import YOLO
+
+    if backend == 'keras':
+        return YOLO(str(pt_path))
+
+    name = Path(pt_path).stem
+    fp32_path = onnx_path(model_dir, name)
+    if not fp32_path.exists():
+        print(f"  → Exporting {Path(pt_path).name} to ONNX...")
+        export_yolo_to_onnx(pt_path, fp32_path, imgsz=imgsz)
+
+    path = fp32_path
+    if int8:
+        path = onnx_path(model_dir, name, int8=True)
+        if not path.exists():
+            print("  → Quantizing detector to int8...")
+            quantize_int8(fp32_path, path)
+
+    return YOLO(str(path), task='detect')
+
+
+def load_embedder(backend, create_keras_model, model_dir=None, int8=False, threads=0, keras_cache=None):
+    """
+    KerasEmbedder hoặc OnnxEmbedder. Keras model (từ keras_cache hoặc
+    create_keras_model()) chỉ được load khi cần: backend keras, hoặc file ONNX
+    chưa có và phải export. Khi vừa export, so ngay ONNX với Keras và in drift.
+    """
+    if backend == 'keras':
+        return KerasEmbedder(*load_cached_keras_model(create_keras_model, keras_cache))
+    if backend != 'onnx':
+        raise ValueError(f"Unknown inference backend: {backend} (expected one of {BACKENDS})")
+
+    fp32_path = onnx_path(model_dir, EMBEDDER_ONNX_NAME)
+    path = onnx_path(model_dir, EMBEDDER_ONNX_NAME, int8=True) if int8 else fp32_path
+
+    keras_embedder = None
+    if not fp32_path.exists():
+        keras_embedder = KerasEmbedder(*load_cached_keras_model(create_keras_model, keras_cache))
+        print("  → Exporting VGG-Face to ONNX...")
+        export_keras_to_onnx(keras_embedder.model, fp32_path)
+    if int8 and not path.exists():
+        print("  → Quantizing VGG-Face to int8...")
+        quantize_int8(fp32_path, path)
+
+    embedder = OnnxEmbedder(path, threads=threads, source='onnx' if keras_embedder is None else 'onnx-exported')
+
+    if keras_embedder is not None:
+        sample = np.random.default_rng(0).uniform(-1, 1, (8, *EMBEDDER_INPUT_SHAPE)).astype(np.float32)
+        drift = embedding_drift(keras_embedder.embed(sample), embedder.embed(sample))
+        print(f"  ✓ ONNX drift vs Keras: cosine mean {drift['cosine_mean']:.5f}, min {drift['cosine_min']:.5f}")
+
+    return embedder
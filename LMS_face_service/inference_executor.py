@@ -0,0 +1,111 @@
+"""
+Bounded inference executor
+===========================
+Thread pool riêng cho các lần gọi model (YOLO / embedding) ở chế độ ASGI:
+số worker bằng số core, hàng đợi có giới hạn. Khi hàng đợi đầy, submit()
+ném ExecutorSaturated ngay (server trả 503 + Retry-After) thay vì xếp hàng
+vô hạn và để latency tăng không kiểm soát.
+
+Đếm queue depth (đang chờ worker), in-flight (đang chạy), thời gian chờ /
+chạy để /api/health thấy được server đang nghẽn ở đâu.
+"""
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class ExecutorSaturated(Exception):
+    """Hàng đợi inference đã đầy"""
+
+
+class InferenceExecutor:
+    """ThreadPoolExecutor với hàng đợi có giới hạn + metrics"""
+
+    def __init__(self, max_workers=None, max_queue=64, name='inference'):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_queue = max_queue
+        self.name = name
+
+        self._pool = None
+        self._lock = threading.Lock()
+
+        self.queued = 0
+        self.in_flight = 0
+        self.max_queue_depth = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.wait_ms = 0.0
+        self.run_ms = 0.0
+
+    def start(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=self.name)
+        return self
+
+    def stop(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True)
+
+    @property
+    def started(self):
+        return self._pool is not None
+
+    def submit(self, fn, *args):
+        """Returns Future; ném ExecutorSaturated nếu đã có max_queue việc đang chờ"""
+        with self._lock:
+            if self._pool is None:
+                raise RuntimeError(f"{self.name} executor is not started")
+            if self.queued >= self.max_queue:
+                self.rejected += 1
+                raise ExecutorSaturated(f"{self.name} queue is full ({self.queued} waiting)")
+            self.queued += 1
+            self.submitted += 1
+            self.max_queue_depth = max(self.max_queue_depth, self.queued)
+            return self._pool.submit(self._run, time.perf_counter(), fn, args)
+
+    async def run(self, fn, *args):
+        """submit() cho coroutine: chờ kết quả mà không chặn event loop"""
+        return await asyncio.wrap_future(self.submit(fn, *args))
+
+    def _run(self, enqueued_at, fn, args):
+        started_at = time.perf_counter()
+        with self._lock:
+            self.queued -= 1
+            self.in_flight += 1
+            self.wait_ms += (started_at - enqueued_at) * 1000
+        ok = False
+        try:
+            result = fn(*args)
+            ok = True
+            return result
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+                self.run_ms += (time.perf_counter() - started_at) * 1000
+                if ok:
+                    self.completed += 1
+                else:
+                    self.failed += 1
+
+    def stats(self):
+        done = self.completed + self.failed
+        return {
+            'workers': self.max_workers,
+            'max_queue': self.max_queue,
+            'queue_depth': self.queued,
+            'in_flight': self.in_flight,
+            'max_queue_depth': self.max_queue_depth,
+            'submitted': self.submitted,
+            'completed': self.completed,
+            'failed': self.failed,
+            'rejected': self.rejected,
+            'mean_wait_ms': round(self.wait_ms / done, 2) if done else 0.0,
+            'mean_run_ms': round(self.run_ms / done, 2) if done else 0.0,
+        }
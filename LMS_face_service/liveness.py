@@ -0,0 +1,132 @@
+"""
+Vectorized liveness engine
+===========================
+Cùng 6 đặc trưng, ngưỡng và trọng số với detect_liveness_simple() cũ nhưng:
+- chỉ chuyển sang gray một lần (dùng lại cho glare)
+- DFT thật một nửa phổ (rfft2); |F(u,v)| = |F(-u,-v)| nên năng lượng cao tần
+  trên toàn phổ = tổng có trọng số trên nửa phổ. Ma trận trọng số (mask
+  r=30 quanh tâm sau fftshift, đã gộp đối xứng) được cache theo kích thước crop
+- 16 ô sáng 4x4 tính bằng một lần reshape + mean
+- Laplacian / Sobel ở float32 (giá trị nguyên, chính xác) + cv2.meanStdDev
+"""
+from functools import lru_cache
+
+import cv2
+import numpy as np
+
+HIGH_FREQ_RADIUS = 30
+GLARE_LEVEL = 230
+
+# (ngưỡng giảm dần, điểm tương ứng, điểm mặc định) - giống hệt bản cũ
+LAPLACIAN_SCORES = ((800, 100), (400, 60), (200, 30)), 0
+HIGH_FREQ_SCORES = ((4.5, 100), (3.5, 60)), 20
+UNIFORMITY_SCORES = ((100, 100), (50, 60)), 10
+TEXTURE_SCORES = ((500, 100), (250, 50)), 10
+# Hai đặc trưng "càng nhỏ càng thật": (ngưỡng tăng dần, điểm)
+COLOR_TEMP_SCORES = ((1.05, 100), (1.15, 60)), 20
+GLARE_SCORES = ((0.01, 100), (0.03, 60)), 20
+
+WEIGHTS = np.array([2.0, 1.5, 1.0, 1.5, 1.2, 1.0])
+REAL_THRESHOLD = 70
+
+
+@lru_cache(maxsize=128)
+def high_freq_weights(rows, cols, radius=HIGH_FREQ_RADIUS):
+    """
+    Trọng số (rows, cols//2 + 1) trên phổ rfft2: mỗi ô = số điểm cao tần (ngoài
+    hình tròn bán kính `radius` quanh tâm phổ đã fftshift) ánh xạ về ô đó.
+    Returns: (weights, số điểm cao tần trên toàn phổ)
+    """
+    x, y = np.ogrid[:rows, :cols]
+    high_freq = ((x - rows // 2) ** 2 + (y - cols // 2) ** 2 > radius * radius).astype(np.float64)
+    # Về tọa độ chưa shift
+    high_freq = np.fft.ifftshift(high_freq)
+
+    half = cols // 2 + 1
+    weights = high_freq[:, :half].copy()
+    # Cột v > cols//2 là liên hợp của (-u, cols - v)
+    u = np.arange(rows)[:, None]
+    v = np.arange(half, cols)[None, :]
+    np.add.at(weights, ((-u) % rows, cols - v), high_freq[:, half:])
+
+    weights.setflags(write=False)
+    return weights, float(high_freq.sum())
+
+
+def liveness_features(face_img):
+    """6 đặc trưng liveness của một crop BGR"""
+    gray = cv2.cvtColor(face_img, cv2.COLOR_BGR2GRAY)
+    rows, cols = gray.shape
+
+    # 1. Laplacian variance
+    laplacian_var = cv2.meanStdDev(cv2.Laplacian(gray, cv2.CV_32F))[1][0, 0] ** 2
+
+    # 2. High frequency energy (log |DFT| ngoài vùng tần số thấp)
+    weights, count = high_freq_weights(rows, cols)
+    magnitude = np.log1p(np.abs(np.fft.rfft2(gray)))
+    # Crop nhỏ hơn hình tròn: bản cũ chia 0/0 -> nan
+    high_freq_energy = float(np.vdot(magnitude, weights)) / count if count else float('nan')
+
+    # 3. Brightness uniformity: variance của 16 ô 4x4
+    grid_h, grid_w = rows // 4, cols // 4
+    if grid_h and grid_w:
+        grid = gray[:4 * grid_h, :4 * grid_w].reshape(4, grid_h, 4, grid_w)
+        brightness_uniformity = float(grid.mean(axis=(1, 3), dtype=np.float64).var())
+    else:
+        brightness_uniformity = float('nan')   # bản cũ: mean của ô rỗng -> nan
+
+    # 4. Texture complexity
+    sobel_magnitude = cv2.magnitude(cv2.Sobel(gray, cv2.CV_32F, 1, 0, ksize=3),
+                                    cv2.Sobel(gray, cv2.CV_32F, 0, 1, ksize=3))
+    texture_complexity = cv2.meanStdDev(sobel_magnitude)[1][0, 0] ** 2
+
+    # 5. Color temperature (cv2.mean: trung bình từng kênh B, G, R trong một lần)
+    mean_b, _, mean_r, _ = cv2.mean(face_img)
+    color_temp_ratio = mean_b / (mean_r + 1e-5)
+
+    # 6. Glare
+    glare_ratio = np.count_nonzero(gray > GLARE_LEVEL) / gray.size
+
+    return {
+        'laplacian_var': float(laplacian_var),
+        'high_freq_energy': high_freq_energy,
+        'brightness_uniformity': brightness_uniformity,
+        'texture_complexity': float(texture_complexity),
+        'color_temp_ratio': float(color_temp_ratio),
+        'glare_ratio': float(glare_ratio),
+    }
+
+
+def _score_above(value, table):
+    thresholds, default = table
+    for threshold, score in thresholds:
+        if value > threshold:
+            return score
+    return default
+
+
+def _score_below(value, table):
+    thresholds, default = table
+    for threshold, score in thresholds:
+        if value < threshold:
+            return score
+    return default
+
+
+def score_liveness(features):
+    """(is_real, liveness_confidence) từ 6 đặc trưng"""
+    scores = [
+        _score_above(features['laplacian_var'], LAPLACIAN_SCORES),
+        _score_above(features['high_freq_energy'], HIGH_FREQ_SCORES),
+        _score_above(features['brightness_uniformity'], UNIFORMITY_SCORES),
+        _score_above(features['texture_complexity'], TEXTURE_SCORES),
+        _score_below(features['color_temp_ratio'], COLOR_TEMP_SCORES),
+        _score_below(features['glare_ratio'], GLARE_SCORES),
+    ]
+    liveness_confidence = np.average(scores, weights=WEIGHTS)
+    return liveness_confidence >= REAL_THRESHOLD, liveness_confidence
+
+
+def detect_liveness(face_img):
+    """Liveness của một crop BGR. Returns: (is_real, liveness_confidence)"""
+    return score_liveness(liveness_features(face_img))
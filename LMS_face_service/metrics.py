@@ -0,0 +1,212 @@
+"""
+Metrics registry (Prometheus text format) và log có lấy mẫu
+============================================================
+Counter / Histogram giữ giá trị theo tuple label trong dict, mỗi metric một
+lock: một lần inc / observe chỉ là một lần tra dict + bisect (~2 µs), không
+cần prometheus_client. Gauge đọc giá trị qua callback lúc render (queue
+depth, kích thước gallery...), nên hot path không phải cập nhật gì.
+
+render() xuất text exposition format 0.0.4 cho /api/metrics.
+
+SampledLogger thay print theo từng request: mỗi dòng là một JSON object
+(ts, level, event, các field), info / warning chỉ ghi với xác suất
+sample_rate, error luôn ghi (kèm traceback nếu truyền exc).
+"""
+import json
+import math
+import random
+import threading
+import time
+import traceback
+from bisect import bisect_left
+
+# Giây; đủ rộng cho cả match (< 1 ms) lẫn YOLO + embedding trên CPU
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs += [f'{name}="{_escape(value)}"' for name, value in extra]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][index] += 1
+            state[1] += value
+
+    def count(self, **labels):
+        state = self._values.get(self._key(labels))
+        return sum(state[0]) if state else 0
+
+    def samples(self):
+        with self._lock:
+            items = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+        lines = []
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, [('le', _format_value(bound))])} "
+                             f"{cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class Gauge(Metric):
+    """
+    Giá trị đọc lúc render: callback trả về một số, hoặc dict
+    {tuple label: số} khi có labelnames. None = bỏ qua (vd. component tắt).
+    """
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, callback, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+
+    def samples(self):
+        values = self.callback()
+        if values is None:
+            return []
+        if not self.labelnames:
+            values = {(): values}
+        return [f"{self.name}{_labels(self.labelnames, key)} {_format_value(value)}"
+                for key, value in sorted(values.items()) if value is not None]
+
+
+class CounterFunc(Gauge):
+    """Như Gauge nhưng kiểu counter: callback đọc một bộ đếm tăng dần có sẵn (vd. FrameCache.hits)"""
+    kind = 'counter'
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge(self, name, documentation, callback, labelnames=()):
+        return self._register(Gauge(name, documentation, callback, labelnames))
+
+    def counter_func(self, name, documentation, callback, labelnames=()):
+        return self._register(CounterFunc(name, documentation, callback, labelnames))
+
+    def render(self):
+        """Text exposition format (Content-Type: text/plain; version=0.0.4)"""
+        lines = []
+        for metric in list(self._metrics.values()):
+            try:
+                samples = metric.samples()
+            except Exception as e:
+                # Một gauge lỗi không làm hỏng cả lần scrape
+                samples = []
+                lines.append(f"# {metric.name} unavailable: {_escape(e)}")
+            lines.extend(metric.header())
+            lines.extend(samples)
+        return '\n'.join(lines) + '\n'
+
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class SampledLogger:
+    def __init__(self, sample_rate=1.0, stream=print, rng=random.random):
+        self.sample_rate = sample_rate
+        self.stream = stream
+        self.rng = rng
+        self.dropped = 0
+
+    def log(self, level, event, exc=None, **fields):
+        if level != 'error' and self.sample_rate < 1.0 and self.rng() >= self.sample_rate:
+            self.dropped += 1
+            return False
+        record = {'ts': round(time.time(), 3), 'level': level, 'event': event, **fields}
+        if level != 'error' and self.sample_rate < 1.0:
+            record['sample_rate'] = self.sample_rate
+        if exc is not None:
+            record['error'] = str(exc)
+            record['traceback'] = ''.join(traceback.format_exception(type(exc), exc, exc.__traceback__))
+        self.stream(json.dumps(record, default=str, ensure_ascii=False))
+        return True
+
+    def info(self, event, **fields):
+        return self.log('info', event, **fields)
+
+    def warning(self, event, **fields):
+        return self.log('warning', event, **fields)
+
+    def error(self, event, exc=None, **fields):
+        return self.log('error', event, exc=exc, **fields)
@@ -0,0 +1,84 @@
+"""
+PCA projection cho gallery
+===========================
+Embeddings VGG-Face 2048 chiều có phổ giảm nhanh: vài trăm thành phần chính
+giữ gần hết phương sai. Projection (fit offline trên các embedding đã đăng
+ký, xem fit_projection.py) đưa embeddings về 128-512 chiều; gallery lưu kết
+quả ở float16 và upcast sang float32 theo từng khối khi so khớp.
+
+Không chuẩn hóa lại sau khi chiếu: khoảng cách Euclidean trong không gian PCA
+xấp xỉ (và không lớn hơn) khoảng cách gốc, nên ngưỡng nhận diện giữ nguyên ý
+nghĩa. Phần phương sai bị bỏ đi được báo trong explained_variance.
+"""
+from pathlib import Path
+
+import numpy as np
+
+
+class PCAProjection:
+    """x -> (x - mean) @ components, components (D, d) trực chuẩn"""
+
+    def __init__(self, mean, components, explained_variance=None):
+        self.mean = np.ascontiguousarray(mean, dtype=np.float32)
+        self.components = np.ascontiguousarray(components, dtype=np.float32)
+        self.explained_variance = explained_variance
+
+    @property
+    def input_dim(self):
+        return self.components.shape[0]
+
+    @property
+    def output_dim(self):
+        return self.components.shape[1]
+
+    @classmethod
+    def fit(cls, embeddings, n_components):
+        """
+        Fit trên (N, D) embeddings. Dùng eigendecomposition của ma trận
+        hiệp phương sai (D, D) thay vì SVD của (N, D): chi phí O(N·D²) một lần
+        GEMM, bộ nhớ không phụ thuộc N.
+        """
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        n, dim = embeddings.shape
+        if not 0 < n_components <= dim:
+            raise ValueError(f"n_components must be in 1..{dim}, got {n_components}")
+
+        mean = embeddings.mean(axis=0, dtype=np.float64)
+        cov = np.zeros((dim, dim), dtype=np.float64)
+        for i in range(0, n, 8192):
+            chunk = embeddings[i:i + 8192] - mean
+            cov += chunk.T @ chunk
+        cov /= max(n - 1, 1)
+
+        eigvals, eigvecs = np.linalg.eigh(cov)          # tăng dần
+        order = np.argsort(eigvals)[::-1][:n_components]
+        total = float(eigvals.clip(min=0).sum())
+        explained = float(eigvals[order].clip(min=0).sum() / total) if total > 0 else 1.0
+        return cls(mean, eigvecs[:, order], explained)
+
+    def transform(self, x):
+        """(N, D) hoặc (D,) -> (N, d) hoặc (d,) float32"""
+        x = np.asarray(x, dtype=np.float32)
+        return (x - self.mean) @ self.components
+
+    # ----- I/O -----
+    def save(self, path):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'wb') as f:
+            np.savez(f, mean=self.mean, components=self.components,
+                     explained_variance=np.float64(self.explained_variance if self.explained_variance is not None else np.nan))
+        return path
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            explained = float(data['explained_variance'])
+            return cls(data['mean'], data['components'], None if np.isnan(explained) else explained)
+
+    def stats(self):
+        return {
+            'input_dim': self.input_dim,
+            'output_dim': self.output_dim,
+            'explained_variance': None if self.explained_variance is None else round(self.explained_variance, 4),
+        }
@@ -1,5 +1,6 @@
 """
 Quick register face using existing dataset images via API
+(Cần Flask server đang chạy. Rebuild offline nhanh hơn: python bulk_enroll.py)
 """
 import requests
 import base64
@@ -0,0 +1,148 @@
+"""
+Pipeline nhiều luồng cho vòng lặp realtime (capture -> detect -> embed)
+========================================================================
+Mỗi stage là một thread đọc từ một DropOldestQueue giới hạn: stage phía trước
+chậm hơn thì frame cũ nhất bị bỏ (không xếp hàng), nên độ trễ từ lúc chụp
+tới lúc hiển thị không tăng dần như khi đọc tuần tự từ buffer của camera.
+drop=False: put chờ chỗ trống (đọc file video không bỏ frame, để benchmark
+lặp lại được).
+
+StageCounter đếm item / giây (cửa sổ trượt) và thời gian xử lý trung bình
+cho overlay và báo cáo cuối.
+"""
+import threading
+import time
+import traceback
+from collections import deque
+
+
+class DropOldestQueue:
+    def __init__(self, maxsize=1, drop=True, on_drop=None):
+        self.maxsize = maxsize
+        self.drop = drop
+        self.on_drop = on_drop
+        self._items = deque()
+        self._cond = threading.Condition()
+        self.closed = False
+        self.put_count = 0
+        self.dropped = 0
+
+    def put(self, item):
+        """Thêm item; đầy thì bỏ item cũ nhất (drop=True) hoặc chờ (drop=False). False nếu đã đóng"""
+        dropped = None
+        with self._cond:
+            if not self.drop:
+                while len(self._items) >= self.maxsize and not self.closed:
+                    self._cond.wait()
+            if self.closed:
+                return False
+            if len(self._items) >= self.maxsize:
+                dropped = self._items.popleft()
+                self.dropped += 1
+            self._items.append(item)
+            self.put_count += 1
+            self._cond.notify_all()
+        if dropped is not None and self.on_drop:
+            self.on_drop(dropped)
+        return True
+
+    def get(self, timeout=None):
+        """Item cũ nhất, hoặc None khi hết thời gian chờ / queue đã đóng và rỗng"""
+        with self._cond:
+            if not self._items and not self.closed:
+                self._cond.wait(timeout)
+            if not self._items:
+                return None
+            item = self._items.popleft()
+            self._cond.notify_all()
+            return item
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+    @property
+    def finished(self):
+        return self.closed and not self._items
+
+    def __len__(self):
+        return len(self._items)
+
+
+class StageCounter:
+    def __init__(self, name, window=1.0, clock=time.monotonic):
+        self.name = name
+        self.window = window
+        self.clock = clock
+        self.items = 0
+        self.busy_s = 0.0
+        self._recent = deque()
+
+    def tick(self, busy_s):
+        now = self.clock()
+        self.items += 1
+        self.busy_s += busy_s
+        self._recent.append(now)
+        while self._recent and self._recent[0] < now - self.window:
+            self._recent.popleft()
+
+    def rate(self):
+        """Item / giây trong cửa sổ gần nhất"""
+        now = self.clock()
+        while self._recent and self._recent[0] < now - self.window:
+            self._recent.popleft()
+        return len(self._recent) / self.window
+
+    def stats(self):
+        return {
+            'name': self.name,
+            'items': self.items,
+            'per_s': round(self.rate(), 1),
+            'mean_busy_ms': round(self.busy_s * 1000 / self.items, 2) if self.items else 0.0,
+        }
+
+
+class Stage(threading.Thread):
+    """
+    Thread chạy target(item) cho mỗi item của inbox (hoặc target() lặp lại nếu
+    inbox=None, vd. capture). target trả về False -> stage dừng. Khi dừng,
+    đóng các queue trong outputs để stage phía sau kết thúc theo.
+    """
+
+    def __init__(self, name, target, inbox=None, outputs=(), stop_event=None):
+        super().__init__(name=name, daemon=True)
+        self.target = target
+        self.inbox = inbox
+        self.outputs = list(outputs)
+        self.stop_event = stop_event or threading.Event()
+        self.counter = StageCounter(name)
+        self.errors = 0
+
+    def run(self):
+        try:
+            while not self.stop_event.is_set():
+                if self.inbox is not None:
+                    item = self.inbox.get(timeout=0.1)
+                    if item is None:
+                        if self.inbox.finished:
+                            break
+                        continue
+                    args = (item,)
+                else:
+                    args = ()
+                start = time.perf_counter()
+                try:
+                    result = self.target(*args)
+                except Exception as e:
+                    self.errors += 1
+                    print(f"[WARNING] {self.name}: {e}")
+                    if self.errors == 1:
+                        traceback.print_exc()
+                    continue
+                if result is False:
+                    break
+                self.counter.tick(time.perf_counter() - start)
+        finally:
+            for queue in self.outputs:
+                queue.close()
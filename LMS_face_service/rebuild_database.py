@@ -1,5 +1,6 @@
 """
 Rebuild face embeddings database from dataset folder
+(Cần Flask server đang chạy. Rebuild offline nhanh hơn: python bulk_enroll.py)
 """
 import requests
 import base64
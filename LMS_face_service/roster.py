@@ -0,0 +1,130 @@
+"""
+Class-scoped recognition: roster + LRU caches
+==============================================
+Một buổi học (Session) chỉ có ~50-300 sinh viên trong lớp, nên /api/recognize
+chỉ cần so khớp với các sinh viên đó thay vì toàn bộ gallery.
+
+- RosterCache: session_id -> frozenset(user_id), lấy từ Django và cache có TTL
+- SubsetCache: (roster, gallery.version) -> FaceGallery con đã cắt sẵn, để các
+  frame liên tiếp trong cùng buổi dùng lại ma trận thay vì cắt lại mỗi request
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    """LRU cache thread-safe, mỗi entry có thể có thời hạn (ttl giây)"""
+
+    def __init__(self, maxsize=128, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            value, expires_at = entry
+            if expires_at is not None and expires_at < time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        return {'size': len(self._data), 'maxsize': self.maxsize, 'hits': self.hits, 'misses': self.misses}
+
+
+_MISSING = object()
+
+
+class RosterCache:
+    """
+    Cache roster theo session_id; fetch_roster(session_id) -> list[user_id].
+    log: logger có .warning(event, **fields) (vd. metrics.SampledLogger); None = print
+    """
+
+    def __init__(self, fetch_roster, maxsize=256, ttl=300, retry_after=15, log=None):
+        self.fetch_roster = fetch_roster
+        self.retry_after = retry_after
+        self.log = log
+        self._cache = LRUCache(maxsize=maxsize, ttl=ttl)
+
+    def get(self, session_id):
+        """frozenset user_id của buổi học, hoặc None nếu không lấy được"""
+        key = str(session_id)
+        roster = self._cache.get(key, _MISSING)
+        if roster is not _MISSING:
+            return roster
+
+        try:
+            roster = frozenset(str(user_id) for user_id in self.fetch_roster(session_id))
+            self._cache.put(key, roster)
+        except Exception as e:
+            # Nhớ lỗi một lúc để không gọi lại backend ở mỗi frame
+            if self.log is not None:
+                self.log.warning('roster_fetch_failed', session_id=key, error=str(e))
+            else:
+                print(f"[WARNING] Cannot fetch roster for session {session_id}: {e}")
+            roster = None
+            self._cache.put(key, None, ttl=self.retry_after)
+        return roster
+
+    def invalidate(self, session_id=None):
+        if session_id is None:
+            self._cache.clear()
+        else:
+            self._cache.pop(str(session_id))
+
+    def stats(self):
+        return self._cache.stats()
+
+
+class SubsetCache:
+    """Cache FaceGallery con theo (roster, phiên bản gallery)"""
+
+    def __init__(self, maxsize=64):
+        self._cache = LRUCache(maxsize=maxsize)
+
+    def get(self, gallery, roster):
+        roster = roster if isinstance(roster, frozenset) else frozenset(str(user_id) for user_id in roster)
+        key = (roster, gallery.version)
+        subset = self._cache.get(key)
+        if subset is None:
+            subset = gallery.subset(roster)
+            self._cache.put(key, subset)
+        return subset
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self):
+        return self._cache.stats()
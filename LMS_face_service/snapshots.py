@@ -0,0 +1,129 @@
+"""
+Copy-on-write gallery snapshots
+================================
+Request handler lấy một snapshot FaceGallery (bất biến) ở đầu request và dùng
+nó đến hết request, không cần lock. Register/delete tạo snapshot mới từ
+snapshot hiện tại (FaceGallery.with_embedding / without), lưu xuống store rồi
+mới swap tham chiếu — gán một attribute là atomic, nên reader luôn thấy
+snapshot cũ hoặc mới trọn vẹn, không bao giờ thấy gallery đang sửa dở.
+
+Writer được tuần tự hóa bằng một lock riêng; reader không bao giờ chờ writer.
+
+Snapshot mới dùng chung ma trận với snapshot cũ (đăng ký lại / xóa chỉ để
+lại lỗ). Khi lỗ nhiều (FaceGallery.needs_compaction), một thread nền build
+bản compact ngoài lock rồi swap nếu trong lúc đó không có write nào; có write
+thì compact lại trong write lock (writer chờ một lần copy, reader không chờ),
+để write liên tục không làm lỗ tăng mãi.
+"""
+import threading
+import time
+
+import numpy as np
+
+
+class GalleryRegistry:
+    """Giữ snapshot FaceGallery hiện tại và swap atomic khi có thay đổi"""
+
+    def __init__(self, gallery):
+        self._current = gallery
+        self._write_lock = threading.Lock()
+        self.swaps = 0
+        self.last_swap_at = None
+        self.compactions = 0
+        self._compacting = False
+
+    def snapshot(self):
+        """Snapshot hiện tại; không được sửa tại chỗ"""
+        return self._current
+
+    @property
+    def version(self):
+        return self._current.version
+
+    def put(self, user_id, embedding, persist=None):
+        """
+        Thêm/cập nhật user_id. persist(user_id, embedding) (nếu có) được gọi
+        trước khi swap; nếu nó raise thì snapshot hiện tại giữ nguyên.
+        Returns: snapshot mới
+        """
+        with self._write_lock:
+            gallery = self._current.with_embedding(user_id, embedding)
+            if persist is not None:
+                # Embedding gốc (gallery có thể lưu bản đã chiếu / float16)
+                persist(user_id, np.asarray(embedding, dtype=np.float32))
+            self._publish(gallery)
+            self._maybe_compact()
+            return gallery
+
+    def delete(self, user_id, persist=None):
+        """Xóa user_id. Returns: snapshot mới, hoặc None nếu không tồn tại"""
+        with self._write_lock:
+            if user_id not in self._current:
+                return None
+            gallery = self._current.without(user_id)
+            if persist is not None:
+                persist(user_id)
+            self._publish(gallery)
+            self._maybe_compact()
+            return gallery
+
+    def swap(self, gallery):
+        """Thay toàn bộ gallery (vd. load lại từ store). Returns: snapshot cũ"""
+        with self._write_lock:
+            return self._replace(gallery)
+
+    def reload(self, build):
+        """
+        Thay toàn bộ gallery bằng build() chạy trong write lock: register /
+        delete chờ tới khi xong, reader vẫn dùng snapshot cũ. build raise thì
+        snapshot hiện tại giữ nguyên.
+        Returns: (snapshot cũ, snapshot mới)
+        """
+        with self._write_lock:
+            gallery = build()
+            return self._replace(gallery), gallery
+
+    def _replace(self, gallery):
+        previous = self._current
+        if gallery.version <= previous.version:
+            gallery.version = previous.version + 1
+        self._publish(gallery)
+        return previous
+
+    def _publish(self, gallery):
+        self._current = gallery
+        self.swaps += 1
+        self.last_swap_at = time.time()
+        return gallery
+
+    def _maybe_compact(self):
+        """Gọi trong write lock"""
+        if self._compacting or not self._current.needs_compaction():
+            return
+        self._compacting = True
+        threading.Thread(target=self._compact, args=(self._current,), name='gallery-compact', daemon=True).start()
+
+    def _compact(self, gallery):
+        try:
+            compacted = gallery.compacted()
+            with self._write_lock:
+                if self._current is not gallery:
+                    compacted = self._current.compacted()
+                # Cùng nội dung nên giữ version (cache theo version vẫn đúng)
+                self._publish(compacted)
+                self.compactions += 1
+        except Exception as e:
+            print(f"[WARNING] Gallery compaction failed: {e}")
+        finally:
+            self._compacting = False
+
+    def stats(self):
+        gallery = self._current
+        return {
+            'version': gallery.version,
+            'size': len(gallery),
+            'holes': gallery.holes,
+            'swaps': self.swaps,
+            'compactions': self.compactions,
+            'last_swap_at': self.last_swap_at,
+        }
@@ -0,0 +1,187 @@
+"""
+Streaming recognition: theo dõi khuôn mặt qua nhiều frame + bỏ phiếu
+=====================================================================
+Một RecognitionStream cho mỗi kết nối (WebSocket /api/recognize-stream ở chế
+độ ASGI). Mỗi frame:
+
+1. detect: chọn khuôn mặt lớn nhất, nối vào track hiện tại nếu IoU với box
+   trước >= iou_threshold; mất dấu quá max_missed frame hoặc box nhảy chỗ ->
+   track mới, xóa phiếu (có thể đã đổi người)
+2. chất lượng crop (độ nét, kích thước, độ tin cậy detection, độ sáng); chỉ
+   chạy liveness + embedding khi crop đủ tốt và tốt hơn rõ rệt crop đã embed
+   trước đó, hoặc đã bỏ qua max_gap frame liên tiếp
+3. mỗi lần embed là một phiếu (user_id hoặc None + confidence). Kết luận khi
+   một user có >= min_votes phiếu, chiếm >= agreement tổng phiếu và confidence
+   trung bình >= min_confidence; hoặc mọi phiếu đều cho cùng một user với
+   confidence trung bình >= instant_confidence (một phiếu rất chắc là đủ).
+   fake_votes phiếu liveness fail -> kết luận ảnh giả.
+
+Các hàm model được truyền vào (detect / analyze_crop / match) nên module này
+không phụ thuộc YOLO / TF.
+"""
+import cv2
+
+
+def iou(a, b):
+    x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+    x2, y2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0, x2 - x1) * max(0, y2 - y1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def face_quality(face_crop, detection_confidence, min_size=80, sharpness_ref=150.0):
+    """
+    Điểm chất lượng 0..1 của một face crop: detection confidence x kích thước
+    x độ nét (phương sai Laplacian trên ảnh 96x96) x độ sáng hợp lý.
+    """
+    h, w = face_crop.shape[:2]
+    size = min(1.0, min(h, w) / min_size)
+    gray = cv2.cvtColor(cv2.resize(face_crop, (96, 96), interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2GRAY)
+    sharpness = min(1.0, cv2.Laplacian(gray, cv2.CV_32F).var() / sharpness_ref)
+    brightness = float(gray.mean())
+    exposure = 1.0 if 50 <= brightness <= 210 else 0.5
+    return float(detection_confidence * size * sharpness * exposure)
+
+
+class RecognitionStream:
+    def __init__(self, detect, analyze_crop, match, min_quality=0.35, improve=0.15, max_gap=2,
+                 iou_threshold=0.3, max_missed=3, min_votes=2, agreement=0.6, min_confidence=50.0,
+                 instant_confidence=70.0, fake_votes=2, max_frames=60):
+        """
+        detect(img) -> [(box (x1, y1, x2, y2), confidence), ...]
+        analyze_crop(face_crop) -> {'is_real', 'liveness_confidence', 'embedding'?}
+        match(embedding) -> (user_id | None, distance, confidence)
+        """
+        self.detect = detect
+        self.analyze_crop = analyze_crop
+        self.match = match
+        self.min_quality = min_quality
+        self.improve = improve
+        self.max_gap = max_gap
+        self.iou_threshold = iou_threshold
+        self.max_missed = max_missed
+        self.min_votes = min_votes
+        self.agreement = agreement
+        self.min_confidence = min_confidence
+        self.instant_confidence = instant_confidence
+        self.fake_votes = fake_votes
+        self.max_frames = max_frames
+
+        self.frames = 0
+        self.embedded_frames = 0
+        self.tracks = 0
+        self.decision = None
+        self._reset_track()
+
+    def _reset_track(self, box=None):
+        self.box = box
+        self.missed = 0
+        self.best_quality = 0.0
+        self.since_embed = 0
+        self.votes = []          # [(user_id | None, confidence)]
+        self.fakes = 0
+        if box is not None:
+            self.tracks += 1
+
+    def reset(self):
+        self._reset_track()
+
+    def _select_face(self, faces):
+        """Khuôn mặt lớn nhất; nối track nếu IoU đủ lớn, ngược lại mở track mới"""
+        box, confidence = max(faces, key=lambda f: (f[0][2] - f[0][0]) * (f[0][3] - f[0][1]))
+        if self.box is None or iou(self.box, box) < self.iou_threshold:
+            self._reset_track(box)
+        else:
+            self.box = box
+            self.missed = 0
+        return box, confidence
+
+    def _should_embed(self, quality):
+        if quality < self.min_quality:
+            return False
+        if not self.votes and not self.fakes:
+            return True
+        return quality >= self.best_quality * (1 + self.improve) or self.since_embed >= self.max_gap
+
+    def tally(self):
+        """user_id -> (số phiếu, confidence trung bình)"""
+        counts = {}
+        for user_id, confidence in self.votes:
+            if user_id is None:
+                continue
+            n, total = counts.get(user_id, (0, 0.0))
+            counts[user_id] = (n + 1, total + confidence)
+        return {user_id: (n, total / n) for user_id, (n, total) in counts.items()}
+
+    def _decide(self):
+        if self.fakes >= self.fake_votes:
+            return {'recognized': False, 'is_real': False, 'error': 'Fake face detected'}
+        for user_id, (n, mean_confidence) in self.tally().items():
+            instant = (self.instant_confidence and n == len(self.votes)
+                       and mean_confidence >= self.instant_confidence)
+            agreed = (n >= self.min_votes and n / len(self.votes) >= self.agreement
+                      and mean_confidence >= self.min_confidence)
+            if instant or agreed:
+                return {'recognized': True, 'is_real': True, 'user_id': user_id,
+                        'confidence': round(mean_confidence, 2)}
+        if self.frames >= self.max_frames:
+            return {'recognized': False, 'error': 'No decision within max frames'}
+        return None
+
+    def _result(self, **frame):
+        body = {
+            'type': 'decision' if self.decision else 'progress',
+            'frame': self.frames,
+            'embedded_frames': self.embedded_frames,
+            'tracks': self.tracks,
+            'votes': {user_id: n for user_id, (n, _) in self.tally().items()},
+            **frame,
+        }
+        if self.decision:
+            body.update(self.decision)
+        return body
+
+    def process(self, img):
+        """Một frame -> dict progress hoặc decision (sau decision không xử lý thêm)"""
+        if self.decision:
+            return self._result()
+        self.frames += 1
+
+        faces = self.detect(img)
+        if not faces:
+            self.missed += 1
+            if self.missed > self.max_missed:
+                self._reset_track()
+            self.decision = self._decide()
+            return self._result(face=False)
+
+        (x1, y1, x2, y2), detection_confidence = self._select_face(faces)
+        face_crop = img[y1:y2, x1:x2]
+        quality = face_quality(face_crop, detection_confidence) if face_crop.size else 0.0
+        self.since_embed += 1
+
+        embedded = self._should_embed(quality)
+        if embedded:
+            self.embedded_frames += 1
+            self.since_embed = 0
+            self.best_quality = max(self.best_quality, quality)
+            analysis = self.analyze_crop(face_crop)
+            if not analysis.get('is_real', True):
+                self.fakes += 1
+            elif 'embedding' in analysis:
+                user_id, _, confidence = self.match(analysis['embedding'])
+                self.votes.append((user_id, float(confidence)))
+
+        self.decision = self._decide()
+        return self._result(face=True, box=[int(x1), int(y1), int(x2), int(y2)],
+                            quality=round(quality, 3), embedded=embedded)
+
+    def finish(self):
+        """Client kết thúc stream: trả về kết luận (không nhận diện được nếu chưa đủ phiếu)"""
+        if not self.decision:
+            self.decision = self._decide() or {'recognized': False, 'error': 'Not enough votes'}
+        return self._result()
+
+    def stats(self):
+        return {'frames': self.frames, 'embedded_frames': self.embedded_frames, 'tracks': self.tracks}
@@ -6,6 +6,22 @@ Sử dụng:
 - VGG-Face (keras-vggface): Trích xuất embedding (2622-dim, pretrained)
 - Euclidean Distance: So sánh khoảng cách giữa embeddings
 - Strict threshold: Chỉ nhận diện người có trong database
+- FaceTracker (face_tracker.py): YOLO mỗi --detect-every frame, giữa hai lần
+  detect box được ngoại suy; embedding chỉ chạy cho track mới hoặc track có
+  độ tin cậy danh tính đã giảm. --naive: detect + embed mọi mặt mọi frame
+  (cách cũ) để so sánh FPS / embedding mỗi giây.
+- Pipeline (realtime_pipeline.py): thread capture, detect/track và embed nối
+  bằng queue giới hạn bỏ frame cũ nhất, nên I/O camera và inference chạy
+  song song và độ trễ không dồn lại; main thread chỉ hiển thị. Overlay hiển
+  thị số item / giây của từng stage, số frame bị bỏ và độ trễ.
+  --sequential: một thread như trước để so sánh.
+
+Usage:
+    python utils/realtime_face_recognition.py
+    python utils/realtime_face_recognition.py --detect-every 5
+    python utils/realtime_face_recognition.py --naive --sequential --source video.mp4
+    python utils/realtime_face_recognition.py --headless --source video.mp4            # theo FPS gốc
+    python utils/realtime_face_recognition.py --headless --no-pace --source video.mp4  # không bỏ frame
 
 Author: Generated for Online Classroom System
 Date: 2025-10-19
@@ -14,6 +30,10 @@ Date: 2025-10-19
 import os
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
 
+import argparse
+import copy
+import sys
+import threading
 import cv2
 import numpy as np
 from pathlib import Path
@@ -23,6 +43,11 @@ from ultralytics import YOLO
 import tensorflow as tf
 from tensorflow import keras
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from face_tracker import FaceTracker
+from realtime_pipeline import DropOldestQueue, Stage, StageCounter
+
 # ===========================
 # Cấu hình đường dẫn
 # ===========================
@@ -305,7 +330,349 @@ def draw_face_box(frame, box, label, distance, color):
     cv2.putText(frame, text, (x1 + 5, y1 - 5), 
                 font, font_scale, (255, 255, 255), thickness)
 
-def main():
+def detect_faces(yolo_model, frame, min_conf=0.5):
+    """YOLO -> [((x1, y1, x2, y2), conf)] đã clip vào frame"""
+    results = yolo_model(frame, verbose=False)
+    faces = []
+    if len(results) > 0:
+        for box in results[0].boxes:
+            conf = float(box.conf[0].cpu().numpy())
+            if conf < min_conf:
+                continue
+            x1, y1, x2, y2 = map(int, box.xyxy[0].cpu().numpy())
+            x1 = max(0, x1)
+            y1 = max(0, y1)
+            x2 = min(frame.shape[1], x2)
+            y2 = min(frame.shape[0], y2)
+            if x2 > x1 and y2 > y1:
+                faces.append(((x1, y1, x2, y2), conf))
+    return faces
+
+class Recognizer:
+    """Tracker + model: logic của stage detect và stage embed (dùng chung cho chạy tuần tự và pipeline)"""
+    
+    def __init__(self, args, yolo_model, vggface_model, database):
+        self.naive = args.naive
+        self.detect_every = 1 if args.naive else max(1, args.detect_every)
+        self.yolo_model = yolo_model
+        self.vggface_model = vggface_model
+        self.database = database
+        self.threshold = 0.30
+        self.tracker = FaceTracker(half_life=args.half_life, reembed_below=args.reembed_below,
+                                   min_interval=args.min_interval)
+        self.lock = threading.Lock()   # tracker dùng chung giữa stage detect và stage embed
+        self.frame_idx = 0
+        self.yolo_calls = 0
+        self.embed_calls = 0
+    
+    def track(self, frame):
+        """Stage detect: YOLO mỗi detect_every frame, còn lại ngoại suy. Returns (frame_idx, jobs cần embed)"""
+        self.frame_idx += 1
+        if (self.frame_idx - 1) % self.detect_every != 0:
+            with self.lock:
+                self.tracker.predict()
+            return self.frame_idx, []
+        
+        detections = detect_faces(self.yolo_model, frame)
+        self.yolo_calls += 1
+        with self.lock:
+            tracks = self.tracker.update(detections, self.frame_idx)
+            if self.naive:
+                to_embed = [t for t in tracks if not t.missed]
+            else:
+                to_embed = [t for t in tracks if self.tracker.needs_embedding(t, self.frame_idx)]
+            for track in to_embed:
+                track.pending = True
+            return self.frame_idx, [(track, track.int_box) for track in to_embed]
+    
+    def embed(self, frame, jobs, frame_idx):
+        """Stage embed: liveness + một lần predict cho cả batch crop; cập nhật danh tính track"""
+        crops, live_jobs, fakes = [], [], []
+        for track, (x1, y1, x2, y2) in jobs:
+            face_crop = frame[max(0, y1):y2, max(0, x1):x2]
+            if face_crop.size == 0:
+                continue
+            is_real, liveness_conf = detect_liveness_simple(face_crop)
+            if not is_real:
+                fakes.append((track, liveness_conf))
+                continue
+            face_rgb = cv2.cvtColor(face_crop, cv2.COLOR_BGR2RGB)
+            crops.append(preprocess_face_for_vggface(face_rgb))
+            live_jobs.append((track, liveness_conf))
+        
+        identities = []
+        if crops:
+            embeddings = self.vggface_model.predict(np.concatenate(crops), verbose=0)
+            database, threshold = self.database, self.threshold
+            for (track, liveness_conf), embedding in zip(live_jobs, embeddings):
+                identities.append((track, recognize_face(embedding, database, threshold=threshold), liveness_conf))
+        
+        with self.lock:
+            for track, liveness_conf in fakes:
+                track.set_identity(None, None, 0.0, frame_idx, is_real=False, liveness_confidence=liveness_conf)
+            for track, (person_name, distance, confidence), liveness_conf in identities:
+                track.set_identity(person_name, distance, confidence, frame_idx, liveness_confidence=liveness_conf)
+            for track, _ in jobs:
+                track.pending = False
+        self.embed_calls += len(crops)
+        return len(crops)
+    
+    def release(self, jobs):
+        """Job embed bị bỏ (queue đầy): cho phép track được chọn lại ở lần detect sau"""
+        with self.lock:
+            for track, _ in jobs:
+                track.pending = False
+    
+    def snapshot(self):
+        """Bản sao các track đang hiển thị (stage embed có thể cập nhật track trong lúc vẽ)"""
+        with self.lock:
+            return [copy.copy(track) for track in self.tracker.tracks if not track.missed]
+    
+    def set_database(self, database):
+        self.database = database
+        with self.lock:
+            self.tracker.forget_identities()
+    
+    def set_threshold(self, threshold):
+        self.threshold = threshold
+        with self.lock:
+            self.tracker.forget_identities()
+
+def draw_track(frame, track):
+    """Vẽ box + danh tính của một track"""
+    if track.is_real is False:
+        color = (0, 0, 255)
+        label = f"#{track.id} FAKE ({track.liveness_confidence:.1f}%)"
+        draw_face_box(frame, track.int_box, label, 0, color)
+        return
+    if track.name is None:
+        draw_face_box(frame, track.int_box, f"#{track.id} ...", 0, (200, 200, 200))
+        return
+    
+    if track.name == "Unknown":
+        color = (0, 0, 255)
+    elif track.confidence >= 85:
+        color = (0, 255, 0)
+    elif track.confidence >= 70:
+        color = (0, 255, 255)
+    else:
+        color = (0, 165, 255)
+    
+    label = f"#{track.id} {track.name} ({track.confidence:.1f}%)"
+    draw_face_box(frame, track.int_box, label, track.distance, color)
+
+class VideoSource:
+    """
+    Webcam (số) hoặc file video. File video được phát theo FPS gốc như camera
+    (pace=True): đọc chậm hơn FPS thì chỉ còn tối đa `buffers` frame tồn đọng
+    (như buffer của driver camera), các frame cũ hơn bị bỏ qua.
+    Returns (ok, frame, thời điểm frame được "chụp").
+    """
+    
+    def __init__(self, source, pace=True, buffers=4):
+        self.is_file = not source.isdigit()
+        self.cap = cv2.VideoCapture(source if self.is_file else int(source))
+        if not self.is_file:
+            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
+            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
+        self.pace = pace and self.is_file
+        self.buffers = buffers
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 30.0
+        self.start = None
+        self.next_index = 0
+        self.skipped = 0
+    
+    def isOpened(self):
+        return self.cap.isOpened()
+    
+    def read(self):
+        if not self.pace:
+            ret, frame = self.cap.read()
+            return ret, frame, time.monotonic()
+        
+        now = time.monotonic()
+        if self.start is None:
+            self.start = now
+        latest = int((now - self.start) * self.fps)
+        while self.next_index < latest - self.buffers + 1:
+            if not self.cap.grab():
+                return False, None, now
+            self.next_index += 1
+            self.skipped += 1
+        
+        captured_at = self.start + self.next_index / self.fps
+        if captured_at > now:
+            time.sleep(captured_at - now)
+        ret, frame = self.cap.read()
+        self.next_index += 1
+        return ret, frame, captured_at
+    
+    def release(self):
+        self.cap.release()
+
+class Display:
+    """Stage hiển thị (main thread): vẽ track + overlay counter, phím điều khiển, đo độ trễ"""
+    
+    def __init__(self, args, recognizer, counters, queues):
+        self.args = args
+        self.recognizer = recognizer
+        self.counters = counters
+        self.queues = queues
+        self.counter = StageCounter('display')
+        self.latencies = []
+        self.frames = 0
+    
+    def show(self, frame, tracks, captured_at):
+        """Returns False khi cần dừng (ESC / --max-frames)"""
+        start = time.perf_counter()
+        self.frames += 1
+        latency_ms = (time.monotonic() - captured_at) * 1000
+        self.latencies.append(latency_ms)
+        
+        # Stage embed có thể vẫn đang crop từ frame này: vẽ trên bản sao
+        frame = frame.copy()
+        for track in tracks:
+            draw_track(frame, track)
+        
+        rates = "  ".join(f"{c.name} {c.rate():.1f}/s" for c in self.counters + [self.counter])
+        dropped = sum(q.dropped for q in self.queues)
+        cv2.putText(frame, rates, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
+        cv2.putText(frame, f"Embeds: {self.recognizer.embed_calls}  Dropped: {dropped}  Latency: {latency_ms:.0f} ms",
+                    (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
+        cv2.putText(frame, f"Threshold: {self.recognizer.threshold:.2f}  Tracks: {len(tracks)}", 
+                    (10, 90), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+        
+        keep_going = not (self.args.max_frames and self.frames >= self.args.max_frames)
+        if not self.args.headless:
+            cv2.imshow("Face Recognition", frame)
+            keep_going = self.handle_key(cv2.waitKey(1) & 0xFF) and keep_going
+        
+        self.counter.tick(time.perf_counter() - start)
+        return keep_going
+    
+    def handle_key(self, key):
+        recognizer = self.recognizer
+        if key == 27:
+            return False
+        elif key == ord('r'):
+            print("\n[INFO] Rebuilding database...")
+            database = create_registered_database(
+                recognizer.vggface_model, 
+                DATASET_PATH, 
+                REGISTERED_PEOPLE
+            )
+            if database:
+                recognizer.set_database(database)
+        elif key == ord('+') or key == ord('='):
+            recognizer.set_threshold(min(0.50, recognizer.threshold + 0.02))
+            print(f"[INFO] Threshold: {recognizer.threshold:.2f}")
+        elif key == ord('-') or key == ord('_'):
+            recognizer.set_threshold(max(0.10, recognizer.threshold - 0.02))
+            print(f"[INFO] Threshold: {recognizer.threshold:.2f}")
+        return True
+
+def run_sequential(cap, recognizer, args):
+    """Một thread: read -> detect -> embed -> hiển thị (cách cũ, để so sánh)"""
+    counters = [StageCounter('capture'), StageCounter('detect'), StageCounter('embed')]
+    capture_counter, detect_counter, embed_counter = counters
+    display = Display(args, recognizer, counters, [])
+    
+    while True:
+        start = time.perf_counter()
+        ret, frame, captured_at = cap.read()
+        if not ret:
+            break
+        capture_counter.tick(time.perf_counter() - start)
+        
+        start = time.perf_counter()
+        frame_idx, jobs = recognizer.track(frame)
+        detect_counter.tick(time.perf_counter() - start)
+        
+        if jobs:
+            start = time.perf_counter()
+            recognizer.embed(frame, jobs, frame_idx)
+            embed_counter.tick(time.perf_counter() - start)
+        
+        if not display.show(frame, recognizer.snapshot(), captured_at):
+            break
+    return display, counters, []
+
+def run_pipeline(cap, recognizer, args, drop):
+    """
+    Thread capture -> queue -> thread detect/track -> queue -> thread embed;
+    detect đẩy frame + track hiện tại sang main thread để hiển thị (không chờ embed).
+    drop=True: queue đầy thì bỏ frame / job cũ nhất.
+    """
+    stop = threading.Event()
+    frames = DropOldestQueue(args.queue_size, drop=drop)
+    embed_jobs = DropOldestQueue(args.queue_size, drop=drop, on_drop=lambda job: recognizer.release(job[1]))
+    shown = DropOldestQueue(args.queue_size, drop=drop)
+    queues = [frames, embed_jobs, shown]
+    
+    def capture():
+        ret, frame, captured_at = cap.read()
+        if not ret:
+            return False
+        return frames.put((frame, captured_at))
+    
+    def detect(item):
+        frame, captured_at = item
+        frame_idx, jobs = recognizer.track(frame)
+        if jobs:
+            embed_jobs.put((frame, jobs, frame_idx))
+        shown.put((frame, recognizer.snapshot(), captured_at))
+    
+    def embed(job):
+        recognizer.embed(*job)
+    
+    stages = [
+        Stage('capture', capture, outputs=[frames], stop_event=stop),
+        Stage('detect', detect, inbox=frames, outputs=[embed_jobs, shown], stop_event=stop),
+        Stage('embed', embed, inbox=embed_jobs, stop_event=stop),
+    ]
+    display = Display(args, recognizer, [stage.counter for stage in stages], queues)
+    for stage in stages:
+        stage.start()
+    
+    try:
+        while True:
+            item = shown.get(timeout=0.1)
+            if item is None:
+                if shown.finished:
+                    break
+                if not args.headless:
+                    cv2.waitKey(1)
+                continue
+            if not display.show(*item):
+                break
+    finally:
+        stop.set()
+        for queue in queues:
+            queue.close()
+        for stage in stages:
+            stage.join(timeout=5)
+    return display, [stage.counter for stage in stages], queues
+
+def print_summary(mode, display, counters, queues, cap, recognizer, elapsed):
+    print("\n" + "="*60)
+    print(f"[SUMMARY] Mode: {mode}")
+    print(f"  Displayed: {display.frames} frames in {elapsed:.1f}s -> {display.frames / elapsed:.1f} FPS")
+    for counter in counters:
+        print(f"  {counter.name:>8}: {counter.items} items ({counter.items / elapsed:.1f}/s), "
+              f"{counter.stats()['mean_busy_ms']:.1f} ms each")
+    for name, queue in zip(('frames', 'embed', 'display'), queues):
+        print(f"  Queue {name}: {queue.dropped} dropped of {queue.put_count}")
+    if cap.skipped:
+        print(f"  Source frames skipped (reader fell behind): {cap.skipped}")
+    latencies = np.array(display.latencies)
+    print(f"  Latency capture -> display: mean {latencies.mean():.0f} ms, "
+          f"p95 {np.percentile(latencies, 95):.0f} ms, max {latencies.max():.0f} ms")
+    print(f"  YOLO calls: {recognizer.yolo_calls} ({recognizer.yolo_calls / elapsed:.1f}/s)")
+    print(f"  Embeddings: {recognizer.embed_calls} ({recognizer.embed_calls / elapsed:.1f}/s)")
+    print(f"  Tracks created: {recognizer.tracker.created}")
+    print("="*60 + "\n")
+
+def main(args):
     print("\n" + "="*60)
     print("SIMPLE FACE RECOGNITION - REBUILD DATABASE")
     print("YOLOv8m-face + VGG-Face ResNet50")
@@ -339,131 +706,65 @@ def main():
         print("[ERROR] Failed to create database!")
         return
     
-    print("\n[STEP 3] Opening webcam...\n")
-    cap = cv2.VideoCapture(0)
+    print("\n[STEP 3] Opening video source...\n")
+    cap = VideoSource(args.source, pace=not args.no_pace)
     
     if not cap.isOpened():
-        print("[ERROR] Cannot open webcam")
+        print(f"[ERROR] Cannot open video source: {args.source}")
         return
     
-    cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
-    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
-    print("  ✓ Webcam opened\n")
-    
-    print("[STEP 4] Starting recognition...\n")
-    print("[CONTROLS]")
-    print("  ESC - Exit")
-    print("  'r' - Rebuild database")
-    print("  '+' - Increase threshold")
-    print("  '-' - Decrease threshold")
-    print("\n" + "="*60 + "\n")
-    
-    fps_start = time.time()
-    fps_counter = 0
-    fps_display = 0
-    
-    DISTANCE_THRESHOLD = 0.30
-    
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
-        
-        fps_counter += 1
-        if time.time() - fps_start >= 1.0:
-            fps_display = fps_counter
-            fps_counter = 0
-            fps_start = time.time()
-        
-        results = yolo_model(frame, verbose=False)
-        
-        if len(results) > 0:
-            boxes = results[0].boxes
-            
-            for box in boxes:
-                x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-                conf = box.conf[0].cpu().numpy()
-                
-                if conf < 0.5:
-                    continue
-                
-                x1, y1, x2, y2 = map(int, [x1, y1, x2, y2])
-                x1 = max(0, x1)
-                y1 = max(0, y1)
-                x2 = min(frame.shape[1], x2)
-                y2 = min(frame.shape[0], y2)
-                
-                face_crop = frame[y1:y2, x1:x2]
-                
-                if face_crop.size == 0:
-                    continue
-                
-                try:
-                    is_real, liveness_conf = detect_liveness_simple(face_crop)
-                    
-                    if not is_real:
-                        color = (0, 0, 255)
-                        label = f"FAKE ({liveness_conf:.1f}%)"
-                        draw_face_box(frame, (x1, y1, x2, y2), label, 0, color)
-                        continue
-                    
-                    face_rgb = cv2.cvtColor(face_crop, cv2.COLOR_BGR2RGB)
-                    face_batch = preprocess_face_for_vggface(face_rgb)
-                    current_embedding = vggface_model.predict(face_batch, verbose=0)[0]
-                    
-                    person_name, distance, confidence = recognize_face(
-                        current_embedding, 
-                        database, 
-                        threshold=DISTANCE_THRESHOLD
-                    )
-                    
-                    if person_name == "Unknown":
-                        color = (0, 0, 255)
-                    elif confidence >= 85:
-                        color = (0, 255, 0)
-                    elif confidence >= 70:
-                        color = (0, 255, 255)
-                    else:
-                        color = (0, 165, 255)
-                    
-                    label = f"{person_name} ({confidence:.1f}%)"
-                    draw_face_box(frame, (x1, y1, x2, y2), label, distance, color)
-                    
-                except Exception as e:
-                    continue
-        
-        cv2.putText(frame, f"FPS: {fps_display}", 
-                    (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-        
-        cv2.putText(frame, f"Threshold: {DISTANCE_THRESHOLD:.2f}", 
-                    (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
-        
-        cv2.imshow("Face Recognition", frame)
-        
-        key = cv2.waitKey(1) & 0xFF
-        
-        if key == 27:
-            break
-        elif key == ord('r'):
-            print("\n[INFO] Rebuilding database...")
-            database = create_registered_database(
-                vggface_model, 
-                DATASET_PATH, 
-                REGISTERED_PEOPLE
-            )
-        elif key == ord('+') or key == ord('='):
-            DISTANCE_THRESHOLD = min(0.50, DISTANCE_THRESHOLD + 0.02)
-            print(f"[INFO] Threshold: {DISTANCE_THRESHOLD:.2f}")
-        elif key == ord('-') or key == ord('_'):
-            DISTANCE_THRESHOLD = max(0.10, DISTANCE_THRESHOLD - 0.02)
-            print(f"[INFO] Threshold: {DISTANCE_THRESHOLD:.2f}")
-    
-    cap.release()
-    cv2.destroyAllWindows()
+    print("  ✓ Video source opened\n")
+    
+    if args.headless and not cap.is_file and not args.max_frames:
+        print("[WARNING] Headless webcam mode without --max-frames: stop with Ctrl+C")
+    
+    recognizer = Recognizer(args, yolo_model, vggface_model, database)
+    # Đọc file không theo FPS gốc: không bỏ frame để kết quả lặp lại được
+    drop = not (cap.is_file and args.no_pace)
+    mode = "naive (detect + embed every frame)" if args.naive else f"tracked (detect every {recognizer.detect_every} frames)"
+    mode += ", sequential" if args.sequential else f", pipelined ({'drop-oldest' if drop else 'lossless'} queues)"
+    print(f"[STEP 4] Starting recognition: {mode}\n")
+    if not args.headless:
+        print("[CONTROLS]")
+        print("  ESC - Exit")
+        print("  'r' - Rebuild database")
+        print("  '+' - Increase threshold")
+        print("  '-' - Decrease threshold")
+        print("\n" + "="*60 + "\n")
+    
+    run_start = time.time()
+    try:
+        if args.sequential:
+            display, counters, queues = run_sequential(cap, recognizer, args)
+        else:
+            display, counters, queues = run_pipeline(cap, recognizer, args, drop)
+    finally:
+        cap.release()
+        if not args.headless:
+            cv2.destroyAllWindows()
+    elapsed = time.time() - run_start
+    
+    if display.frames and elapsed > 0:
+        print_summary(mode, display, counters, queues, cap, recognizer, elapsed)
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--source', default='0', help='Chỉ số webcam hoặc đường dẫn file video')
+    parser.add_argument('--naive', action='store_true', help='Detect + embed mọi khuôn mặt mọi frame (cách cũ)')
+    parser.add_argument('--detect-every', type=int, default=3, help='Chạy YOLO mỗi N frame')
+    parser.add_argument('--half-life', type=float, default=90, help='Độ tin cậy danh tính giảm một nửa sau N frame')
+    parser.add_argument('--reembed-below', type=float, default=50.0, help='Embed lại khi độ tin cậy < ngưỡng')
+    parser.add_argument('--min-interval', type=int, default=15, help='Tối thiểu N frame giữa hai lần embed một track')
+    parser.add_argument('--sequential', action='store_true', help='Chạy tuần tự trong một thread (không pipeline)')
+    parser.add_argument('--queue-size', type=int, default=2, help='Kích thước mỗi queue giữa các stage')
+    parser.add_argument('--headless', action='store_true', help='Không mở cửa sổ (benchmark với file video)')
+    parser.add_argument('--no-pace', action='store_true',
+                        help='Đọc file video nhanh nhất có thể, không bỏ frame (mặc định: theo FPS gốc như camera)')
+    parser.add_argument('--max-frames', type=int, default=0, help='Dừng sau N frame hiển thị (0 = không giới hạn)')
+    args = parser.parse_args()
+    
     try:
-        main()
+        main(args)
     except KeyboardInterrupt:
         print("\n[INFO] Interrupted")
     except Exception as e:
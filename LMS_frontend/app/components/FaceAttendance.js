@@ -9,6 +9,8 @@ export default function FaceAttendance({ sessionId, onSuccess, onError }) {
   const videoRef = useRef(null);
   const streamRef = useRef(null);
   const captureIntervalRef = useRef(null);
+  const socketRef = useRef(null);
+  const lastFrameRef = useRef(null);
 
   // Khởi động webcam
   const startWebcam = async () => {
@@ -45,13 +47,18 @@ export default function FaceAttendance({ sessionId, onSuccess, onError }) {
       clearInterval(captureIntervalRef.current);
       captureIntervalRef.current = null;
     }
+    if (socketRef.current) {
+      socketRef.current.onclose = null;
+      socketRef.current.close();
+      socketRef.current = null;
+    }
     setIsCapturing(false);
     setStatus('');
   };
 
-  // Chuyển video frame sang base64
+  // Chụp video frame thành JPEG Blob (gửi nhị phân, không cần base64)
   const captureFrame = () => {
-    if (!videoRef.current) return null;
+    if (!videoRef.current) return Promise.resolve(null);
 
     const canvas = document.createElement('canvas');
     canvas.width = videoRef.current.videoWidth;
@@ -60,24 +67,22 @@ export default function FaceAttendance({ sessionId, onSuccess, onError }) {
     const ctx = canvas.getContext('2d');
     ctx.drawImage(videoRef.current, 0, 0);
     
-    // Chuyển sang base64 (chỉ lấy data, bỏ prefix "data:image/jpeg;base64,")
-    const base64Image = canvas.toDataURL('image/jpeg', 0.8).split(',')[1];
-    return base64Image;
+    return new Promise((resolve) => canvas.toBlob(resolve, 'image/jpeg', 0.8));
   };
 
-  // Gọi Face Recognition API
-  const recognizeFace = async (base64Image) => {
+  // Gọi Face Recognition API (body là ảnh JPEG thô)
+  const recognizeFace = async (imageBlob) => {
     try {
-      const response = await fetch('http://localhost:5000/api/recognize', {
+      const params = new URLSearchParams({
+        session_id: sessionId,
+        threshold: '0.30'
+      });
+      const response = await fetch(`http://localhost:5000/api/recognize-binary?${params}`, {
         method: 'POST',
         headers: {
-          'Content-Type': 'application/json',
+          'Content-Type': 'image/jpeg',
         },
-        body: JSON.stringify({
-          image: base64Image,
-          session_id: sessionId,
-          threshold: 0.30
-        })
+        body: imageBlob
       });
 
       const data = await response.json();
@@ -88,23 +93,26 @@ export default function FaceAttendance({ sessionId, onSuccess, onError }) {
     }
   };
 
-  // Gọi Backend để điểm danh
-  const markAttendance = async (userId, confidence, distance) => {
+  // Gọi Backend để điểm danh. Gửi kèm frame đã nhận diện (multipart 'image'):
+  // backend tự nhận diện lại ảnh này (FACE_VERIFY_ATTENDANCE, mặc định bật)
+  const markAttendance = async (userId, confidence, distance, frame) => {
     try {
       const token = localStorage.getItem('access_token');
-      
+
+      const form = new FormData();
+      form.append('session_id', sessionId);
+      form.append('user_id', userId);
+      form.append('confidence', confidence);
+      form.append('distance', distance);
+      if (frame) form.append('image', frame, 'frame.jpg');
+
+      // Không đặt Content-Type: trình duyệt tự thêm boundary của multipart
       const response = await fetch('http://localhost:8000/api/attendances/mark-with-face/', {
         method: 'POST',
         headers: {
-          'Content-Type': 'application/json',
           'Authorization': `Bearer ${token}`
         },
-        body: JSON.stringify({
-          session_id: sessionId,
-          user_id: userId,
-          confidence: confidence,
-          distance: distance
-        })
+        body: form
       });
 
       const data = await response.json();
@@ -115,17 +123,124 @@ export default function FaceAttendance({ sessionId, onSuccess, onError }) {
     }
   };
 
-  // Quy trình điểm danh tự động
-  const startAttendanceProcess = async () => {
-    if (!streamRef.current) {
-      setError('Vui lòng khởi động camera trước');
+  // Nhận diện xong (polling hoặc stream) -> kiểm tra liveness, gọi backend
+  const handleRecognized = async (recognitionResult, frame) => {
+    // Kiểm tra liveness
+    if (!recognitionResult.is_real) {
+      console.log('❌ Fake face detected! is_real:', recognitionResult.is_real);
+      setError('⚠️ Phát hiện ảnh giả! Vui lòng sử dụng khuôn mặt thật.');
+      setIsCapturing(false);
+      if (onError) onError('Fake face detected');
       return;
     }
 
-    setIsCapturing(true);
-    setStatus('Đang quét khuôn mặt...');
-    setError('');
+    console.log('✅ Liveness check passed! Calling backend...');
+    // Nhận diện thành công -> Gọi backend để điểm danh
+    setStatus(`✅ Nhận diện: ${recognitionResult.user_id} (${recognitionResult.confidence.toFixed(1)}%)`);
+
+    const attendanceResult = await markAttendance(
+      recognitionResult.user_id,
+      recognitionResult.confidence,
+      recognitionResult.distance,
+      frame
+    );
+
+    console.log('📤 Django API Response:', attendanceResult);
+
+    if (attendanceResult.success) {
+      setStatus(`✅ Điểm danh thành công!`);
+      setIsCapturing(false);
+      
+      // Callback thành công
+      if (onSuccess) {
+        onSuccess({
+          user: attendanceResult.user,
+          joined_time: attendanceResult.joined_time,
+          confidence: recognitionResult.confidence
+        });
+      }
+
+      // Tự động tắt webcam sau 3 giây
+      setTimeout(() => {
+        stopWebcam();
+      }, 3000);
+    } else {
+      // Backend lỗi
+      setError(`❌ ${attendanceResult.error || 'Không thể điểm danh'}`);
+      setIsCapturing(false);
+      if (onError) onError(attendanceResult.error);
+    }
+  };
+
+  // Stream qua WebSocket (face service chạy asgi_server.py): gửi frame liên tục
+  // trên một kết nối, server theo dõi khuôn mặt + bỏ phiếu rồi trả kết luận.
+  // Không kết nối được (Flask dev server) -> quay về polling.
+  const startStreamProcess = () => {
+    const params = new URLSearchParams({
+      session_id: sessionId,
+      threshold: '0.30'
+    });
+    const ws = new WebSocket(`ws://localhost:5000/api/recognize-stream?${params}`);
+    let opened = false;
+    let decided = false;
+    socketRef.current = ws;
+
+    const sendFrame = async () => {
+      const frame = await captureFrame();
+      if (ws.readyState !== WebSocket.OPEN) return;
+      if (frame) {
+        lastFrameRef.current = frame;
+        ws.send(frame);
+      } else {
+        setTimeout(sendFrame, 200);
+      }
+    };
+
+    ws.onopen = () => {
+      opened = true;
+      setStatus('Đang nhận diện khuôn mặt...');
+      sendFrame();
+    };
+
+    ws.onmessage = async (event) => {
+      const result = JSON.parse(event.data);
+
+      if (result.type === 'decision') {
+        decided = true;
+        console.log('🔍 Stream decision:', result);
+        if (result.recognized || result.is_real === false) {
+          // Frame cuối cùng đã gửi: khuôn mặt vừa được bỏ phiếu
+          await handleRecognized(result, lastFrameRef.current);
+        } else {
+          setError('❌ Không nhận diện được khuôn mặt. Vui lòng thử lại.');
+          setIsCapturing(false);
+          if (onError) onError(result.error || 'Not recognized');
+        }
+        return;
+      }
 
+      if (result.type === 'progress') {
+        setStatus(result.face
+          ? `Đang nhận diện khuôn mặt... (${result.frame} frame)`
+          : `Đang tìm khuôn mặt... (${result.frame} frame)`);
+      }
+      // Frame tiếp theo sau khi có trả lời (server quá tải -> đợi lâu hơn)
+      setTimeout(sendFrame, result.retry ? 1000 : 300);
+    };
+
+    ws.onclose = () => {
+      socketRef.current = null;
+      if (!opened) {
+        console.log('WebSocket không khả dụng, dùng polling');
+        startPollingProcess();
+      } else if (!decided) {
+        setIsCapturing(false);
+      }
+    };
+  };
+
+  // Polling /api/recognize-binary mỗi 2 giây (Flask dev server)
+  const startPollingProcess = () => {
     let attemptCount = 0;
     const maxAttempts = 20; // Thử 20 lần (khoảng 40 giây)
 
@@ -133,7 +248,7 @@ export default function FaceAttendance({ sessionId, onSuccess, onError }) {
       attemptCount++;
 
       // Capture frame từ video
-      const frame = captureFrame();
+      const frame = await captureFrame();
       if (!frame) {
         setStatus(`Đang chụp... (${attemptCount}/${maxAttempts})`);
         return;
@@ -147,54 +262,8 @@ export default function FaceAttendance({ sessionId, onSuccess, onError }) {
 
       if (recognitionResult.success && recognitionResult.recognized) {
         console.log('✅ Face recognized:', recognitionResult.user_id, 'Confidence:', recognitionResult.confidence);
-        console.log('✅ Face recognized:', recognitionResult.user_id, 'Confidence:', recognitionResult.confidence);
-        // Kiểm tra liveness
-        if (!recognitionResult.is_real) {
-          console.log('❌ Fake face detected! is_real:', recognitionResult.is_real);
-          setError('⚠️ Phát hiện ảnh giả! Vui lòng sử dụng khuôn mặt thật.');
-          setIsCapturing(false);
-          clearInterval(captureIntervalRef.current);
-          if (onError) onError('Fake face detected');
-          return;
-        }
-
-        console.log('✅ Liveness check passed! Calling backend...');
-        // Nhận diện thành công -> Gọi backend để điểm danh
-        setStatus(`✅ Nhận diện: ${recognitionResult.user_id} (${recognitionResult.confidence.toFixed(1)}%)`);
-
-        const attendanceResult = await markAttendance(
-          recognitionResult.user_id,
-          recognitionResult.confidence,
-          recognitionResult.distance
-        );
-
-        console.log('📤 Django API Response:', attendanceResult);
-
-        if (attendanceResult.success) {
-          setStatus(`✅ Điểm danh thành công!`);
-          setIsCapturing(false);
-          clearInterval(captureIntervalRef.current);
-          
-          // Callback thành công
-          if (onSuccess) {
-            onSuccess({
-              user: attendanceResult.user,
-              joined_time: attendanceResult.joined_time,
-              confidence: recognitionResult.confidence
-            });
-          }
-
-          // Tự động tắt webcam sau 3 giây
-          setTimeout(() => {
-            stopWebcam();
-          }, 3000);
-        } else {
-          // Backend lỗi
-          setError(`❌ ${attendanceResult.error || 'Không thể điểm danh'}`);
-          setIsCapturing(false);
-          clearInterval(captureIntervalRef.current);
-          if (onError) onError(attendanceResult.error);
-        }
+        clearInterval(captureIntervalRef.current);
+        await handleRecognized(recognitionResult, frame);
 
       } else if (attemptCount >= maxAttempts) {
         // Hết số lần thử
@@ -210,6 +279,20 @@ export default function FaceAttendance({ sessionId, onSuccess, onError }) {
     }, 2000); // Thử mỗi 2 giây
   };
 
+  // Quy trình điểm danh tự động
+  const startAttendanceProcess = async () => {
+    if (!streamRef.current) {
+      setError('Vui lòng khởi động camera trước');
+      return;
+    }
+
+    setIsCapturing(true);
+    setStatus('Đang quét khuôn mặt...');
+    setError('');
+
+    startStreamProcess();
+  };
+
   // Cleanup khi component unmount
   useEffect(() => {
     return () => {
@@ -279,6 +362,11 @@ export default function FaceAttendance({ sessionId, onSuccess, onError }) {
             onClick={() => {
               setIsCapturing(false);
               clearInterval(captureIntervalRef.current);
+              if (socketRef.current) {
+                socketRef.current.onclose = null;
+                socketRef.current.close();
+                socketRef.current = null;
+              }
               setStatus('Đã dừng quét');
             }}
             className="px-4 py-2 bg-red-600 text-white rounded-lg hover:bg-red-700"